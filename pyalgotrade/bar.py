@@ -260,6 +260,36 @@ class BasicBar(Bar):
             return self.__close
 
 
+def build_bars(dateTimes, opens, highs, lows, closes, volumes, adjCloses, frequency):
+    """Builds many :class:`BasicBar` instances at once without checking OHLC values one bar at a time.
+    Use it only when values were already checked in bulk, for example with
+    :func:`pyalgotrade.barfeed.common.check_ohlc`, or when they come from bars that were already built.
+
+    :param dateTimes: The datetimes.
+    :param opens: The opening prices.
+    :param highs: The highest prices.
+    :param lows: The lowest prices.
+    :param closes: The closing prices.
+    :param volumes: The volumes.
+    :param adjCloses: The adjusted closing prices, or None if they are not available.
+    :param frequency: The frequency of the bars.
+    :rtype: A list of :class:`BasicBar` instances.
+    """
+
+    if adjCloses is None:
+        adjCloses = [None] * len(dateTimes)
+
+    # Bars are built the way they are unpickled, so __init__ checks are skipped.
+    new = BasicBar.__new__
+    setState = BasicBar.__setstate__
+    ret = []
+    for dateTime, open_, high, low, close, volume, adjClose in zip(dateTimes, opens, highs, lows, closes, volumes, adjCloses):
+        bar_ = new(BasicBar)
+        setState(bar_, (dateTime, open_, close, high, low, volume, adjClose, frequency, False))
+        ret.append(bar_)
+    return ret
+
+
 class Bars(object):
 
     """A group of :class:`Bar` objects.
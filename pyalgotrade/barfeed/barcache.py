@@ -0,0 +1,250 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pytz
+
+from pyalgotrade import bar
+from pyalgotrade import utils
+from pyalgotrade.barfeed import common
+from pyalgotrade.utils import dt
+
+
+# Default directory where parsed bars get cached. None disables the cache.
+cache_dir = None
+
+VERSION = 1
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+DTYPE = np.dtype([
+    ("dateTime", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+    ("adjClose", "<f8"),
+    ("hasAdjClose", "?"),
+])
+
+
+def timezone_key(timezone):
+    """Returns a value that identifies a timezone, suitable to be used in cache keys."""
+    if timezone is None:
+        return None
+    return getattr(timezone, "zone", None) or repr(timezone)
+
+
+def datetime_to_micros(dateTime):
+    """Returns the number of microseconds since the epoch. Aware datetimes are converted to UTC first."""
+    if not dt.datetime_is_naive(dateTime):
+        dateTime = dt.unlocalize(dt.as_utc(dateTime))
+    delta = dateTime - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def pack_bars(bars):
+    """Packs bars into a numpy structured array.
+
+    :param bars: The bars to pack.
+    :type bars: list of :class:`pyalgotrade.bar.BasicBar`.
+    :rtype: A (values, frequency, timezone name) tuple, or None if the bars don't share frequency and timezone.
+    """
+
+    frequency = None
+    timezone = None
+    if len(bars):
+        frequency = bars[0].getFrequency()
+        tzinfo = bars[0].getDateTime().tzinfo
+        if tzinfo is not None:
+            timezone = getattr(tzinfo, "zone", None)
+            if timezone is None:
+                return None
+    for bar_ in bars:
+        if type(bar_) != bar.BasicBar or bar_.getFrequency() != frequency:
+            return None
+        tzinfo = bar_.getDateTime().tzinfo
+        if (tzinfo is None and timezone is not None) or (tzinfo is not None and getattr(tzinfo, "zone", None) != timezone):
+            return None
+
+    values = np.zeros(len(bars), dtype=DTYPE)
+    for i, bar_ in enumerate(bars):
+        dateTime = bar_.getDateTime()
+        if timezone is not None:
+            dateTime = dt.unlocalize(dt.as_utc(dateTime))
+        adjClose = bar_.getAdjClose()
+        values[i] = (
+            datetime_to_micros(dateTime), bar_.getOpen(), bar_.getHigh(), bar_.getLow(), bar_.getClose(),
+            bar_.getVolume(), adjClose if adjClose is not None else 0, adjClose is not None
+        )
+    return values, frequency, timezone
+
+
+def micros_to_datetime(micros, timezone=None):
+    """Returns the datetime for a number of microseconds since the epoch, localized to a timezone if one is given."""
+    ret = EPOCH + datetime.timedelta(microseconds=int(micros))
+    if timezone is not None:
+        ret = dt.localize(pytz.utc.localize(ret), timezone)
+    return ret
+
+
+def unpack_bars(values, frequency, timezone):
+    """Builds :class:`pyalgotrade.bar.BasicBar` instances from the values returned by :func:`pack_bars`."""
+
+    if len(values) == 0:
+        return []
+
+    dateTimes = values["dateTime"].astype("datetime64[us]").astype(object).tolist()
+    if timezone is not None:
+        timezone = pytz.timezone(timezone)
+        dateTimes = [dt.localize(pytz.utc.localize(dateTime), timezone) for dateTime in dateTimes]
+    common.check_ohlc(dateTimes, values["open"], values["high"], values["low"], values["close"])
+    adjCloses = [
+        adjClose if hasAdjClose else None
+        for adjClose, hasAdjClose in zip(values["adjClose"].tolist(), values["hasAdjClose"].tolist())
+    ]
+    return bar.build_bars(
+        dateTimes, values["open"].tolist(), values["high"].tolist(), values["low"].tolist(),
+        values["close"].tolist(), values["volume"].tolist(), adjCloses, frequency
+    )
+
+
+def save_packed_bars(basePath, values, frequency, timezone):
+    """Writes the values returned by :func:`pack_bars` to *basePath*.npy, and their frequency and timezone to
+    *basePath*.json, so they can be loaded with :func:`load_packed_bars`."""
+
+    np.save(basePath + ".npy", values)
+    with open(basePath + ".json", "w") as f:
+        json.dump({"version": VERSION, "frequency": frequency, "timezone": timezone}, f)
+
+
+def load_packed_bars(basePath):
+    """Returns the :class:`pyalgotrade.bar.BasicBar` instances saved with :func:`save_packed_bars`."""
+
+    with open(basePath + ".json", "r") as f:
+        metadata = json.load(f)
+    if metadata.get("version") != VERSION:
+        raise Exception("Unsupported version in %s.json" % (basePath))
+    values = np.load(basePath + ".npy", mmap_mode="r")
+    return unpack_bars(values, metadata["frequency"], metadata["timezone"])
+
+
+class BarCache(object):
+    """Caches bars parsed from CSV files in a binary columnar format that gets memory mapped when loaded.
+
+    Entries are keyed by the source file path and the parser settings, and they are invalidated when the
+    source file modification time or size changes.
+
+    :param cacheDir: The directory where cached bars are stored. It will be created if it doesn't exist.
+    :type cacheDir: string.
+
+    .. note::
+        Only :class:`pyalgotrade.bar.BasicBar` instances that share frequency and timezone can be cached.
+    """
+
+    def __init__(self, cacheDir):
+        self.__cacheDir = cacheDir
+
+    def __getBasePath(self, path, cacheKey):
+        name = hashlib.sha1(repr((os.path.abspath(path), cacheKey))).hexdigest()
+        return os.path.join(self.__cacheDir, name)
+
+    def __getMetadata(self, path, cacheKey):
+        stat = os.stat(path)
+        return {
+            "version": VERSION,
+            "path": os.path.abspath(path),
+            "key": repr(cacheKey),
+            "mtime": repr(stat.st_mtime),
+            "size": stat.st_size,
+        }
+
+    def load(self, path, cacheKey):
+        """Returns the bars cached for a given file, or None if they are not available or are out of date.
+
+        :param path: The path to the source file.
+        :type path: string.
+        :param cacheKey: A value that identifies the parser settings.
+        """
+
+        basePath = self.__getBasePath(path, cacheKey)
+        try:
+            with open(basePath + ".json", "r") as f:
+                metadata = json.load(f)
+            expected = self.__getMetadata(path, cacheKey)
+            for key, value in expected.iteritems():
+                if metadata.get(key) != value:
+                    return None
+            values = np.load(basePath + ".npy", mmap_mode="r")
+        except (IOError, OSError, ValueError):
+            return None
+
+        if values.dtype != DTYPE:
+            return None
+        return unpack_bars(values, metadata["frequency"], metadata["timezone"])
+
+    def save(self, path, cacheKey, bars):
+        """Caches the bars parsed from a given file. Returns True if the bars were cached.
+
+        :param path: The path to the source file.
+        :type path: string.
+        :param cacheKey: A value that identifies the parser settings.
+        :param bars: The bars parsed from the file.
+        :type bars: list of :class:`pyalgotrade.bar.BasicBar`.
+        """
+
+        packed = pack_bars(bars)
+        if packed is None:
+            return False
+        values, frequency, timezone = packed
+
+        metadata = self.__getMetadata(path, cacheKey)
+        metadata["frequency"] = frequency
+        metadata["timezone"] = timezone
+
+        if not os.path.exists(self.__cacheDir):
+            os.makedirs(self.__cacheDir)
+        basePath = self.__getBasePath(path, cacheKey)
+        # Write to temporary files and rename them so readers never see partially written entries.
+        # The metadata goes last since it is what makes an entry valid.
+        self.__writeFile(basePath + ".npy", lambda f: np.save(f, values))
+        self.__writeFile(basePath + ".json", lambda f: json.dump(metadata, f))
+        return True
+
+    def __writeFile(self, path, writer):
+        fd, tmpPath = tempfile.mkstemp(dir=self.__cacheDir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                writer(f)
+            utils.set_file_mode(tmpPath, path)
+            if os.path.exists(path):
+                os.remove(path)
+            os.rename(tmpPath, path)
+        except:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+            raise
@@ -18,6 +18,28 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import numpy as np
+
+
+def check_ohlc(dateTimes, open_, high, low, close):
+    """Checks the same OHLC constraints that :class:`pyalgotrade.bar.BasicBar` checks, using numpy arrays."""
+
+    checks = [
+        (high < low, "high < low"),
+        (high < open_, "high < open"),
+        (high < close, "high < close"),
+        (low > open_, "low > open"),
+        (low > close, "low > close"),
+    ]
+    invalid = checks[0][0]
+    for mask, msg in checks[1:]:
+        invalid = invalid | mask
+    if np.any(invalid):
+        pos = np.flatnonzero(invalid)[0]
+        for mask, msg in checks:
+            if mask[pos]:
+                raise Exception("%s on %s" % (msg, dateTimes[pos]))
+
 
 def sanitize_ohlc(open_, high, low, close):
     if low > open_:
@@ -29,3 +51,10 @@ def sanitize_ohlc(open_, high, low, close):
     if high < close:
         high = close
     return open_, high, low, close
+
+
+def sanitize_ohlc_columns(open_, high, low, close):
+    """Same as :func:`sanitize_ohlc` but for numpy arrays. Returns new arrays."""
+    low = np.minimum(np.minimum(low, open_), close)
+    high = np.maximum(np.maximum(high, open_), close)
+    return open_.copy(), high, low, close.copy()
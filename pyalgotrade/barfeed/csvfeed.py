@@ -21,10 +21,22 @@
 from pyalgotrade.utils import dt
 from pyalgotrade.utils import csvutils
 from pyalgotrade.barfeed import membf
+from pyalgotrade.barfeed import barcache
+from pyalgotrade.barfeed import common
+from pyalgotrade.barfeed import offsetindex
 from pyalgotrade import dataseries
+from pyalgotrade.dataseries import resampled
 from pyalgotrade import bar
+from pyalgotrade import resamplebase
+from pyalgotrade import marketsession
+import pyalgotrade.logger
 
+import csv
 import datetime
+import multiprocessing
+import warnings
+
+import numpy as np
 import pytz
 
 
@@ -39,18 +51,121 @@ class RowParser(object):
     def getDelimiter(self):
         raise NotImplementedError()
 
+    # Return a list with all the bars in a file, or None to parse it row by row.
+    def parseBars(self, path):
+        return None
+
+    # Return a dictionary with the raw values in a file as numpy arrays, like GenericRowParser.parseColumns does,
+    # or None if the file can't be parsed in bulk.
+    def parseColumns(self, path):
+        return None
+
+    # Return the timezone that bars get localized to, or None. Datetimes returned by parseColumns are in this timezone.
+    def getTimezone(self):
+        return None
+
+    # Return a value that identifies the parser settings, or None if the bars parsed can't be cached.
+    def getCacheKey(self):
+        return None
+
+    # Called when bars are loaded from the cache instead of being parsed.
+    def barsLoadedFromCache(self, bars):
+        pass
+
+    # Return the bars to load given an iterable with the bars parsed from a file, after the bar filter was applied.
+    # Override to transform bars while the file is being parsed.
+    def processBars(self, bars):
+        return bars
+
+
+def aggregate_bars(bars, frequency):
+    """Yields the bars that result from grouping bars sorted in ascending order into
+    :class:`pyalgotrade.bar.BasicBar` instances of a given frequency. Every bar yielded has the datetime
+    where its range begins.
+
+    :param bars: The bars to group.
+    :type bars: An iterable of :class:`pyalgotrade.bar.Bar`.
+    :param frequency: The grouping frequency. Check :func:`pyalgotrade.resamplebase.is_valid_frequency`.
+    :type frequency: int.
+    """
+
+    range_ = None
+    grouper = None
+    for bar_ in bars:
+        dateTime = bar_.getDateTime()
+        if range_ is not None and range_.belongs(dateTime):
+            grouper.addValue(bar_)
+        else:
+            if grouper is not None:
+                yield grouper.getGrouped()
+            range_ = resamplebase.build_range(dateTime, frequency)
+            grouper = resampled.BarGrouper(range_.getBeginning(), bar_, frequency)
+    if grouper is not None:
+        yield grouper.getGrouped()
+
+
+class AggregatingRowParser(RowParser):
+    """A :class:`RowParser` that groups the bars parsed by another one into bars of a given frequency, as the file
+    is being parsed, so only the grouped bars are held in memory. This is useful to load trades or ticks.
+
+    :param rowParser: The row parser for the rows in the file. Rows must be sorted in ascending order.
+    :type rowParser: :class:`RowParser`.
+    :param frequency: The grouping frequency. Check :func:`pyalgotrade.resamplebase.is_valid_frequency`.
+    :type frequency: int.
+
+    .. note::
+        The bar filter is applied to the bars before grouping them.
+    """
+
+    def __init__(self, rowParser, frequency):
+        if not resamplebase.is_valid_frequency(frequency):
+            raise Exception("Unsupported frequency")
+        self.__rowParser = rowParser
+        self.__frequency = frequency
+
+    def getRowParser(self):
+        return self.__rowParser
+
+    def getFrequency(self):
+        return self.__frequency
+
+    def parseBar(self, csvRowDict):
+        return self.__rowParser.parseBar(csvRowDict)
+
+    def getFieldNames(self):
+        return self.__rowParser.getFieldNames()
+
+    def getDelimiter(self):
+        return self.__rowParser.getDelimiter()
+
+    def parseBars(self, path):
+        return self.__rowParser.parseBars(path)
+
+    def processBars(self, bars):
+        return aggregate_bars(self.__rowParser.processBars(bars), self.__frequency)
+
 
 # Interface for bar filters.
 class BarFilter(object):
     def includeBar(self, bar_):
         raise NotImplementedError()
 
+    # Returns the bars that pass the filter. Override to filter many bars at once.
+    def filterBars(self, bars):
+        return (bar_ for bar_ in bars if self.includeBar(bar_))
+
 
 class DateRangeFilter(BarFilter):
     def __init__(self, fromDate=None, toDate=None):
         self.__fromDate = fromDate
         self.__toDate = toDate
 
+    def getFromDate(self):
+        return self.__fromDate
+
+    def getToDate(self):
+        return self.__toDate
+
     def includeBar(self, bar_):
         if self.__toDate and bar_.getDateTime() > self.__toDate:
             return False
@@ -60,33 +175,127 @@ class DateRangeFilter(BarFilter):
 
 
 # US Equities Regular Trading Hours filter
-# Monday ~ Friday
-# 9:30 ~ 16 (GMT-5)
+# Monday ~ Friday, except holidays
+# 9:30 ~ 16 (US/Eastern), or earlier on early closes
 class USEquitiesRTH(DateRangeFilter):
     timezone = pytz.timezone("US/Eastern")
 
     def __init__(self, fromDate=None, toDate=None):
         DateRangeFilter.__init__(self, fromDate, toDate)
-
-        self.__fromTime = datetime.time(9, 30, 0)
-        self.__toTime = datetime.time(16, 0, 0)
+        self.__calendar = marketsession.USEquities.getCalendar()
 
     def includeBar(self, bar_):
         ret = DateRangeFilter.includeBar(self, bar_)
         if ret:
-            # Check day of week
-            barDay = bar_.getDateTime().weekday()
-            if barDay > 4:
-                return False
-
-            # Check time
-            barTime = dt.localize(bar_.getDateTime(), USEquitiesRTH.timezone).time()
-            if barTime < self.__fromTime:
-                return False
-            if barTime > self.__toTime:
-                return False
+            ret = self.__calendar.inSession(bar_.getDateTime())
+        return ret
+
+    def filterBars(self, bars):
+        bars = [bar_ for bar_ in bars if DateRangeFilter.includeBar(self, bar_)]
+        mask = self.__calendar.inSessionMask([self.__calendar.datetimeToMicros(bar_.getDateTime()) for bar_ in bars])
+        return [bar_ for bar_, include in zip(bars, mask.tolist()) if include]
+
+
+def iter_bars(path, rowParser):
+    """Yields every bar in a CSV file, one row at a time."""
+    with open(path, "r") as f:
+        reader = csvutils.FastDictReader(f, fieldnames=rowParser.getFieldNames(), delimiter=rowParser.getDelimiter())
+        for row in reader:
+            bar_ = rowParser.parseBar(row)
+            if bar_ is not None:
+                yield bar_
+
+
+def parse_bars(path, rowParser):
+    """Returns every bar in a CSV file."""
+    ret = rowParser.parseBars(path)
+    if ret is None:
+        ret = list(iter_bars(path, rowParser))
+    return ret
+
+
+def parse_bars_in_range(path, rowParser, fromDateTime, toDateTime, index):
+    """Yields the bars in a CSV file sorted in ascending order that are within a date range.
+    The file is read starting at the offset given by the index, and reading stops after the first bar past toDateTime."""
+    with open(path, "r") as f:
+        fieldNames = rowParser.getFieldNames()
+        if fieldNames is None:
+            fieldNames = csv.reader([f.readline()], delimiter=rowParser.getDelimiter()).next()
+        f.seek(index.getOffset(fromDateTime))
+        reader = csvutils.FastDictReader(f, fieldnames=fieldNames, delimiter=rowParser.getDelimiter())
+        for row in reader:
+            bar_ = rowParser.parseBar(row)
+            if bar_ is None:
+                continue
+            if toDateTime is not None and bar_.getDateTime() > toDateTime:
+                break
+            if fromDateTime is None or bar_.getDateTime() >= fromDateTime:
+                yield bar_
+
+
+def load_bars_in_range(path, rowParser, barFilter):
+    """Yields the bars in a CSV file that are within the range of a :class:`DateRangeFilter`, using the file's
+    :class:`pyalgotrade.barfeed.offsetindex.OffsetIndex`. Returns None if the filter doesn't restrict dates or
+    the file is not sorted."""
+    if not isinstance(barFilter, DateRangeFilter):
+        return None
+    fromDateTime = barFilter.getFromDate()
+    toDateTime = barFilter.getToDate()
+    if fromDateTime is None and toDateTime is None:
+        return None
+
+    index = offsetindex.get_index(path, rowParser)
+    if index is None:
+        return None
+    return parse_bars_in_range(path, rowParser, fromDateTime, toDateTime, index)
+
+
+def load_unfiltered_bars(path, rowParser, cacheDir):
+    cacheKey = rowParser.getCacheKey()
+    if cacheDir is None or cacheKey is None:
+        ret = rowParser.parseBars(path)
+        if ret is None:
+            ret = iter_bars(path, rowParser)
         return ret
 
+    cache = barcache.BarCache(cacheDir)
+    ret = cache.load(path, cacheKey)
+    if ret is None:
+        ret = parse_bars(path, rowParser)
+        cache.save(path, cacheKey, ret)
+    else:
+        rowParser.barsLoadedFromCache(ret)
+    return ret
+
+
+def load_bars(path, rowParser, cacheDir=None, barFilter=None, useOffsetIndex=False):
+    """Returns the bars in a CSV file that pass the filter, processed by :meth:`RowParser.processBars`.
+    The cache is used if a directory is given and the row parser supports it.
+    If useOffsetIndex is True and barFilter is a :class:`DateRangeFilter`, only the rows within the range are read."""
+    bars = None
+    if useOffsetIndex:
+        bars = load_bars_in_range(path, rowParser, barFilter)
+    if bars is None:
+        bars = load_unfiltered_bars(path, rowParser, cacheDir)
+
+    if barFilter is not None:
+        bars = barFilter.filterBars(bars)
+    return list(rowParser.processBars(bars))
+
+
+# Entry point for worker processes. Returns the row parser (since it may hold state), the bars (packed if requested)
+# and an error message.
+def load_bars_worker(args):
+    rowParser, path, cacheDir, barFilter, useOffsetIndex, pack = args
+    try:
+        bars = load_bars(path, rowParser, cacheDir, barFilter, useOffsetIndex)
+        if pack:
+            # Packed bars are way cheaper to send back to the parent process.
+            bars = barcache.pack_bars(bars) or bars
+        return rowParser, bars, None
+    except Exception, e:
+        return None, None, "%s: %s" % (path, e)
+
 
 class BarFeed(membf.BarFeed):
     """Base class for CSV file based :class:`pyalgotrade.barfeed.BarFeed`.
@@ -99,6 +308,8 @@ class BarFeed(membf.BarFeed):
         membf.BarFeed.__init__(self, frequency, maxLen)
         self.__barFilter = None
         self.__dailyTime = datetime.time(0, 0, 0)
+        self.__cacheDir = None
+        self.__useOffsetIndex = False
 
     def getDailyBarTime(self):
         return self.__dailyTime
@@ -112,16 +323,106 @@ class BarFeed(membf.BarFeed):
     def setBarFilter(self, barFilter):
         self.__barFilter = barFilter
 
+    def getCacheDir(self):
+        """Returns the directory where parsed bars are cached, or None if caching is disabled."""
+        ret = self.__cacheDir
+        if ret is None:
+            ret = barcache.cache_dir
+        return ret
+
+    def setCacheDir(self, cacheDir):
+        """Sets the directory where parsed bars are cached.
+        Subsequent loads of the same file with the same settings will skip parsing until the file changes.
+
+        :param cacheDir: The cache directory. If None, :data:`pyalgotrade.barfeed.barcache.cache_dir` is used.
+        :type cacheDir: string.
+        """
+        self.__cacheDir = cacheDir
+
+    def getUseOffsetIndex(self):
+        return self.__useOffsetIndex
+
+    def setUseOffsetIndex(self, useOffsetIndex):
+        """Enables or disables the use of sidecar offset indexes when a :class:`DateRangeFilter` is set.
+        When enabled, an index mapping datetimes to byte offsets is built the first time a file is loaded with a
+        date range, and saved next to it (as *path*.idx) so later loads seek directly to the first row in range
+        and stop reading after the last one.
+
+        :param useOffsetIndex: True to use offset indexes.
+        :type useOffsetIndex: boolean.
+
+        .. note::
+            * Files that are not sorted in ascending order are loaded without using the index.
+            * Bars loaded using the index are not cached.
+        """
+        self.__useOffsetIndex = useOffsetIndex
+
+    def createRowParser(self, timezone=None):
+        """Returns the :class:`RowParser` used to load files.
+        Subclasses need to override this to support :meth:`addBarsFromCSVFiles`.
+
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        """
+        raise NotImplementedError()
+
+    # Called after the bars loaded using a row parser are added.
+    def onBarsLoaded(self, instrument, rowParser):
+        pass
+
+    def __addLoadedBars(self, instrument, bars, rowParser):
+        self.addBarsFromSequence(instrument, bars)
+        self.onBarsLoaded(instrument, rowParser)
+
     def addBarsFromCSV(self, instrument, path, rowParser):
-        # Load the csv file
-        loadedBars = []
-        reader = csvutils.FastDictReader(open(path, "r"), fieldnames=rowParser.getFieldNames(), delimiter=rowParser.getDelimiter())
-        for row in reader:
-            bar_ = rowParser.parseBar(row)
-            if bar_ is not None and (self.__barFilter is None or self.__barFilter.includeBar(bar_)):
-                loadedBars.append(bar_)
+        bars = load_bars(path, rowParser, self.getCacheDir(), self.__barFilter, self.__useOffsetIndex)
+        self.__addLoadedBars(instrument, bars, rowParser)
 
-        self.addBarsFromSequence(instrument, loadedBars)
+    def addBarsFromCSVFiles(self, files, timezone=None, processes=1, skipErrors=False):
+        """Loads bars from many CSV formatted files, optionally parsing them in parallel using a pool of
+        worker processes. Bars are added in the same order the files were given, regardless of the order
+        in which they were parsed.
+
+        :param files: A list of (instrument, path) tuples.
+        :type files: list.
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        :param processes: The number of worker processes. 1 parses the files in this process, and None uses as many
+            processes as CPUs.
+        :type processes: int.
+        :param skipErrors: True to log errors and keep on loading the rest of the files. If False, an exception
+            with every error is raised and no bars are added.
+        :type skipErrors: boolean.
+        """
+
+        cacheDir = self.getCacheDir()
+        parallel = processes != 1 and len(files) > 1
+        tasks = [
+            (self.createRowParser(timezone), path, cacheDir, self.__barFilter, self.__useOffsetIndex, parallel)
+            for instrument, path in files
+        ]
+        if parallel:
+            pool = multiprocessing.Pool(processes)
+            try:
+                results = pool.map(load_bars_worker, tasks, chunksize=1)
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            results = map(load_bars_worker, tasks)
+
+        errors = [error for rowParser, bars, error in results if error is not None]
+        if len(errors) and not skipErrors:
+            raise Exception("Failed to load %d file(s):\n%s" % (len(errors), "\n".join(errors)))
+
+        logger = pyalgotrade.logger.getLogger("csvfeed")
+        for (instrument, path), (rowParser, bars, error) in zip(files, results):
+            if error is not None:
+                logger.error(error)
+                continue
+            if isinstance(bars, tuple):
+                bars = barcache.unpack_bars(*bars)
+            self.__addLoadedBars(instrument, bars, rowParser)
 
 
 class GenericRowParser(RowParser):
@@ -140,6 +441,23 @@ class GenericRowParser(RowParser):
         self.__volumeColName = columnNames["volume"]
         self.__adjCloseColName = columnNames["adj_close"]
 
+    def getTimezone(self):
+        return self.__timezone
+
+    def getCacheKey(self):
+        return (
+            "GenericRowParser", self.__dateTimeFormat, self.__dailyBarTime, self.__frequency,
+            barcache.timezone_key(self.__timezone), self.__dateTimeColName, self.__openColName,
+            self.__highColName, self.__lowColName, self.__closeColName, self.__volumeColName,
+            self.__adjCloseColName
+        )
+
+    def barsLoadedFromCache(self, bars):
+        for bar_ in bars:
+            if bar_.getAdjClose() is not None:
+                self.__haveAdjClose = True
+                break
+
     def _parseDate(self, dateString):
         ret = datetime.datetime.strptime(dateString, self.__dateTimeFormat)
 
@@ -160,6 +478,101 @@ class GenericRowParser(RowParser):
     def getDelimiter(self):
         return ","
 
+    def parseColumns(self, path):
+        """Parses a whole file into numpy arrays.
+
+        Returns a dictionary with the datetime (datetime64[us], not localized), open, high, low, close, volume and
+        adj_close (None if not available) columns, or None if the file can't be parsed in bulk. That is the case if the
+        datetime is not the first column or it has a variable width, if there are missing or non numeric values, or if
+        values are quoted.
+        """
+
+        layout = csvutils.get_fixed_datetime_layout(self.__dateTimeFormat)
+        if layout is None:
+            return None
+        width = layout[0]
+        delimiter = self.getDelimiter()
+
+        with open(path, "rb") as f:
+            data = f.read()
+        pos = data.find("\n")
+        if pos == -1 or data.find('"') != -1:
+            return None
+        fieldNames = data[:pos].rstrip("\r").split(delimiter)
+        body = data[pos+1:].rstrip("\r\n")
+        if len(body) == 0 or len(fieldNames) < 2 or fieldNames[0] != self.__dateTimeColName:
+            return None
+        body += "\n"
+
+        buf = np.frombuffer(body, dtype=np.uint8)
+        lineEnds = np.flatnonzero(buf == ord("\n"))
+        lineBegins = np.empty_like(lineEnds)
+        lineBegins[0] = 0
+        lineBegins[1:] = lineEnds[:-1] + 1
+        # Every line must have the datetime followed by the delimiter. This also rules out empty lines.
+        if np.any(lineEnds - lineBegins <= width) or np.any(buf[lineBegins + width] != ord(delimiter)):
+            return None
+        offsets = lineBegins[:, np.newaxis] + np.arange(width + 1)
+        dateTimes = csvutils.parse_fixed_datetimes(buf[offsets[:, :width]], layout)
+        if dateTimes is None:
+            return None
+
+        # Blank out the datetimes and join every line so the rest of the values can be parsed in one go.
+        numbers = buf.copy()
+        numbers[offsets] = ord(" ")
+        numbers[numbers == ord("\r")] = ord(" ")
+        numbers[lineEnds] = ord(delimiter)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            values = np.fromstring(numbers.tostring(), sep=delimiter)
+        # Parsing stops on the first missing or non numeric value.
+        columnCount = len(fieldNames) - 1
+        if values.size != len(lineEnds) * columnCount:
+            return None
+        values = values.reshape(len(lineEnds), columnCount)
+
+        if self.__dailyBarTime is not None:
+            dailyBarTime = self.__dailyBarTime
+            micros = ((dailyBarTime.hour * 60 + dailyBarTime.minute) * 60 + dailyBarTime.second) * 1000000 + dailyBarTime.microsecond
+            dateTimes = dateTimes.astype("datetime64[D]").astype("datetime64[us]") + np.timedelta64(micros, "us")
+
+        ret = {"datetime": dateTimes, "adj_close": None}
+        columns = [
+            ("open", self.__openColName),
+            ("high", self.__highColName),
+            ("low", self.__lowColName),
+            ("close", self.__closeColName),
+            ("volume", self.__volumeColName),
+            ("adj_close", self.__adjCloseColName),
+        ]
+        for key, colName in columns:
+            if colName in fieldNames[1:]:
+                ret[key] = values[:, fieldNames.index(colName) - 1]
+            elif key != "adj_close":
+                return None
+        return ret
+
+    def parseBars(self, path):
+        columns = self.parseColumns(path)
+        if columns is None:
+            return None
+
+        dateTimes = columns["datetime"].astype(object).tolist()
+        if self.__timezone:
+            dateTimes = [dt.localize(dateTime, self.__timezone) for dateTime in dateTimes]
+        common.check_ohlc(dateTimes, columns["open"], columns["high"], columns["low"], columns["close"])
+
+        adjCloses = None
+        if columns["adj_close"] is not None:
+            adjCloses = columns["adj_close"].tolist()
+            self.__haveAdjClose = True
+
+        # Values were checked in bulk, so there is no need to check every bar.
+        return bar.build_bars(
+            dateTimes, columns["open"].tolist(), columns["high"].tolist(), columns["low"].tolist(),
+            columns["close"].tolist(), columns["volume"].tolist(), adjCloses, self.__frequency
+        )
+
     def parseBar(self, csvRowDict):
         dateTime = self._parseDate(csvRowDict[self.__dateTimeColName])
         open_ = float(csvRowDict[self.__openColName])
@@ -245,12 +658,14 @@ class GenericBarFeed(BarFeed):
         :type timezone: A pytz timezone.
         """
 
+        BarFeed.addBarsFromCSV(self, instrument, path, self.createRowParser(timezone))
+
+    def createRowParser(self, timezone=None):
         if timezone is None:
             timezone = self.__timezone
+        return GenericRowParser(self.__columnNames, self.__dateTimeFormat, self.getDailyBarTime(), self.getFrequency(), timezone)
 
-        rowParser = GenericRowParser(self.__columnNames, self.__dateTimeFormat, self.getDailyBarTime(), self.getFrequency(), timezone)
-        BarFeed.addBarsFromCSV(self, instrument, path, rowParser)
-
+    def onBarsLoaded(self, instrument, rowParser):
         if rowParser.barsHaveAdjClose():
             self.__haveAdjClose = True
         elif self.__haveAdjClose:
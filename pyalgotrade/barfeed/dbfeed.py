@@ -19,19 +19,38 @@
 """
 
 
+# Number of bars that addBarsFromFeed accumulates before adding them to the database.
+DEFAULT_BATCH_SIZE = 10000
+
+
 class Database(object):
     def addBars(self, bars, frequency):
-        for instrument in bars.getInstruments():
-            bar = bars.getBar(instrument)
-            self.addBar(instrument, bar, frequency)
+        self.addManyBars([(instrument, bars.getBar(instrument)) for instrument in bars.getInstruments()], frequency)
 
-    def addBarsFromFeed(self, feed):
+    def addBarsFromFeed(self, feed, batchSize=DEFAULT_BATCH_SIZE):
+        batch = []
         for dateTime, bars in feed:
             if bars:
-                self.addBars(bars, feed.getFrequency())
+                for instrument in bars.getInstruments():
+                    batch.append((instrument, bars.getBar(instrument)))
+                if len(batch) >= batchSize:
+                    self.addManyBars(batch, feed.getFrequency())
+                    batch = []
+        if len(batch):
+            self.addManyBars(batch, feed.getFrequency())
+
+    # Adds a list of (instrument, bar) tuples.
+    # Subclasses should override this to add many bars more efficiently than one at a time.
+    def addManyBars(self, instrumentBars, frequency):
+        for instrument, bar in instrumentBars:
+            self.addBar(instrument, bar, frequency)
 
     def addBar(self, instrument, bar, frequency):
         raise NotImplementedError()
 
     def getBars(self, instrument, frequency, timezone=None, fromDateTime=None, toDateTime=None):
         raise NotImplementedError()
+
+    # Returns the datetime of the last bar stored for an instrument, in UTC, or None if there are no bars.
+    def getLastDateTime(self, instrument, frequency):
+        raise NotImplementedError()
@@ -21,6 +21,7 @@
 """
 
 from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import barcache
 from pyalgotrade.barfeed import common
 from pyalgotrade.utils import dt
 from pyalgotrade import bar
@@ -73,6 +74,9 @@ class RowParser(csvfeed.RowParser):
             ret = dt.localize(ret, self.__timezone)
         return ret
 
+    def getCacheKey(self):
+        return ("googlefeed", self.__dailyBarTime, self.__frequency, barcache.timezone_key(self.__timezone), self.__sanitize)
+
     def getFieldNames(self):
         # It is expected for the first row to have the field names.
         return None
@@ -140,8 +144,10 @@ class Feed(csvfeed.BarFeed):
         :type timezone: A pytz timezone.
         """
 
+        csvfeed.BarFeed.addBarsFromCSV(self, instrument, path, self.createRowParser(timezone))
+
+    def createRowParser(self, timezone=None):
         if timezone is None:
             timezone = self.__timezone
 
-        rowParser = RowParser(self.getDailyBarTime(), self.getFrequency(), timezone, self.__sanitizeBars)
-        csvfeed.BarFeed.addBarsFromCSV(self, instrument, path, rowParser)
+        return RowParser(self.getDailyBarTime(), self.getFrequency(), timezone, self.__sanitizeBars)
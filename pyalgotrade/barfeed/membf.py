@@ -21,7 +21,6 @@
 from pyalgotrade import barfeed
 from pyalgotrade import dataseries
 from pyalgotrade import bar
-from pyalgotrade import utils
 
 
 # A non real-time BarFeed responsible for:
@@ -38,12 +37,15 @@ class BarFeed(barfeed.BaseBarFeed):
         self.__nextPos = {}
         self.__started = False
         self.__currDateTime = None
+        self.__timeline = None
+        self.__timelinePos = 0
 
     def reset(self):
         self.__nextPos = {}
         for instrument in self.__bars.keys():
             self.__nextPos.setdefault(instrument, 0)
         self.__currDateTime = None
+        self.__timeline = None
         barfeed.BaseBarFeed.reset(self)
 
     def getCurrentDateTime(self):
@@ -51,6 +53,7 @@ class BarFeed(barfeed.BaseBarFeed):
 
     def start(self):
         self.__started = True
+        self.__getTimeline()
 
     def stop(self):
         pass
@@ -67,44 +70,70 @@ class BarFeed(barfeed.BaseBarFeed):
 
         # Add and sort the bars
         self.__bars[instrument].extend(bars)
-        barCmp = lambda x, y: cmp(x.getDateTime(), y.getDateTime())
-        self.__bars[instrument].sort(barCmp)
+        self.__bars[instrument].sort(key=lambda bar: bar.getDateTime())
+        self.__timeline = None
 
         self.registerInstrument(instrument)
 
-    def eof(self):
-        ret = True
-        # Check if there is at least one more bar to return.
+    # The timeline is a sorted list of (datetime, instruments) tuples with the instruments that have a bar for each
+    # datetime, built from the union of the remaining bars. This way each bar set is built only looking at those
+    # instruments that actually have a bar, and both eof() and peekDateTime() don't depend on the number of instruments.
+    def __buildTimeline(self):
+        instrumentsByDateTime = {}
         for instrument, bars in self.__bars.iteritems():
-            nextPos = self.__nextPos[instrument]
-            if nextPos < len(bars):
-                ret = False
-                break
+            for i in xrange(self.__nextPos[instrument], len(bars)):
+                instrumentsByDateTime.setdefault(bars[i].getDateTime(), []).append(instrument)
+
+        ret = []
+        for dateTime in sorted(instrumentsByDateTime.keys()):
+            instruments = instrumentsByDateTime[dateTime]
+            if len(set(instruments)) == len(instruments):
+                ret.append((dateTime, instruments))
+            else:
+                # Duplicate bars are split into multiple entries with the same datetime. getNextBars will fail on those.
+                while len(instruments):
+                    entry = []
+                    remaining = []
+                    for instrument in instruments:
+                        if instrument in entry:
+                            remaining.append(instrument)
+                        else:
+                            entry.append(instrument)
+                    ret.append((dateTime, entry))
+                    instruments = remaining
         return ret
 
+    def __getTimeline(self):
+        if self.__timeline is None:
+            self.__timeline = self.__buildTimeline()
+            self.__timelinePos = 0
+        return self.__timeline
+
+    def eof(self):
+        timeline = self.__getTimeline()
+        return self.__timelinePos >= len(timeline)
+
     def peekDateTime(self):
         ret = None
-
-        for instrument, bars in self.__bars.iteritems():
-            nextPos = self.__nextPos[instrument]
-            if nextPos < len(bars):
-                ret = utils.safe_min(ret, bars[nextPos].getDateTime())
+        timeline = self.__getTimeline()
+        if self.__timelinePos < len(timeline):
+            ret = timeline[self.__timelinePos][0]
         return ret
 
     def getNextBars(self):
         # All bars must have the same datetime. We will return all the ones with the smallest datetime.
-        smallestDateTime = self.peekDateTime()
-
-        if smallestDateTime is None:
+        timeline = self.__getTimeline()
+        if self.__timelinePos >= len(timeline):
             return None
 
-        # Make a second pass to get all the bars that had the smallest datetime.
+        smallestDateTime, instruments = timeline[self.__timelinePos]
+        self.__timelinePos += 1
+
         ret = {}
-        for instrument, bars in self.__bars.iteritems():
+        for instrument in instruments:
             nextPos = self.__nextPos[instrument]
-            if nextPos < len(bars) and bars[nextPos].getDateTime() == smallestDateTime:
-                ret[instrument] = bars[nextPos]
-                self.__nextPos[instrument] += 1
+            ret[instrument] = self.__bars[instrument][nextPos]
+            self.__nextPos[instrument] = nextPos + 1
 
         if self.__currDateTime == smallestDateTime:
             raise Exception("Duplicate bars found for %s on %s" % (ret.keys(), smallestDateTime))
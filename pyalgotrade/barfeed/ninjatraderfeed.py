@@ -20,6 +20,7 @@
 
 import pyalgotrade.barfeed
 from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import barcache
 from pyalgotrade import bar
 from pyalgotrade import dataseries
 from pyalgotrade.utils import dt
@@ -85,6 +86,9 @@ class RowParser(csvfeed.RowParser):
             ret = dt.localize(ret, self.__timezone)
         return ret
 
+    def getCacheKey(self):
+        return ("ninjatraderfeed", self.__frequency, self.__dailyBarTime, barcache.timezone_key(self.__timezone))
+
     def getFieldNames(self):
         return ["Date Time", "Open", "High", "Low", "Close", "Volume"]
 
@@ -138,11 +142,13 @@ class Feed(csvfeed.BarFeed):
         :type timezone: A pytz timezone.
         """
 
+        csvfeed.BarFeed.addBarsFromCSV(self, instrument, path, self.createRowParser(timezone))
+
+    def createRowParser(self, timezone=None):
         if isinstance(timezone, int):
             raise Exception("timezone as an int parameter is not supported anymore. Please use a pytz timezone instead.")
 
         if timezone is None:
             timezone = self.__timezone
 
-        rowParser = RowParser(self.getFrequency(), self.getDailyBarTime(), timezone)
-        csvfeed.BarFeed.addBarsFromCSV(self, instrument, path, rowParser)
+        return RowParser(self.getFrequency(), self.getDailyBarTime(), timezone)
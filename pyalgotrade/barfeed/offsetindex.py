@@ -0,0 +1,243 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import bisect
+import copy
+import csv
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from pyalgotrade import utils
+from pyalgotrade.barfeed import barcache
+from pyalgotrade.utils import dt
+
+
+VERSION = 1
+
+# An index entry is recorded for the first row after every block of this many bytes.
+BLOCK_SIZE = 64 * 1024
+
+
+def datetime_to_seconds(dateTime):
+    """Returns the number of whole seconds since the epoch. Aware datetimes are converted to UTC first."""
+    if not dt.datetime_is_naive(dateTime):
+        dateTime = dt.unlocalize(dt.as_utc(dateTime))
+    return barcache.datetime_to_micros(dateTime) // 1000000
+
+
+def get_index_path(path):
+    return path + ".idx"
+
+
+class OffsetIndex(object):
+    """A sparse index that maps bar datetimes to byte offsets in a CSV file sorted in ascending order.
+
+    :param timestamps: Seconds since the epoch for the indexed rows, as returned by :func:`datetime_to_seconds`.
+    :type timestamps: list.
+    :param offsets: The byte offsets where the indexed rows start.
+    :type offsets: list.
+    :param dataOffset: The byte offset where the first row after the header starts.
+    :type dataOffset: int.
+    :param sorted: False if the file was found not to be sorted, in which case the index can't be used.
+    :type sorted: boolean.
+    """
+
+    def __init__(self, timestamps, offsets, dataOffset, sorted=True):
+        assert(len(timestamps) == len(offsets))
+        self.__timestamps = timestamps
+        self.__offsets = offsets
+        self.__dataOffset = dataOffset
+        self.__sorted = sorted
+
+    def isSorted(self):
+        return self.__sorted
+
+    def getTimestamps(self):
+        return self.__timestamps
+
+    def getOffsets(self):
+        return self.__offsets
+
+    def getDataOffset(self):
+        return self.__dataOffset
+
+    def getOffset(self, fromDateTime):
+        """Returns the byte offset to start reading from so that no row with a datetime greater than or equal to
+        fromDateTime gets skipped.
+
+        :param fromDateTime: The datetime to seek to. If None, the offset where the data begins is returned.
+        :type fromDateTime: datetime.datetime.
+        """
+
+        ret = self.__dataOffset
+        if fromDateTime is not None:
+            # Timestamps are truncated to whole seconds, so the row found is strictly before fromDateTime,
+            # and so are all the rows before it.
+            pos = bisect.bisect_left(self.__timestamps, datetime_to_seconds(fromDateTime)) - 1
+            if pos >= 0:
+                ret = self.__offsets[pos]
+        return ret
+
+
+def parse_timestamp(rowParser, fieldNames, line):
+    values = csv.reader([line], delimiter=rowParser.getDelimiter()).next()
+    bar_ = rowParser.parseBar(dict(zip(fieldNames, values)))
+    if bar_ is None:
+        return None
+    return datetime_to_seconds(bar_.getDateTime())
+
+
+def build_index(path, rowParser, blockSize=BLOCK_SIZE):
+    """Builds an :class:`OffsetIndex` for a CSV file.
+
+    :param path: The path to the CSV file.
+    :type path: string.
+    :param rowParser: The parser for the rows in the file. It will not be modified.
+    :type rowParser: :class:`pyalgotrade.barfeed.csvfeed.RowParser`.
+    :param blockSize: The approximate number of bytes between index entries.
+    :type blockSize: int.
+    :rtype: An :class:`OffsetIndex`.
+    """
+
+    # Parsers may hold state, so a copy is used to parse the sampled rows.
+    rowParser = copy.deepcopy(rowParser)
+    timestamps = []
+    offsets = []
+    with open(path, "r") as f:
+        fieldNames = rowParser.getFieldNames()
+        if fieldNames is None:
+            fieldNames = csv.reader([f.readline()], delimiter=rowParser.getDelimiter()).next()
+        dataOffset = f.tell()
+
+        # Besides the indexed rows, the rows that follow them and the last row are parsed to check that the file
+        # is sorted, so files sorted in descending order are detected even if they are small.
+        nextOffset = dataOffset
+        checkNext = False
+        lastLine = None
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if line == "":
+                break
+            if line.strip() == "":
+                continue
+            lastLine = line
+            if offset < nextOffset and not checkNext:
+                continue
+
+            timestamp = parse_timestamp(rowParser, fieldNames, line)
+            if timestamp is None:
+                continue
+            if len(timestamps) and timestamp < timestamps[-1]:
+                return OffsetIndex([], [], dataOffset, False)
+            checkNext = offset >= nextOffset
+            if checkNext:
+                timestamps.append(timestamp)
+                offsets.append(offset)
+                nextOffset = offset + blockSize
+
+        if lastLine is not None and len(timestamps):
+            timestamp = parse_timestamp(rowParser, fieldNames, lastLine)
+            if timestamp is not None and timestamp < timestamps[-1]:
+                return OffsetIndex([], [], dataOffset, False)
+
+    return OffsetIndex(timestamps, offsets, dataOffset)
+
+
+def get_metadata(path, cacheKey):
+    stat = os.stat(path)
+    return {
+        "version": VERSION,
+        "key": repr(cacheKey),
+        "mtime": repr(stat.st_mtime),
+        "size": stat.st_size,
+    }
+
+
+def load_index(path, cacheKey):
+    """Loads the sidecar index for a CSV file. Returns None if it is not available or is out of date."""
+
+    try:
+        with open(get_index_path(path), "rb") as f:
+            values = np.load(f)
+            metadata = json.loads(str(values["metadata"]))
+            for key, value in get_metadata(path, cacheKey).iteritems():
+                if metadata.get(key) != value:
+                    return None
+            return OffsetIndex(
+                values["timestamps"].tolist(), values["offsets"].tolist(), metadata["dataOffset"], metadata["sorted"]
+            )
+    except (IOError, OSError, ValueError, KeyError):
+        return None
+
+
+def save_index(path, cacheKey, index):
+    """Saves the sidecar index for a CSV file. Returns True if the index was saved."""
+
+    metadata = get_metadata(path, cacheKey)
+    metadata["dataOffset"] = index.getDataOffset()
+    metadata["sorted"] = index.isSorted()
+    indexPath = get_index_path(path)
+    try:
+        fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(indexPath)))
+    except (IOError, OSError):
+        return False
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(
+                f, metadata=np.array(json.dumps(metadata)),
+                timestamps=np.array(index.getTimestamps(), dtype=np.int64),
+                offsets=np.array(index.getOffsets(), dtype=np.int64)
+            )
+        utils.set_file_mode(tmpPath, indexPath)
+        if os.path.exists(indexPath):
+            os.remove(indexPath)
+        os.rename(tmpPath, indexPath)
+    except:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        raise
+    return True
+
+
+def get_index(path, rowParser):
+    """Returns the index for a CSV file, building it and saving it as a sidecar file if it is not available
+    or is out of date.
+
+    :param path: The path to the CSV file.
+    :type path: string.
+    :param rowParser: The parser for the rows in the file.
+    :type rowParser: :class:`pyalgotrade.barfeed.csvfeed.RowParser`.
+    :rtype: An :class:`OffsetIndex`, or None if the file is not sorted in ascending order.
+    """
+
+    cacheKey = rowParser.getCacheKey()
+    ret = load_index(path, cacheKey)
+    if ret is None:
+        ret = build_index(path, rowParser)
+        # Indexes for files that are not sorted are saved too, so they don't get scanned again.
+        save_index(path, cacheKey, ret)
+    if not ret.isSorted():
+        ret = None
+    return ret
@@ -0,0 +1,189 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import collections
+import Queue
+import sys
+import threading
+
+from pyalgotrade import barfeed
+from pyalgotrade import dataseries
+
+
+# Number of chunks that can be buffered. With 2 chunks, one gets filled while the other one gets consumed.
+DEFAULT_DEPTH = 2
+
+# Number of pyalgotrade.bar.Bars in a chunk.
+DEFAULT_CHUNK_SIZE = 256
+
+
+class PrefetchThread(threading.Thread):
+    """Pulls :class:`pyalgotrade.bar.Bars` from a bar feed and puts them in a bounded queue, in chunks.
+    The last item put in the queue is either an empty chunk, when the bar feed is exhausted, or the exception
+    info if pulling bars failed.
+    """
+
+    def __init__(self, barFeed, queue, chunkSize):
+        threading.Thread.__init__(self)
+        self.__barFeed = barFeed
+        self.__queue = queue
+        self.__chunkSize = chunkSize
+        self.__stopped = False
+        self.daemon = True
+
+    def run(self):
+        try:
+            chunk = []
+            while not self.__stopped and not self.__barFeed.eof():
+                bars = self.__barFeed.getNextBars()
+                if bars is not None:
+                    chunk.append(bars)
+                if len(chunk) >= self.__chunkSize:
+                    # This blocks while the queue is full, so no more bars are pulled than the ones that fit.
+                    self.__queue.put(chunk)
+                    chunk = []
+            if not self.__stopped:
+                if len(chunk):
+                    self.__queue.put(chunk)
+                self.__queue.put([])
+        except Exception:
+            self.__queue.put(sys.exc_info())
+
+    def stop(self):
+        self.__stopped = True
+        # Make room in the queue in case the thread is blocked putting a chunk.
+        try:
+            while True:
+                self.__queue.get_nowait()
+        except Queue.Empty:
+            pass
+
+
+class Feed(barfeed.BaseBarFeed):
+    """A :class:`pyalgotrade.barfeed.BaseBarFeed` that pulls bars from another bar feed on a background thread,
+    so that reading and decoding upcoming bars overlaps with the strategy processing the current ones.
+
+    :param barFeed: The bar feed to pull bars from. For example, a :class:`pyalgotrade.barfeed.streamingfeed.Feed`
+        or a :class:`pyalgotrade.barfeed.sqlitefeed.StreamingFeed`. Its bars are never dispatched.
+    :type barFeed: :class:`pyalgotrade.barfeed.BaseBarFeed`.
+    :param depth: The maximum number of chunks to buffer. The background thread waits while the buffer is full.
+    :type depth: int.
+    :param chunkSize: The number of :class:`pyalgotrade.bar.Bars` in each chunk.
+    :type chunkSize: int.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the opposite end.
+    :type maxLen: int.
+
+    .. note::
+        * This is meant for backtesting. Live bar feeds should not be wrapped.
+        * Python threads only run in parallel while waiting for I/O, or while running code that releases the GIL,
+          like SQLite queries. Parsing that runs Python code gets interleaved with the strategy instead.
+        * Instruments must be registered in the wrapped bar feed before starting this one.
+    """
+
+    def __init__(self, barFeed, depth=DEFAULT_DEPTH, chunkSize=DEFAULT_CHUNK_SIZE, maxLen=dataseries.DEFAULT_MAX_LEN):
+        assert depth > 0, "Invalid depth"
+        assert chunkSize > 0, "Invalid chunk size"
+        barfeed.BaseBarFeed.__init__(self, barFeed.getFrequency(), maxLen)
+        self.__barFeed = barFeed
+        self.__depth = depth
+        self.__chunkSize = chunkSize
+        self.__thread = None
+        self.__queue = None
+        self.__chunk = collections.deque()
+        self.__eof = False
+        self.__currDateTime = None
+        self.__registerInstruments()
+
+    def __registerInstruments(self):
+        for instrument in self.__barFeed.getRegisteredInstruments():
+            self.registerInstrument(instrument)
+
+    def getBarFeed(self):
+        return self.__barFeed
+
+    def reset(self):
+        self.stop()
+        self.join()
+        self.__barFeed.reset()
+        self.__thread = None
+        self.__chunk = collections.deque()
+        self.__eof = False
+        self.__currDateTime = None
+        barfeed.BaseBarFeed.reset(self)
+
+    def getCurrentDateTime(self):
+        return self.__currDateTime
+
+    def barsHaveAdjClose(self):
+        return self.__barFeed.barsHaveAdjClose()
+
+    def start(self):
+        if self.__thread is None:
+            self.__registerInstruments()
+            self.__barFeed.start()
+            self.__queue = Queue.Queue(self.__depth)
+            self.__thread = PrefetchThread(self.__barFeed, self.__queue, self.__chunkSize)
+            self.__thread.start()
+
+    def stop(self):
+        if self.__thread is not None:
+            self.__thread.stop()
+        self.__chunk.clear()
+        self.__eof = True
+
+    def join(self):
+        if self.__thread is not None:
+            # The thread may have put another chunk after it was stopped, so the queue is drained until it exits.
+            while self.__thread.isAlive():
+                self.__thread.stop()
+                self.__thread.join(0.01)
+            self.__barFeed.stop()
+            self.__barFeed.join()
+
+    # Waits for the next chunk if the current one was consumed. Returns False if there are no more bars.
+    def __fillChunk(self):
+        if not self.__eof and len(self.__chunk) == 0:
+            self.start()
+            item = self.__queue.get()
+            if isinstance(item, tuple):
+                self.__eof = True
+                raise item[0], item[1], item[2]
+            elif len(item) == 0:
+                self.__eof = True
+            else:
+                self.__chunk.extend(item)
+        return len(self.__chunk) > 0
+
+    def eof(self):
+        return not self.__fillChunk()
+
+    def peekDateTime(self):
+        ret = None
+        if self.__fillChunk():
+            ret = self.__chunk[0].getDateTime()
+        return ret
+
+    def getNextBars(self):
+        ret = None
+        if self.__fillChunk():
+            ret = self.__chunk.popleft()
+            self.__currDateTime = ret.getDateTime()
+        return ret
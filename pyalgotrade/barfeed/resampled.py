@@ -15,6 +15,8 @@
 # limitations under the License.
 
 
+import collections
+
 from pyalgotrade import barfeed
 from pyalgotrade import dataseries
 from pyalgotrade.dataseries import resampled
@@ -50,7 +52,54 @@ class BarsGrouper(resamplebase.Grouper):
         return bar.Bars(bar_dict)
 
 
+def ranges_nest(frequency, sourceFrequency):
+    """Returns True if every range for sourceFrequency falls within a single range for frequency, so bars grouped
+    by sourceFrequency can be grouped again by frequency.
+
+    .. note::
+        Intraday ranges are aligned to the epoch, in UTC, while day and month ranges begin at midnight in the bars
+        timezone. When sourceFrequency is intraday and frequency is not, ranges nest only if the UTC offset at
+        each boundary is a multiple of sourceFrequency too. Check :func:`range_nests`.
+    """
+
+    if sourceFrequency >= frequency:
+        ret = False
+    elif sourceFrequency < bar.Frequency.DAY:
+        if frequency < bar.Frequency.DAY:
+            ret = frequency % sourceFrequency == 0
+        else:
+            ret = bar.Frequency.DAY % sourceFrequency == 0
+    else:
+        ret = sourceFrequency == bar.Frequency.DAY and frequency == bar.Frequency.MONTH
+    return ret
+
+
+def range_nests(range_, sourceFrequency):
+    """Returns True if range_ begins and ends at the boundaries of the ranges for an intraday sourceFrequency."""
+
+    assert(sourceFrequency < bar.Frequency.DAY)
+    slotMicros = sourceFrequency * 1000000
+    return range_.getBeginningMicros() % slotMicros == 0 and range_.getEndingMicros() % slotMicros == 0
+
+
 class ResampledBarFeed(barfeed.BaseBarFeed):
+    """A :class:`pyalgotrade.barfeed.BaseBarFeed` that groups the bars from another bar feed by a certain frequency.
+
+    :param barFeed: The bar feed to group bars from.
+    :type barFeed: :class:`pyalgotrade.barfeed.BaseBarFeed`.
+    :param frequency: The grouping frequency in seconds. Check :func:`pyalgotrade.resamplebase.is_valid_frequency`.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the opposite end.
+    :type maxLen: int.
+
+    .. note::
+        If barFeed is a :class:`ResampledBarFeed` whose ranges nest into the ones for frequency (check :func:`ranges_nest`),
+        bars already grouped by barFeed are grouped again, instead of grouping every bar from the source bar feed.
+        For example, 1 hour bars can be built from 15 minute bars, and 1 day bars from 1 hour bars.
+        Bars are generated at the same time as when grouping the bars from the source bar feed.
+        Day and month ranges that don't begin and end at the boundaries of barFeed ranges because of the UTC offset
+        are built from the bars in the source bar feed.
+    """
 
     def __init__(self, barFeed, frequency, maxLen=dataseries.DEFAULT_MAX_LEN):
         barfeed.BaseBarFeed.__init__(self, frequency, maxLen)
@@ -65,23 +114,79 @@ class ResampledBarFeed(barfeed.BaseBarFeed):
         for instrument in barFeed.getRegisteredInstruments():
             self.registerInstrument(instrument)
 
-        self.__values = []
+        self.__values = collections.deque()
         self.__barFeed = barFeed
+        self.__source = barFeed
         self.__grouper = None
         self.__range = None
+        self.__parent = None
+        self.__children = []
+        # Whether ranges nest depends on the UTC offset. The last range checked with range_nests, and the result.
+        self.__checkNesting = False
+        self.__nestingRange = None
+        self.__rangeNests = True
+
+        if isinstance(barFeed, ResampledBarFeed) and ranges_nest(frequency, barFeed.getFrequency()):
+            self.__parent = barFeed
+            self.__source = barFeed.__source
+            barFeed.__children.append(self)
+            if barFeed.getFrequency() < bar.Frequency.DAY and frequency >= bar.Frequency.DAY:
+                # Source bars are needed for the ranges that don't nest.
+                self.__checkNesting = True
+                self.__source.getNewValuesEvent().subscribe(self.__onSourceValues)
+        else:
+            barFeed.getNewValuesEvent().subscribe(self.__onNewValues)
+
+    # Returns True if bars grouped by the parent bar feed nest into the range that dateTime belongs to.
+    def __parentNests(self, dateTime):
+        if self.__checkNesting and (self.__nestingRange is None or not self.__nestingRange.belongs(dateTime)):
+            self.__nestingRange = resamplebase.build_range(dateTime, self.getFrequency())
+            self.__rangeNests = range_nests(self.__nestingRange, self.__parent.getFrequency())
+        return self.__rangeNests
 
-        barFeed.getNewValuesEvent().subscribe(self.__onNewValues)
+    def __onSourceValues(self, dateTime, value):
+        if not self.__parentNests(dateTime):
+            self.__onNewValues(dateTime, value)
 
     def __onNewValues(self, dateTime, value):
+        self.__addValue(dateTime, value)
+        # Let the bar feeds that group these bars know that time moved forward.
+        for child in self.__children:
+            child.__checkTree(dateTime)
+
+    def __addValue(self, dateTime, value):
+        if self.__range is not None and not self.__range.belongs(dateTime):
+            self.__pushGrouped()
         if self.__range is None:
             self.__range = resamplebase.build_range(dateTime, self.getFrequency())
             self.__grouper = BarsGrouper(self.__range.getBeginning(), value, self.getFrequency())
-        elif self.__range.belongs(dateTime):
-            self.__grouper.addValue(value)
         else:
-            self.__values.append(self.__grouper.getGrouped())
-            self.__range = resamplebase.build_range(dateTime, self.getFrequency())
-            self.__grouper = BarsGrouper(self.__range.getBeginning(), value, self.getFrequency())
+            self.__grouper.addValue(value)
+
+    # Adds bars grouped by the parent bar feed for a given range.
+    def __addGrouped(self, range_, value):
+        # Ranges that don't nest are built from the source bars.
+        if self.__parentNests(range_.getBeginning()):
+            self.__addValue(range_.getBeginning(), value)
+            if range_.getEnding() > self.__range.getEnding():
+                raise Exception("%s ranges don't nest into %s ranges" % (self.__parent.getFrequency(), self.getFrequency()))
+
+    def __pushGrouped(self):
+        grouped = self.__grouper.getGrouped()
+        self.__values.append(grouped)
+        for child in self.__children:
+            child.__addGrouped(self.__range, grouped)
+        self.__grouper = None
+        self.__range = None
+
+    def __checkTree(self, dateTime):
+        if self.__range is not None and not self.__range.belongs(dateTime):
+            self.__pushGrouped()
+        for child in self.__children:
+            child.__checkTree(dateTime)
+
+    def getBarFeed(self):
+        return self.__barFeed
 
     def getCurrentDateTime(self):
         return self.__barFeed.getCurrentDateTime()
@@ -92,7 +197,7 @@ class ResampledBarFeed(barfeed.BaseBarFeed):
     def getNextBars(self):
         ret = None
         if len(self.__values):
-            ret = self.__values.pop(0)
+            ret = self.__values.popleft()
         return ret
 
     def eof(self):
@@ -113,7 +218,8 @@ class ResampledBarFeed(barfeed.BaseBarFeed):
         pass
 
     def checkNow(self, dateTime):
-        if self.__range is not None and not self.__range.belongs(dateTime):
-            self.__values.append(self.__grouper.getGrouped())
-            self.__grouper = None
-            self.__range = None
+        # Bars are pushed from the top of the tree so that bars grouped by parents are included.
+        root = self
+        while root.__parent is not None:
+            root = root.__parent
+        root.__checkTree(dateTime)
@@ -18,6 +18,7 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+from pyalgotrade import barfeed
 from pyalgotrade.barfeed import dbfeed
 from pyalgotrade.barfeed import membf
 from pyalgotrade import bar
@@ -28,25 +29,55 @@ import sqlite3
 import os
 
 
+# Pragmas that speed up bulk ingestion. Together with the WAL journal mode the database can't get corrupted,
+# but the last transactions may be lost if the OS crashes.
+INGESTION_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "cache_size": -64000,  # 64MB
+    "temp_store": "MEMORY",
+}
+
+# Number of rows fetched at once when streaming bars.
+DEFAULT_FETCH_SIZE = 1000
+
+TIMESTAMP_INDEX = "bar_frequency_timestamp"
+
+
 def normalize_instrument(instrument):
     return instrument.upper()
 
 
+def bar_to_row(instrumentId, frequency, bar):
+    return (
+        instrumentId, frequency, dt.datetime_to_timestamp(bar.getDateTime()), bar.getOpen(), bar.getHigh(),
+        bar.getLow(), bar.getClose(), bar.getVolume(), bar.getAdjClose()
+    )
+
+
 # SQLite DB.
 # Timestamps are stored in UTC.
 class Database(dbfeed.Database):
-    def __init__(self, dbFilePath):
+    def __init__(self, dbFilePath, journalMode=None, pragmas=None):
         self.__instrumentIds = {}
 
         # If the file doesn't exist, we'll create it and initialize it.
         initialize = False
         if not os.path.exists(dbFilePath):
             initialize = True
-        self.__connection = sqlite3.connect(dbFilePath)
+        # The connection may be used from a different thread, for example by a prefetchfeed.Feed, but never concurrently.
+        self.__connection = sqlite3.connect(dbFilePath, check_same_thread=False)
         self.__connection.isolation_level = None  # To do auto-commit
+        if journalMode is not None:
+            self.__connection.execute("pragma journal_mode = %s" % journalMode)
+        if pragmas is not None:
+            for name, value in pragmas.iteritems():
+                self.__connection.execute("pragma %s = %s" % (name, value))
         if initialize:
             self.createSchema()
 
+    def getPragma(self, name):
+        return self.__connection.execute("pragma %s" % name).fetchone()[0]
+
     def __findInstrumentId(self, instrument):
         cursor = self.__connection.cursor()
         sql = "select instrument_id from instrument where name = ?"
@@ -94,6 +125,17 @@ class Database(dbfeed.Database):
             ", adj_close real"
             ", primary key (instrument_id, frequency, timestamp))")
 
+        self.createTimestampIndex()
+
+    def createTimestampIndex(self):
+        """Creates the index used to stream bars for many instruments ordered by timestamp.
+        Databases created with older versions don't have it."""
+        self.__connection.execute("create index if not exists %s on bar (frequency, timestamp)" % TIMESTAMP_INDEX)
+
+    def hasTimestampIndex(self):
+        sql = "select count(*) from sqlite_master where type = 'index' and name = ?"
+        return self.__connection.execute(sql, [TIMESTAMP_INDEX]).fetchone()[0] > 0
+
     def addBar(self, instrument, bar, frequency):
         instrument = normalize_instrument(instrument)
         instrumentId = self.__getOrCreateInstrument(instrument)
@@ -109,6 +151,25 @@ class Database(dbfeed.Database):
             params = [bar.getOpen(), bar.getHigh(), bar.getLow(), bar.getClose(), bar.getVolume(), bar.getAdjClose(), instrumentId, frequency, timeStamp]
             self.__connection.execute(sql, params)
 
+    def addManyBars(self, instrumentBars, frequency):
+        """Adds a list of (instrument, bar) tuples in a single transaction. Existing bars get replaced."""
+
+        self.__connection.execute("begin")
+        try:
+            rows = []
+            for instrument, bar_ in instrumentBars:
+                instrumentId = self.__getOrCreateInstrument(normalize_instrument(instrument))
+                rows.append(bar_to_row(instrumentId, frequency, bar_))
+            # Every column is replaced, so this is the same as the update done by addBar.
+            sql = "insert or replace into bar (instrument_id, frequency, timestamp, open, high, low, close, volume, adj_close) values (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            self.__connection.executemany(sql, rows)
+            self.__connection.execute("commit")
+        except:
+            self.__connection.execute("rollback")
+            # Instruments added in the transaction are gone.
+            self.__instrumentIds = {}
+            raise
+
     def getBars(self, instrument, frequency, timezone=None, fromDateTime=None, toDateTime=None):
         instrument = normalize_instrument(instrument)
         sql = "select bar.timestamp, bar.open, bar.high, bar.low, bar.close, bar.volume, bar.adj_close, bar.frequency" \
@@ -126,14 +187,94 @@ class Database(dbfeed.Database):
         sql += " order by bar.timestamp asc"
         cursor = self.__connection.cursor()
         cursor.execute(sql, args)
-        ret = []
-        for row in cursor:
+        rows = cursor.fetchall()
+        cursor.close()
+        if len(rows) == 0:
+            return []
+
+        dateTimes = []
+        for row in rows:
             dateTime = dt.timestamp_to_datetime(row[0])
             if timezone:
                 dateTime = dt.localize(dateTime, timezone)
-            ret.append(bar.BasicBar(dateTime, row[1], row[2], row[3], row[4], row[5], row[6], row[7]))
-        cursor.close()
-        return ret
+            dateTimes.append(dateTime)
+        # Values were checked when the bars were added, so there is no need to check them again.
+        timestamps, opens, highs, lows, closes, volumes, adjCloses, frequencies = zip(*rows)
+        return bar.build_bars(dateTimes, opens, highs, lows, closes, volumes, adjCloses, frequency)
+
+    def getLastDateTime(self, instrument, frequency):
+        instrumentId = self.__findInstrumentId(normalize_instrument(instrument))
+        if instrumentId is None:
+            return None
+        # The primary key index makes this a single lookup.
+        sql = "select max(timestamp) from bar where instrument_id = ? and frequency = ?"
+        timestamp = self.__connection.execute(sql, [instrumentId, frequency]).fetchone()[0]
+        if timestamp is None:
+            return None
+        return dt.timestamp_to_datetime(timestamp)
+
+    def iterBarRows(self, ranges, frequency, fetchSize=DEFAULT_FETCH_SIZE):
+        """Yields bar rows for many instruments ordered by timestamp using a single query.
+        Rows are (instrument, timestamp, open, high, low, close, volume, adj_close) tuples and they are fetched from
+        the cursor in batches.
+
+        :param ranges: A list of (instrument, fromDateTime, toDateTime) tuples. fromDateTime and toDateTime may be None.
+        :type ranges: list.
+        :param frequency: The bar frequency.
+        :param fetchSize: The number of rows to fetch at once.
+        :type fetchSize: int.
+        """
+
+        instruments = {}
+        conditions = []
+        args = [frequency]
+        fromTimestamps = []
+        toTimestamps = []
+        for instrument, fromDateTime, toDateTime in ranges:
+            instrumentId = self.__findInstrumentId(normalize_instrument(instrument))
+            if instrumentId is None:
+                continue
+            instruments[instrumentId] = instrument
+            condition = "instrument_id = ?"
+            args.append(instrumentId)
+            fromTimestamps.append(None)
+            toTimestamps.append(None)
+            if fromDateTime is not None:
+                condition += " and timestamp >= ?"
+                fromTimestamps[-1] = dt.datetime_to_timestamp(fromDateTime)
+                args.append(fromTimestamps[-1])
+            if toDateTime is not None:
+                condition += " and timestamp <= ?"
+                toTimestamps[-1] = dt.datetime_to_timestamp(toDateTime)
+                args.append(toTimestamps[-1])
+            conditions.append("(%s)" % condition)
+        if len(conditions) == 0:
+            return
+
+        # Scanning the timestamp index yields rows in order right away, instead of sorting every matching row first.
+        sql = "select instrument_id, timestamp, open, high, low, close, volume, adj_close from bar"
+        if self.hasTimestampIndex():
+            sql += " indexed by %s" % TIMESTAMP_INDEX
+        sql += " where frequency = ? and (%s)" % " or ".join(conditions)
+        # Bound the index scan if every instrument has a date range.
+        if None not in fromTimestamps:
+            sql += " and timestamp >= ?"
+            args.append(min(fromTimestamps))
+        if None not in toTimestamps:
+            sql += " and timestamp <= ?"
+            args.append(max(toTimestamps))
+        sql += " order by timestamp asc"
+
+        cursor = self.__connection.cursor()
+        try:
+            cursor.execute(sql, args)
+            rows = cursor.fetchmany(fetchSize)
+            while len(rows):
+                for row in rows:
+                    yield (instruments[row[0]],) + row[1:]
+                rows = cursor.fetchmany(fetchSize)
+        finally:
+            cursor.close()
 
     def disconnect(self):
         self.__connection.close()
@@ -141,9 +282,9 @@ class Database(dbfeed.Database):
 
 
 class Feed(membf.BarFeed):
-    def __init__(self, dbFilePath, frequency, maxLen=dataseries.DEFAULT_MAX_LEN):
+    def __init__(self, dbFilePath, frequency, maxLen=dataseries.DEFAULT_MAX_LEN, journalMode=None, pragmas=None):
         membf.BarFeed.__init__(self, frequency, maxLen)
-        self.__db = Database(dbFilePath)
+        self.__db = Database(dbFilePath, journalMode, pragmas)
 
     def barsHaveAdjClose(self):
         return True
@@ -154,3 +295,129 @@ class Feed(membf.BarFeed):
     def loadBars(self, instrument, timezone=None, fromDateTime=None, toDateTime=None):
         bars = self.__db.getBars(instrument, self.getFrequency(), timezone, fromDateTime, toDateTime)
         self.addBarsFromSequence(instrument, bars)
+
+
+class StreamingFeed(barfeed.BaseBarFeed):
+    """A :class:`pyalgotrade.barfeed.BaseBarFeed` that streams bars from a SQLite database.
+    Bars for every instrument are read using a single query ordered by timestamp, and they are built as they are
+    needed, so memory usage doesn't depend on the number of bars and the first bars are available right away.
+
+    :param dbFilePath: The path to the SQLite database.
+    :type dbFilePath: string.
+    :param frequency: The frequency of the bars to load.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the opposite end.
+    :type maxLen: int.
+    :param fetchSize: The number of rows to fetch from the database at once.
+    :type fetchSize: int.
+
+    .. note::
+        Databases created with older versions should call :meth:`Database.createTimestampIndex` once.
+        Without that index SQLite has to sort every bar before returning the first one.
+    """
+
+    def __init__(self, dbFilePath, frequency, maxLen=dataseries.DEFAULT_MAX_LEN, fetchSize=DEFAULT_FETCH_SIZE):
+        barfeed.BaseBarFeed.__init__(self, frequency, maxLen)
+        self.__db = Database(dbFilePath)
+        self.__fetchSize = fetchSize
+        self.__ranges = []
+        self.__timezones = {}
+        self.__rows = None
+        self.__nextRow = None
+        self.__currDateTime = None
+
+    def getDatabase(self):
+        return self.__db
+
+    def barsHaveAdjClose(self):
+        return True
+
+    def loadBars(self, instrument, timezone=None, fromDateTime=None, toDateTime=None):
+        """Registers an instrument to stream bars for.
+
+        :param instrument: Instrument identifier.
+        :type instrument: string.
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        :param fromDateTime: An optional datetime to use to filter bars to load.
+        :type fromDateTime: datetime.datetime.
+        :param toDateTime: An optional datetime to use to filter bars to load.
+        :type toDateTime: datetime.datetime.
+        """
+
+        if self.__rows is not None:
+            raise Exception("Can't load more bars once you started consuming bars")
+        self.__ranges.append((instrument, fromDateTime, toDateTime))
+        self.__timezones[instrument] = timezone
+        self.registerInstrument(instrument)
+
+    def reset(self):
+        self.__close()
+        self.__currDateTime = None
+        barfeed.BaseBarFeed.reset(self)
+
+    def __close(self):
+        if self.__rows is not None:
+            self.__rows.close()
+        self.__rows = None
+        self.__nextRow = None
+
+    def __getRows(self):
+        if self.__rows is None:
+            self.__rows = self.__db.iterBarRows(self.__ranges, self.getFrequency(), self.__fetchSize)
+            self.__advance()
+        return self.__rows
+
+    def __advance(self):
+        self.__nextRow = next(self.__rows, None)
+
+    def __getDateTime(self, row):
+        ret = dt.timestamp_to_datetime(row[1])
+        timezone = self.__timezones[row[0]]
+        if timezone:
+            ret = dt.localize(ret, timezone)
+        return ret
+
+    def getCurrentDateTime(self):
+        return self.__currDateTime
+
+    def start(self):
+        self.__getRows()
+
+    def stop(self):
+        self.__close()
+        # No more rows.
+        self.__rows = self.__db.iterBarRows([], self.getFrequency())
+
+    def join(self):
+        pass
+
+    def eof(self):
+        return self.__rows is not None and self.__nextRow is None
+
+    def peekDateTime(self):
+        self.__getRows()
+        ret = None
+        if self.__nextRow is not None:
+            ret = self.__getDateTime(self.__nextRow)
+        return ret
+
+    def getNextBars(self):
+        self.__getRows()
+        if self.__nextRow is None:
+            return None
+
+        timestamp = self.__nextRow[1]
+        ret = {}
+        while self.__nextRow is not None and self.__nextRow[1] == timestamp:
+            instrument, timestamp, open_, high, low, close, volume, adjClose = self.__nextRow
+            dateTime = self.__getDateTime(self.__nextRow)
+            ret[instrument] = bar.BasicBar(dateTime, open_, high, low, close, volume, adjClose, self.getFrequency())
+            self.__advance()
+
+        self.__currDateTime = dateTime
+        return bar.Bars(ret)
+
+    def loadAll(self):
+        for dateTime, bars in self:
+            pass
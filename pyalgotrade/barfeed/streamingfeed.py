@@ -0,0 +1,269 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import csv
+import heapq
+import itertools
+import os
+
+from pyalgotrade import barfeed
+from pyalgotrade import dataseries
+from pyalgotrade import bar
+from pyalgotrade.utils import csvutils
+
+
+def reverse_lines(f, stopOffset=0, blockSize=65536):
+    """Yields the lines in a file from the last one to the one that starts at stopOffset, reading blocks backwards."""
+    f.seek(0, os.SEEK_END)
+    offset = f.tell()
+    partial = ""
+    while offset > stopOffset:
+        size = min(blockSize, offset - stopOffset)
+        offset -= size
+        f.seek(offset)
+        lines = (f.read(size) + partial).split("\n")
+        partial = lines[0]
+        for line in reversed(lines[1:]):
+            yield line + "\n"
+    yield partial + "\n"
+
+
+def iter_csv_bars(path, rowParser, barFilter=None, reverse=False):
+    """Yields the bars in a CSV file, one row at a time. If reverse is True rows are read from the last one to the first one."""
+    with open(path, "r") as f:
+        lines = f
+        fieldNames = rowParser.getFieldNames()
+        if reverse:
+            # Skip the header row, if any, so it doesn't get read last.
+            if fieldNames is None:
+                fieldNames = csv.reader([f.readline()], delimiter=rowParser.getDelimiter()).next()
+            lines = reverse_lines(f, f.tell())
+        reader = csvutils.FastDictReader(lines, fieldnames=fieldNames, delimiter=rowParser.getDelimiter())
+        bars = (rowParser.parseBar(row) for row in reader)
+        bars = (bar_ for bar_ in bars if bar_ is not None and (barFilter is None or barFilter.includeBar(bar_)))
+        for bar_ in rowParser.processBars(bars):
+            yield bar_
+
+
+def iter_sorted_csv_bars(path, rowParser, barFilter=None):
+    """Yields the bars in a CSV file in ascending order.
+    Files sorted in descending order, like the ones from Yahoo! Finance, are detected looking at the first two bars
+    and are read backwards."""
+    bars = iter_csv_bars(path, rowParser, barFilter)
+    try:
+        head = list(itertools.islice(bars, 2))
+        if len(head) == 2 and head[1].getDateTime() < head[0].getDateTime():
+            bars.close()
+            bars = iter_csv_bars(path, rowParser, barFilter, True)
+            head = []
+        for bar_ in head:
+            yield bar_
+        for bar_ in bars:
+            yield bar_
+    finally:
+        bars.close()
+
+
+class InstrumentBars(object):
+    """Iterates over the bars for an instrument, reading its files in order and checking that bars are sorted.
+    Only the next bar is held in memory."""
+
+    def __init__(self, instrument, sources, onFileStarted):
+        self.__instrument = instrument
+        self.__sources = sources
+        self.__onFileStarted = onFileStarted
+        self.__sourcePos = 0
+        self.__bars = None
+        self.__path = None
+        self.__rowParser = None
+        self.__nextBar = None
+        self.__lastDateTime = None
+        self.__advance()
+
+    def __advance(self):
+        self.__nextBar = None
+        while self.__nextBar is None:
+            if self.__bars is None:
+                if self.__sourcePos >= len(self.__sources):
+                    return
+                self.__path, self.__rowParser, barFilter = self.__sources[self.__sourcePos]
+                self.__sourcePos += 1
+                self.__bars = iter_sorted_csv_bars(self.__path, self.__rowParser, barFilter)
+            try:
+                self.__nextBar = self.__bars.next()
+            except StopIteration:
+                self.__bars = None
+            # Notify once the first bar in the file was parsed, since row parsers may update their state while parsing.
+            if self.__rowParser is not None:
+                self.__onFileStarted(self.__instrument, self.__path, self.__rowParser)
+                self.__rowParser = None
+
+        dateTime = self.__nextBar.getDateTime()
+        if self.__lastDateTime is not None:
+            if dateTime == self.__lastDateTime:
+                raise Exception("Duplicate bars found for %s on %s" % ([self.__instrument], dateTime))
+            elif dateTime < self.__lastDateTime:
+                raise Exception("Bars for %s are not sorted. %s found after %s in %s" % (
+                    self.__instrument, dateTime, self.__lastDateTime, self.__path
+                ))
+        self.__lastDateTime = dateTime
+
+    def getInstrument(self):
+        return self.__instrument
+
+    def peekBar(self):
+        return self.__nextBar
+
+    def popBar(self):
+        ret = self.__nextBar
+        self.__advance()
+        return ret
+
+    def close(self):
+        if self.__bars is not None:
+            self.__bars.close()
+            self.__bars = None
+        self.__nextBar = None
+
+
+class Feed(barfeed.BaseBarFeed):
+    """A :class:`pyalgotrade.barfeed.BaseBarFeed` that streams bars from CSV files instead of loading them in memory.
+    Bars for the different instruments are merged on the fly, so memory usage doesn't depend on the number of bars
+    in the files.
+
+    :param csvBarFeed: The feed used to build the parsers for the files, and where the frequency, the bar filter and
+        the daily bar time are taken from. For example, a :class:`pyalgotrade.barfeed.yahoofeed.Feed`.
+        Bars are never added to it.
+    :type csvBarFeed: :class:`pyalgotrade.barfeed.csvfeed.BarFeed`.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the opposite end.
+    :type maxLen: int.
+
+    .. note::
+        * Files for an instrument are read in the order they were added, and bars must be sorted by datetime.
+          Files sorted in descending order are read backwards.
+          An exception is raised as soon as a bar is found out of order.
+        * Files are opened when bars are first requested, so errors in the files are not reported when they are added.
+    """
+
+    def __init__(self, csvBarFeed, maxLen=dataseries.DEFAULT_MAX_LEN):
+        barfeed.BaseBarFeed.__init__(self, csvBarFeed.getFrequency(), maxLen)
+        self.__csvBarFeed = csvBarFeed
+        self.__sources = {}
+        self.__instrumentBars = None
+        self.__heap = None
+        self.__currDateTime = None
+
+    def reset(self):
+        self.__close()
+        self.__currDateTime = None
+        barfeed.BaseBarFeed.reset(self)
+
+    def __close(self):
+        if self.__instrumentBars is not None:
+            for instrumentBars in self.__instrumentBars:
+                instrumentBars.close()
+        self.__instrumentBars = None
+        self.__heap = None
+
+    def __onFileStarted(self, instrument, path, rowParser):
+        self.__csvBarFeed.onBarsLoaded(instrument, rowParser)
+
+    # The heap holds a (datetime, position) tuple for every instrument that has bars left.
+    def __getHeap(self):
+        if self.__heap is None:
+            self.__instrumentBars = []
+            self.__heap = []
+            for instrument in sorted(self.__sources.keys()):
+                instrumentBars = InstrumentBars(instrument, self.__sources[instrument], self.__onFileStarted)
+                self.__instrumentBars.append(instrumentBars)
+                nextBar = instrumentBars.peekBar()
+                if nextBar is not None:
+                    self.__heap.append((nextBar.getDateTime(), len(self.__instrumentBars) - 1))
+            heapq.heapify(self.__heap)
+        return self.__heap
+
+    def addBarsFromCSV(self, instrument, path, timezone=None):
+        """Adds a CSV formatted file to read bars from.
+        The instrument gets registered in the bar feed.
+
+        :param instrument: Instrument identifier.
+        :type instrument: string.
+        :param path: The path to the CSV file.
+        :type path: string.
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        """
+
+        if self.__heap is not None:
+            raise Exception("Can't add more bars once you started consuming bars")
+
+        rowParser = self.__csvBarFeed.createRowParser(timezone)
+        self.__sources.setdefault(instrument, []).append((path, rowParser, self.__csvBarFeed.getBarFilter()))
+        self.registerInstrument(instrument)
+
+    def getCurrentDateTime(self):
+        return self.__currDateTime
+
+    def barsHaveAdjClose(self):
+        return self.__csvBarFeed.barsHaveAdjClose()
+
+    def start(self):
+        self.__getHeap()
+
+    def stop(self):
+        self.__close()
+        self.__heap = []
+
+    def join(self):
+        pass
+
+    def eof(self):
+        return self.__heap is not None and len(self.__heap) == 0
+
+    def peekDateTime(self):
+        ret = None
+        heap = self.__getHeap()
+        if len(heap):
+            ret = heap[0][0]
+        return ret
+
+    def getNextBars(self):
+        heap = self.__getHeap()
+        if len(heap) == 0:
+            return None
+
+        # Pop every instrument that has a bar with the smallest datetime.
+        smallestDateTime = heap[0][0]
+        ret = {}
+        while len(heap) and heap[0][0] == smallestDateTime:
+            pos = heapq.heappop(heap)[1]
+            instrumentBars = self.__instrumentBars[pos]
+            ret[instrumentBars.getInstrument()] = instrumentBars.popBar()
+            nextBar = instrumentBars.peekBar()
+            if nextBar is not None:
+                heapq.heappush(heap, (nextBar.getDateTime(), pos))
+
+        self.__currDateTime = smallestDateTime
+        return bar.Bars(ret)
+
+    def loadAll(self):
+        for dateTime, bars in self:
+            pass
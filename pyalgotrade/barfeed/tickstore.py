@@ -0,0 +1,457 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import heapq
+import json
+import os
+
+import numpy as np
+import pytz
+
+from pyalgotrade import barfeed
+from pyalgotrade import bar
+from pyalgotrade import dataseries
+from pyalgotrade.barfeed import barcache
+from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.utils import dt
+
+
+VERSION = 1
+
+# Name and numpy dtype for every column.
+COLUMNS = [
+    ("timestamps", "<i8"),
+    ("prices", "<f8"),
+    ("amounts", "<f8"),
+    ("tradeIds", "<i8"),
+]
+
+# Stored in place of the trade id for trades that don't have one.
+NO_TRADE_ID = -1
+
+# Number of trades that are buffered before writing them to disk.
+DEFAULT_CHUNK_SIZE = 100000
+
+METADATA_FILE = "metadata.json"
+
+
+def datetime_to_micros(dateTime):
+    """Returns the number of microseconds since the epoch. Aware datetimes are converted to UTC first."""
+    if not dt.datetime_is_naive(dateTime):
+        dateTime = dt.unlocalize(dt.as_utc(dateTime))
+    return barcache.datetime_to_micros(dateTime)
+
+
+def micros_to_datetime(micros):
+    """Returns the UTC datetime for a number of microseconds since the epoch."""
+    return pytz.utc.localize(barcache.EPOCH + datetime.timedelta(microseconds=int(micros)))
+
+
+class TradeView(bar.Bar):
+    """A :class:`pyalgotrade.bar.Bar` for a trade in a :class:`TickStore`.
+    Values are read from the store when requested, so views are cheap to build.
+    """
+
+    # Optimization to reduce memory footprint.
+    __slots__ = ('__store', '__pos', '__dateTime')
+
+    def __init__(self, store, pos, dateTime=None):
+        self.__store = store
+        self.__pos = pos
+        self.__dateTime = dateTime
+
+    def __setstate__(self, state):
+        (self.__store, self.__pos, self.__dateTime) = state
+
+    def __getstate__(self):
+        return (self.__store, self.__pos, self.__dateTime)
+
+    def setUseAdjustedValue(self, useAdjusted):
+        if useAdjusted:
+            raise Exception("Adjusted close is not available")
+
+    def getUseAdjValue(self):
+        return False
+
+    def getDateTime(self):
+        if self.__dateTime is None:
+            self.__dateTime = self.__store.getDateTime(self.__pos)
+        return self.__dateTime
+
+    def getOpen(self, adjusted=False):
+        return self.getPrice()
+
+    def getHigh(self, adjusted=False):
+        return self.getPrice()
+
+    def getLow(self, adjusted=False):
+        return self.getPrice()
+
+    def getClose(self, adjusted=False):
+        return self.getPrice()
+
+    def getVolume(self):
+        return float(self.__store.getAmounts()[self.__pos])
+
+    def getAdjClose(self):
+        return None
+
+    def getFrequency(self):
+        return bar.Frequency.TRADE
+
+    def getPrice(self):
+        return float(self.__store.getPrices()[self.__pos])
+
+    def getTradeId(self):
+        ret = int(self.__store.getTradeIds()[self.__pos])
+        if ret == NO_TRADE_ID:
+            ret = None
+        return ret
+
+
+class TickStore(object):
+    """Trades held in contiguous arrays, sorted by timestamp.
+
+    :param timestamps: Microseconds since the epoch, in UTC, sorted in ascending order and without duplicates.
+    :type timestamps: numpy.ndarray.
+    :param prices: The trade prices.
+    :type prices: numpy.ndarray.
+    :param amounts: The trade amounts.
+    :type amounts: numpy.ndarray.
+    :param tradeIds: The trade ids, or :data:`NO_TRADE_ID` for trades that don't have one. If None, no trade has one.
+    :type tradeIds: numpy.ndarray.
+
+    .. note::
+        Arrays can be memory-mapped. Check :func:`load`.
+    """
+
+    def __init__(self, timestamps, prices, amounts, tradeIds=None):
+        if tradeIds is None:
+            tradeIds = np.empty(len(timestamps), dtype=np.int64)
+            tradeIds.fill(NO_TRADE_ID)
+        assert(len(timestamps) == len(prices) == len(amounts) == len(tradeIds))
+        self.__timestamps = timestamps
+        self.__prices = prices
+        self.__amounts = amounts
+        self.__tradeIds = tradeIds
+
+    def __len__(self):
+        return len(self.__timestamps)
+
+    def getTimestamps(self):
+        return self.__timestamps
+
+    def getPrices(self):
+        return self.__prices
+
+    def getAmounts(self):
+        return self.__amounts
+
+    def getTradeIds(self):
+        return self.__tradeIds
+
+    def getDateTime(self, pos):
+        """Returns the UTC datetime for the trade at a given position."""
+        return micros_to_datetime(self.__timestamps[pos])
+
+    def getTrade(self, pos):
+        """Returns a :class:`TradeView` for the trade at a given position."""
+        return TradeView(self, pos)
+
+    def slice(self, fromDateTime=None, toDateTime=None):
+        """Returns a :class:`TickStore` with the trades within a date range, without copying them.
+
+        :param fromDateTime: If not None, only trades whose datetime is greater than or equal to fromDateTime are included.
+        :type fromDateTime: datetime.datetime.
+        :param toDateTime: If not None, only trades whose datetime is lower than or equal to toDateTime are included.
+        :type toDateTime: datetime.datetime.
+
+        .. note::
+            Naive datetimes are treated as UTC.
+        """
+
+        begin = 0
+        end = len(self.__timestamps)
+        if fromDateTime is not None:
+            begin = int(np.searchsorted(self.__timestamps, datetime_to_micros(fromDateTime), side="left"))
+        if toDateTime is not None:
+            end = int(np.searchsorted(self.__timestamps, datetime_to_micros(toDateTime), side="right"))
+        end = max(begin, end)
+        return TickStore(
+            self.__timestamps[begin:end], self.__prices[begin:end], self.__amounts[begin:end], self.__tradeIds[begin:end]
+        )
+
+
+class TickStoreWriter(object):
+    """Writes trades to a directory that can be loaded with :func:`load`, in chunks, so the trades don't need to fit
+    in memory.
+
+    :param path: The directory to write to. It gets created if it doesn't exist, and existing trades are overwritten.
+    :type path: string.
+    :param chunkSize: The number of trades to buffer before writing them.
+    :type chunkSize: int.
+
+    .. note::
+        Trades must be added in ascending order, and two trades can't have the same datetime since the bar feed
+        can't dispatch more than one bar for an instrument at a time. Row parsers like
+        :class:`pyalgotrade.bitcoincharts.barfeed.RowParser` move trades with repeated datetimes slightly forward.
+        Call :meth:`close` once every trade was added.
+    """
+
+    def __init__(self, path, chunkSize=DEFAULT_CHUNK_SIZE):
+        assert chunkSize > 0, "Invalid chunk size"
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self.__path = path
+        self.__chunkSize = chunkSize
+        self.__count = 0
+        self.__lastTimestamp = None
+        metadataPath = os.path.join(path, METADATA_FILE)
+        if os.path.exists(metadataPath):
+            os.remove(metadataPath)
+        self.__files = [open(get_column_path(path, name), "wb") for name, dtype in COLUMNS]
+        self.__buffers = None
+        self.__resetBuffers()
+
+    def __resetBuffers(self):
+        self.__buffers = [[] for column in COLUMNS]
+
+    def __flush(self):
+        for (name, dtype), f, values in zip(COLUMNS, self.__files, self.__buffers):
+            np.array(values, dtype=dtype).tofile(f)
+        self.__resetBuffers()
+
+    def getCount(self):
+        return self.__count
+
+    def addTrade(self, dateTime, price, amount, tradeId=None):
+        timestamp = datetime_to_micros(dateTime)
+        if self.__lastTimestamp is not None:
+            if timestamp < self.__lastTimestamp:
+                raise Exception("Trades are not sorted: %s" % (dateTime))
+            elif timestamp == self.__lastTimestamp:
+                raise Exception("Duplicate trade datetime: %s" % (dateTime))
+        self.__lastTimestamp = timestamp
+        if tradeId is None:
+            tradeId = NO_TRADE_ID
+        timestamps, prices, amounts, tradeIds = self.__buffers
+        timestamps.append(timestamp)
+        prices.append(price)
+        amounts.append(amount)
+        tradeIds.append(tradeId)
+        self.__count += 1
+        if len(timestamps) >= self.__chunkSize:
+            self.__flush()
+
+    def addBar(self, bar_):
+        """Adds a trade bar, like the ones from :class:`pyalgotrade.bitcoincharts.barfeed.CSVTradeFeed` or
+        :class:`pyalgotrade.bitstamp.barfeed.LiveTradeFeed`. The close price is used as the trade price."""
+        tradeId = None
+        if hasattr(bar_, "getTradeId"):
+            tradeId = bar_.getTradeId()
+        self.addTrade(bar_.getDateTime(), bar_.getClose(), bar_.getVolume(), tradeId)
+
+    def close(self):
+        self.__flush()
+        for f in self.__files:
+            f.close()
+        with open(os.path.join(self.__path, METADATA_FILE), "w") as f:
+            json.dump({"version": VERSION, "count": self.__count}, f)
+
+
+def get_column_path(path, name):
+    return os.path.join(path, name + ".bin")
+
+
+def save(store, path):
+    """Saves a :class:`TickStore` to a directory that can be loaded with :func:`load`."""
+    if not os.path.exists(path):
+        os.makedirs(path)
+    for name, dtype in COLUMNS:
+        getter = getattr(store, "get" + name[0].upper() + name[1:])
+        np.asarray(getter(), dtype=dtype).tofile(get_column_path(path, name))
+    with open(os.path.join(path, METADATA_FILE), "w") as f:
+        json.dump({"version": VERSION, "count": len(store)}, f)
+
+
+def load(path, mmap=True):
+    """Loads a :class:`TickStore` saved with :func:`save` or :class:`TickStoreWriter`.
+
+    :param path: The directory where the trades were saved.
+    :type path: string.
+    :param mmap: True to memory-map the arrays instead of reading them, so only the pages used get loaded.
+    :type mmap: boolean.
+    :rtype: A :class:`TickStore`.
+    """
+
+    with open(os.path.join(path, METADATA_FILE), "r") as f:
+        metadata = json.load(f)
+    if metadata.get("version") != VERSION:
+        raise Exception("Unsupported tick store version in %s" % (path))
+    count = metadata["count"]
+
+    columns = []
+    for name, dtype in COLUMNS:
+        columnPath = get_column_path(path, name)
+        if count == 0:
+            column = np.zeros(0, dtype=dtype)
+        elif mmap:
+            column = np.memmap(columnPath, dtype=dtype, mode="r", shape=(count,))
+        else:
+            column = np.fromfile(columnPath, dtype=dtype, count=count)
+        columns.append(column)
+    return TickStore(*columns)
+
+
+def write_from_csv(csvPath, rowParser, path, chunkSize=DEFAULT_CHUNK_SIZE):
+    """Parses a CSV file with trades, one row at a time, and writes them to a directory that can be loaded
+    with :func:`load`. Returns the number of trades written.
+
+    :param csvPath: The path to the CSV file.
+    :type csvPath: string.
+    :param rowParser: The parser for the rows in the file. For example, a :class:`pyalgotrade.bitcoincharts.barfeed.RowParser`.
+    :type rowParser: :class:`pyalgotrade.barfeed.csvfeed.RowParser`.
+    :param path: The directory to write to.
+    :type path: string.
+    :param chunkSize: The number of trades to buffer before writing them.
+    :type chunkSize: int.
+    """
+
+    writer = TickStoreWriter(path, chunkSize)
+    for bar_ in csvfeed.iter_bars(csvPath, rowParser):
+        writer.addBar(bar_)
+    writer.close()
+    return writer.getCount()
+
+
+class Feed(barfeed.BaseBarFeed):
+    """A :class:`pyalgotrade.barfeed.BaseBarFeed` that dispatches the trades in :class:`TickStore` instances.
+    Every trade is dispatched as a :class:`TradeView`, so values stay in the stores until they are used.
+
+    :param timezone: An optional timezone to use to localize bars. By default bars are in UTC.
+    :type timezone: A pytz timezone.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the opposite end.
+    :type maxLen: int.
+    """
+
+    def __init__(self, timezone=None, maxLen=dataseries.DEFAULT_MAX_LEN):
+        barfeed.BaseBarFeed.__init__(self, bar.Frequency.TRADE, maxLen)
+        self.__timezone = timezone
+        self.__stores = {}
+        self.__instruments = None
+        self.__positions = None
+        self.__heap = None
+        self.__currDateTime = None
+
+    def reset(self):
+        self.__heap = None
+        self.__currDateTime = None
+        barfeed.BaseBarFeed.reset(self)
+
+    # The heap holds a (timestamp, instrument position) tuple for every instrument that has trades left.
+    def __getHeap(self):
+        if self.__heap is None:
+            self.__instruments = sorted(self.__stores.keys())
+            self.__positions = [0] * len(self.__instruments)
+            self.__heap = []
+            for i, instrument in enumerate(self.__instruments):
+                store = self.__stores[instrument]
+                if len(store):
+                    self.__heap.append((int(store.getTimestamps()[0]), i))
+            heapq.heapify(self.__heap)
+        return self.__heap
+
+    def __getDateTime(self, timestamp):
+        ret = micros_to_datetime(timestamp)
+        if self.__timezone is not None:
+            ret = dt.localize(ret, self.__timezone)
+        return ret
+
+    def addTicks(self, instrument, store, fromDateTime=None, toDateTime=None):
+        """Adds the trades for an instrument. The instrument gets registered in the bar feed.
+
+        :param instrument: Instrument identifier.
+        :type instrument: string.
+        :param store: The trades.
+        :type store: :class:`TickStore`.
+        :param fromDateTime: If not None, only trades whose datetime is greater than or equal to fromDateTime are dispatched.
+        :type fromDateTime: datetime.datetime.
+        :param toDateTime: If not None, only trades whose datetime is lower than or equal to toDateTime are dispatched.
+        :type toDateTime: datetime.datetime.
+        """
+
+        if self.__heap is not None:
+            raise Exception("Can't add more trades once you started consuming bars")
+        if instrument in self.__stores:
+            raise Exception("Trades for %s were already added" % (instrument))
+        if fromDateTime is not None or toDateTime is not None:
+            store = store.slice(fromDateTime, toDateTime)
+        self.__stores[instrument] = store
+        self.registerInstrument(instrument)
+
+    def getCurrentDateTime(self):
+        return self.__currDateTime
+
+    def barsHaveAdjClose(self):
+        return False
+
+    def start(self):
+        self.__getHeap()
+
+    def stop(self):
+        self.__heap = []
+
+    def join(self):
+        pass
+
+    def eof(self):
+        return self.__heap is not None and len(self.__heap) == 0
+
+    def peekDateTime(self):
+        ret = None
+        heap = self.__getHeap()
+        if len(heap):
+            ret = self.__getDateTime(heap[0][0])
+        return ret
+
+    def getNextBars(self):
+        heap = self.__getHeap()
+        if len(heap) == 0:
+            return None
+
+        # Pop every instrument that has a trade with the smallest timestamp.
+        smallestTimestamp = heap[0][0]
+        dateTime = self.__getDateTime(smallestTimestamp)
+        ret = {}
+        while len(heap) and heap[0][0] == smallestTimestamp:
+            i = heapq.heappop(heap)[1]
+            instrument = self.__instruments[i]
+            store = self.__stores[instrument]
+            pos = self.__positions[i]
+            ret[instrument] = TradeView(store, pos, dateTime)
+            pos += 1
+            self.__positions[i] = pos
+            if pos < len(store):
+                heapq.heappush(heap, (int(store.getTimestamps()[pos]), i))
+
+        self.__currDateTime = dateTime
+        return bar.Bars(ret)
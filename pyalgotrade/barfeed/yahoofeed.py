@@ -19,6 +19,7 @@
 """
 
 from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import barcache
 from pyalgotrade.barfeed import common
 from pyalgotrade.utils import dt
 from pyalgotrade import bar
@@ -64,6 +65,26 @@ class RowParser(csvfeed.RowParser):
             ret = dt.localize(ret, self.__timezone)
         return ret
 
+    def getTimezone(self):
+        return self.__timezone
+
+    def getCacheKey(self):
+        return ("yahoofeed", self.__dailyBarTime, self.__frequency, barcache.timezone_key(self.__timezone), self.__sanitize)
+
+    def parseColumns(self, path):
+        # Values are not sanitized.
+        columnNames = {
+            "datetime": "Date",
+            "open": "Open",
+            "high": "High",
+            "low": "Low",
+            "close": "Close",
+            "volume": "Volume",
+            "adj_close": "Adj Close",
+        }
+        rowParser = csvfeed.GenericRowParser(columnNames, "%Y-%m-%d", self.__dailyBarTime, self.__frequency, self.__timezone)
+        return rowParser.parseColumns(path)
+
     def getFieldNames(self):
         # It is expected for the first row to have the field names.
         return None
@@ -134,11 +155,13 @@ class Feed(csvfeed.BarFeed):
         :type timezone: A pytz timezone.
         """
 
+        csvfeed.BarFeed.addBarsFromCSV(self, instrument, path, self.createRowParser(timezone))
+
+    def createRowParser(self, timezone=None):
         if isinstance(timezone, int):
             raise Exception("timezone as an int parameter is not supported anymore. Please use a pytz timezone instead.")
 
         if timezone is None:
             timezone = self.__timezone
 
-        rowParser = RowParser(self.getDailyBarTime(), self.getFrequency(), timezone, self.__sanitizeBars)
-        csvfeed.BarFeed.addBarsFromCSV(self, instrument, path, rowParser)
+        return RowParser(self.getDailyBarTime(), self.getFrequency(), timezone, self.__sanitizeBars)
@@ -22,6 +22,7 @@ from pyalgotrade import barfeed
 from pyalgotrade import bar
 from pyalgotrade.barfeed import csvfeed
 from pyalgotrade import dataseries
+from pyalgotrade import resamplebase
 from pyalgotrade.utils import dt
 
 import datetime
@@ -139,20 +140,46 @@ class CSVTradeFeed(csvfeed.BarFeed):
         If not None, it must be greater than 0.
         Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the opposite end.
     :type maxLen: int.
+    :param frequency: The frequency of the bars. If it is not **pyalgotrade.bar.Frequency.TRADE**, trades are
+        grouped into bars of that frequency as files are loaded, and only those bars are kept in memory.
+        Check :func:`pyalgotrade.resamplebase.is_valid_frequency` for the supported frequencies.
+    :type frequency: int.
 
     .. note::
-        * A :class:`pyalgotrade.bar.Bar` instance will be created for every trade, so open, high, low and close values will all be the same.
+        * Unless trades are grouped, a :class:`pyalgotrade.bar.Bar` instance will be created for every trade, so open, high, low and close values will all be the same.
         * Files must be sorted with the **unixtime** column in ascending order.
+        * Grouped bars have the datetime where their range begins, and fromDateTime and toDateTime are applied to
+          the trades before grouping them.
+        * Trades are grouped one file at a time, so when loading many files for the same instrument, trades in
+          different files can't fall into the same bar. An exception is raised if bars loaded for an instrument
+          overlap the ones already loaded.
     """
 
-    def __init__(self, timezone=None, maxLen=dataseries.DEFAULT_MAX_LEN):
-        csvfeed.BarFeed.__init__(self, barfeed.Frequency.TRADE, maxLen)
+    def __init__(self, timezone=None, maxLen=dataseries.DEFAULT_MAX_LEN, frequency=barfeed.Frequency.TRADE):
+        if frequency != barfeed.Frequency.TRADE and not resamplebase.is_valid_frequency(frequency):
+            raise Exception("Unsupported frequency")
+        csvfeed.BarFeed.__init__(self, frequency, maxLen)
         self.__timezone = timezone
         self.__unixTimeFix = UnixTimeFix()
+        # The datetimes of the first and last grouped bars loaded from each file, for every instrument.
+        self.__groupedRanges = {}
 
     def barsHaveAdjClose(self):
         return False
 
+    def addBarsFromSequence(self, instrument, bars):
+        if self.getFrequency() != barfeed.Frequency.TRADE and len(bars):
+            first = bars[0].getDateTime()
+            last = bars[-1].getDateTime()
+            for loadedFirst, loadedLast in self.__groupedRanges.get(instrument, []):
+                if first <= loadedLast and loadedFirst <= last:
+                    raise Exception(
+                        "Bars from %s to %s overlap the ones already loaded for %s. Trades in different files can't "
+                        "be grouped into the same bar" % (first, last, instrument)
+                    )
+            self.__groupedRanges.setdefault(instrument, []).append((first, last))
+        csvfeed.BarFeed.addBarsFromSequence(self, instrument, bars)
+
     def addBarsFromCSV(self, path, instrument="BTC", timezone=None, fromDateTime=None, toDateTime=None):
         """Loads bars from a trades CSV formatted file.
 
@@ -172,11 +199,15 @@ class CSVTradeFeed(csvfeed.BarFeed):
         .. note::
             * Every file that you load bars from must have trades in the same currency.
             * If fromDateTime or toDateTime are naive, they are treated as UTC.
+            * To avoid reading the whole file when fromDateTime or toDateTime are set, call
+              :meth:`pyalgotrade.barfeed.csvfeed.BarFeed.setUseOffsetIndex` first.
         """
 
         if timezone is None:
             timezone = self.__timezone
         rowParser = RowParser(self.__unixTimeFix, timezone)
+        if self.getFrequency() != barfeed.Frequency.TRADE:
+            rowParser = csvfeed.AggregatingRowParser(rowParser, self.getFrequency())
 
         # Save the barfilter to restore it later.
         prevBarFilter = self.getBarFilter()
@@ -23,6 +23,7 @@ import time
 import Queue
 
 from pyalgotrade import broker
+from pyalgotrade import dispatcher
 from pyalgotrade.bitstamp import httpclient
 from pyalgotrade.bitstamp import common
 
@@ -51,7 +52,7 @@ class TradeMonitor(threading.Thread):
         threading.Thread.__init__(self)
         self.__lastTradeId = -1
         self.__httpClient = httpClient
-        self.__queue = Queue.Queue()
+        self.__queue = dispatcher.EventQueue()
         self.__stop = False
 
     def _getNewTrades(self):
@@ -123,8 +124,6 @@ class LiveBroker(broker.Broker):
           * Sell limit order
     """
 
-    QUEUE_TIMEOUT = 0.01
-
     def __init__(self, clientId, key, secret):
         broker.Broker.__init__(self)
         self.__stop = False
@@ -228,16 +227,20 @@ class LiveBroker(broker.Broker):
         return self.__stop
 
     def dispatch(self):
+        ret = False
+
         # Switch orders from SUBMITTED to ACCEPTED.
         ordersToProcess = self.__activeOrders.values()
         for order in ordersToProcess:
             if order.isSubmitted():
                 order.switchState(broker.Order.State.ACCEPTED)
                 self.notifyOrderEvent(broker.OrderEvent(order, broker.OrderEvent.Type.ACCEPTED, None))
+                ret = True
 
         # Dispatch events from the trade monitor.
         try:
-            eventType, eventData = self.__tradeMonitor.getQueue().get(True, LiveBroker.QUEUE_TIMEOUT)
+            eventType, eventData = self.__tradeMonitor.getQueue().get(False)
+            ret = True
 
             if eventType == TradeMonitor.ON_USER_TRADE:
                 self._onUserTrades(eventData)
@@ -245,11 +248,20 @@ class LiveBroker(broker.Broker):
                 common.logger.error("Invalid event received to dispatch: %s - %s" % (eventType, eventData))
         except Queue.Empty:
             pass
+        return ret
 
     def peekDateTime(self):
         # Return None since this is a realtime subject.
         return None
 
+    def setWaker(self, waker):
+        self.__tradeMonitor.getQueue().setWaker(waker)
+
+    def getPollInterval(self):
+        # Trade monitor events are put in a dispatcher.EventQueue, and orders get submitted while handling events
+        # from other subjects.
+        return None
+
     # END observer.Subject interface
 
     # BEGIN broker.Broker interface
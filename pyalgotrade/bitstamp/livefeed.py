@@ -111,6 +111,7 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
         self.registerInstrument(common.btc_symbol)
         self.__prevTradeDateTime = None
         self.__thread = None
+        self.__waker = None
         self.__initializationOk = None
         self.__enableReconnection = True
         self.__stopped = False
@@ -133,6 +134,7 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
         try:
             # Start the thread that runs the client.
             self.__thread = self.buildWebSocketClientThread()
+            self.__thread.getQueue().setWaker(self.__waker)
             self.__thread.start()
         except Exception, e:
             self.__initializationOk = False
@@ -140,7 +142,7 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
 
         # Wait for initialization to complete.
         while self.__initializationOk is None and self.__thread.is_alive():
-            self.__dispatchImpl([wsclient.WebSocketClient.ON_CONNECTED])
+            self.__dispatchImpl([wsclient.WebSocketClient.ON_CONNECTED], True)
 
         if self.__initializationOk:
             common.logger.info("Initialization ok.")
@@ -162,10 +164,10 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
         else:
             self.__stopped = True
 
-    def __dispatchImpl(self, eventFilter):
+    def __dispatchImpl(self, eventFilter, block=False):
         ret = False
         try:
-            eventType, eventData = self.__thread.getQueue().get(True, LiveTradeFeed.QUEUE_TIMEOUT)
+            eventType, eventData = self.__thread.getQueue().get(block, LiveTradeFeed.QUEUE_TIMEOUT)
             if eventFilter is not None and eventType not in eventFilter:
                 return False
 
@@ -213,6 +215,16 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
         # Return None since this is a realtime subject.
         return None
 
+    def setWaker(self, waker):
+        # The queue belongs to the websocket client thread, which is built again when reconnecting.
+        self.__waker = waker
+        if self.__thread is not None:
+            self.__thread.getQueue().setWaker(waker)
+
+    def getPollInterval(self):
+        # Events are put in a dispatcher.EventQueue.
+        return None
+
     # This may raise.
     def start(self):
         if self.__thread is not None:
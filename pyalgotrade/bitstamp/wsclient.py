@@ -20,8 +20,8 @@
 
 import datetime
 import threading
-import Queue
 
+from pyalgotrade import dispatcher
 from pyalgotrade.websocket import pusher
 from pyalgotrade.bitstamp import common
 
@@ -95,7 +95,7 @@ class WebSocketClient(pusher.WebSocketClient):
 
     def __init__(self):
         pusher.WebSocketClient.__init__(self, WebSocketClient.PUSHER_APP_KEY, 5)
-        self.__queue = Queue.Queue()
+        self.__queue = dispatcher.EventQueue()
 
     def getQueue(self):
         return self.__queue
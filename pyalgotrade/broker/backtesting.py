@@ -117,6 +117,9 @@ class MarketOrder(broker.MarketOrder, BacktestingOrder):
         BacktestingOrder.__init__(self)
 
     def process(self, broker_, bar_):
+        # Market-on-close orders with intraday bars wait for the last bar of the session.
+        if self.getFillOnClose() and not broker_.isSessionClose(bar_):
+            return None
         return broker_.getFillStrategy().fillMarketOrder(broker_, self, bar_)
 
 
@@ -196,6 +199,7 @@ class Broker(broker.Broker):
         self.__activeOrders = {}
         self.__useAdjustedValues = False
         self.__fillStrategy = fillstrategy.DefaultStrategy()
+        self.__sessionCalendar = None
         self.__logger = logger.getLogger(Broker.LOGGER_NAME)
 
         # It is VERY important that the broker subscribes to barfeed events before the strategy.
@@ -268,6 +272,22 @@ class Broker(broker.Broker):
         """Returns the :class:`pyalgotrade.broker.fillstrategy.FillStrategy` currently set."""
         return self.__fillStrategy
 
+    def setSessionCalendar(self, sessionCalendar):
+        """Sets the :class:`pyalgotrade.sessioncalendar.SessionCalendar` used to tell when trading sessions close.
+        This is required for Market-On-Close orders with intraday feeds."""
+        self.__sessionCalendar = sessionCalendar
+
+    def getSessionCalendar(self):
+        """Returns the :class:`pyalgotrade.sessioncalendar.SessionCalendar` currently set, or None."""
+        return self.__sessionCalendar
+
+    def isSessionClose(self, bar_):
+        """Returns True if a bar is the last one of its trading session. Bars with daily (or greater) frequency are
+        always the last one."""
+        if bar_.getFrequency() >= pyalgotrade.bar.Frequency.DAY:
+            return True
+        return self.__sessionCalendar is not None and self.__sessionCalendar.isLastBar(bar_.getDateTime(), bar_.getFrequency())
+
     def getUseAdjustedValues(self):
         return self.__useAdjustedValues
 
@@ -488,13 +508,16 @@ class Broker(broker.Broker):
     def peekDateTime(self):
         return None
 
+    def getPollInterval(self):
+        # All events are emitted while processing barfeed events.
+        return None
+
     def createMarketOrder(self, action, instrument, quantity, onClose=False):
-        # In order to properly support market-on-close with intraday feeds I'd need to know about different
-        # exchange/market trading hours and support specifying routing an order to a specific exchange/market.
-        # Even if I had all this in place it would be a problem while paper-trading with a live feed since
-        # I can't tell if the next bar will be the last bar of the market session or not.
-        if onClose is True and self.__barFeed.isIntraday():
-            raise Exception("Market-on-close not supported with intraday feeds")
+        # In order to support market-on-close with intraday feeds the trading hours are needed to tell which bar is
+        # the last one in the session. This would still be a problem while paper-trading with a live feed since
+        # I can't tell if the next bar will be there or not.
+        if onClose is True and self.__barFeed.isIntraday() and self.__sessionCalendar is None:
+            raise Exception("Market-on-close not supported with intraday feeds unless a session calendar is set")
 
         return MarketOrder(action, instrument, quantity, onClose, self.getInstrumentTraits(instrument))
 
@@ -18,18 +18,200 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
-from pyalgotrade import utils
+import errno
+import heapq
+import os
+import Queue
+import select
+import threading
+
 from pyalgotrade import observer
 
 
+# This class is used to wake up a dispatcher waiting for new events from other threads.
+# On POSIX systems a pipe is used (the self-pipe trick) so waiting with a timeout doesn't require polling.
+class Waker(object):
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__pid = None
+        self.__event = None
+        self.__readFd = None
+        self.__writeFd = None
+        if os.name != "posix":
+            self.__event = threading.Event()
+
+    def __del__(self):
+        # File descriptors get released if close was not called.
+        if self.__pid is not None:
+            self.close()
+
+    # The pipe is created when first needed, so dispatchers that never wait don't use file descriptors.
+    # A new one is created after forking to avoid sharing it with the parent process.
+    def __getFds(self):
+        with self.__lock:
+            if self.__pid != os.getpid():
+                import fcntl
+                self.__readFd, self.__writeFd = os.pipe()
+                self.__pid = os.getpid()
+                for fd in (self.__readFd, self.__writeFd):
+                    fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+            return self.__readFd, self.__writeFd
+
+    def close(self):
+        with self.__lock:
+            if self.__pid == os.getpid():
+                os.close(self.__readFd)
+                os.close(self.__writeFd)
+            self.__pid = None
+            self.__readFd = None
+            self.__writeFd = None
+
+    def wake(self):
+        if self.__event is not None:
+            self.__event.set()
+        else:
+            try:
+                os.write(self.__getFds()[1], "\0")
+            except OSError, e:
+                # If the pipe is full there is a pending wake up already.
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    raise
+
+    # Waits until wake() gets called or until the timeout expires.
+    # Returns True if wake() was called.
+    def wait(self, timeout):
+        if self.__event is not None:
+            ret = self.__event.wait(timeout)
+            self.__event.clear()
+            return ret is True
+
+        readFd = self.__getFds()[0]
+        try:
+            select.select([readFd], [], [], timeout)
+        except select.error, e:
+            if e.args[0] != errno.EINTR:
+                raise
+        ret = False
+        try:
+            while os.read(readFd, 1024):
+                ret = True
+        except OSError, e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+        return ret
+
+
+class EventQueue(Queue.Queue):
+    """A Queue.Queue that wakes up the dispatcher when new items are put in it.
+    Realtime subjects that get events from other threads should use this class, pass the waker they receive in
+    setWaker to the queue, return None from getPollInterval and consume events without blocking.
+    """
+
+    def __init__(self, maxsize=0, waker=None):
+        Queue.Queue.__init__(self, maxsize)
+        self.__waker = waker
+
+    def setWaker(self, waker):
+        self.__waker = waker
+
+    def _put(self, item):
+        Queue.Queue._put(self, item)
+        waker = self.__waker
+        if waker is not None:
+            waker.wake()
+
+
+# This class keeps track of which subjects should be checked on every dispatch.
+# Non-realtime subjects are kept in a heap ordered by the datetime of their next event, and they only need to be
+# peeked again after they dispatch. Realtime subjects, and those that hit eof (that may have new events later on, like
+# resampled feeds), are checked on every dispatch.
+# Subjects are identified by their position in the dispatch queue, so ties are broken using the dispatch priority.
+class SubjectScheduler(object):
+    def __init__(self, subjects):
+        self.__subjects = subjects
+        self.__heap = []
+        self.__polled = range(len(subjects))
+
+    # Returns a tuple with:
+    # 1: True if all subjects hit eof
+    # 2: The lowest datetime from non-realtime subjects, or None.
+    def peek(self):
+        eof = True
+        polled = []
+        for pos in self.__polled:
+            subject = self.__subjects[pos]
+            if not subject.eof():
+                eof = False
+                dateTime = subject.peekDateTime()
+                if dateTime is not None:
+                    heapq.heappush(self.__heap, (dateTime, pos))
+                    continue
+            polled.append(pos)
+        self.__polled = polled
+
+        smallestDateTime = None
+        if len(self.__heap):
+            eof = False
+            smallestDateTime = self.__heap[0][0]
+        return eof, smallestDateTime
+
+    # Returns True if there are non-realtime subjects with events to dispatch.
+    def pending(self):
+        return len(self.__heap) > 0
+
+    # Returns the realtime subjects that didn't hit eof.
+    def getRealtimeSubjects(self):
+        ret = []
+        for pos in self.__polled:
+            subject = self.__subjects[pos]
+            if not subject.eof():
+                ret.append(subject)
+        return ret
+
+    # Returns a tuple with:
+    # 1: The positions of the subjects that should be considered for dispatch at dateTime, sorted by priority.
+    # 2: The positions of the non-realtime subjects taken from the heap, that should be rescheduled once dispatched.
+    def pop(self, dateTime):
+        ret = []
+        while len(self.__heap) and self.__heap[0][0] == dateTime:
+            ret.append(heapq.heappop(self.__heap)[1])
+        scheduled = ret
+        if len(ret) > 1:
+            ret.sort()
+        if len(self.__polled):
+            ret = sorted(ret + self.__polled)
+        return ret, scheduled
+
+    # Puts back the subjects returned by pop, according to the datetime of their next event.
+    def reschedule(self, positions):
+        for pos in positions:
+            subject = self.__subjects[pos]
+            dateTime = None
+            if not subject.eof():
+                dateTime = subject.peekDateTime()
+            if dateTime is not None:
+                heapq.heappush(self.__heap, (dateTime, pos))
+            else:
+                self.__polled.append(pos)
+        if len(positions):
+            self.__polled.sort()
+
+
 # This class is responsible for dispatching events from multiple subjects, synchronizing them if necessary.
 class Dispatcher(object):
+    # The maximum number of seconds to wait for new events when idle.
+    # Idle events are emitted at least this often.
+    MAX_IDLE_WAIT = 0.1
+
     def __init__(self):
         self.__subjects = []
         self.__stop = False
         self.__startEvent = observer.Event()
         self.__idleEvent = observer.Event()
         self.__currDateTime = None
+        self.__scheduler = None
+        self.__profiler = None
+        self.__waker = Waker()
 
     # Returns the current event datetime. It may be None for events from realtime subjects.
     def getCurrentDateTime(self):
@@ -43,10 +225,23 @@ class Dispatcher(object):
 
     def stop(self):
         self.__stop = True
+        # In case we're waiting for events.
+        self.__waker.wake()
 
     def getSubjects(self):
         return self.__subjects
 
+    # Returns the Waker used to wake up this dispatcher while it waits for new events.
+    def getWaker(self):
+        return self.__waker
+
+    # Set a pyalgotrade.profiler.Profiler to profile event handlers and subjects while running.
+    def setProfiler(self, profiler):
+        self.__profiler = profiler
+
+    def getProfiler(self):
+        return self.__profiler
+
     def addSubject(self, subject):
         assert(subject not in self.__subjects)
         if subject.getDispatchPriority() is None:
@@ -59,39 +254,59 @@ class Dispatcher(object):
                     break
                 pos += 1
             self.__subjects.insert(pos, subject)
+        subject.setWaker(self.__waker)
+        # Positions may have changed so the scheduler needs to be rebuilt.
+        self.__scheduler = None
 
     # Return True if events were dispatched.
     def __dispatchSubject(self, subject, currEventDateTime):
         ret = False
         # Dispatch if the datetime is currEventDateTime of if its a realtime subject.
         if not subject.eof() and subject.peekDateTime() in (None, currEventDateTime):
-            ret = subject.dispatch() is True
+            if self.__profiler is None:
+                ret = subject.dispatch() is True
+            else:
+                ret = self.__profiler.call(subject.dispatch) is True
         return ret
 
     # Returns a tuple with booleans
     # 1: True if all subjects hit eof
     # 2: True if at least one subject dispatched events.
     def __dispatch(self):
-        smallestDateTime = None
-        eof = True
-        eventsDispatched = False
+        if self.__scheduler is None:
+            self.__scheduler = SubjectScheduler(self.__subjects)
 
-        # Scan for the lowest datetime.
-        for subject in self.__subjects:
-            if not subject.eof():
-                eof = False
-                smallestDateTime = utils.safe_min(smallestDateTime, subject.peekDateTime())
+        eventsDispatched = False
+        eof, smallestDateTime = self.__scheduler.peek()
 
         # Dispatch realtime subjects and those subjects with the lowest datetime.
         if not eof:
             self.__currDateTime = smallestDateTime
 
-            for subject in self.__subjects:
-                if self.__dispatchSubject(subject, smallestDateTime):
+            positions, scheduled = self.__scheduler.pop(smallestDateTime)
+            for pos in positions:
+                if self.__dispatchSubject(self.__subjects[pos], smallestDateTime):
                     eventsDispatched = True
+            self.__scheduler.reschedule(scheduled)
         return eof, eventsDispatched
 
+    # Waits for new events from realtime subjects. The wait is cut short when a subject puts an item in an
+    # EventQueue, and it is skipped if a subject needs to be polled continuously.
+    def __waitForEvents(self):
+        if self.__scheduler.pending():
+            return
+
+        timeout = Dispatcher.MAX_IDLE_WAIT
+        for subject in self.__scheduler.getRealtimeSubjects():
+            pollInterval = subject.getPollInterval()
+            if pollInterval is not None:
+                timeout = min(timeout, pollInterval)
+        if timeout > 0:
+            self.__waker.wait(timeout)
+
     def run(self):
+        if self.__profiler is not None:
+            self.__profiler.start()
         try:
             for subject in self.__subjects:
                 subject.start()
@@ -104,8 +319,13 @@ class Dispatcher(object):
                     self.__stop = True
                 elif not eventsDispatched:
                     self.__idleEvent.emit()
+                    if not self.__stop:
+                        self.__waitForEvents()
         finally:
             for subject in self.__subjects:
                 subject.stop()
             for subject in self.__subjects:
                 subject.join()
+            self.__waker.close()
+            if self.__profiler is not None:
+                self.__profiler.stop()
@@ -19,8 +19,11 @@
 """
 
 import abc
+import csv
 import datetime
 
+import numpy as np
+
 from pyalgotrade.utils import dt
 from pyalgotrade.utils import csvutils
 from pyalgotrade.feed import memfeed
@@ -49,6 +52,12 @@ class RowParser(object):
     def getDelimiter(self):
         raise NotImplementedError()
 
+    # Parses a whole file and returns a tuple with two elements, or None if the file can't be parsed in bulk:
+    # 1: list of datetime.datetime. Rows with a None datetime are skipped, like with parseRow.
+    # 2: dictionary that maps column names to lists of values.
+    def parseColumns(self, path):
+        return None
+
 
 # Interface for bar filters.
 class RowFilter(object):
@@ -59,6 +68,14 @@ class RowFilter(object):
     def includeRow(self, dateTime, values):
         raise NotImplementedError()
 
+    # Returns a list of booleans with the rows to include. Override to filter columns in bulk.
+    def includeRows(self, dateTimes, columns):
+        ret = []
+        for i, dateTime in enumerate(dateTimes):
+            values = dict((key, column[i]) for key, column in columns.iteritems())
+            ret.append(self.includeRow(dateTime, values))
+        return ret
+
 
 class DateRangeFilter(RowFilter):
     def __init__(self, fromDate=None, toDate=None):
@@ -72,6 +89,9 @@ class DateRangeFilter(RowFilter):
             return False
         return True
 
+    def includeRows(self, dateTimes, columns):
+        return [self.includeRow(dateTime, None) for dateTime in dateTimes]
+
 
 class BaseFeed(memfeed.MemFeed):
     def __init__(self, rowParser, maxLen=dataseries.DEFAULT_MAX_LEN):
@@ -83,6 +103,23 @@ class BaseFeed(memfeed.MemFeed):
         self.__rowFilter = rowFilter
 
     def addValuesFromCSV(self, path):
+        # Try to load the values in bulk first.
+        parsed = self.__rowParser.parseColumns(path)
+        if parsed is not None:
+            dateTimes, columns = parsed
+            if None in dateTimes:
+                include = [dateTime is not None for dateTime in dateTimes]
+                dateTimes = [dateTime for dateTime in dateTimes if dateTime is not None]
+                for key in columns.keys():
+                    columns[key] = [value for value, included in zip(columns[key], include) if included]
+            if self.__rowFilter is not None:
+                include = self.__rowFilter.includeRows(dateTimes, columns)
+                dateTimes = [dateTime for dateTime, included in zip(dateTimes, include) if included]
+                for key in columns.keys():
+                    columns[key] = [value for value, included in zip(columns[key], include) if included]
+            self.addColumns(dateTimes, columns)
+            return
+
         # Load the values from the csv file
         values = []
         reader = csvutils.FastDictReader(open(path, "r"), fieldnames=self.__rowParser.getFieldNames(), delimiter=self.__rowParser.getDelimiter())
@@ -96,28 +133,100 @@ class BaseFeed(memfeed.MemFeed):
 
 # This row parser doesn't support CSV files that have date and time in different columns.
 class BasicRowParser(RowParser):
-    def __init__(self, dateTimeColumn, dateTimeFormat, converter, delimiter=",", timezone=None):
+    def __init__(self, dateTimeColumn, dateTimeFormat, converter, delimiter=",", timezone=None, columnTypes=None):
         self.__dateTimeColumn = dateTimeColumn
         self.__dateTimeFormat = dateTimeFormat
         self.__converter = converter
         self.__delimiter = delimiter
         self.__timezone = timezone
         self.__timeDelta = None
+        self.__columnTypes = {}
+        if columnTypes is not None:
+            self.__columnTypes.update(columnTypes)
 
-    def parseRow(self, csvRowDict):
-        dateTime = datetime.datetime.strptime(csvRowDict[self.__dateTimeColumn], self.__dateTimeFormat)
+    def __localize(self, dateTime):
         # Localize the datetime if a timezone was given.
         if self.__timezone is not None:
             if self.__timeDelta is not None:
                 dateTime += self.__timeDelta
             dateTime = dt.localize(dateTime, self.__timezone)
+        return dateTime
+
+    def __convert(self, key, value):
+        columnType = self.__columnTypes.get(key)
+        if columnType is not None:
+            return columnType(value)
+        return self.__converter(key, value)
+
+    def parseRow(self, csvRowDict):
+        dateTime = datetime.datetime.strptime(csvRowDict[self.__dateTimeColumn], self.__dateTimeFormat)
+        dateTime = self.__localize(dateTime)
         # Convert the values
         values = {}
         for key, value in csvRowDict.items():
             if key != self.__dateTimeColumn:
-                values[key] = self.__converter(key, value)
+                values[key] = self.__convert(key, value)
         return (dateTime, values)
 
+    def __parseDateTimes(self, values):
+        ret = None
+        # Fixed width datetimes get parsed in bulk.
+        layout = csvutils.get_fixed_datetime_layout(self.__dateTimeFormat)
+        if layout is not None and len(values) and all(len(value) == layout[0] for value in values):
+            chars = np.array(values, dtype="S%d" % layout[0]).view(np.uint8).reshape(len(values), layout[0])
+            parsed = csvutils.parse_fixed_datetimes(chars, layout)
+            if parsed is not None:
+                ret = parsed.astype(object).tolist()
+        if ret is None:
+            ret = [datetime.datetime.strptime(value, self.__dateTimeFormat) for value in values]
+        if self.__timezone is not None:
+            ret = [self.__localize(dateTime) for dateTime in ret]
+        return ret
+
+    def __convertColumn(self, key, values):
+        columnType = self.__columnTypes.get(key)
+        if columnType is not None:
+            return map(columnType, values)
+        # Infer the type of the column, instead of trying to convert every value on its own.
+        if self.__converter is float_or_string:
+            try:
+                return map(float, values)
+            except ValueError:
+                pass
+        return [self.__converter(key, value) for value in values]
+
+    def parseColumns(self, path):
+        # Subclasses that override parseRow have to be parsed row by row.
+        if type(self).parseRow.im_func is not BasicRowParser.parseRow.im_func:
+            return None
+
+        with open(path, "r") as f:
+            reader = csv.reader(f, delimiter=self.__delimiter)
+            fieldNames = reader.next()
+            rows = []
+            for row in reader:
+                if row == []:
+                    continue
+                if len(row) != len(fieldNames):
+                    raise Exception("Line %d in %s has %d values instead of %d" % (reader.line_num, path, len(row), len(fieldNames)))
+                rows.append(row)
+
+        if self.__dateTimeColumn not in fieldNames:
+            raise KeyError(self.__dateTimeColumn)
+
+        columns = {}
+        if len(rows):
+            for key, values in zip(fieldNames, zip(*rows)):
+                columns[key] = values
+        else:
+            for key in fieldNames:
+                columns[key] = ()
+
+        dateTimes = self.__parseDateTimes(columns.pop(self.__dateTimeColumn))
+        for key in columns.keys():
+            columns[key] = self.__convertColumn(key, columns[key])
+        return (dateTimes, columns)
+
     def getFieldNames(self):
         return None
 
@@ -154,12 +263,19 @@ class Feed(BaseFeed):
     :param maxLen: The maximum number of values that each :class:`pyalgotrade.dataseries.DataSeries` will hold.
         Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the opposite end.
     :type maxLen: int.
+    :param columnTypes: An optional dictionary that maps column names to the type used to convert their values,
+        for example float, int or str. Columns not in the dictionary are converted using the converter.
+    :type columnTypes: dict.
+
+    .. note::
+        Files are parsed column by column. With the default converter, columns where every value is a number are
+        converted to floats in bulk.
     """
 
-    def __init__(self, dateTimeColumn, dateTimeFormat, converter=None, delimiter=",", timezone=None, maxLen=dataseries.DEFAULT_MAX_LEN):
+    def __init__(self, dateTimeColumn, dateTimeFormat, converter=None, delimiter=",", timezone=None, maxLen=dataseries.DEFAULT_MAX_LEN, columnTypes=None):
         if converter is None:
             converter = float_or_string
-        self.__rowParser = BasicRowParser(dateTimeColumn, dateTimeFormat, converter, delimiter, timezone)
+        self.__rowParser = BasicRowParser(dateTimeColumn, dateTimeFormat, converter, delimiter, timezone, columnTypes)
         BaseFeed.__init__(self, self.__rowParser, maxLen)
 
     def addValuesFromCSV(self, path):
@@ -22,10 +22,18 @@ from pyalgotrade import feed
 from pyalgotrade import dataseries
 
 
+# Marks a missing value in a column.
+MISSING = object()
+
+
+# Values are stored in columns, one list per key, and the dictionaries are built as values get dispatched.
 class MemFeed(feed.BaseFeed):
     def __init__(self, maxLen=dataseries.DEFAULT_MAX_LEN):
         feed.BaseFeed.__init__(self, maxLen)
-        self.__values = []
+        self.__dateTimes = []
+        self.__columns = {}
+        # True if some rows don't have values for every column.
+        self.__sparse = False
         self.__nextIdx = 0
 
     def reset(self):
@@ -42,15 +50,15 @@ class MemFeed(feed.BaseFeed):
         pass
 
     def eof(self):
-        if self.__nextIdx < len(self.__values):
+        if self.__nextIdx < len(self.__dateTimes):
             return False
         else:
             return True
 
     def peekDateTime(self):
         ret = None
-        if self.__nextIdx < len(self.__values):
-            ret = self.__values[self.__nextIdx][0]
+        if self.__nextIdx < len(self.__dateTimes):
+            ret = self.__dateTimes[self.__nextIdx]
         return ret
 
     def createDataSeries(self, key, maxLen):
@@ -58,8 +66,17 @@ class MemFeed(feed.BaseFeed):
 
     def getNextValues(self):
         ret = (None, None)
-        if self.__nextIdx < len(self.__values):
-            ret = self.__values[self.__nextIdx]
+        idx = self.__nextIdx
+        if idx < len(self.__dateTimes):
+            if self.__sparse:
+                values = {}
+                for key, column in self.__columns.iteritems():
+                    value = column[idx]
+                    if value is not MISSING:
+                        values[key] = value
+            else:
+                values = dict((key, column[idx]) for key, column in self.__columns.iteritems())
+            ret = (self.__dateTimes[idx], values)
             self.__nextIdx += 1
         return ret
 
@@ -72,6 +89,55 @@ class MemFeed(feed.BaseFeed):
             for key in values[0][1].keys():
                 self.registerDataSeries(key)
 
-            self.__values.extend(values)
-            cmpFun = lambda x, y: cmp(x[0], y[0])
-            self.__values.sort(cmpFun)
+            dateTimes = []
+            columns = {}
+            for i, (dateTime, rowValues) in enumerate(values):
+                dateTimes.append(dateTime)
+                for key, value in rowValues.items():
+                    column = columns.get(key)
+                    if column is None:
+                        column = [MISSING] * i
+                        columns[key] = column
+                    column.append(value)
+                # Pad the columns that the row doesn't have values for.
+                for column in columns.itervalues():
+                    if len(column) <= i:
+                        column.append(MISSING)
+            self.__addColumns(dateTimes, columns)
+
+    def addColumns(self, dateTimes, columns):
+        """Adds values to the feed, in columns.
+
+        :param dateTimes: The datetimes for the values.
+        :type dateTimes: list of :class:`datetime.datetime`.
+        :param columns: A dictionary that maps keys to lists of values. Every list must have the same length as dateTimes.
+        :type columns: dict.
+        """
+        if len(dateTimes):
+            for key in columns.keys():
+                self.registerDataSeries(key)
+            self.__addColumns(dateTimes, columns)
+
+    def __addColumns(self, dateTimes, columns):
+        size = len(self.__dateTimes)
+        newSize = size + len(dateTimes)
+        for key, column in columns.iteritems():
+            assert len(column) == len(dateTimes), "Column %s has %d values instead of %d" % (key, len(column), len(dateTimes))
+            if key not in self.__columns:
+                self.__columns[key] = [MISSING] * size
+                self.__sparse = self.__sparse or size > 0
+            self.__columns[key].extend(column)
+            self.__sparse = self.__sparse or MISSING in column
+        for column in self.__columns.itervalues():
+            if len(column) < newSize:
+                column.extend([MISSING] * (newSize - len(column)))
+                self.__sparse = True
+        self.__dateTimes.extend(dateTimes)
+
+        # Sort by datetime, keeping the order of values with the same datetime, if they are not sorted already.
+        if any(self.__dateTimes[i] > self.__dateTimes[i + 1] for i in xrange(max(size - 1, 0), newSize - 1)):
+            order = sorted(xrange(newSize), key=self.__dateTimes.__getitem__)
+            self.__dateTimes = [self.__dateTimes[i] for i in order]
+            for key in self.__columns.keys():
+                column = self.__columns[key]
+                self.__columns[key] = [column[i] for i in order]
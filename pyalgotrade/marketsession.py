@@ -18,8 +18,16 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import datetime
+
 import pytz
 
+from pyalgotrade import sessioncalendar
+
+
+# Session calendars are built once per market session class.
+calendars = {}
+
 
 # http://en.wikipedia.org/wiki/List_of_market_opening_times
 class MarketSession(object):
@@ -29,11 +37,32 @@ class MarketSession(object):
         This is a base class and should not be used directly.
     """
 
+    # Regular trading hours in the market timezone, or None if not available.
+    openTime = None
+    closeTime = None
+    # The file in pyalgotrade/data with the holidays and early closes, if available.
+    holidaysFile = None
+
     @classmethod
     def getTimezone(cls):
         """Returns the pytz timezone for the market session."""
         return cls.timezone
 
+    @classmethod
+    def getCalendar(cls):
+        """Returns the :class:`pyalgotrade.sessioncalendar.SessionCalendar` with the regular trading sessions."""
+        ret = calendars.get(cls)
+        if ret is None:
+            if cls.openTime is None or cls.closeTime is None:
+                raise Exception("Trading hours for %s are not available" % (cls.__name__))
+            holidays = None
+            earlyCloses = None
+            if cls.holidaysFile is not None:
+                holidays, earlyCloses = sessioncalendar.load_holidays(sessioncalendar.get_data_file_path(cls.holidaysFile))
+            ret = sessioncalendar.SessionCalendar(cls.timezone, cls.openTime, cls.closeTime, holidays, earlyCloses)
+            calendars[cls] = ret
+        return ret
+
 
 ######################################################################
 # US
@@ -41,16 +70,25 @@ class MarketSession(object):
 class NASDAQ(MarketSession):
     """NASDAQ market session."""
     timezone = pytz.timezone("US/Eastern")
+    openTime = datetime.time(9, 30)
+    closeTime = datetime.time(16)
+    holidaysFile = "us_equities_holidays.csv"
 
 
 class NYSE(MarketSession):
     """New York Stock Exchange market session."""
     timezone = pytz.timezone("US/Eastern")
+    openTime = datetime.time(9, 30)
+    closeTime = datetime.time(16)
+    holidaysFile = "us_equities_holidays.csv"
 
 
 class USEquities(MarketSession):
     """US Equities market session."""
     timezone = pytz.timezone("US/Eastern")
+    openTime = datetime.time(9, 30)
+    closeTime = datetime.time(16)
+    holidaysFile = "us_equities_holidays.csv"
 
 
 ######################################################################
@@ -19,16 +19,17 @@
 .. moduleauthor:: Richard Crook <richard@pinkgrass.org>
 """
 
-import urllib2
 import urllib
 import os
 import datetime
 import json
 import csv
+import StringIO
 
 import pyalgotrade.logger
 from pyalgotrade import bar
 from pyalgotrade.oanda import barfeed
+from pyalgotrade.tools import downloader
 
 OANDA_FREQUENCY = {
     bar.Frequency.TRADE: 'all', # The bar represents a single trade.
@@ -58,13 +59,12 @@ def get_instruments():
     ]
     '''
 
-    req = urllib2.Request('https://api-sandbox.oanda.com/v1/instruments')
-    f = urllib2.urlopen(req)
+    f = downloader.fetch('https://api-sandbox.oanda.com/v1/instruments')
 
-    if f.getcode() != 200:
-        raise Exception("Failed to download data: %s" % f.getcode())
+    if f.getStatus() != 200:
+        raise Exception("Failed to download data: %s" % f.getStatus())
 
-    response = json.loads(f.read())
+    response = json.loads(f.getBody())
     instruments = response['instruments']
 
     markets = {}
@@ -98,26 +98,28 @@ def download_json(instrument, begin, end, frequency=bar.Frequency.HOUR, authToke
     url = 'https://api-sandbox.oanda.com/v1/candles'
     url += '?' + urllib.urlencode(params)
 
-    #req = urllib2.Request('https://api-sandbox.oanda.com/v1/instruments')
-    f = urllib2.urlopen(url)
+    f = downloader.fetch(url)
 
-    if f.getcode() != 200:
-        raise Exception("Failed to download data: %s" % f.getcode())
+    if f.getStatus() != 200:
+        raise Exception("Failed to download data: %s" % f.getStatus())
 
-    response = json.loads(f.read())
-    f.close()
+    response = json.loads(f.getBody())
     candles = response['candles']
 
     return candles
 
+def write_candles(candles, csvFile):
+    buff = StringIO.StringIO()
+    writer = csv.writer(buff)
+    writer.writerow(candles[0].keys())  # header row
+    for candle in candles:
+        writer.writerow(candle.values())
+    downloader.write_file(csvFile, buff.getvalue())
+
 def download_bars(instrument, begin, end, frequency, csvFile):
     bars = download_json(instrument, begin, end, frequency)
 
-    with open(csvFile, 'w') as f:
-        writer = csv.writer(f)
-        writer.writerow(bars[0].keys())  # header row
-        for candle in bars:
-            writer.writerow(candle.values())
+    write_candles(bars, csvFile)
 
 def download_recent_bars(instrument, periods, frequency, step, csvFile):
     """Download most recent bars from Oanda for a given frequency and number of days
@@ -126,11 +128,7 @@ def download_recent_bars(instrument, periods, frequency, step, csvFile):
     begin = end - datetime.timedelta(seconds=((periods + 1) * frequency)) # X periods
 
     bars = download_json(instrument, begin, end, frequency)
-    with open(csvFile, 'w') as f:
-        writer = csv.writer(f)
-        writer.writerow(bars[0].keys())  # header row
-        for candle in bars:
-            writer.writerow(candle.values())
+    write_candles(bars, csvFile)
 
 def download_daily_bars(instrument, year, csvFile):
     """Download daily bars from Ripple Charts for a given year.
@@ -138,11 +136,7 @@ def download_daily_bars(instrument, year, csvFile):
     begin = datetime.datetime(year=year,month=1,day=1)
     end = datetime.datetime(year=year,month=12,day=31)
     bars = download_json(instrument, begin, end, bar.Frequency.DAY)
-    with open(csvFile, 'w') as f:
-        writer = csv.writer(f)
-        writer.writerow(bars[0].keys())  # header row
-        for candle in bars:
-            writer.writerow(candle.values())
+    write_candles(bars, csvFile)
 
 
 def download_hourly_bars(instrument, year, csvFile):
@@ -160,11 +154,7 @@ def download_hourly_bars(instrument, year, csvFile):
     bars = download_json(instrument, begin, end_H1, bar.Frequency.HOUR)
     bars += download_json(instrument, begin_H2, end, bar.Frequency.HOUR)
 
-    with open(csvFile, 'w') as f:
-        writer = csv.writer(f)
-        writer.writerow(bars[0].keys())  # header row
-        for candle in bars:
-            writer.writerow(candle.values())
+    write_candles(bars, csvFile)
 
 def build_feed_recent(instruments, periods=1, storage='.', frequency=bar.Frequency.HOUR, step=1, timezone=None, skipErrors=False):
     """Build and load a :class:`pyalgotrade.ripple.Feed` using CSV files downloaded from Ripple Charts.
@@ -207,7 +197,7 @@ def build_feed_recent(instruments, periods=1, storage='.', frequency=bar.Frequen
     return ret
 
 
-def build_feed(instruments, fromYear, toYear, storage, frequency=bar.Frequency.DAY, timezone=None, skipErrors=False):
+def build_feed(instruments, fromYear, toYear, storage, frequency=bar.Frequency.DAY, timezone=None, skipErrors=False, processes=1, downloads=1):
     """Build and load a :class:`pyalgotrade.ripple.Feed` using CSV files downloaded from Ripple Charts.
     CSV files are downloaded if they haven't been downloaded before.
 
@@ -225,6 +215,11 @@ def build_feed(instruments, fromYear, toYear, storage, frequency=bar.Frequency.D
     :type timezone: A pytz timezone.
     :param skipErrors: True to keep on loading/downloading files in case of errors.
     :type skipErrors: boolean.
+    :param processes: The number of worker processes used to parse the files. 1 parses them in this process, and None
+        uses as many processes as CPUs.
+    :type processes: int.
+    :param downloads: The number of files downloaded at the same time.
+    :type downloads: int.
     :rtype: :class:`pyalgotrade.ripple.Feed`.
     """
 
@@ -235,25 +230,25 @@ def build_feed(instruments, fromYear, toYear, storage, frequency=bar.Frequency.D
         logger.info("Creating %s directory" % (storage))
         os.mkdir(storage)
 
+    if frequency == bar.Frequency.DAY:
+        downloadFunc = download_daily_bars
+    elif frequency == bar.Frequency.HOUR:
+        downloadFunc = download_hourly_bars
+    else:
+        raise Exception("Invalid frequency")
+
+    files = []
+    missing = []
     for year in range(fromYear, toYear+1):
         for instrument in instruments:
             fileName = os.path.join(storage, "%s-%d-oanda.csv" % (instrument.replace('/','_'), year))
             if not os.path.exists(fileName):
-                logger.info("Downloading %s %d to %s" % (instrument, year, fileName))
-                try:
-                    if frequency == bar.Frequency.DAY:
-                        download_daily_bars(instrument, year, fileName)
-                    elif frequency == bar.Frequency.HOUR:
-                        download_hourly_bars(instrument, year, fileName)
-                    else:
-                        raise Exception("Invalid frequency")
-                except Exception, e:
-                    if skipErrors:
-                        logger.error(str(e))
-                        continue
-                    else:
-                        raise e
-            ret.addBarsFromCSV(instrument, fileName)
+                missing.append(("%s %d" % (instrument, year), fileName, downloadFunc, (instrument, year, fileName)))
+            files.append((instrument, fileName))
+
+    failed = downloader.download_files(missing, downloads, skipErrors, logger)
+    files = [item for item in files if item[1] not in failed]
+    ret.addBarsFromCSVFiles(files, processes=processes, skipErrors=skipErrors)
     return ret
 
 
@@ -19,6 +19,19 @@
 """
 
 import abc
+import threading
+
+
+# The pyalgotrade.profiler.Profiler active in each thread, if any. Handlers are called through it while it is set.
+profilerState = threading.local()
+
+
+def get_active_profiler():
+    return getattr(profilerState, "profiler", None)
+
+
+def set_active_profiler(profiler):
+    profilerState.profiler = profiler
 
 
 class Event(object):
@@ -55,8 +68,13 @@ class Event(object):
     def emit(self, *args, **kwargs):
         try:
             self.__emitting = True
-            for handler in self.__handlers:
-                handler(*args, **kwargs)
+            profiler = get_active_profiler()
+            if profiler is None:
+                for handler in self.__handlers:
+                    handler(*args, **kwargs)
+            else:
+                for handler in self.__handlers:
+                    profiler.call(handler, *args, **kwargs)
         finally:
             self.__emitting = False
             self.__applyChanges()
@@ -101,3 +119,16 @@ class Subject(object):
         # Returns a number (or None) used to sort subjects within the dispatch queue.
         # The return value should never change.
         return None
+
+    def setWaker(self, waker):
+        # Called when the subject is added to a dispatcher, with the pyalgotrade.dispatcher.Waker that interrupts
+        # the dispatcher's wait for new events. Subjects that put events in a pyalgotrade.dispatcher.EventQueue from
+        # other threads should pass it to the queue.
+        pass
+
+    def getPollInterval(self):
+        # Only used for realtime subjects.
+        # Returns the maximum number of seconds the dispatcher can wait for new events before calling dispatch again.
+        # Return None if the subject doesn't need to be polled because it puts new events in a
+        # pyalgotrade.dispatcher.EventQueue, or because it only reacts to events from other subjects.
+        return 0
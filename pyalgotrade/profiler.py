@@ -0,0 +1,211 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import inspect
+import json
+import time
+
+from pyalgotrade import observer
+
+
+def get_handler_name(handler):
+    """Returns a name for an event handler: Class.method for methods, module.function for functions."""
+
+    func = getattr(handler, "im_func", None)
+    if func is not None:
+        # Look for the class where the method was defined.
+        owner = handler.im_self
+        if owner is None:
+            owner = handler.im_class
+        elif not inspect.isclass(owner):
+            owner = owner.__class__
+        ownerName = owner.__name__
+        for cls in inspect.getmro(owner):
+            if func in cls.__dict__.values():
+                ownerName = cls.__name__
+                break
+        return "%s.%s" % (ownerName, func.__name__)
+
+    name = getattr(handler, "__name__", None)
+    if name is not None:
+        return "%s.%s" % (getattr(handler, "__module__", None), name)
+
+    return handler.__class__.__name__
+
+
+class HandlerStats(object):
+    """Statistics collected for an event handler.
+
+    .. note::
+        * Cumulative times include the time spent in handlers called while this one was running.
+        * Self times exclude the time spent in those handlers.
+    """
+
+    def __init__(self, name):
+        self.__name = name
+        self.__calls = 0
+        self.__wallTime = 0.0
+        self.__cpuTime = 0.0
+        self.__selfWallTime = 0.0
+        self.__selfCpuTime = 0.0
+
+    def addCall(self, wallTime, cpuTime, selfWallTime, selfCpuTime):
+        self.__calls += 1
+        self.__wallTime += wallTime
+        self.__cpuTime += cpuTime
+        self.__selfWallTime += selfWallTime
+        self.__selfCpuTime += selfCpuTime
+
+    def getName(self):
+        """Returns the handler name."""
+        return self.__name
+
+    def getCalls(self):
+        """Returns the number of times the handler was called."""
+        return self.__calls
+
+    def getWallTime(self):
+        """Returns the cumulative wall time, in seconds."""
+        return self.__wallTime
+
+    def getCPUTime(self):
+        """Returns the cumulative CPU time, in seconds."""
+        return self.__cpuTime
+
+    def getSelfWallTime(self):
+        """Returns the wall time, in seconds, excluding the time spent in nested handlers."""
+        return self.__selfWallTime
+
+    def getSelfCPUTime(self):
+        """Returns the CPU time, in seconds, excluding the time spent in nested handlers."""
+        return self.__selfCpuTime
+
+    def toDict(self):
+        return {
+            "name": self.__name,
+            "calls": self.__calls,
+            "wallTime": self.__wallTime,
+            "cpuTime": self.__cpuTime,
+            "selfWallTime": self.__selfWallTime,
+            "selfCpuTime": self.__selfCpuTime,
+        }
+
+
+class Profiler(object):
+    """Collects call counts and wall/CPU times for every event handler called while the profiler is active.
+    Handlers are grouped by name, so the same method subscribed by different instances shows up once.
+
+    .. note::
+        * Profiling is disabled unless a Profiler is started, and the overhead when disabled is negligible.
+        * Only handlers called from the thread that started the profiler are profiled.
+    """
+
+    def __init__(self):
+        self.__stats = {}
+        self.__statsByHandler = {}
+        # Each item holds the wall and CPU time spent in nested handlers.
+        self.__stack = []
+        self.__prevProfiler = None
+        self.__beginWall = None
+        self.__beginCpu = None
+        self.__wallTime = 0.0
+        self.__cpuTime = 0.0
+
+    def start(self):
+        """Activates the profiler in the current thread. Handlers for every :class:`pyalgotrade.observer.Event`
+        emitted from this thread will be profiled."""
+        self.__prevProfiler = observer.get_active_profiler()
+        observer.set_active_profiler(self)
+        self.__beginWall = time.time()
+        self.__beginCpu = time.clock()
+
+    def stop(self):
+        """Deactivates the profiler. Call this from the thread that started it."""
+        observer.set_active_profiler(self.__prevProfiler)
+        self.__prevProfiler = None
+        if self.__beginWall is not None:
+            self.__wallTime += time.time() - self.__beginWall
+            self.__cpuTime += time.clock() - self.__beginCpu
+            self.__beginWall = None
+            self.__beginCpu = None
+
+    def __getHandlerStats(self, handler):
+        try:
+            ret = self.__statsByHandler[handler]
+        except KeyError:
+            name = get_handler_name(handler)
+            ret = self.__stats.get(name)
+            if ret is None:
+                ret = HandlerStats(name)
+                self.__stats[name] = ret
+            self.__statsByHandler[handler] = ret
+        return ret
+
+    def call(self, handler, *args, **kwargs):
+        """Calls a handler and updates its statistics."""
+        stats = self.__getHandlerStats(handler)
+        nested = [0.0, 0.0]
+        self.__stack.append(nested)
+        beginWall = time.time()
+        beginCpu = time.clock()
+        try:
+            return handler(*args, **kwargs)
+        finally:
+            wallTime = time.time() - beginWall
+            cpuTime = time.clock() - beginCpu
+            self.__stack.pop()
+            if len(self.__stack):
+                parent = self.__stack[-1]
+                parent[0] += wallTime
+                parent[1] += cpuTime
+            stats.addCall(wallTime, cpuTime, wallTime - nested[0], cpuTime - nested[1])
+
+    def getWallTime(self):
+        """Returns the wall time, in seconds, the profiler was active."""
+        return self.__wallTime
+
+    def getCPUTime(self):
+        """Returns the CPU time, in seconds, the profiler was active."""
+        return self.__cpuTime
+
+    def getStats(self):
+        """Returns a list of :class:`HandlerStats` sorted by cumulative wall time, in descending order."""
+        return sorted(self.__stats.values(), key=lambda stats: stats.getWallTime(), reverse=True)
+
+    def getReport(self):
+        """Returns a string with a table with the statistics for every handler."""
+        lines = []
+        lines.append("Total wall time: %.4f s. Total CPU time: %.4f s." % (self.__wallTime, self.__cpuTime))
+        lines.append("%-60s %10s %12s %12s %12s %12s" % ("Handler", "Calls", "Wall (s)", "CPU (s)", "Self wall (s)", "Self CPU (s)"))
+        for stats in self.getStats():
+            lines.append("%-60s %10d %12.4f %12.4f %12.4f %12.4f" % (
+                stats.getName(), stats.getCalls(), stats.getWallTime(), stats.getCPUTime(),
+                stats.getSelfWallTime(), stats.getSelfCPUTime()
+            ))
+        return "\n".join(lines)
+
+    def getJSONReport(self):
+        """Returns the statistics as a JSON string, for regression tracking."""
+        report = {
+            "wallTime": self.__wallTime,
+            "cpuTime": self.__cpuTime,
+            "handlers": [stats.toDict() for stats in self.getStats()],
+        }
+        return json.dumps(report, indent=4, sort_keys=True)
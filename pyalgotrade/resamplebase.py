@@ -22,6 +22,46 @@ from pyalgotrade.utils import dt
 from pyalgotrade import bar
 
 
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# Day and month boundaries keyed by timezone and local beginning, so they are localized only once.
+# The cache gets cleared once it holds MAX_CACHED_BOUNDARIES entries.
+MAX_CACHED_BOUNDARIES = 10000
+boundaries_cache = {}
+
+
+def datetime_to_micros(dateTime):
+    """Returns the number of microseconds since the epoch. Naive datetimes are treated as UTC."""
+    offset = dateTime.utcoffset()
+    if offset is not None:
+        dateTime = dateTime.replace(tzinfo=None) - offset
+    delta = dateTime - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def get_timezone(dateTime):
+    if dt.datetime_is_naive(dateTime):
+        return None
+    return dateTime.tzinfo
+
+
+# Returns the beginning and the ending of a range that begins and ends at local midnights, both as microseconds
+# since the epoch and as datetimes.
+def get_local_boundaries(begin, end, timezone):
+    key = (getattr(timezone, "zone", timezone), begin, end)
+    ret = boundaries_cache.get(key)
+    if ret is None:
+        if timezone is not None:
+            # Each boundary is localized on its own, so days when DST begins or ends are 23 or 25 hours long.
+            begin = dt.localize(begin, timezone)
+            end = dt.localize(end, timezone)
+        ret = (datetime_to_micros(begin), datetime_to_micros(end), begin, end)
+        if len(boundaries_cache) >= MAX_CACHED_BOUNDARIES:
+            boundaries_cache.clear()
+        boundaries_cache[key] = ret
+    return ret
+
+
 class TimeRange(object):
     __metaclass__ = abc.ABCMeta
 
@@ -39,22 +79,21 @@ class TimeRange(object):
         raise NotImplementedError()
 
 
-class IntraDayRange(TimeRange):
-    def __init__(self, dateTime, frequency):
-        assert isinstance(frequency, int)
-        assert frequency > 1
-        assert frequency < bar.Frequency.DAY
+class IntegerRange(TimeRange):
+    """A :class:`TimeRange` with its boundaries precomputed both as datetimes and as microseconds since the epoch,
+    for code that works with integer timestamps."""
 
-        ts = int(dt.datetime_to_timestamp(dateTime))
-        slot = int(ts / frequency)
-        slotTs = slot * frequency
-        self.__begin = dt.timestamp_to_datetime(slotTs, not dt.datetime_is_naive(dateTime))
-        if not dt.datetime_is_naive(dateTime):
-            self.__begin = dt.localize(self.__begin, dateTime.tzinfo)
-        self.__end = self.__begin + datetime.timedelta(seconds=frequency)
+    def __init__(self, beginMicros, endMicros, begin, end):
+        self.__beginMicros = beginMicros
+        self.__endMicros = endMicros
+        self.__begin = begin
+        self.__end = end
 
     def belongs(self, dateTime):
-        return dateTime >= self.__begin and dateTime < self.__end
+        return self.__begin <= dateTime < self.__end
+
+    def belongsMicros(self, micros):
+        return self.__beginMicros <= micros < self.__endMicros
 
     def getBeginning(self):
         return self.__begin
@@ -62,46 +101,46 @@ class IntraDayRange(TimeRange):
     def getEnding(self):
         return self.__end
 
+    def getBeginningMicros(self):
+        return self.__beginMicros
 
-class DayRange(TimeRange):
-    def __init__(self, dateTime):
-        self.__begin = datetime.datetime(dateTime.year, dateTime.month, dateTime.day)
-        if not dt.datetime_is_naive(dateTime):
-            self.__begin = dt.localize(self.__begin, dateTime.tzinfo)
-        self.__end = self.__begin + datetime.timedelta(days=1)
+    def getEndingMicros(self):
+        return self.__endMicros
 
-    def belongs(self, dateTime):
-        return dateTime >= self.__begin and dateTime < self.__end
 
-    def getBeginning(self):
-        return self.__begin
+class IntraDayRange(IntegerRange):
+    def __init__(self, dateTime, frequency):
+        assert isinstance(frequency, int)
+        assert frequency > 1
+        assert frequency < bar.Frequency.DAY
 
-    def getEnding(self):
-        return self.__end
+        # Slots are aligned to the epoch, in UTC.
+        slotMicros = frequency * 1000000
+        micros = datetime_to_micros(dateTime)
+        beginMicros = micros - micros % slotMicros
+        begin = dateTime - datetime.timedelta(microseconds=micros - beginMicros)
+        timezone = get_timezone(dateTime)
+        if timezone is not None:
+            # The slot may begin before a DST change, so the UTC offset is fixed.
+            begin = dt.localize(begin, timezone)
+        IntegerRange.__init__(self, beginMicros, beginMicros + slotMicros, begin, begin + datetime.timedelta(seconds=frequency))
 
 
-class MonthRange(TimeRange):
+class DayRange(IntegerRange):
     def __init__(self, dateTime):
-        self.__begin = datetime.datetime(dateTime.year, dateTime.month, 1)
+        begin = datetime.datetime(dateTime.year, dateTime.month, dateTime.day)
+        end = begin + datetime.timedelta(days=1)
+        IntegerRange.__init__(self, *get_local_boundaries(begin, end, get_timezone(dateTime)))
+
 
-        # Calculate the ending date.
+class MonthRange(IntegerRange):
+    def __init__(self, dateTime):
+        begin = datetime.datetime(dateTime.year, dateTime.month, 1)
         if dateTime.month == 12:
-            self.__end = datetime.datetime(dateTime.year + 1, 1, 1)
+            end = datetime.datetime(dateTime.year + 1, 1, 1)
         else:
-            self.__end = datetime.datetime(dateTime.year, dateTime.month + 1, 1)
-
-        if not dt.datetime_is_naive(dateTime):
-            self.__begin = dt.localize(self.__begin, dateTime.tzinfo)
-            self.__end = dt.localize(self.__end, dateTime.tzinfo)
-
-    def belongs(self, dateTime):
-        return dateTime >= self.__begin and dateTime < self.__end
-
-    def getBeginning(self):
-        return self.__begin
-
-    def getEnding(self):
-        return self.__end
+            end = datetime.datetime(dateTime.year, dateTime.month + 1, 1)
+        IntegerRange.__init__(self, *get_local_boundaries(begin, end, get_timezone(dateTime)))
 
 
 def is_valid_frequency(frequency):
@@ -22,6 +22,7 @@
 """
 
 from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import barcache
 from pyalgotrade.barfeed import common
 from pyalgotrade.utils import dt
 from pyalgotrade import bar
@@ -69,6 +70,9 @@ class RowParser(csvfeed.RowParser):
             ret = dt.localize(ret, self.__timezone)
         return ret
 
+    def getCacheKey(self):
+        return ("ripple", self.__dailyBarTime, self.__frequency, barcache.timezone_key(self.__timezone), self.__sanitize)
+
     def getFieldNames(self):
         # It is expected for the first row to have the field names.
         return None
@@ -131,11 +135,13 @@ class Feed(csvfeed.BarFeed):
         :type timezone: A pytz timezone.
         """
 
+        csvfeed.BarFeed.addBarsFromCSV(self, instrument, path, self.createRowParser(timezone))
+
+    def createRowParser(self, timezone=None):
         if timezone is None:
             timezone = self.__timezone
 
-        rowParser = RowParser(self.getDailyBarTime(), self.getFrequency(), timezone, self.__sanitizeBars)
-        csvfeed.BarFeed.addBarsFromCSV(self, instrument, path, rowParser)
+        return RowParser(self.getDailyBarTime(), self.getFrequency(), timezone, self.__sanitizeBars)
 
 if __name__ == '__main__':
     # DEBUG PURPOSES ONLY - please ignore
@@ -19,7 +19,6 @@
 .. moduleauthor:: Richard Crook <richard@pinkgrass.org>
 """
 
-import urllib2
 import os
 import datetime
 import json
@@ -27,6 +26,7 @@ import json
 import pyalgotrade.logger
 from pyalgotrade import bar
 from pyalgotrade.ripple import barfeed
+from pyalgotrade.tools import downloader
 
 RIPPLECHART_FREQUENCY = {
     bar.Frequency.TRADE: 'all', # The bar represents a single trade.
@@ -67,14 +67,12 @@ def top_markets(startTime=None,endTime=None):
         'endTime' : endTime
     }
 
-    req = urllib2.Request('http://api.ripplecharts.com/api/top_markets')
-    req.add_header('Content-Type', 'application/json')
-    f = urllib2.urlopen(req, json.dumps(data))
+    f = downloader.fetch('http://api.ripplecharts.com/api/top_markets', json.dumps(data), {'Content-Type': 'application/json'})
 
-    if f.getcode() != 200:
-        raise Exception("Failed to download data: %s" % f.getcode())
+    if f.getStatus() != 200:
+        raise Exception("Failed to download data: %s" % f.getStatus())
 
-    response = json.loads(f.read())
+    response = json.loads(f.getBody())
     components = response['components']
 
     markets = {}
@@ -112,15 +110,11 @@ def download_csv(instrument, begin, end, frequency):
         'format' : "csv"
     }
 
-    req = urllib2.Request('http://api.ripplecharts.com/api/offers_exercised')
-    req.add_header('Content-Type', 'application/json')
+    f = downloader.fetch('http://api.ripplecharts.com/api/offers_exercised', json.dumps(data), {'Content-Type': 'application/json'})
 
-    f = urllib2.urlopen(req, json.dumps(data))
-
-    if f.getcode() != 200:
-        raise Exception("Failed to download data: %s" % f.getcode())
-    buff = f.read()
-    f.close()
+    if f.getStatus() != 200:
+        raise Exception("Failed to download data: %s" % f.getStatus())
+    buff = f.getBody()
 
     # Remove the BOM
     #while not buff[0].isalnum():
@@ -130,9 +124,7 @@ def download_csv(instrument, begin, end, frequency):
 
 def download_bars(instrument, begin, end, frequency, csvFile):
     bars = download_csv(instrument, begin, end, frequency)
-    f = open(csvFile, 'w')
-    f.write(bars)
-    f.close()
+    downloader.write_file(csvFile, bars)
 
 def download_recent_bars(instrument, periods, frequency, step, csvFile):
     """Download most recent bars from Ripple Charts for a given frequency and number of days
@@ -141,9 +133,7 @@ def download_recent_bars(instrument, periods, frequency, step, csvFile):
     begin = end - datetime.timedelta(seconds=((periods + 1) * frequency)) # X periods
 
     bars = download_csv(instrument, str(begin), str(end), frequency)
-    f = open(csvFile, "w")
-    f.write(bars)
-    f.close()
+    downloader.write_file(csvFile, bars)
 
 def download_daily_bars(instrument, year, csvFile):
     """Download daily bars from Ripple Charts for a given year.
@@ -151,9 +141,7 @@ def download_daily_bars(instrument, year, csvFile):
     begin = str(year)+'-01-01'
     end = str(year)+'-12-31'
     bars = download_csv(instrument, begin, end, bar.Frequency.DAY)
-    f = open(csvFile, "w")
-    f.write(bars)
-    f.close()
+    downloader.write_file(csvFile, bars)
 
 
 def download_hourly_bars(instrument, year, csvFile):
@@ -166,9 +154,7 @@ def download_hourly_bars(instrument, year, csvFile):
     begin = str(year)+'-01-01'
     end = str(year)+'-12-31'
     bars = download_csv(instrument, begin, end, bar.Frequency.HOUR)
-    f = open(csvFile, "w")
-    f.write(bars)
-    f.close()
+    downloader.write_file(csvFile, bars)
 
 def build_feed_recent(instruments, periods=1, storage='.', frequency=bar.Frequency.HOUR, step=1, timezone=None, skipErrors=False):
     """Build and load a :class:`pyalgotrade.ripple.Feed` using CSV files downloaded from Ripple Charts.
@@ -211,7 +197,7 @@ def build_feed_recent(instruments, periods=1, storage='.', frequency=bar.Frequen
     return ret
 
 
-def build_feed(instruments, fromYear, toYear, storage, frequency=bar.Frequency.DAY, timezone=None, skipErrors=False):
+def build_feed(instruments, fromYear, toYear, storage, frequency=bar.Frequency.DAY, timezone=None, skipErrors=False, processes=1, downloads=1):
     """Build and load a :class:`pyalgotrade.ripple.Feed` using CSV files downloaded from Ripple Charts.
     CSV files are downloaded if they haven't been downloaded before.
 
@@ -229,6 +215,11 @@ def build_feed(instruments, fromYear, toYear, storage, frequency=bar.Frequency.D
     :type timezone: A pytz timezone.
     :param skipErrors: True to keep on loading/downloading files in case of errors.
     :type skipErrors: boolean.
+    :param processes: The number of worker processes used to parse the files. 1 parses them in this process, and None
+        uses as many processes as CPUs.
+    :type processes: int.
+    :param downloads: The number of files downloaded at the same time.
+    :type downloads: int.
     :rtype: :class:`pyalgotrade.ripple.Feed`.
     """
 
@@ -239,25 +230,25 @@ def build_feed(instruments, fromYear, toYear, storage, frequency=bar.Frequency.D
         logger.info("Creating %s directory" % (storage))
         os.mkdir(storage)
 
+    if frequency == bar.Frequency.DAY:
+        downloadFunc = download_daily_bars
+    elif frequency == bar.Frequency.HOUR:
+        downloadFunc = download_hourly_bars
+    else:
+        raise Exception("Invalid frequency")
+
+    files = []
+    missing = []
     for year in range(fromYear, toYear+1):
         for instrument in instruments:
             fileName = os.path.join(storage, "%s-%d-ripplecharts.csv" % (instrument.replace('/','_'), year))
             if not os.path.exists(fileName):
-                logger.info("Downloading %s %d to %s" % (instrument, year, fileName))
-                try:
-                    if frequency == bar.Frequency.DAY:
-                        download_daily_bars(instrument, year, fileName)
-                    elif frequency == bar.Frequency.HOUR:
-                        download_hourly_bars(instrument, year, fileName)
-                    else:
-                        raise Exception("Invalid frequency")
-                except Exception, e:
-                    if skipErrors:
-                        logger.error(str(e))
-                        continue
-                    else:
-                        raise e
-            ret.addBarsFromCSV(instrument, fileName)
+                missing.append(("%s %d" % (instrument, year), fileName, downloadFunc, (instrument, year, fileName)))
+            files.append((instrument, fileName))
+
+    failed = downloader.download_files(missing, downloads, skipErrors, logger)
+    files = [item for item in files if item[1] not in failed]
+    ret.addBarsFromCSVFiles(files, processes=processes, skipErrors=skipErrors)
     return ret
 
 
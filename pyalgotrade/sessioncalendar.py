@@ -0,0 +1,272 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import csv
+import datetime
+import os
+
+import numpy as np
+
+from pyalgotrade.utils import dt
+from pyalgotrade import resamplebase
+
+
+MICROS_PER_DAY = 86400 * 1000000
+
+
+def micros_to_datetime(micros):
+    return dt.as_utc(resamplebase.EPOCH + datetime.timedelta(microseconds=micros))
+
+
+def time_to_micros(time):
+    return ((time.hour * 60 + time.minute) * 60 + time.second) * 1000000 + time.microsecond
+
+
+def get_data_file_path(fileName):
+    return os.path.join(os.path.dirname(__file__), "data", fileName)
+
+
+def load_holidays(path):
+    """Loads market holidays from a CSV file with a Date column (YYYY-MM-DD) and a Close column.
+    The Close column is empty for days when the market is closed, or has the closing time (HH:MM) for days when the
+    market closes early.
+
+    :param path: The path to the CSV file.
+    :type path: string.
+    :rtype: A tuple with a set with the holidays and a dictionary that maps dates to early closing times.
+    """
+
+    holidays = set()
+    earlyCloses = {}
+    with open(path, "r") as f:
+        for row in csv.DictReader(f):
+            date = datetime.datetime.strptime(row["Date"], "%Y-%m-%d").date()
+            if row["Close"]:
+                earlyCloses[date] = datetime.datetime.strptime(row["Close"], "%H:%M").time()
+            else:
+                holidays.add(date)
+    return holidays, earlyCloses
+
+
+class SessionCalendar(object):
+    """The regular trading sessions of a market. Session opening and closing times are calculated once per year,
+    as UTC timestamps in microseconds, so checking if a datetime is within a session takes a dictionary lookup and
+    integer comparisons.
+
+    :param timezone: The market timezone.
+    :type timezone: A pytz timezone.
+    :param openTime: The local time when sessions open.
+    :type openTime: datetime.time.
+    :param closeTime: The local time when sessions close.
+    :type closeTime: datetime.time.
+    :param holidays: The dates when the market is closed.
+    :type holidays: A set of datetime.date.
+    :param earlyCloses: Dates when the market closes earlier, mapped to the local closing time.
+    :type earlyCloses: A dictionary of datetime.date to datetime.time.
+    :param weekdays: The weekdays when the market opens, being 0 Monday and 6 Sunday.
+    :type weekdays: A list of ints.
+
+    .. note::
+        * Naive datetimes are considered to be in the market timezone, while timestamps are in UTC.
+        * Bars are expected to have the datetime when they begin. A bar with the closing datetime is also
+          considered to be in the session, since some feeds use the datetime when bars end.
+    """
+
+    def __init__(self, timezone, openTime, closeTime, holidays=None, earlyCloses=None, weekdays=range(5)):
+        self.__timezone = timezone
+        self.__openTime = openTime
+        self.__closeTime = closeTime
+        self.__holidays = holidays or set()
+        self.__earlyCloses = earlyCloses or {}
+        self.__weekdays = set(weekdays)
+        self.__years = set()
+        # Opening and closing timestamps by local date.
+        self.__sessions = {}
+        # Sessions that overlap each UTC day, as (open, close) tuples.
+        self.__sessionsByDay = {}
+        # Opening and closing timestamps sorted, for the years in self.__years.
+        self.__opens = np.zeros(0, dtype=np.int64)
+        self.__closes = np.zeros(0, dtype=np.int64)
+        # Session days, and local opening and closing times, by year.
+        self.__localSessions = {}
+
+    def getTimezone(self):
+        return self.__timezone
+
+    def __toMicros(self, date, time):
+        localDateTime = dt.localize(datetime.datetime.combine(date, time), self.__timezone)
+        return resamplebase.datetime_to_micros(localDateTime)
+
+    def __buildYear(self, year):
+        opens = []
+        closes = []
+        date = datetime.date(year, 1, 1)
+        while date.year == year:
+            if date.weekday() in self.__weekdays and date not in self.__holidays:
+                openMicros = self.__toMicros(date, self.__openTime)
+                closeMicros = self.__toMicros(date, self.__earlyCloses.get(date, self.__closeTime))
+                session = (openMicros, closeMicros)
+                self.__sessions[date] = session
+                for day in xrange(openMicros // MICROS_PER_DAY, closeMicros // MICROS_PER_DAY + 1):
+                    self.__sessionsByDay.setdefault(day, []).append(session)
+                opens.append(openMicros)
+                closes.append(closeMicros)
+            date += datetime.timedelta(days=1)
+
+        self.__years.add(year)
+        self.__opens = np.concatenate([self.__opens, np.array(opens, dtype=np.int64)])
+        self.__closes = np.concatenate([self.__closes, np.array(closes, dtype=np.int64)])
+        order = np.argsort(self.__opens, kind="mergesort")
+        self.__opens = self.__opens[order]
+        self.__closes = self.__closes[order]
+
+    def __checkYears(self, fromYear, toYear):
+        for year in xrange(fromYear, toYear + 1):
+            if year not in self.__years:
+                self.__buildYear(year)
+
+    def __getLocalYear(self, year):
+        ret = self.__localSessions.get(year)
+        if ret is None:
+            openMicros = time_to_micros(self.__openTime)
+            days = []
+            closes = []
+            date = datetime.date(year, 1, 1)
+            day = (date - resamplebase.EPOCH.date()).days
+            while date.year == year:
+                if date.weekday() in self.__weekdays and date not in self.__holidays:
+                    days.append(day)
+                    closes.append(day * MICROS_PER_DAY + time_to_micros(self.__earlyCloses.get(date, self.__closeTime)))
+                date += datetime.timedelta(days=1)
+                day += 1
+            days = np.array(days, dtype=np.int64)
+            ret = (days, days * MICROS_PER_DAY + openMicros, np.array(closes, dtype=np.int64))
+            self.__localSessions[year] = ret
+        return ret
+
+    def getLocalSessions(self, fromDate, toDate):
+        """Returns the sessions between two dates, both included, as a tuple of numpy arrays: the days since the
+        epoch for the session dates, and the local opening and closing times as microseconds since the epoch.
+        Local times are not converted to UTC, so they can be compared with naive datetimes in the market timezone
+        without having to localize them.
+
+        :param fromDate: The first date.
+        :type fromDate: datetime.date.
+        :param toDate: The last date.
+        :type toDate: datetime.date.
+        """
+
+        years = [self.__getLocalYear(year) for year in xrange(fromDate.year, toDate.year + 1)]
+        if len(years) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+        days, opens, closes = [np.concatenate([year[i] for year in years]) for i in xrange(3)]
+        epochDate = resamplebase.EPOCH.date()
+        begin = np.searchsorted(days, (fromDate - epochDate).days, side="left")
+        end = np.searchsorted(days, (toDate - epochDate).days, side="right")
+        return days[begin:end], opens[begin:end], closes[begin:end]
+
+    def datetimeToMicros(self, dateTime):
+        """Returns the microseconds since the epoch for a datetime. Naive datetimes are in the market timezone."""
+        offset = dateTime.utcoffset()
+        if offset is None:
+            dateTime = dt.localize(dateTime, self.__timezone)
+            offset = dateTime.utcoffset()
+        delta = dateTime.replace(tzinfo=None) - offset - resamplebase.EPOCH
+        return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+    def getSession(self, date):
+        """Returns the opening and closing datetimes of the session for a given date, or None if the market is closed
+        that day.
+
+        :param date: A date in the market timezone.
+        :type date: datetime.date.
+        """
+
+        self.__checkYears(date.year, date.year)
+        ret = self.__sessions.get(date)
+        if ret is not None:
+            ret = tuple(dt.localize(micros_to_datetime(micros), self.__timezone) for micros in ret)
+        return ret
+
+    def getSessionMicros(self, micros):
+        """Returns the opening and closing timestamps of the session that a timestamp belongs to, or None.
+        Closing timestamps are considered to be part of the session.
+
+        :param micros: Microseconds since the epoch, in UTC.
+        :type micros: int.
+        """
+
+        day = micros // MICROS_PER_DAY
+        sessions = self.__sessionsByDay.get(day)
+        if sessions is None:
+            # Sessions that overlap a UTC day may belong to local dates in the previous or the next year.
+            year = micros_to_datetime(micros).year
+            self.__checkYears(year - 1, year + 1)
+            sessions = self.__sessionsByDay.setdefault(day, [])
+        for session in sessions:
+            if session[0] <= micros <= session[1]:
+                return session
+        return None
+
+    def isOpen(self, dateTime):
+        """Returns True if the market is open at a given datetime. The market is closed at the closing time."""
+        micros = self.datetimeToMicros(dateTime)
+        session = self.getSessionMicros(micros)
+        return session is not None and micros < session[1]
+
+    def inSession(self, dateTime):
+        """Returns True if a datetime is within a session, including the closing time."""
+        return self.getSessionMicros(self.datetimeToMicros(dateTime)) is not None
+
+    def isLastBar(self, dateTime, frequency):
+        """Returns True if a bar is the last one of its session, that is, if the next bar would begin at, or after,
+        the closing time.
+
+        :param dateTime: The bar datetime.
+        :type dateTime: datetime.datetime.
+        :param frequency: The bar frequency in seconds.
+        :type frequency: int.
+        """
+
+        micros = self.datetimeToMicros(dateTime)
+        session = self.getSessionMicros(micros)
+        return session is not None and micros + frequency * 1000000 >= session[1]
+
+    def inSessionMask(self, timestamps):
+        """Returns a boolean array that is True for the timestamps within a session, including closing times.
+
+        :param timestamps: Microseconds since the epoch, in UTC.
+        :type timestamps: numpy.array.
+        """
+
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if len(timestamps) == 0:
+            return np.zeros(0, dtype=bool)
+        fromYear = micros_to_datetime(int(timestamps.min())).year
+        toYear = micros_to_datetime(int(timestamps.max())).year
+        self.__checkYears(fromYear - 1, toYear + 1)
+
+        # Each timestamp is checked against the last session that opened before it.
+        pos = np.searchsorted(self.__opens, timestamps, side="right") - 1
+        ret = pos >= 0
+        pos[~ret] = 0
+        ret &= timestamps <= self.__closes[pos]
+        return ret
@@ -25,6 +25,7 @@ import pyalgotrade.broker
 from pyalgotrade.broker import backtesting
 from pyalgotrade import observer
 from pyalgotrade import dispatcher
+from pyalgotrade import profiler
 import pyalgotrade.strategy.position
 from pyalgotrade import warninghelpers
 from pyalgotrade import logger
@@ -92,6 +93,32 @@ class BaseStrategy(object):
     def getDispatcher(self):
         return self.__dispatcher
 
+    def setProfilingEnabled(self, enabled):
+        """Enables or disables profiling of event handlers while the strategy runs.
+
+        :param enabled: True to enable profiling.
+        :type enabled: boolean.
+
+        .. note::
+            Call this before running the strategy. Use :meth:`getProfiler` to get the statistics when done.
+        """
+        if enabled:
+            if self.__dispatcher.getProfiler() is None:
+                self.__dispatcher.setProfiler(profiler.Profiler())
+        else:
+            self.__dispatcher.setProfiler(None)
+
+    def getProfiler(self):
+        """Returns the :class:`pyalgotrade.profiler.Profiler` in use, or None if profiling is disabled."""
+        return self.__dispatcher.getProfiler()
+
+    def getProfileReport(self):
+        """Returns a string with the profiling statistics, or None if profiling is disabled."""
+        ret = None
+        if self.__dispatcher.getProfiler() is not None:
+            ret = self.__dispatcher.getProfiler().getReport()
+        return ret
+
     def getResult(self):
         return self.getBroker().getEquity()
 
@@ -511,7 +538,11 @@ class BaseStrategy(object):
         self.__notifyAnalyzers(lambda s: s.beforeOnBars(self, bars))
 
         # 2: Let the strategy process current bars and submit orders.
-        self.onBars(bars)
+        profiler_ = self.__dispatcher.getProfiler()
+        if profiler_ is None:
+            self.onBars(bars)
+        else:
+            profiler_.call(self.onBars, bars)
 
         # 3: Notify that the bars were processed.
         self.__barsProcessedEvent.emit(self, bars)
@@ -563,8 +594,19 @@ class BaseStrategy(object):
         :param frequency: The grouping frequency in seconds. Must be > 0.
         :param callback: A function similar to onBars that will be called when new bars are available.
         :rtype: :class:`pyalgotrade.barfeed.BaseBarFeed`.
+
+        .. note::
+            Bars are grouped from the bars of the coarsest resampled barfeed built so far whose ranges nest into the
+            ones for frequency, if any. For example, if 5 minute and 1 hour bars are needed, building the 5 minute
+            barfeed first will build 1 hour bars from 5 minute bars.
         """
-        ret = resampled.ResampledBarFeed(self.getFeed(), frequency)
+        source = self.getFeed()
+        for resampledBarFeed in self.__resampledBarFeeds:
+            if resampled.ranges_nest(frequency, resampledBarFeed.getFrequency()) and (
+                source is self.getFeed() or resampledBarFeed.getFrequency() > source.getFrequency()
+            ):
+                source = resampledBarFeed
+        ret = resampled.ResampledBarFeed(source, frequency)
         ret.getNewValuesEvent().subscribe(callback)
         self.getDispatcher().addSubject(ret)
         self.__resampledBarFeeds.append(ret)
@@ -18,6 +18,8 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import heapq
+
 from pyalgotrade import technical
 from pyalgotrade import dataseries
 
@@ -86,3 +88,307 @@ class ZScore(technical.EventBasedFilter):
 
     def __init__(self, dataSeries, period, ddof=0, maxLen=dataseries.DEFAULT_MAX_LEN):
         technical.EventBasedFilter.__init__(self, dataSeries, ZScoreEventWindow(period, ddof), maxLen)
+
+
+class EWMAVarianceEventWindow(technical.EventWindow):
+    def __init__(self, period):
+        assert(period > 1)
+        technical.EventWindow.__init__(self, period)
+        self.__alpha = (2.0 / (period + 1))
+        self.__mean = None
+        self.__variance = None
+
+    def onNewValue(self, dateTime, value):
+        technical.EventWindow.onNewValue(self, dateTime, value)
+
+        if value is not None:
+            # Incremental formula from Tony Finch, "Incremental calculation of weighted mean and variance".
+            if self.__mean is None:
+                self.__mean = float(value)
+                self.__variance = 0.0
+            else:
+                diff = value - self.__mean
+                incr = self.__alpha * diff
+                self.__mean = self.__mean + incr
+                self.__variance = (1 - self.__alpha) * (self.__variance + diff * incr)
+
+    def getMean(self):
+        return self.__mean
+
+    def getValue(self):
+        ret = None
+        if self.windowFull():
+            ret = self.__variance
+        return ret
+
+
+class EWMAVariance(technical.EventBasedFilter):
+    """Exponentially weighted moving variance filter.
+    Values are weighted using the same smoothing factor as :class:`pyalgotrade.technical.ma.EMA`, 2 / (period + 1),
+    and updated in constant time.
+
+    :param dataSeries: The DataSeries instance being filtered.
+    :type dataSeries: :class:`pyalgotrade.dataseries.DataSeries`.
+    :param period: The number of values that have to be seen before values are emitted. Must be an integer greater than 1.
+    :type period: int.
+    :param maxLen: The maximum number of values to hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the opposite end.
+    :type maxLen: int.
+
+    .. note::
+        The square root of the variance can be used as an EWMA volatility estimate.
+    """
+
+    def __init__(self, dataSeries, period, maxLen=dataseries.DEFAULT_MAX_LEN):
+        technical.EventBasedFilter.__init__(self, dataSeries, EWMAVarianceEventWindow(period), maxLen)
+
+
+class QuantileEventWindow(technical.EventWindow):
+    # The values in the window are split in two heaps: a max-heap (stored negated) with the lowest values, and a min-heap
+    # with the rest. The lower heap is kept with exactly k + 1 values, k being the index of the lower order statistic
+    # needed to interpolate the quantile, so the quantile is calculated using the top of both heaps.
+    # Values that leave the window are removed lazily, once they reach the top of a heap, and the heaps are compacted
+    # when they hold too many of those values.
+
+    def __init__(self, period, quantile):
+        assert(period > 0)
+        assert(quantile >= 0 and quantile <= 1)
+        technical.EventWindow.__init__(self, period)
+        self.__quantile = quantile
+        self.__low = []
+        self.__high = []
+        self.__lowSize = 0
+        self.__highSize = 0
+        self.__lowDelayed = {}
+        self.__highDelayed = {}
+
+    def __prune(self, heap, delayed, sign):
+        while len(heap) and delayed.get(heap[0] * sign, 0):
+            value = heapq.heappop(heap) * sign
+            count = delayed[value] - 1
+            if count:
+                delayed[value] = count
+            else:
+                del delayed[value]
+
+    def __compact(self, heap, delayed, sign):
+        ret = []
+        for item in heap:
+            value = item * sign
+            count = delayed.get(value, 0)
+            if count:
+                if count > 1:
+                    delayed[value] = count - 1
+                else:
+                    del delayed[value]
+            else:
+                ret.append(item)
+        heapq.heapify(ret)
+        return ret
+
+    def __pruneAll(self):
+        self.__prune(self.__low, self.__lowDelayed, -1)
+        self.__prune(self.__high, self.__highDelayed, 1)
+
+    def __add(self, value):
+        if self.__lowSize and value <= -self.__low[0]:
+            heapq.heappush(self.__low, -value)
+            self.__lowSize += 1
+        else:
+            heapq.heappush(self.__high, value)
+            self.__highSize += 1
+
+    def __remove(self, value):
+        # The top of the lower heap is always a value inside the window.
+        if value <= -self.__low[0]:
+            self.__lowDelayed[value] = self.__lowDelayed.get(value, 0) + 1
+            self.__lowSize -= 1
+            if len(self.__low) > 2 * self.__lowSize + 1:
+                self.__low = self.__compact(self.__low, self.__lowDelayed, -1)
+        else:
+            self.__highDelayed[value] = self.__highDelayed.get(value, 0) + 1
+            self.__highSize -= 1
+            if len(self.__high) > 2 * self.__highSize + 1:
+                self.__high = self.__compact(self.__high, self.__highDelayed, 1)
+        self.__pruneAll()
+
+    def __rebalance(self):
+        target = int(self.__quantile * (self.__lowSize + self.__highSize - 1)) + 1
+        while self.__lowSize > target:
+            heapq.heappush(self.__high, -heapq.heappop(self.__low))
+            self.__lowSize -= 1
+            self.__highSize += 1
+            self.__pruneAll()
+        while self.__lowSize < target:
+            heapq.heappush(self.__low, -heapq.heappop(self.__high))
+            self.__lowSize += 1
+            self.__highSize -= 1
+            self.__pruneAll()
+
+    def onNewValue(self, dateTime, value):
+        firstValue = None
+        if value is not None and self.windowFull():
+            firstValue = self.getValues()[0]
+
+        technical.EventWindow.onNewValue(self, dateTime, value)
+
+        if value is not None:
+            self.__add(value)
+            if firstValue is not None:
+                self.__remove(firstValue)
+            self.__rebalance()
+
+    def getValue(self):
+        ret = None
+        if self.windowFull():
+            pos = self.__quantile * (self.getWindowSize() - 1)
+            fraction = pos - int(pos)
+            ret = -self.__low[0]
+            if fraction:
+                ret = ret + (self.__high[0] - ret) * fraction
+        return ret
+
+
+class Quantile(technical.EventBasedFilter):
+    """Rolling quantile filter. Each new value is processed in O(log n) time.
+
+    :param dataSeries: The DataSeries instance being filtered.
+    :type dataSeries: :class:`pyalgotrade.dataseries.DataSeries`.
+    :param period: The number of values to use to calculate the quantile.
+    :type period: int.
+    :param quantile: The quantile to calculate. Must be between 0 and 1 inclusive. Use 0.5 for the median.
+    :type quantile: float.
+    :param maxLen: The maximum number of values to hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the opposite end.
+    :type maxLen: int.
+
+    .. note::
+        When the quantile lies between two values, linear interpolation is used, like numpy.percentile does by default.
+    """
+
+    def __init__(self, dataSeries, period, quantile, maxLen=dataseries.DEFAULT_MAX_LEN):
+        technical.EventBasedFilter.__init__(self, dataSeries, QuantileEventWindow(period, quantile), maxLen)
+
+
+class MomentsEventWindow(technical.EventWindow):
+    # Power sums of the values in the window are updated as values enter and leave the window.
+    # To keep rounding errors under control, values are shifted by a reference value and the sums get recalculated from
+    # scratch every period values.
+    # Rounding errors are relative to the largest squared shifted value that went through the sums. If the variance is
+    # below that scale times VARIANCE_TOLERANCE after an update, the sums are recalculated from the window, so a window
+    # that becomes constant has a variance of 0.
+    VARIANCE_TOLERANCE = 1e-9
+
+    def __init__(self, period):
+        assert(period > 1)
+        technical.EventWindow.__init__(self, period)
+        self.__shift = None
+        self.__sums = [0.0, 0.0, 0.0, 0.0]
+        self.__scale = 0.0
+        self.__updates = 0
+
+    def __recalculate(self):
+        values = self.getValues()
+        self.__shift = values.mean()
+        shifted = values - self.__shift
+        powers = shifted.copy()
+        for i in xrange(4):
+            self.__sums[i] = powers.sum()
+            powers *= shifted
+        self.__scale = float((shifted ** 2).max())
+        self.__updates = 0
+
+    def __update(self, value, sign):
+        value -= self.__shift
+        self.__scale = max(self.__scale, value * value)
+        power = value
+        for i in xrange(4):
+            self.__sums[i] += sign * power
+            power *= value
+
+    def onNewValue(self, dateTime, value):
+        firstValue = None
+        if value is not None and self.windowFull():
+            firstValue = self.getValues()[0]
+
+        technical.EventWindow.onNewValue(self, dateTime, value)
+
+        if value is not None and self.windowFull():
+            if firstValue is None or self.__updates == self.getWindowSize():
+                self.__recalculate()
+            else:
+                self.__update(value, 1)
+                self.__update(firstValue, -1)
+                self.__updates += 1
+                m2 = self.getCentralMoments()[0]
+                if m2 != 0 and m2 <= self.__scale * MomentsEventWindow.VARIANCE_TOLERANCE:
+                    self.__recalculate()
+
+    def getCentralMoments(self):
+        # Returns the 2nd, 3rd and 4th central moments.
+        n = float(self.getWindowSize())
+        s1, s2, s3, s4 = [s / n for s in self.__sums]
+        m2 = s2 - s1 ** 2
+        m3 = s3 - 3 * s1 * s2 + 2 * s1 ** 3
+        m4 = s4 - 4 * s1 * s3 + 6 * s1 ** 2 * s2 - 3 * s1 ** 4
+        return m2, m3, m4
+
+
+class SkewnessEventWindow(MomentsEventWindow):
+    def getValue(self):
+        ret = None
+        if self.windowFull():
+            m2, m3, m4 = self.getCentralMoments()
+            if m2 > 0:
+                ret = m3 / m2 ** 1.5
+        return ret
+
+
+class Skewness(technical.EventBasedFilter):
+    """Rolling skewness filter. Each new value is processed in constant time.
+
+    :param dataSeries: The DataSeries instance being filtered.
+    :type dataSeries: :class:`pyalgotrade.dataseries.DataSeries`.
+    :param period: The number of values to use to calculate the skewness. Must be an integer greater than 1.
+    :type period: int.
+    :param maxLen: The maximum number of values to hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the opposite end.
+    :type maxLen: int.
+
+    .. note::
+        This is the biased estimator, like scipy.stats.skew with the default parameters. None is returned if all the values
+        in the window are the same.
+    """
+
+    def __init__(self, dataSeries, period, maxLen=dataseries.DEFAULT_MAX_LEN):
+        technical.EventBasedFilter.__init__(self, dataSeries, SkewnessEventWindow(period), maxLen)
+
+
+class KurtosisEventWindow(MomentsEventWindow):
+    def getValue(self):
+        ret = None
+        if self.windowFull():
+            m2, m3, m4 = self.getCentralMoments()
+            if m2 > 0:
+                ret = m4 / m2 ** 2 - 3
+        return ret
+
+
+class Kurtosis(technical.EventBasedFilter):
+    """Rolling excess kurtosis filter. Each new value is processed in constant time.
+
+    :param dataSeries: The DataSeries instance being filtered.
+    :type dataSeries: :class:`pyalgotrade.dataseries.DataSeries`.
+    :param period: The number of values to use to calculate the kurtosis. Must be an integer greater than 1.
+    :type period: int.
+    :param maxLen: The maximum number of values to hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the opposite end.
+    :type maxLen: int.
+
+    .. note::
+        This is the biased estimator of the excess kurtosis (Fisher's definition), like scipy.stats.kurtosis with the
+        default parameters. None is returned if all the values in the window are the same.
+    """
+
+    def __init__(self, dataSeries, period, maxLen=dataseries.DEFAULT_MAX_LEN):
+        technical.EventBasedFilter.__init__(self, dataSeries, KurtosisEventWindow(period), maxLen)
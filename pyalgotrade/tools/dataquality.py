@@ -0,0 +1,443 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import csv
+import datetime
+import multiprocessing
+import os
+
+import numpy as np
+
+from pyalgotrade import bar
+from pyalgotrade import resamplebase
+from pyalgotrade import sessioncalendar
+from pyalgotrade.barfeed import barcache
+from pyalgotrade.barfeed import common
+from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.utils import dt
+
+
+# Runs of bars without volume shorter than this are not reported.
+MIN_ZERO_VOLUME_RUN = 5
+
+# Returns that deviate from the median return by more than this many (scaled) median absolute deviations are
+# reported as outliers.
+MAX_DEVIATIONS = 20
+
+# Scales the median absolute deviation so that it estimates the standard deviation of normally distributed values.
+MAD_SCALE = 1.4826
+
+# The issues checked, in the order they are reported.
+ISSUES = ["unsorted", "duplicated", "invalid_prices", "ohlc", "zero_volume_runs", "outliers", "missing_sessions"]
+
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+COLUMNS = ["datetime"] + PRICE_COLUMNS + ["volume", "adj_close"]
+
+
+def micros_to_datetimes(micros):
+    return np.asarray(micros, dtype=np.int64).astype("datetime64[us]").astype(object).tolist()
+
+
+def micros_to_date(micros):
+    return resamplebase.EPOCH.date() + datetime.timedelta(days=int(micros // sessioncalendar.MICROS_PER_DAY))
+
+
+def bars_to_columns(bars, timezone=None):
+    """Returns the values of a list of bars as columns. Datetimes are microseconds since the epoch, in local time.
+
+    :param bars: The bars.
+    :type bars: list of :class:`pyalgotrade.bar.Bar`.
+    :param timezone: The timezone to convert localized datetimes to. If None, localized datetimes are left in their
+        own timezone.
+    :type timezone: A pytz timezone.
+    """
+
+    dateTimes = []
+    for bar_ in bars:
+        dateTime = bar_.getDateTime()
+        if not dt.datetime_is_naive(dateTime):
+            if timezone is not None:
+                dateTime = dt.localize(dateTime, timezone)
+            dateTime = dt.unlocalize(dateTime)
+        dateTimes.append(barcache.datetime_to_micros(dateTime))
+
+    adjCloses = [bar_.getAdjClose() for bar_ in bars]
+    ret = {
+        "datetime": np.array(dateTimes, dtype=np.int64),
+        "open": np.array([bar_.getOpen() for bar_ in bars], dtype=np.float64),
+        "high": np.array([bar_.getHigh() for bar_ in bars], dtype=np.float64),
+        "low": np.array([bar_.getLow() for bar_ in bars], dtype=np.float64),
+        "close": np.array([bar_.getClose() for bar_ in bars], dtype=np.float64),
+        "volume": np.array([bar_.getVolume() for bar_ in bars], dtype=np.float64),
+        "adj_close": None,
+    }
+    if len(bars) and None not in adjCloses:
+        ret["adj_close"] = np.array(adjCloses, dtype=np.float64)
+    return ret
+
+
+def load_columns(path, rowParser, timezone=None):
+    """Loads the values in a CSV file as columns, without building bars, so values that
+    :class:`pyalgotrade.bar.BasicBar` would reject can be checked. Files that the row parser can't parse in bulk
+    are loaded bar by bar.
+
+    :param path: The path to the CSV file.
+    :type path: string.
+    :param rowParser: The parser for the file.
+    :type rowParser: :class:`pyalgotrade.barfeed.csvfeed.RowParser`.
+    :param timezone: The timezone to convert localized datetimes to. If None, localized datetimes are left in their
+        own timezone.
+    :type timezone: A pytz timezone.
+    :rtype: A dictionary with the datetime (microseconds since the epoch, in local time), open, high, low, close,
+        volume and adj_close (None if not available) numpy arrays.
+    """
+
+    ret = rowParser.parseColumns(path)
+    if ret is None:
+        return bars_to_columns(csvfeed.parse_bars(path, rowParser), timezone)
+    ret = dict(ret)
+    ret["datetime"] = ret["datetime"].astype(np.int64)
+    # Datetimes are in the timezone of the parser, and they are converted just like bars_to_columns does.
+    fileTimezone = rowParser.getTimezone()
+    if timezone is not None and fileTimezone is not None and barcache.timezone_key(timezone) != barcache.timezone_key(fileTimezone):
+        ret["datetime"] = np.array([
+            barcache.datetime_to_micros(dt.unlocalize(dt.localize(dt.localize(dateTime, fileTimezone), timezone)))
+            for dateTime in micros_to_datetimes(ret["datetime"])
+        ], dtype=np.int64)
+    return ret
+
+
+def join_columns(columnsList):
+    """Joins the columns loaded from many files, in order. Files sorted in descending order, like the ones
+    downloaded from Yahoo! Finance, are reversed first."""
+
+    parts = []
+    for columns in columnsList:
+        dateTimes = columns["datetime"]
+        if len(dateTimes) > 1 and dateTimes[0] > dateTimes[-1]:
+            columns = dict((key, value[::-1] if value is not None else None) for key, value in columns.iteritems())
+        parts.append(columns)
+
+    ret = {}
+    for key in COLUMNS:
+        dtype = np.int64 if key == "datetime" else np.float64
+        ret[key] = np.concatenate([np.zeros(0, dtype=dtype)] + [part[key] for part in parts if part[key] is not None])
+    if any(part["adj_close"] is None for part in parts if len(part["datetime"])):
+        ret["adj_close"] = None
+    return ret
+
+
+def get_invalid_mask(columns):
+    # Prices have to be positive and volume can't be negative. NaNs are invalid too.
+    ret = np.zeros(len(columns["datetime"]), dtype=bool)
+    for key in PRICE_COLUMNS:
+        ret |= ~(columns[key] > 0)
+    ret |= ~(columns["volume"] >= 0)
+    return ret
+
+
+class InstrumentReport(object):
+    """The issues found in the bars of an instrument. Datetimes are naive, in the timezone of the bars.
+
+    .. note::
+        This class should not be instantiated directly. Check :func:`analyze_columns` and :func:`analyze_files`.
+    """
+
+    def __init__(self, instrument, dateTimes=None, issues=None, error=None):
+        self.__instrument = instrument
+        self.__barCount = 0
+        self.__firstDateTime = None
+        self.__lastDateTime = None
+        if dateTimes is not None and len(dateTimes):
+            self.__barCount = len(dateTimes)
+            self.__firstDateTime = micros_to_datetimes(dateTimes[:1])[0]
+            self.__lastDateTime = micros_to_datetimes(dateTimes[-1:])[0]
+        self.__issues = issues or {}
+        self.__error = error
+
+    def getInstrument(self):
+        return self.__instrument
+
+    def getError(self):
+        """Returns the error message if the bars could not be loaded, or None."""
+        return self.__error
+
+    def getBarCount(self):
+        return self.__barCount
+
+    def getFirstDateTime(self):
+        return self.__firstDateTime
+
+    def getLastDateTime(self):
+        return self.__lastDateTime
+
+    def getUnsorted(self):
+        """Returns the datetimes of the bars that come after a bar with a later datetime."""
+        return micros_to_datetimes(self.__issues.get("unsorted", []))
+
+    def getDuplicated(self):
+        """Returns the datetimes that more than one bar has."""
+        return micros_to_datetimes(self.__issues.get("duplicated", []))
+
+    def getInvalidPrices(self):
+        """Returns the datetimes of the bars with prices that are not positive, or volume that is negative."""
+        return micros_to_datetimes(self.__issues.get("invalid_prices", []))
+
+    def getOHLCViolations(self):
+        """Returns the datetimes of the bars with a high lower than the low, open or close, or with a low higher than
+        the open or close."""
+        return micros_to_datetimes(self.__issues.get("ohlc", []))
+
+    def getZeroVolumeRuns(self):
+        """Returns a list of (datetime, count) tuples with the first datetime and the number of consecutive bars
+        without volume."""
+        dateTimes, lengths = self.__issues.get("zero_volume_runs", ([], []))
+        return zip(micros_to_datetimes(dateTimes), np.asarray(lengths).tolist())
+
+    def getOutliers(self):
+        """Returns a list of (datetime, return) tuples with the bars that have outlier returns."""
+        dateTimes, returns = self.__issues.get("outliers", ([], []))
+        return zip(micros_to_datetimes(dateTimes), np.asarray(returns).tolist())
+
+    def getMissingSessions(self):
+        """Returns the dates of the sessions without bars, between the first and the last bar."""
+        days = np.asarray(self.__issues.get("missing_sessions", []), dtype=np.int64)
+        return [micros_to_date(day * sessioncalendar.MICROS_PER_DAY) for day in days.tolist()]
+
+    def getIssueCounts(self):
+        """Returns a dictionary with the number of issues found, by issue name. Check :data:`ISSUES`."""
+        ret = {}
+        for issue in ISSUES:
+            values = self.__issues.get(issue, [])
+            # Runs and outliers are (datetimes, values) tuples.
+            if isinstance(values, tuple):
+                values = values[0]
+            ret[issue] = len(values)
+        return ret
+
+    def hasIssues(self):
+        return self.__error is not None or sum(self.getIssueCounts().values()) > 0
+
+
+def find_missing_sessions(dateTimes, frequency, calendar):
+    # Returns the days since the epoch of the sessions without bars. dateTimes must be sorted.
+    days, opens, closes = calendar.getLocalSessions(micros_to_date(dateTimes[0]), micros_to_date(dateTimes[-1]))
+    if frequency == bar.Frequency.DAY:
+        return np.setdiff1d(days, dateTimes // sessioncalendar.MICROS_PER_DAY)
+
+    # Only sessions within the range of the bars are checked.
+    inRange = (closes >= dateTimes[0]) & (opens <= dateTimes[-1])
+    pos = np.searchsorted(opens, dateTimes, side="right") - 1
+    inSession = (pos >= 0) & (dateTimes <= closes[np.maximum(pos, 0)])
+    withBars = np.zeros(len(days), dtype=bool)
+    withBars[pos[inSession]] = True
+    return days[inRange & ~withBars]
+
+
+def analyze_columns(instrument, columns, frequency=bar.Frequency.DAY, calendar=None, minZeroVolumeRun=MIN_ZERO_VOLUME_RUN, maxDeviations=MAX_DEVIATIONS):
+    """Checks the bars of an instrument using numpy arrays.
+
+    :param instrument: Instrument identifier.
+    :type instrument: string.
+    :param columns: The columns, like the ones returned by :func:`load_columns`.
+    :type columns: dict.
+    :param frequency: The frequency of the bars.
+    :param calendar: The calendar used to look for missing sessions. Datetimes are expected to be in the calendar
+        timezone. Only daily and intraday bars are checked.
+    :type calendar: :class:`pyalgotrade.sessioncalendar.SessionCalendar`.
+    :param minZeroVolumeRun: Runs of bars without volume shorter than this are not reported.
+    :type minZeroVolumeRun: int.
+    :param maxDeviations: Returns that deviate from the median return by more than this many median absolute
+        deviations (scaled to estimate the standard deviation) are reported as outliers. Adjusted closes are used
+        if available, so that splits and dividends are not reported.
+    :type maxDeviations: float.
+    :rtype: :class:`InstrumentReport`.
+    """
+
+    dateTimes = np.asarray(columns["datetime"], dtype=np.int64)
+    issues = {}
+    issues["unsorted"] = dateTimes[np.flatnonzero(dateTimes[1:] < dateTimes[:-1]) + 1]
+
+    # The rest of the checks are done on the bars sorted, just like bar feeds do.
+    order = np.argsort(dateTimes, kind="mergesort")
+    dateTimes = dateTimes[order]
+    sortedColumns = {"datetime": dateTimes}
+    for key in COLUMNS[1:]:
+        if columns[key] is not None:
+            sortedColumns[key] = np.asarray(columns[key], dtype=np.float64)[order]
+        else:
+            sortedColumns[key] = None
+    open_, high, low, close = [sortedColumns[key] for key in PRICE_COLUMNS]
+    volume = sortedColumns["volume"]
+
+    issues["duplicated"] = np.unique(dateTimes[np.flatnonzero(dateTimes[1:] == dateTimes[:-1]) + 1])
+    invalid = get_invalid_mask(sortedColumns)
+    issues["invalid_prices"] = dateTimes[invalid]
+    # Bars with invalid prices are reported only once.
+    ohlc = (high < low) | (high < open_) | (high < close) | (low > open_) | (low > close)
+    issues["ohlc"] = dateTimes[ohlc & ~invalid]
+
+    # Runs of bars without volume.
+    edges = np.diff(np.concatenate([[0], (volume == 0).astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    lengths = np.flatnonzero(edges == -1) - starts
+    runs = lengths >= minZeroVolumeRun
+    issues["zero_volume_runs"] = (dateTimes[starts[runs]], lengths[runs])
+
+    # Outlier returns, between consecutive bars with valid prices.
+    prices = sortedColumns["adj_close"]
+    if prices is None:
+        prices = close
+    valid = np.flatnonzero(~invalid & (prices > 0))
+    prices = prices[valid]
+    if len(prices) > 2:
+        returns = prices[1:] / prices[:-1] - 1
+        deviations = np.abs(returns - np.median(returns))
+        mad = np.median(deviations) * MAD_SCALE
+        if mad > 0:
+            outliers = np.flatnonzero(deviations > maxDeviations * mad)
+            issues["outliers"] = (dateTimes[valid[outliers + 1]], returns[outliers])
+
+    if calendar is not None and len(dateTimes) and frequency <= bar.Frequency.DAY:
+        issues["missing_sessions"] = find_missing_sessions(dateTimes, frequency, calendar)
+
+    return InstrumentReport(instrument, dateTimes, issues)
+
+
+def sanitize_columns(columns):
+    """Returns a copy of the columns sorted by datetime, without bars with invalid prices, keeping only the last bar
+    for duplicated datetimes, and with OHLC values fixed using
+    :func:`pyalgotrade.barfeed.common.sanitize_ohlc_columns`."""
+
+    dateTimes = np.asarray(columns["datetime"], dtype=np.int64)
+    order = np.argsort(dateTimes, kind="mergesort")
+    ret = {}
+    for key in COLUMNS:
+        ret[key] = columns[key][order] if columns[key] is not None else None
+
+    keep = ~get_invalid_mask(ret)
+    dateTimes = ret["datetime"]
+    keep[:-1] &= dateTimes[1:] != dateTimes[:-1]
+    for key in COLUMNS:
+        if ret[key] is not None:
+            ret[key] = ret[key][keep]
+    ret["open"], ret["high"], ret["low"], ret["close"] = common.sanitize_ohlc_columns(
+        ret["open"], ret["high"], ret["low"], ret["close"]
+    )
+    return ret
+
+
+def columns_to_packed(columns):
+    """Packs columns into the format used by :func:`pyalgotrade.barfeed.barcache.save_packed_bars`."""
+
+    ret = np.zeros(len(columns["datetime"]), dtype=barcache.DTYPE)
+    ret["dateTime"] = columns["datetime"]
+    for key, name in [("open", "open"), ("high", "high"), ("low", "low"), ("close", "close"), ("volume", "volume")]:
+        ret[name] = columns[key]
+    if columns["adj_close"] is not None:
+        ret["adjClose"] = columns["adj_close"]
+        ret["hasAdjClose"] = True
+    return ret
+
+
+# Entry point for worker processes. Returns the InstrumentReport.
+def analyze_worker(args):
+    instrument, sources, frequency, calendar, minZeroVolumeRun, maxDeviations, outputDir = args
+    try:
+        timezone = calendar.getTimezone() if calendar is not None else None
+        columns = join_columns([load_columns(path, rowParser, timezone) for rowParser, path in sources])
+        ret = analyze_columns(instrument, columns, frequency, calendar, minZeroVolumeRun, maxDeviations)
+        if outputDir is not None:
+            values = columns_to_packed(sanitize_columns(columns))
+            barcache.save_packed_bars(os.path.join(outputDir, instrument), values, frequency, None)
+        return ret
+    except Exception, e:
+        return InstrumentReport(instrument, error=str(e))
+
+
+def analyze_files(barFeed, files, calendar=None, processes=1, outputDir=None, minZeroVolumeRun=MIN_ZERO_VOLUME_RUN, maxDeviations=MAX_DEVIATIONS):
+    """Checks the bars in CSV files for many instruments, optionally using a pool of worker processes.
+    Files are loaded into numpy arrays without building bars, and every check is done on whole arrays.
+
+    :param barFeed: The feed used to build the parsers for the files, and where the bar frequency is taken from.
+        For example, a :class:`pyalgotrade.barfeed.yahoofeed.Feed`. Bars are never added to it.
+    :type barFeed: :class:`pyalgotrade.barfeed.csvfeed.BarFeed`.
+    :param files: A list of (instrument, path) tuples. Files for the same instrument are joined in the given order.
+    :type files: list.
+    :param calendar: The calendar used to look for missing sessions.
+    :type calendar: :class:`pyalgotrade.sessioncalendar.SessionCalendar`.
+    :param processes: The number of worker processes. 1 checks the files in this process, and None uses as many
+        processes as CPUs.
+    :type processes: int.
+    :param outputDir: If set, the sanitized bars for every instrument are written to this directory as
+        *instrument*.npy and *instrument*.json files. Check :func:`sanitize_columns` and
+        :func:`pyalgotrade.barfeed.barcache.load_packed_bars`.
+    :type outputDir: string.
+    :param minZeroVolumeRun: Check :func:`analyze_columns`.
+    :type minZeroVolumeRun: int.
+    :param maxDeviations: Check :func:`analyze_columns`.
+    :type maxDeviations: float.
+    :rtype: A list of :class:`InstrumentReport`, one for every instrument, in the order they were given.
+    """
+
+    if outputDir is not None and not os.path.exists(outputDir):
+        os.makedirs(outputDir)
+
+    instruments = []
+    sources = {}
+    for instrument, path in files:
+        if instrument not in sources:
+            instruments.append(instrument)
+        sources.setdefault(instrument, []).append((barFeed.createRowParser(), path))
+
+    tasks = [
+        (instrument, sources[instrument], barFeed.getFrequency(), calendar, minZeroVolumeRun, maxDeviations, outputDir)
+        for instrument in instruments
+    ]
+    if processes != 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            ret = pool.map(analyze_worker, tasks, chunksize=max(1, len(tasks) / (4 * (processes or multiprocessing.cpu_count()))))
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        ret = map(analyze_worker, tasks)
+    return ret
+
+
+def write_summary(reports, csvFile):
+    """Writes a CSV file with one row for every instrument, with the number of issues of each kind.
+
+    :param reports: The reports.
+    :type reports: list of :class:`InstrumentReport`.
+    :param csvFile: The path to the CSV file.
+    :type csvFile: string.
+    """
+
+    with open(csvFile, "wb") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Instrument", "Bars", "First", "Last"] + ISSUES + ["Error"])
+        for report in reports:
+            counts = report.getIssueCounts()
+            writer.writerow(
+                [report.getInstrument(), report.getBarCount(), report.getFirstDateTime() or "", report.getLastDateTime() or ""] +
+                [counts[issue] for issue in ISSUES] + [report.getError() or ""]
+            )
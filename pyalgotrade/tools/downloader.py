@@ -0,0 +1,448 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import email.utils
+import httplib
+import os
+import Queue
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib
+import urlparse
+
+import pyalgotrade.logger
+from pyalgotrade import utils
+
+
+# Number of times a request is retried after a connection error or a temporary server error.
+DEFAULT_RETRIES = 3
+
+# Seconds to wait before the first retry. The delay is doubled on every retry.
+DEFAULT_BACKOFF = 1
+
+# Seconds to wait for the server.
+DEFAULT_TIMEOUT = 30
+
+MAX_REDIRECTS = 5
+
+# The maximum number of seconds to wait when a server asks to retry later using the Retry-After header.
+MAX_RETRY_AFTER = 600
+
+# Status codes worth retrying.
+TEMPORARY_ERRORS = [429, 500, 502, 503, 504]
+
+REDIRECTS = [301, 302, 303, 307]
+
+logger = pyalgotrade.logger.getLogger("downloader")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, reason, retryAfter=None):
+        Exception.__init__(self, "HTTP Error %d: %s" % (status, reason))
+        self.__status = status
+        self.__retryAfter = retryAfter
+
+    def getStatus(self):
+        return self.__status
+
+    def getRetryAfter(self):
+        """Returns the number of seconds the server asked to wait before retrying, or None."""
+        return self.__retryAfter
+
+
+def parse_retry_after(value):
+    """Returns the number of seconds to wait given the value of a Retry-After header, which is either a number of
+    seconds or an HTTP date, or None if it can't be parsed."""
+
+    ret = None
+    if value is not None:
+        value = value.strip()
+        if value.isdigit():
+            ret = int(value)
+        else:
+            parsed = email.utils.parsedate_tz(value)
+            if parsed is not None:
+                ret = max(0, email.utils.mktime_tz(parsed) - time.time())
+    return ret
+
+
+class Response(object):
+    def __init__(self, status, reason, headers, body):
+        self.__status = status
+        self.__reason = reason
+        self.__headers = dict((name.lower(), value) for name, value in headers)
+        self.__body = body
+
+    def getStatus(self):
+        return self.__status
+
+    def getReason(self):
+        return self.__reason
+
+    def getHeader(self, name):
+        return self.__headers.get(name.lower())
+
+    def getBody(self):
+        return self.__body
+
+
+class RateLimiter(object):
+    """Spaces requests evenly so that no more than maxRequests are made every period seconds. Thread safe."""
+
+    def __init__(self, maxRequests, period):
+        assert maxRequests > 0, "Invalid maximum number of requests"
+        self.__interval = period / float(maxRequests)
+        self.__nextRequest = 0
+        self.__lock = threading.Lock()
+
+    def wait(self):
+        with self.__lock:
+            now = time.time()
+            requestTime = max(now, self.__nextRequest)
+            self.__nextRequest = requestTime + self.__interval
+        if requestTime > now:
+            time.sleep(requestTime - now)
+
+    def pause(self, seconds):
+        """Delays the requests that follow for at least a number of seconds from now."""
+        with self.__lock:
+            self.__nextRequest = max(self.__nextRequest, time.time() + seconds)
+
+
+# Rate limiters by host.
+rate_limiters = {}
+
+
+def set_rate_limit(host, maxRequests, period):
+    """Limits the requests made to a host, from every thread.
+
+    :param host: The host name, for example ichart.finance.yahoo.com.
+    :type host: string.
+    :param maxRequests: The maximum number of requests.
+    :type maxRequests: int.
+    :param period: The number of seconds.
+    :type period: int/float.
+    """
+
+    rate_limiters[host] = RateLimiter(maxRequests, period)
+
+
+def set_default_rate_limit(host, maxRequests, period):
+    """Limits the requests made to a host, from every thread, unless a limit was already set.
+    Check :func:`set_rate_limit`."""
+
+    if host not in rate_limiters:
+        set_rate_limit(host, maxRequests, period)
+
+
+def remove_rate_limit(host):
+    rate_limiters.pop(host, None)
+
+
+class HTTPClient(object):
+    """Makes HTTP requests keeping connections open between requests to the same host.
+    Requests that fail because of connection errors or temporary server errors are retried, with exponential backoff,
+    waiting longer if the server asks to using the Retry-After header.
+
+    .. note::
+        A client should not be shared between threads. Use :func:`fetch` to use one client per thread.
+    """
+
+    def __init__(self, retries=None, backoff=None, timeout=None):
+        self.__retries = retries
+        self.__backoff = backoff
+        self.__timeout = timeout
+        # Open connections by (scheme, host, port).
+        self.__connections = {}
+
+    def __getConnection(self, scheme, host, port):
+        key = (scheme, host, port)
+        ret = self.__connections.get(key)
+        if ret is None:
+            timeout = self.__timeout if self.__timeout is not None else DEFAULT_TIMEOUT
+            if scheme == "https":
+                connectionClass = httplib.HTTPSConnection
+            else:
+                connectionClass = httplib.HTTPConnection
+            proxy = urllib.getproxies().get(scheme)
+            if proxy and not urllib.proxy_bypass(host):
+                proxyUrl = urlparse.urlsplit(proxy)
+                ret = connectionClass(proxyUrl.hostname, proxyUrl.port, timeout=timeout)
+                if scheme == "https":
+                    ret.set_tunnel(host, port)
+            else:
+                ret = connectionClass(host, port, timeout=timeout)
+            self.__connections[key] = ret
+        return ret
+
+    def __closeConnection(self, key):
+        connection = self.__connections.pop(key, None)
+        if connection is not None:
+            connection.close()
+
+    def close(self):
+        for key in self.__connections.keys():
+            self.__closeConnection(key)
+
+    def __request(self, url, data, headers):
+        parts = urlparse.urlsplit(url)
+        scheme = parts.scheme
+        port = parts.port
+        if port is None:
+            port = httplib.HTTPS_PORT if scheme == "https" else httplib.HTTP_PORT
+        key = (scheme, parts.hostname, port)
+
+        # Plain HTTP proxies take the whole URL.
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        if scheme == "http" and urllib.getproxies().get(scheme) and not urllib.proxy_bypass(parts.hostname):
+            path = url
+
+        rateLimiter = rate_limiters.get(parts.hostname)
+        if rateLimiter is not None:
+            rateLimiter.wait()
+
+        method = "GET" if data is None else "POST"
+        headers = dict(headers or {})
+        headers.setdefault("Host", parts.netloc)
+
+        # If the connection was reused, the server may have closed it in the meantime, so it is tried once more
+        # with a new connection.
+        reused = key in self.__connections
+        while True:
+            connection = self.__getConnection(scheme, parts.hostname, port)
+            try:
+                connection.request(method, path, data, headers)
+                response = connection.getresponse()
+                body = response.read()
+                if response.getheader("connection", "").lower() == "close":
+                    self.__closeConnection(key)
+                return Response(response.status, response.reason, response.getheaders(), body)
+            except (socket.error, httplib.HTTPException):
+                self.__closeConnection(key)
+                if not reused:
+                    raise
+                reused = False
+
+    def request(self, url, data=None, headers=None):
+        """Makes a request and returns the :class:`Response`. It is a POST request if data is not None.
+        Redirects are followed and error statuses raise :class:`HTTPError`.
+
+        :param url: The URL.
+        :type url: string.
+        :param data: The request body.
+        :type data: string.
+        :param headers: The request headers.
+        :type headers: dict.
+        """
+
+        retries = self.__retries if self.__retries is not None else DEFAULT_RETRIES
+        backoff = self.__backoff if self.__backoff is not None else DEFAULT_BACKOFF
+
+        attempt = 0
+        redirects = 0
+        while True:
+            try:
+                ret = self.__request(url, data, headers)
+                if ret.getStatus() in REDIRECTS and ret.getHeader("location") and redirects < MAX_REDIRECTS:
+                    url = urlparse.urljoin(url, ret.getHeader("location"))
+                    redirects += 1
+                    # Redirected POSTs become GETs.
+                    if ret.getStatus() != 307:
+                        data = None
+                    continue
+                if ret.getStatus() >= 400:
+                    raise HTTPError(ret.getStatus(), ret.getReason(), parse_retry_after(ret.getHeader("retry-after")))
+                return ret
+            except (socket.error, httplib.HTTPException, HTTPError), e:
+                if isinstance(e, HTTPError) and e.getStatus() not in TEMPORARY_ERRORS:
+                    raise
+                # Host names that can't be resolved won't be resolved on a retry either.
+                if isinstance(e, socket.gaierror):
+                    raise
+                if attempt >= retries:
+                    raise
+                delay = backoff * 2 ** attempt
+                if isinstance(e, HTTPError) and e.getRetryAfter() is not None:
+                    delay = max(delay, min(e.getRetryAfter(), MAX_RETRY_AFTER))
+                    # Other threads making requests to the same host wait too.
+                    rateLimiter = rate_limiters.get(urlparse.urlsplit(url).hostname)
+                    if rateLimiter is not None:
+                        rateLimiter.pause(delay)
+                attempt += 1
+                logger.warning("Request to %s failed (%s). Retrying in %s seconds" % (url, e, delay))
+                time.sleep(delay)
+
+
+# HTTP clients for each thread.
+clients = threading.local()
+
+
+def get_client():
+    """Returns the :class:`HTTPClient` for the calling thread."""
+    ret = getattr(clients, "client", None)
+    if ret is None:
+        ret = HTTPClient()
+        clients.client = ret
+    return ret
+
+
+def fetch(url, data=None, headers=None):
+    """Makes a request using the :class:`HTTPClient` for the calling thread, so connections are kept open between
+    calls from the same thread. Check :meth:`HTTPClient.request`."""
+    return get_client().request(url, data, headers)
+
+
+def write_file(path, content, appendTo=None):
+    """Writes a file atomically: the content is written to a temporary file in the same directory, and then the
+    temporary file is renamed. Files are never left half written if the download fails or the process is killed.
+    If appendTo is a file object, its remaining content is written before the content.
+    """
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmpPath = tempfile.mkstemp(dir=directory, prefix=".%s." % os.path.basename(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if appendTo is not None:
+                shutil.copyfileobj(appendTo, f)
+            f.write(content)
+        utils.set_file_mode(tmpPath, path)
+        if sys.platform == "win32" and os.path.exists(path):
+            os.remove(path)
+        os.rename(tmpPath, path)
+    except Exception:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        raise
+
+
+def append_file(path, content):
+    """Appends content to a file atomically. The file is copied to a temporary file, the content is appended to the
+    copy, and then the copy replaces the file. If the file doesn't exist it gets created.
+    """
+
+    if not os.path.exists(path):
+        write_file(path, content)
+        return
+
+    with open(path, "rb") as f:
+        # Make sure the content begins on a new line.
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != "\n":
+                content = "\n" + content
+        f.seek(0)
+        write_file(path, content, f)
+
+
+class DownloadThread(threading.Thread):
+    def __init__(self, queue, results):
+        threading.Thread.__init__(self)
+        self.__queue = queue
+        self.__results = results
+        self.daemon = True
+
+    def run(self):
+        try:
+            while True:
+                try:
+                    pos, func, args = self.__queue.get_nowait()
+                except Queue.Empty:
+                    break
+                try:
+                    func(*args)
+                except Exception, e:
+                    self.__results[pos] = e
+        finally:
+            get_client().close()
+
+
+class DownloadManager(object):
+    """Runs downloads on a pool of threads. Each thread keeps its own connections open, so requests made with
+    :func:`fetch` from the download functions reuse them.
+
+    :param workers: The number of downloads that run at the same time.
+    :type workers: int.
+    """
+
+    def __init__(self, workers=1):
+        assert workers > 0, "Invalid number of workers"
+        self.__workers = workers
+        self.__downloads = []
+
+    def addDownload(self, func, *args):
+        """Adds a download.
+
+        :param func: The function that downloads the data and writes the file.
+        :param args: The arguments for func.
+        """
+        self.__downloads.append((func, args))
+
+    def run(self):
+        """Runs the downloads and returns a list with the exception raised by each one, or None if it succeeded,
+        in the order they were added."""
+
+        results = [None] * len(self.__downloads)
+        queue = Queue.Queue()
+        for pos, (func, args) in enumerate(self.__downloads):
+            queue.put((pos, func, args))
+        self.__downloads = []
+
+        threads = [DownloadThread(queue, results) for i in xrange(min(self.__workers, len(results)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            # Join with a timeout so the main thread can be interrupted.
+            while thread.isAlive():
+                thread.join(0.1)
+        return results
+
+
+def download_files(downloads, workers, skipErrors, logger):
+    """Runs downloads using a :class:`DownloadManager` and returns the set of files that could not be downloaded.
+
+    :param downloads: The downloads, as (description, path, func, args) tuples. func(*args) should write path.
+    :type downloads: list.
+    :param workers: The number of downloads that run at the same time.
+    :type workers: int.
+    :param skipErrors: False to raise the first error, in the order of the downloads, after all of them finished.
+    :type skipErrors: boolean.
+    :param logger: The logger used to report progress and errors.
+    """
+
+    manager = DownloadManager(workers)
+    for description, path, func, args in downloads:
+        logger.info("Downloading %s to %s" % (description, path))
+        manager.addDownload(func, *args)
+
+    ret = set()
+    for (description, path, func, args), error in zip(downloads, manager.run()):
+        if error is not None:
+            if not skipErrors:
+                raise error
+            logger.error(str(error))
+            ret.add(path)
+    return ret
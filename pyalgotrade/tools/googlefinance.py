@@ -20,27 +20,36 @@
 .. moduleauthor:: Maciej Żok <maciek.zok@gmail.com>
 """
 
-import urllib2
 import os
 import datetime
+import urlparse
 
 import pyalgotrade.logger
 from pyalgotrade import bar
 from pyalgotrade.barfeed import googlefeed
+from pyalgotrade.tools import downloader
+from pyalgotrade.tools import refresh
+
+
+base_url = "http://www.google.com"
+# The maximum number of requests made to Google Finance every MAX_REQUESTS_PERIOD seconds.
+MAX_REQUESTS = 1
+MAX_REQUESTS_PERIOD = 1
+
+downloader.set_default_rate_limit(urlparse.urlsplit(base_url).hostname, MAX_REQUESTS, MAX_REQUESTS_PERIOD)
 
 
 def download_csv(instrument, begin, end):
-    url = "http://www.google.com/finance/historical"
+    url = "{base}/finance/historical".format(base=base_url)
     url += "?q={quote}".format(quote=instrument)
     url += "&startdate={date}".format(date=begin.strftime("%b+%d,+%Y"))
     url += "&enddate={date}".format(date=end.strftime("%b+%d,+%Y"))
     url += "&output=csv"
 
-    f = urllib2.urlopen(url)
-    if f.headers['Content-Type'] != 'application/vnd.ms-excel':
-        raise Exception("Failed to download data: %s" % f.getcode())
-    buff = f.read()
-    f.close()
+    response = downloader.fetch(url)
+    if response.getHeader('Content-Type') != 'application/vnd.ms-excel':
+        raise Exception("Failed to download data: %s" % response.getStatus())
+    buff = response.getBody()
 
     # Remove the BOM
     while not buff[0].isalnum():
@@ -63,12 +72,30 @@ def download_daily_bars(instrument, year, csvFile):
     bars = download_csv(instrument,
                         datetime.date(year, 1, 1),
                         datetime.date(year, 12, 31))
-    f = open(csvFile, "w")
-    f.write(bars)
-    f.close()
+    downloader.write_file(csvFile, bars)
+
 
+def update_daily_bars(instrument, csvFile, fromDate, toDate=None):
+    """Appends the daily bars missing at the end of a CSV file, downloading only the bars after the last one stored.
+    The file gets created if it doesn't exist. Bars are sorted in ascending order.
 
-def build_feed(instruments, fromYear, toYear, storage, frequency=bar.Frequency.DAY, timezone=None, skipErrors=False):
+    :param instrument: Instrument identifier.
+    :type instrument: string.
+    :param csvFile: The path to the CSV file to update.
+    :type csvFile: string.
+    :param fromDate: The first date to download if the file has no bars.
+    :type fromDate: datetime.date.
+    :param toDate: The last date to download. If None, today is used.
+    :type toDate: datetime.date.
+    :rtype: The number of bars appended.
+    """
+
+    rowParser = googlefeed.RowParser(None, bar.Frequency.DAY)
+    downloadFunc = lambda begin, end: download_csv(instrument, begin, end)
+    return refresh.update_csv_file(csvFile, rowParser, downloadFunc, fromDate, toDate)
+
+
+def build_feed(instruments, fromYear, toYear, storage, frequency=bar.Frequency.DAY, timezone=None, skipErrors=False, processes=1, downloads=1):
     """Build and load a :class:`pyalgotrade.barfeed.googlefeed.Feed` using CSV files downloaded from Google Finance.
     CSV files are downloaded if they haven't been downloaded before.
 
@@ -85,6 +112,11 @@ def build_feed(instruments, fromYear, toYear, storage, frequency=bar.Frequency.D
     :type timezone: A pytz timezone.
     :param skipErrors: True to keep on loading/downloading files in case of errors.
     :type skipErrors: boolean.
+    :param processes: The number of worker processes used to parse the files. 1 parses them in this process, and None
+        uses as many processes as CPUs.
+    :type processes: int.
+    :param downloads: The number of files downloaded at the same time.
+    :type downloads: int.
     :rtype: :class:`pyalgotrade.barfeed.googlefeed.Feed`.
     """
 
@@ -95,6 +127,11 @@ def build_feed(instruments, fromYear, toYear, storage, frequency=bar.Frequency.D
         logger.info("Creating {dirname} directory".format(dirname=storage))
         os.mkdir(storage)
 
+    if frequency != bar.Frequency.DAY:
+        raise Exception("Invalid frequency")
+
+    files = []
+    missing = []
     for year in range(fromYear, toYear+1):
         for instrument in instruments:
             fileName = os.path.join(
@@ -102,19 +139,11 @@ def build_feed(instruments, fromYear, toYear, storage, frequency=bar.Frequency.D
                 "{instrument}-{year}-googlefinance.csv".format(
                     instrument=instrument, year=year))
             if not os.path.exists(fileName):
-                logger.info(
-                    "Downloading {instrument} {year} to {filename}".format(
-                        instrument=instrument, year=year, filename=fileName))
-                try:
-                    if frequency == bar.Frequency.DAY:
-                        download_daily_bars(instrument, year, fileName)
-                    else:
-                        raise Exception("Invalid frequency")
-                except Exception, e:
-                    if skipErrors:
-                        logger.error(str(e))
-                        continue
-                    else:
-                        raise e
-            ret.addBarsFromCSV(instrument, fileName)
+                description = "{instrument} {year}".format(instrument=instrument, year=year)
+                missing.append((description, fileName, download_daily_bars, (instrument, year, fileName)))
+            files.append((instrument, fileName))
+
+    failed = downloader.download_files(missing, downloads, skipErrors, logger)
+    files = [item for item in files if item[1] not in failed]
+    ret.addBarsFromCSVFiles(files, processes=processes, skipErrors=skipErrors)
     return ret
@@ -19,17 +19,24 @@
 """
 
 import urllib
-import urllib2
+import urlparse
 import datetime
 import os
 from pyalgotrade import bar
 from pyalgotrade.barfeed import quandlfeed
+from pyalgotrade.tools import downloader
 
 from pyalgotrade.utils import dt
 import pyalgotrade.logger
 
 
 # http://www.quandl.com/help/api
+base_url = "http://www.quandl.com"
+# The maximum number of requests made to Quandl every MAX_REQUESTS_PERIOD seconds.
+MAX_REQUESTS = 2
+MAX_REQUESTS_PERIOD = 1
+
+downloader.set_default_rate_limit(urlparse.urlsplit(base_url).hostname, MAX_REQUESTS, MAX_REQUESTS_PERIOD)
 
 def download_csv(sourceCode, tableCode, begin, end, frequency, authToken):
     params = {
@@ -40,14 +47,13 @@ def download_csv(sourceCode, tableCode, begin, end, frequency, authToken):
     if authToken is not None:
         params["auth_token"] = authToken
 
-    url = "http://www.quandl.com/api/v1/datasets/%s/%s.csv" % (sourceCode, tableCode)
+    url = "%s/api/v1/datasets/%s/%s.csv" % (base_url, sourceCode, tableCode)
     url = "%s?%s" % (url, urllib.urlencode(params))
 
-    f = urllib2.urlopen(url)
-    if f.headers['Content-Type'] != 'text/csv':
-        raise Exception("Failed to download data: %s" % f.getcode())
-    buff = f.read()
-    f.close()
+    response = downloader.fetch(url)
+    if response.getHeader('Content-Type') != 'text/csv':
+        raise Exception("Failed to download data: %s" % response.getStatus())
+    buff = response.getBody()
 
     # Remove the BOM
     while not buff[0].isalnum():
@@ -72,9 +78,7 @@ def download_daily_bars(sourceCode, tableCode, year, csvFile, authToken=None):
     """
 
     bars = download_csv(sourceCode, tableCode, datetime.date(year, 1, 1), datetime.date(year, 12, 31), "daily", authToken)
-    f = open(csvFile, "w")
-    f.write(bars)
-    f.close()
+    downloader.write_file(csvFile, bars)
 
 
 def download_weekly_bars(sourceCode, tableCode, year, csvFile, authToken=None):
@@ -95,12 +99,10 @@ def download_weekly_bars(sourceCode, tableCode, year, csvFile, authToken=None):
     begin = dt.get_first_monday(year) - datetime.timedelta(days=1)  # Start on a sunday
     end = dt.get_last_monday(year) - datetime.timedelta(days=1)  # Start on a sunday
     bars = download_csv(sourceCode, tableCode, begin, end, "weekly", authToken)
-    f = open(csvFile, "w")
-    f.write(bars)
-    f.close()
+    downloader.write_file(csvFile, bars)
 
 
-def build_feed(sourceCode, tableCodes, fromYear, toYear, storage, frequency=bar.Frequency.DAY, timezone=None, skipErrors=False, noAdjClose=False, authToken=None):
+def build_feed(sourceCode, tableCodes, fromYear, toYear, storage, frequency=bar.Frequency.DAY, timezone=None, skipErrors=False, noAdjClose=False, authToken=None, processes=1, downloads=1):
     """Build and load a :class:`pyalgotrade.barfeed.quandlfeed.Feed` using CSV files downloaded from Quandl.
     CSV files are downloaded if they haven't been downloaded before.
 
@@ -124,6 +126,11 @@ def build_feed(sourceCode, tableCodes, fromYear, toYear, storage, frequency=bar.
     :type noAdjClose: boolean.
     :param authToken: Optional. An authentication token needed if you're doing more than 50 calls per day.
     :type authToken: string.
+    :param processes: The number of worker processes used to parse the files. 1 parses them in this process, and None
+        uses as many processes as CPUs.
+    :type processes: int.
+    :param downloads: The number of files downloaded at the same time.
+    :type downloads: int.
     :rtype: :class:`pyalgotrade.barfeed.quandlfeed.Feed`.
     """
 
@@ -136,23 +143,23 @@ def build_feed(sourceCode, tableCodes, fromYear, toYear, storage, frequency=bar.
         logger.info("Creating %s directory" % (storage))
         os.mkdir(storage)
 
+    if frequency == bar.Frequency.DAY:
+        downloadFunc = download_daily_bars
+    elif frequency == bar.Frequency.WEEK:
+        downloadFunc = download_weekly_bars
+    else:
+        raise Exception("Invalid frequency")
+
+    files = []
+    missing = []
     for year in range(fromYear, toYear+1):
         for tableCode in tableCodes:
             fileName = os.path.join(storage, "%s-%s-%d-quandl.csv" % (sourceCode, tableCode, year))
             if not os.path.exists(fileName):
-                logger.info("Downloading %s %d to %s" % (tableCode, year, fileName))
-                try:
-                    if frequency == bar.Frequency.DAY:
-                        download_daily_bars(sourceCode, tableCode, year, fileName, authToken)
-                    elif frequency == bar.Frequency.WEEK:
-                        download_weekly_bars(sourceCode, tableCode, year, fileName, authToken)
-                    else:
-                        raise Exception("Invalid frequency")
-                except Exception, e:
-                    if skipErrors:
-                        logger.error(str(e))
-                        continue
-                    else:
-                        raise e
-            ret.addBarsFromCSV(tableCode, fileName)
+                missing.append(("%s %d" % (tableCode, year), fileName, downloadFunc, (sourceCode, tableCode, year, fileName, authToken)))
+            files.append((tableCode, fileName))
+
+    failed = downloader.download_files(missing, downloads, skipErrors, logger)
+    files = [item for item in files if item[1] not in failed]
+    ret.addBarsFromCSVFiles(files, processes=processes, skipErrors=skipErrors)
     return ret
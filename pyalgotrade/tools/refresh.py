@@ -0,0 +1,232 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import csv
+import datetime
+import os
+import threading
+
+from pyalgotrade.tools import downloader
+from pyalgotrade.utils import dt
+
+
+# Bytes read at once when looking for the last line of a file.
+BLOCK_SIZE = 4096
+
+
+def read_last_line(path):
+    """Returns the last non empty line in a file, or None if the file is empty. Only the end of the file is read."""
+
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        buff = ""
+        while end > 0:
+            begin = max(0, end - BLOCK_SIZE)
+            f.seek(begin)
+            buff = f.read(end - begin) + buff
+            end = begin
+            lines = buff.rstrip()
+            pos = lines.rfind("\n")
+            if pos != -1:
+                return lines[pos+1:].strip()
+            if end == 0 and lines:
+                return lines.strip()
+    return None
+
+
+def parse_lines(fieldNames, lines, rowParser):
+    """Parses CSV lines and returns a list of (line, bar) tuples."""
+    ret = []
+    for line, row in zip(lines, csv.reader(lines, delimiter=rowParser.getDelimiter())):
+        bar_ = rowParser.parseBar(dict(zip(fieldNames, row)))
+        if bar_ is not None:
+            ret.append((line, bar_))
+    return ret
+
+
+def get_field_names(header, rowParser):
+    return csv.reader([header], delimiter=rowParser.getDelimiter()).next()
+
+
+def parse_line(header, line, rowParser):
+    bars = parse_lines(get_field_names(header, rowParser), [line], rowParser)
+    if len(bars) == 0:
+        return None
+    return bars[0][1]
+
+
+def get_first_and_last_bars(csvFile, rowParser):
+    """Returns the header and the first and last bars in a CSV file, in the order they are stored. The bars are None
+    if the file doesn't exist or it has no bars. Only the beginning and the end of the file are read."""
+
+    if not os.path.exists(csvFile):
+        return None, None, None
+    firstLine = None
+    with open(csvFile, "rb") as f:
+        header = f.readline().strip()
+        for line in f:
+            if line.strip():
+                firstLine = line.strip()
+                break
+    if not header or firstLine is None:
+        return header, None, None
+    return header, parse_line(header, firstLine, rowParser), parse_line(header, read_last_line(csvFile), rowParser)
+
+
+def get_last_bar(csvFile, rowParser):
+    """Returns the header and the most recent bar in a CSV file sorted in either order. The bar is None if the file
+    doesn't exist or it has no bars."""
+
+    header, firstBar, lastBar = get_first_and_last_bars(csvFile, rowParser)
+    if is_descending(firstBar, lastBar):
+        lastBar = firstBar
+    return header, lastBar
+
+
+def is_descending(firstBar, lastBar):
+    # Files downloaded from Yahoo! Finance have the most recent bars first.
+    if firstBar is None or lastBar is None:
+        return False
+    return dt.datetime_to_timestamp(firstBar.getDateTime()) > dt.datetime_to_timestamp(lastBar.getDateTime())
+
+
+def get_new_bars(content, rowParser, lastDateTime):
+    """Parses downloaded CSV content and returns the header and the (line, bar) tuples for the bars after
+    lastDateTime, sorted in ascending order."""
+
+    lines = [line for line in content.splitlines() if line.strip()]
+    if len(lines) == 0:
+        return None, []
+    header = lines[0].strip()
+    bars = parse_lines(get_field_names(header, rowParser), lines[1:], rowParser)
+    if lastDateTime is not None:
+        # Timestamps let naive and localized datetimes be compared. Naive datetimes are considered to be in UTC,
+        # which is how they are stored in databases.
+        lastTimestamp = dt.datetime_to_timestamp(lastDateTime)
+        bars = [item for item in bars if dt.datetime_to_timestamp(item[1].getDateTime()) > lastTimestamp]
+    bars.sort(key=lambda item: dt.datetime_to_timestamp(item[1].getDateTime()))
+    return header, bars
+
+
+def download_missing(downloadFunc, lastDateTime, fromDate, toDate):
+    """Downloads the bars after lastDateTime, up to toDate. Returns the CSV content, or None if there is nothing to
+    download."""
+
+    if toDate is None:
+        toDate = datetime.date.today()
+    begin = fromDate
+    if lastDateTime is not None:
+        # The last day stored is downloaded again since its date may differ in UTC and in the timezone used to store
+        # the bars. Bars already stored get skipped.
+        begin = max(begin, lastDateTime.date())
+    if begin > toDate:
+        return None
+
+    try:
+        return downloadFunc(begin, toDate)
+    except downloader.HTTPError, e:
+        # Some providers answer Not Found if there are no bars in the range.
+        if e.getStatus() == 404 and lastDateTime is not None:
+            return None
+        raise
+
+
+def update_csv_file(csvFile, rowParser, downloadFunc, fromDate, toDate=None):
+    """Appends the bars missing at the end of a CSV file, downloading only the range after the last bar stored.
+    The file gets created if it doesn't exist. Files are kept sorted in ascending order, and new bars are appended
+    atomically. Files sorted in descending order are kept that way, and get rewritten with the new bars first.
+
+    :param csvFile: The path to the CSV file. The first row should have the field names.
+    :type csvFile: string.
+    :param rowParser: The parser for the rows in the file.
+    :type rowParser: :class:`pyalgotrade.barfeed.csvfeed.RowParser`.
+    :param downloadFunc: A function that receives the first and the last dates to download, and returns CSV content.
+    :param fromDate: The first date to download if the file has no bars.
+    :type fromDate: datetime.date.
+    :param toDate: The last date to download. If None, today is used.
+    :type toDate: datetime.date.
+    :rtype: The number of bars appended.
+    """
+
+    header, firstBar, lastBar = get_first_and_last_bars(csvFile, rowParser)
+    descending = is_descending(firstBar, lastBar)
+    if descending:
+        lastBar = firstBar
+    lastDateTime = None
+    if lastBar is not None:
+        lastDateTime = lastBar.getDateTime()
+
+    content = download_missing(downloadFunc, lastDateTime, fromDate, toDate)
+    if content is None:
+        return 0
+    newHeader, bars = get_new_bars(content, rowParser, lastDateTime)
+    if len(bars) == 0:
+        return 0
+
+    lines = [item[0] for item in bars]
+    if lastBar is None:
+        downloader.write_file(csvFile, "\n".join([newHeader] + lines) + "\n")
+    else:
+        if get_field_names(newHeader, rowParser) != get_field_names(header, rowParser):
+            raise Exception("The columns downloaded don't match the ones in %s" % (csvFile))
+        if descending:
+            with open(csvFile, "rb") as f:
+                f.readline()
+                oldLines = f.read()
+            downloader.write_file(csvFile, "\n".join([header] + lines[::-1]) + "\n" + oldLines)
+        else:
+            downloader.append_file(csvFile, "\n".join(lines) + "\n")
+    return len(bars)
+
+
+def update_database(db, instrument, frequency, rowParser, downloadFunc, fromDate, toDate=None, lock=None):
+    """Adds the bars missing for an instrument in a database, downloading only the range after the last bar stored.
+    New bars are added in a single transaction.
+
+    :param db: The database.
+    :type db: :class:`pyalgotrade.barfeed.sqlitefeed.Database`.
+    :param instrument: Instrument identifier.
+    :type instrument: string.
+    :param frequency: The frequency of the bars.
+    :param rowParser: The parser for the rows downloaded.
+    :type rowParser: :class:`pyalgotrade.barfeed.csvfeed.RowParser`.
+    :param downloadFunc: A function that receives the first and the last dates to download, and returns CSV content.
+    :param fromDate: The first date to download if the instrument has no bars.
+    :type fromDate: datetime.date.
+    :param toDate: The last date to download. If None, today is used.
+    :type toDate: datetime.date.
+    :param lock: An optional lock to hold while using the database, if it is shared between threads.
+    :rtype: The number of bars added.
+    """
+
+    if lock is None:
+        lock = threading.Lock()
+
+    with lock:
+        lastDateTime = db.getLastDateTime(instrument, frequency)
+    content = download_missing(downloadFunc, lastDateTime, fromDate, toDate)
+    if content is None:
+        return 0
+    header, bars = get_new_bars(content, rowParser, lastDateTime)
+    if len(bars):
+        with lock:
+            db.addManyBars([(instrument, item[1]) for item in bars], frequency)
+    return len(bars)
@@ -18,10 +18,18 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import multiprocessing
 import os
 
+import numpy as np
+import pytz
+
 from pyalgotrade import dispatcher
+from pyalgotrade import bar
+from pyalgotrade import resamplebase
 from pyalgotrade.dataseries import resampled
+from pyalgotrade.barfeed import barcache
+from pyalgotrade.barfeed import csvfeed
 
 
 datetime_format = "%Y-%m-%d %H:%M:%S"
@@ -75,6 +83,7 @@ def resample_impl(barFeed, frequency, csvFile):
     disp.addSubject(barFeed)
     disp.run()
     resampledDS.pushLast()
+    csvWriter.close()
 
 
 def resample_to_csv(barFeed, frequency, csvFile):
@@ -104,3 +113,196 @@ def resample_to_csv(barFeed, frequency, csvFile):
 
     assert frequency > 0, "Invalid frequency"
     resample_impl(barFeed, frequency, csvFile)
+
+
+# Returns the positions where groups begin and the datetimes where their ranges begin, given the datetimes of the bars
+# as microseconds since the epoch, sorted in ascending order.
+def get_group_starts(dateTimes, frequency, timezone):
+    if len(dateTimes) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    if frequency < bar.Frequency.DAY:
+        # Intraday ranges are aligned to the epoch, so slots are calculated with integer arithmetic.
+        slots = dateTimes // (frequency * 1000000)
+        changed = np.ones(len(slots), dtype=bool)
+        changed[1:] = slots[1:] != slots[:-1]
+        starts = np.flatnonzero(changed)
+        begins = slots[starts] * frequency * 1000000
+    else:
+        # Day and month ranges depend on the timezone, so a range is built for every group, and the first
+        # bar past its ending is looked up.
+        starts = []
+        begins = []
+        pos = 0
+        while pos < len(dateTimes):
+            range_ = resamplebase.build_range(barcache.micros_to_datetime(dateTimes[pos], timezone), frequency)
+            starts.append(pos)
+            begins.append(range_.getBeginningMicros())
+            pos = int(np.searchsorted(dateTimes, range_.getEndingMicros(), side="left"))
+        starts = np.array(starts, dtype=np.int64)
+        begins = np.array(begins, dtype=np.int64)
+    return starts, begins
+
+
+def resample_packed_bars(values, frequency, timezone):
+    """Groups bars packed with :func:`pyalgotrade.barfeed.barcache.pack_bars` using NumPy, with the same results
+    as :class:`pyalgotrade.dataseries.resampled.ResampledBarDataSeries`. Volumes are added in a different order, so
+    they may differ in the last digits.
+
+    :param values: The packed bars, sorted by datetime.
+    :type values: numpy.ndarray.
+    :param frequency: The grouping frequency in seconds. Check :func:`pyalgotrade.resamplebase.is_valid_frequency`.
+    :param timezone: The name of the timezone of the bars, or None if they are naive.
+    :type timezone: string.
+    :rtype: A numpy.ndarray with the grouped bars, packed.
+    """
+
+    if not resamplebase.is_valid_frequency(frequency):
+        raise Exception("Unsupported frequency")
+
+    dateTimes = np.asarray(values["dateTime"])
+    if np.any(dateTimes[1:] < dateTimes[:-1]):
+        raise Exception("Bars are not sorted")
+    if timezone is not None:
+        timezone = pytz.timezone(timezone)
+
+    starts, begins = get_group_starts(dateTimes, frequency, timezone)
+    ret = np.zeros(len(starts), dtype=barcache.DTYPE)
+    if len(starts) == 0:
+        return ret
+
+    ends = np.append(starts[1:], len(dateTimes)) - 1
+    ret["dateTime"] = begins
+    ret["open"] = values["open"][starts]
+    ret["high"] = np.maximum.reduceat(values["high"], starts)
+    ret["low"] = np.minimum.reduceat(values["low"], starts)
+    ret["close"] = values["close"][ends]
+    ret["volume"] = np.add.reduceat(values["volume"].astype(np.float64), starts)
+    ret["adjClose"] = values["adjClose"][ends]
+    ret["hasAdjClose"] = values["hasAdjClose"][ends]
+    return ret
+
+
+def resample_bars_packed(bars, frequency):
+    """Returns the bars grouped by a certain frequency, packed, and the name of their timezone."""
+
+    packed = barcache.pack_bars(bars)
+    if packed is None:
+        # Bars that can't be packed are grouped one at a time.
+        packed = barcache.pack_bars(list(csvfeed.aggregate_bars(bars, frequency)))
+        if packed is None:
+            raise Exception("Bars must share the same timezone")
+        values, barFrequency, timezone = packed
+        return values, timezone
+
+    values, barFrequency, timezone = packed
+    return resample_packed_bars(values, frequency, timezone), timezone
+
+
+def resample_bars(bars, frequency):
+    """Groups bars by a certain frequency in bulk, with the same results as
+    :class:`pyalgotrade.dataseries.resampled.ResampledBarDataSeries`.
+
+    :param bars: The bars to group, sorted by datetime.
+    :type bars: list of :class:`pyalgotrade.bar.Bar`.
+    :param frequency: The grouping frequency in seconds. Check :func:`pyalgotrade.resamplebase.is_valid_frequency`.
+    :rtype: A list of :class:`pyalgotrade.bar.BasicBar`.
+    """
+
+    values, timezone = resample_bars_packed(bars, frequency)
+    return barcache.unpack_bars(values, frequency, timezone)
+
+
+def write_packed_bars_to_csv(csvFile, values, timezone):
+    if timezone is not None:
+        timezone = pytz.timezone(timezone)
+    dateTimes = [barcache.micros_to_datetime(micros, timezone).strftime(datetime_format) for micros in values["dateTime"].tolist()]
+    columns = [values[name].tolist() for name in ["open", "high", "low", "close", "volume", "adjClose"]]
+    hasAdjCloses = values["hasAdjClose"].tolist()
+    with open(csvFile, "w") as f:
+        f.write(",".join(["Date Time", "Open", "High", "Low", "Close", "Volume", "Adj Close"]))
+        f.write(os.linesep)
+        for i, (open_, high, low, close, volume, adjClose) in enumerate(zip(*columns)):
+            if not hasAdjCloses[i]:
+                adjClose = ""
+            f.write(",".join([dateTimes[i], str(open_), str(high), str(low), str(close), str(volume), str(adjClose)]))
+            f.write(os.linesep)
+
+
+# Entry point for worker processes. Returns the path to the file written and an error message.
+def resample_worker(args):
+    instrument, sources, cacheDir, barFilter, frequency, outputDir, binary = args
+    try:
+        bars = []
+        for rowParser, path in sources:
+            bars.extend(csvfeed.load_bars(path, rowParser, cacheDir, barFilter))
+        # Bars are sorted just like when they are added to a bar feed.
+        bars.sort(key=lambda bar_: bar_.getDateTime())
+        values, timezone = resample_bars_packed(bars, frequency)
+        if binary:
+            ret = os.path.join(outputDir, instrument)
+            barcache.save_packed_bars(ret, values, frequency, timezone)
+            ret += ".npy"
+        else:
+            ret = os.path.join(outputDir, instrument + ".csv")
+            write_packed_bars_to_csv(ret, values, timezone)
+        return ret, None
+    except Exception, e:
+        return None, "%s: %s" % (instrument, e)
+
+
+def resample_files(barFeed, files, frequency, outputDir, timezone=None, processes=1, binary=False):
+    """Resamples CSV files for many instruments in bulk, grouping bars by a certain frequency, optionally using a
+    pool of worker processes. Bars are grouped using NumPy, with the same results as
+    :class:`pyalgotrade.dataseries.resampled.ResampledBarDataSeries`.
+
+    :param barFeed: The feed used to build the parsers for the files, and where the bar filter and the cache
+        directory are taken from. For example, a :class:`pyalgotrade.barfeed.yahoofeed.Feed`. Bars are never added to it.
+    :type barFeed: :class:`pyalgotrade.barfeed.csvfeed.BarFeed`.
+    :param files: A list of (instrument, path) tuples. Files for the same instrument are joined in the given order.
+    :type files: list.
+    :param frequency: The grouping frequency in seconds. Check :func:`pyalgotrade.resamplebase.is_valid_frequency`.
+    :param outputDir: The directory where a file for every instrument is written.
+    :type outputDir: string.
+    :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+    :type timezone: A pytz timezone.
+    :param processes: The number of worker processes. 1 resamples the files in this process, and None uses as many
+        processes as CPUs.
+    :type processes: int.
+    :param binary: If True, bars are written using :func:`pyalgotrade.barfeed.barcache.save_packed_bars`, as
+        *instrument*.npy and *instrument*.json, instead of as *instrument*.csv files in the format used by
+        :func:`resample_to_csv`.
+    :type binary: boolean.
+    :rtype: A list with the paths to the files written, one for every instrument, in the order they were given.
+    """
+
+    if not resamplebase.is_valid_frequency(frequency):
+        raise Exception("Unsupported frequency")
+    if not os.path.exists(outputDir):
+        os.makedirs(outputDir)
+
+    instruments = []
+    sources = {}
+    for instrument, path in files:
+        if instrument not in sources:
+            instruments.append(instrument)
+        sources.setdefault(instrument, []).append((barFeed.createRowParser(timezone), path))
+
+    tasks = [
+        (instrument, sources[instrument], barFeed.getCacheDir(), barFeed.getBarFilter(), frequency, outputDir, binary)
+        for instrument in instruments
+    ]
+    if processes != 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(resample_worker, tasks, chunksize=1)
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        results = map(resample_worker, tasks)
+
+    errors = [error for path, error in results if error is not None]
+    if len(errors):
+        raise Exception("Failed to resample %d instrument(s):\n%s" % (len(errors), "\n".join(errors)))
+    return [path for path, error in results]
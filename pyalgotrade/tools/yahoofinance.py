@@ -18,16 +18,27 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
-import urllib2
 import os
 import datetime
+import threading
+import urlparse
 
 import pyalgotrade.logger
 from pyalgotrade import bar
 from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade.tools import downloader
+from pyalgotrade.tools import refresh
 from pyalgotrade.utils import dt
 
 
+base_url = "http://ichart.finance.yahoo.com"
+# The maximum number of requests made to Yahoo! Finance every MAX_REQUESTS_PERIOD seconds.
+MAX_REQUESTS = 2
+MAX_REQUESTS_PERIOD = 1
+
+downloader.set_default_rate_limit(urlparse.urlsplit(base_url).hostname, MAX_REQUESTS, MAX_REQUESTS_PERIOD)
+
+
 def __adjust_month(month):
     if month > 12 or month < 1:
         raise Exception("Invalid month")
@@ -36,13 +47,12 @@ def __adjust_month(month):
 
 
 def download_csv(instrument, begin, end, frequency):
-    url = "http://ichart.finance.yahoo.com/table.csv?s=%s&a=%d&b=%d&c=%d&d=%d&e=%d&f=%d&g=%s&ignore=.csv" % (instrument, __adjust_month(begin.month), begin.day, begin.year, __adjust_month(end.month), end.day, end.year, frequency)
+    url = "%s/table.csv?s=%s&a=%d&b=%d&c=%d&d=%d&e=%d&f=%d&g=%s&ignore=.csv" % (base_url, instrument, __adjust_month(begin.month), begin.day, begin.year, __adjust_month(end.month), end.day, end.year, frequency)
 
-    f = urllib2.urlopen(url)
-    if f.headers['Content-Type'] != 'text/csv':
-        raise Exception("Failed to download data: %s" % f.getcode())
-    buff = f.read()
-    f.close()
+    response = downloader.fetch(url)
+    if response.getHeader('Content-Type') != 'text/csv':
+        raise Exception("Failed to download data: %s" % response.getStatus())
+    buff = response.getBody()
 
     # Remove the BOM
     while not buff[0].isalnum():
@@ -63,9 +73,7 @@ def download_daily_bars(instrument, year, csvFile):
     """
 
     bars = download_csv(instrument, datetime.date(year, 1, 1), datetime.date(year, 12, 31), "d")
-    f = open(csvFile, "w")
-    f.write(bars)
-    f.close()
+    downloader.write_file(csvFile, bars)
 
 
 def download_weekly_bars(instrument, year, csvFile):
@@ -82,12 +90,31 @@ def download_weekly_bars(instrument, year, csvFile):
     begin = dt.get_first_monday(year)
     end = dt.get_last_monday(year) + datetime.timedelta(days=6)
     bars = download_csv(instrument, begin, end, "w")
-    f = open(csvFile, "w")
-    f.write(bars)
-    f.close()
+    downloader.write_file(csvFile, bars)
+
+
+def update_daily_bars(instrument, csvFile, fromDate, toDate=None):
+    """Appends the daily bars missing at the end of a CSV file, downloading only the bars after the last one stored.
+    The file gets created if it doesn't exist. Bars are sorted in ascending order, unless the file has them in
+    descending order like the ones written by :func:`download_daily_bars`.
+
+    :param instrument: Instrument identifier.
+    :type instrument: string.
+    :param csvFile: The path to the CSV file to update.
+    :type csvFile: string.
+    :param fromDate: The first date to download if the file has no bars.
+    :type fromDate: datetime.date.
+    :param toDate: The last date to download. If None, today is used.
+    :type toDate: datetime.date.
+    :rtype: The number of bars appended.
+    """
+
+    rowParser = yahoofeed.RowParser(None, bar.Frequency.DAY)
+    downloadFunc = lambda begin, end: download_csv(instrument, begin, end, "d")
+    return refresh.update_csv_file(csvFile, rowParser, downloadFunc, fromDate, toDate)
 
 
-def build_feed(instruments, fromYear, toYear, storage, frequency=bar.Frequency.DAY, timezone=None, skipErrors=False):
+def build_feed(instruments, fromYear, toYear, storage, frequency=bar.Frequency.DAY, timezone=None, skipErrors=False, processes=1, downloads=1):
     """Build and load a :class:`pyalgotrade.barfeed.yahoofeed.Feed` using CSV files downloaded from Yahoo! Finance.
     CSV files are downloaded if they haven't been downloaded before.
 
@@ -105,6 +132,11 @@ def build_feed(instruments, fromYear, toYear, storage, frequency=bar.Frequency.D
     :type timezone: A pytz timezone.
     :param skipErrors: True to keep on loading/downloading files in case of errors.
     :type skipErrors: boolean.
+    :param processes: The number of worker processes used to parse the files. 1 parses them in this process, and None
+        uses as many processes as CPUs.
+    :type processes: int.
+    :param downloads: The number of files downloaded at the same time.
+    :type downloads: int.
     :rtype: :class:`pyalgotrade.barfeed.yahoofeed.Feed`.
     """
 
@@ -115,23 +147,109 @@ def build_feed(instruments, fromYear, toYear, storage, frequency=bar.Frequency.D
         logger.info("Creating %s directory" % (storage))
         os.mkdir(storage)
 
+    if frequency == bar.Frequency.DAY:
+        downloadFunc = download_daily_bars
+    elif frequency == bar.Frequency.WEEK:
+        downloadFunc = download_weekly_bars
+    else:
+        raise Exception("Invalid frequency")
+
+    files = []
+    missing = []
     for year in range(fromYear, toYear+1):
         for instrument in instruments:
             fileName = os.path.join(storage, "%s-%d-yahoofinance.csv" % (instrument, year))
             if not os.path.exists(fileName):
-                logger.info("Downloading %s %d to %s" % (instrument, year, fileName))
-                try:
-                    if frequency == bar.Frequency.DAY:
-                        download_daily_bars(instrument, year, fileName)
-                    elif frequency == bar.Frequency.WEEK:
-                        download_weekly_bars(instrument, year, fileName)
-                    else:
-                        raise Exception("Invalid frequency")
-                except Exception, e:
-                    if skipErrors:
-                        logger.error(str(e))
-                        continue
-                    else:
-                        raise e
-            ret.addBarsFromCSV(instrument, fileName)
+                missing.append(("%s %d" % (instrument, year), fileName, downloadFunc, (instrument, year, fileName)))
+            files.append((instrument, fileName))
+
+    failed = downloader.download_files(missing, downloads, skipErrors, logger)
+    files = [item for item in files if item[1] not in failed]
+    ret.addBarsFromCSVFiles(files, processes=processes, skipErrors=skipErrors)
+    return ret
+
+
+def build_updated_feed(instruments, fromYear, storage, toDate=None, timezone=None, skipErrors=False, processes=1, downloads=1):
+    """Build and load a :class:`pyalgotrade.barfeed.yahoofeed.Feed` with daily bars, using one CSV file per
+    instrument. Files are brought up to date first, downloading only the bars after the last one stored.
+
+    :param instruments: Instrument identifiers.
+    :type instruments: list.
+    :param fromYear: The first year to download for instruments that have no bars stored.
+    :type fromYear: int.
+    :param storage: The path were the files will be loaded from, or downloaded to.
+    :type storage: string.
+    :param toDate: The last date to download. If None, today is used.
+    :type toDate: datetime.date.
+    :param timezone: The default timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+    :type timezone: A pytz timezone.
+    :param skipErrors: True to keep on loading/downloading files in case of errors. Files that could not be updated
+        are loaded if they exist.
+    :type skipErrors: boolean.
+    :param processes: The number of worker processes used to parse the files. 1 parses them in this process, and None
+        uses as many processes as CPUs.
+    :type processes: int.
+    :param downloads: The number of files updated at the same time.
+    :type downloads: int.
+    :rtype: :class:`pyalgotrade.barfeed.yahoofeed.Feed`.
+    """
+
+    logger = pyalgotrade.logger.getLogger("yahoofinance")
+    ret = yahoofeed.Feed(bar.Frequency.DAY, timezone)
+
+    if not os.path.exists(storage):
+        logger.info("Creating %s directory" % (storage))
+        os.mkdir(storage)
+
+    fromDate = datetime.date(fromYear, 1, 1)
+    files = []
+    updates = []
+    for instrument in instruments:
+        fileName = os.path.join(storage, "%s-yahoofinance.csv" % (instrument))
+        updates.append((instrument, fileName, update_daily_bars, (instrument, fileName, fromDate, toDate)))
+        files.append((instrument, fileName))
+
+    failed = downloader.download_files(updates, downloads, skipErrors, logger)
+    files = [item for item in files if item[1] not in failed or os.path.exists(item[1])]
+    ret.addBarsFromCSVFiles(files, processes=processes, skipErrors=skipErrors)
+    return ret
+
+
+def update_database(db, instruments, fromYear, toDate=None, skipErrors=False, downloads=1):
+    """Adds the daily bars missing in a database, downloading only the bars after the last one stored for each
+    instrument. Bars are stored with the frequency **pyalgotrade.bar.Frequency.DAY**.
+
+    :param db: The database.
+    :type db: :class:`pyalgotrade.barfeed.sqlitefeed.Database`.
+    :param instruments: Instrument identifiers.
+    :type instruments: list.
+    :param fromYear: The first year to download for instruments that have no bars stored.
+    :type fromYear: int.
+    :param toDate: The last date to download. If None, today is used.
+    :type toDate: datetime.date.
+    :param skipErrors: True to keep on updating other instruments in case of errors.
+    :type skipErrors: boolean.
+    :param downloads: The number of instruments updated at the same time.
+    :type downloads: int.
+    :rtype: A set with the instruments that could not be updated.
+    """
+
+    logger = pyalgotrade.logger.getLogger("yahoofinance")
+    rowParser = yahoofeed.RowParser(None, bar.Frequency.DAY)
+    fromDate = datetime.date(fromYear, 1, 1)
+    # Downloads run concurrently, but the database is used by one thread at a time.
+    lock = threading.Lock()
+
+    manager = downloader.DownloadManager(downloads)
+    for instrument in instruments:
+        downloadFunc = lambda begin, end, instrument=instrument: download_csv(instrument, begin, end, "d")
+        manager.addDownload(refresh.update_database, db, instrument, bar.Frequency.DAY, rowParser, downloadFunc, fromDate, toDate, lock)
+
+    ret = set()
+    for instrument, error in zip(instruments, manager.run()):
+        if error is not None:
+            if not skipErrors:
+                raise error
+            logger.error("%s: %s" % (instrument, error))
+            ret.add(instrument)
     return ret
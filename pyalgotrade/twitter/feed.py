@@ -23,6 +23,7 @@ import threading
 import json
 
 from pyalgotrade import observer
+from pyalgotrade import dispatcher
 import pyalgotrade.logger
 
 import tweepy
@@ -81,7 +82,6 @@ class TwitterFeed(observer.Subject):
         * At least **track** or **follow** have to be set.
     """
 
-    QUEUE_TIMEOUT = 0.01
     MAX_EVENTS_PER_DISPATCH = 50
 
     def __init__(self, consumerKey, consumerSecret, accessToken, accessTokenSecret, track=[], follow=[], languages=[]):
@@ -90,7 +90,7 @@ class TwitterFeed(observer.Subject):
         assert isinstance(languages, list), "languages must be a list"
 
         self.__event = observer.Event()
-        self.__queue = Queue.Queue()
+        self.__queue = dispatcher.EventQueue()
         self.__thread = None
         self.__running = False
 
@@ -113,7 +113,7 @@ class TwitterFeed(observer.Subject):
     def __dispatchImpl(self):
         ret = False
         try:
-            nextTweet = json.loads(self.__queue.get(True, TwitterFeed.QUEUE_TIMEOUT))
+            nextTweet = json.loads(self.__queue.get(False))
             ret = True
             self.__event.emit(nextTweet)
         except Queue.Empty:
@@ -164,3 +164,10 @@ class TwitterFeed(observer.Subject):
 
     def getDispatchPriority(self):
         return None
+
+    def setWaker(self, waker):
+        self.__queue.setWaker(waker)
+
+    def getPollInterval(self):
+        # Tweets are put in a dispatcher.EventQueue.
+        return None
@@ -18,6 +18,28 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import os
+import stat
+
+
+# The umask of the process. It is read once since reading it requires changing it, and other threads could create
+# files in the meantime.
+umask = os.umask(0)
+os.umask(umask)
+
+
+def set_file_mode(path, modelPath=None):
+    """Sets the mode of a file to the mode of modelPath, if it exists, or to the mode that files created with open()
+    get. Files created with tempfile.mkstemp can only be read by their owner, so this should be called before they
+    replace other files.
+    """
+
+    if modelPath is not None and os.path.exists(modelPath):
+        mode = stat.S_IMODE(os.stat(modelPath).st_mode)
+    else:
+        mode = 0666 & ~umask
+    os.chmod(path, mode)
+
 
 def get_change_percentage(actual, prev):
     if actual is None or prev is None or prev == 0:
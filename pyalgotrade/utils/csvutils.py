@@ -20,6 +20,8 @@
 
 import csv
 
+import numpy as np
+
 
 # A faster (but limited) version of csv.DictReader
 class FastDictReader(object):
@@ -47,3 +49,76 @@ class FastDictReader(object):
             self.__dict[self.__fieldNames[i]] = row[i]
 
         return self.__dict
+
+
+# Widths of the directives supported by get_fixed_datetime_layout.
+FIXED_WIDTH_DIRECTIVES = {"Y": 4, "m": 2, "d": 2, "H": 2, "M": 2, "S": 2}
+
+
+def get_fixed_datetime_layout(dateTimeFormat):
+    """Returns the layout for a datetime format where every field has a fixed width, or None if the format is not
+    supported. The layout is a tuple with the total width, a list of (directive, offset, width) for the fields and a
+    list of (offset, char) for the literal characters."""
+
+    fields = []
+    literals = []
+    offset = 0
+    i = 0
+    while i < len(dateTimeFormat):
+        if dateTimeFormat[i] == "%":
+            directive = dateTimeFormat[i+1:i+2]
+            if directive not in FIXED_WIDTH_DIRECTIVES:
+                return None
+            fields.append((directive, offset, FIXED_WIDTH_DIRECTIVES[directive]))
+            offset += FIXED_WIDTH_DIRECTIVES[directive]
+            i += 2
+        else:
+            literals.append((offset, dateTimeFormat[i]))
+            offset += 1
+            i += 1
+    if "Y" not in [field[0] for field in fields]:
+        return None
+    return (offset, fields, literals)
+
+
+def parse_fixed_datetimes(chars, layout):
+    """Parses datetimes that have a fixed width.
+
+    :param chars: A 2D uint8 array with one row per datetime.
+    :param layout: The layout returned by :func:`get_fixed_datetime_layout`.
+    :rtype: A numpy datetime64[us] array, or None if any of the datetimes doesn't match the layout.
+    """
+
+    width, fieldLayout, literals = layout
+    for offset, char in literals:
+        if np.any(chars[:, offset] != ord(char)):
+            return None
+
+    ones = np.ones(len(chars), dtype=np.int64)
+    zeros = np.zeros(len(chars), dtype=np.int64)
+    fields = {"m": ones, "d": ones, "H": zeros, "M": zeros, "S": zeros}
+    for directive, offset, fieldWidth in fieldLayout:
+        digits = chars[:, offset:offset+fieldWidth].astype(np.int64) - ord("0")
+        if np.any((digits < 0) | (digits > 9)):
+            return None
+        value = zeros
+        for i in xrange(fieldWidth):
+            value = value * 10 + digits[:, i]
+        fields[directive] = value
+
+    year = fields["Y"]
+    month = fields["m"]
+    day = fields["d"]
+    if np.any((year < 1) | (month < 1) | (month > 12) | (day < 1)):
+        return None
+    if np.any((fields["H"] > 23) | (fields["M"] > 59) | (fields["S"] > 59)):
+        return None
+
+    months = (year - 1970) * 12 + month - 1
+    monthStart = months.astype("datetime64[M]")
+    ret = monthStart.astype("datetime64[D]") + (day - 1).astype("timedelta64[D]")
+    # Check that the day is valid for the month.
+    if np.any(ret.astype("datetime64[M]") != monthStart):
+        return None
+    seconds = fields["H"] * 3600 + fields["M"] * 60 + fields["S"]
+    return ret.astype("datetime64[us]") + (seconds * 1000000).astype("timedelta64[us]")
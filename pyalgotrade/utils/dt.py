@@ -18,10 +18,17 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import bisect
 import datetime
 import pytz
 
 
+# The pytz tzinfo and UTC offset for each timezone and date, or None if the UTC offset may change around that date.
+# The cache gets cleared once it holds MAX_CACHED_TZINFOS entries.
+MAX_CACHED_TZINFOS = 10000
+tzinfo_cache = {}
+
+
 def datetime_is_naive(dateTime):
     """ Returns True if dateTime is naive."""
     return dateTime.tzinfo is None or dateTime.tzinfo.utcoffset(dateTime) is None
@@ -32,6 +39,38 @@ def unlocalize(dateTime):
     return dateTime.replace(tzinfo=None)
 
 
+def get_day_tzinfo(timeZone, date):
+    """Returns the pytz tzinfo and the UTC offset that apply to a whole day, both in local time and in UTC, or None
+    if there is a DST transition near that day. Results are cached by timezone and date, and transitions are looked up in the pytz
+    transition table, so only days close to a DST transition need a full pytz localization.
+
+    :param timeZone: A pytz timezone with DST transitions.
+    :param date: The date.
+    :type date: datetime.date.
+    """
+
+    key = (timeZone.zone, date)
+    try:
+        return tzinfo_cache[key]
+    except KeyError:
+        pass
+
+    ret = None
+    midnight = datetime.datetime(date.year, date.month, date.day)
+    # UTC offsets are well below a day, so both the local day and the UTC day are between these two.
+    windowBegin = midnight - datetime.timedelta(days=1)
+    windowEnd = midnight + datetime.timedelta(days=2)
+    transitions = timeZone._utc_transition_times
+    pos = bisect.bisect_right(transitions, windowBegin)
+    if pos == len(transitions) or transitions[pos] > windowEnd:
+        localized = timeZone.localize(midnight)
+        ret = (localized.tzinfo, localized.utcoffset())
+    if len(tzinfo_cache) >= MAX_CACHED_TZINFOS:
+        tzinfo_cache.clear()
+    tzinfo_cache[key] = ret
+    return ret
+
+
 def localize(dateTime, timeZone):
     """Returns a datetime adjusted to a timezone:
 
@@ -41,7 +80,21 @@ def localize(dateTime, timeZone):
        and time data so the result is the same UTC time.
     """
 
-    if datetime_is_naive(dateTime):
+    offset = dateTime.utcoffset()
+    # Timezones with DST transitions use the cached tzinfo for the day, unless a transition is near. Other timezones,
+    # like fixed offsets or tzinfo implementations other than pytz, don't have a transition table.
+    if timeZone is not pytz.utc and hasattr(timeZone, "_utc_transition_times"):
+        if offset is None:
+            dayTzInfo = get_day_tzinfo(timeZone, dateTime.date())
+            if dayTzInfo is not None:
+                return dateTime.replace(tzinfo=dayTzInfo[0])
+        else:
+            utcDateTime = dateTime.replace(tzinfo=None) - offset
+            dayTzInfo = get_day_tzinfo(timeZone, utcDateTime.date())
+            if dayTzInfo is not None:
+                return (utcDateTime + dayTzInfo[1]).replace(tzinfo=dayTzInfo[0])
+
+    if offset is None:
         ret = timeZone.localize(dateTime)
     else:
         ret = dateTime.astimezone(timeZone)
@@ -49,20 +102,27 @@ def localize(dateTime, timeZone):
 
 
 def as_utc(dateTime):
-    return localize(dateTime, pytz.utc)
+    offset = dateTime.utcoffset()
+    if offset is not None:
+        dateTime = dateTime.replace(tzinfo=None) - offset
+    return dateTime.replace(tzinfo=pytz.utc)
 
 
 def datetime_to_timestamp(dateTime):
-    """ Converts a datetime.datetime to a UTC timestamp."""
-    diff = as_utc(dateTime) - epoch_utc
-    return diff.total_seconds()
+    """ Converts a datetime.datetime to a UTC timestamp. Naive datetimes are treated as UTC."""
+    offset = dateTime.utcoffset()
+    if offset is not None:
+        dateTime = dateTime.replace(tzinfo=None) - offset
+    diff = dateTime - epoch_naive
+    # Same as diff.total_seconds(), without building aware datetimes.
+    return ((diff.days * 86400 + diff.seconds) * 10**6 + diff.microseconds) / 10.0**6
 
 
 def timestamp_to_datetime(timeStamp, localized=True):
     """ Converts a UTC timestamp to a datetime.datetime."""
     ret = datetime.datetime.utcfromtimestamp(timeStamp)
     if localized:
-        ret = localize(ret, pytz.utc)
+        ret = ret.replace(tzinfo=pytz.utc)
     return ret
 
 
@@ -82,4 +142,5 @@ def get_last_monday(year):
     return ret
 
 
-epoch_utc = as_utc(datetime.datetime(1970, 1, 1))
+epoch_naive = datetime.datetime(1970, 1, 1)
+epoch_utc = as_utc(epoch_naive)
@@ -24,6 +24,7 @@ import threading
 import Queue
 
 from pyalgotrade import bar
+from pyalgotrade import dispatcher
 from pyalgotrade import barfeed
 from pyalgotrade import dataseries
 from pyalgotrade import resamplebase
@@ -182,14 +183,12 @@ class LiveFeed(barfeed.BaseBarFeed):
          * **XNYS**: NEW YORK STOCK EXCHANGE, INC
     """
 
-    QUEUE_TIMEOUT = 0.01
-
     def __init__(self, apiToken, identifiers, frequency, apiCallDelay=30, maxLen=dataseries.DEFAULT_MAX_LEN):
         barfeed.BaseBarFeed.__init__(self, frequency, maxLen)
         if not isinstance(identifiers, list):
             raise Exception("identifiers must be a list")
 
-        self.__queue = Queue.Queue()
+        self.__queue = dispatcher.EventQueue()
         self.__thread = GetBarThread(self.__queue, apiToken, identifiers, frequency, datetime.timedelta(seconds=apiCallDelay))
         for instrument in identifiers:
             self.registerInstrument(instrument)
@@ -217,6 +216,13 @@ class LiveFeed(barfeed.BaseBarFeed):
     def peekDateTime(self):
         return None
 
+    def setWaker(self, waker):
+        self.__queue.setWaker(waker)
+
+    def getPollInterval(self):
+        # Events are put in a dispatcher.EventQueue.
+        return None
+
     ######################################################################
     # barfeed.BaseBarFeed interface
 
@@ -229,7 +235,7 @@ class LiveFeed(barfeed.BaseBarFeed):
     def getNextBars(self):
         ret = None
         try:
-            eventType, eventData = self.__queue.get(True, LiveFeed.QUEUE_TIMEOUT)
+            eventType, eventData = self.__queue.get(False)
             if eventType == GetBarThread.ON_BARS:
                 ret = eventData
             else:
@@ -52,6 +52,9 @@ setup(
         'pyalgotrade.ripple',
         'pyalgotrade.oanda',
     ],
+    package_data={
+        'pyalgotrade': ['data/*.csv'],
+    },
     install_requires=[
         'numpy',
         'pytz',
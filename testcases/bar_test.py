@@ -83,6 +83,38 @@ class BasicBarTestCase(common.TestCase):
             b.getClose(True)
 
 
+class BuildBarsTestCase(common.TestCase):
+    def testSameAsBasicBar(self):
+        dateTimes = [datetime.datetime(2011, 1, 3), datetime.datetime(2011, 1, 4)]
+        values = [(2, 3, 1, 2.1, 10, 5), (3, 4, 2, 2.5, 20, 6)]
+        opens, highs, lows, closes, volumes, adjCloses = zip(*values)
+        bars = bar.build_bars(dateTimes, opens, highs, lows, closes, volumes, adjCloses, bar.Frequency.DAY)
+        self.assertEqual(len(bars), 2)
+        for dateTime, value, b1 in zip(dateTimes, values, bars):
+            b2 = bar.BasicBar(dateTime, *(value + (bar.Frequency.DAY,)))
+            self.assertTrue(isinstance(b1, bar.BasicBar))
+            self.assertEqual(b1.__getstate__(), b2.__getstate__())
+            self.assertEqual(b1.getOpen(True), b2.getOpen(True))
+            self.assertEqual(b1.getTypicalPrice(), b2.getTypicalPrice())
+            self.assertEqual(b1.getPrice(), b2.getPrice())
+            b1.setUseAdjustedValue(True)
+            self.assertEqual(b1.getPrice(), b2.getAdjClose())
+            self.assertEqual(cPickle.loads(cPickle.dumps(b1)).__getstate__(), b1.__getstate__())
+
+    def testNoAdjCloses(self):
+        bars = bar.build_bars([datetime.datetime.now()], [2], [3], [1], [2.1], [10], None, bar.Frequency.DAY)
+        self.assertEqual(bars[0].getAdjClose(), None)
+        self.assertFalse(bars[0].getUseAdjValue())
+        with self.assertRaises(Exception):
+            bars[0].setUseAdjustedValue(True)
+        self.assertEqual(bar.build_bars([], [], [], [], [], [], None, bar.Frequency.DAY), [])
+
+    def testNoChecks(self):
+        # Values are expected to be checked in bulk before.
+        bars = bar.build_bars([datetime.datetime.now()], [2], [1], [1], [1], [1], [1], bar.Frequency.DAY)
+        self.assertEqual(bars[0].getHigh(), 1)
+
+
 class BarsTestCase(common.TestCase):
     def testEmptyDict(self):
         with self.assertRaises(Exception):
@@ -0,0 +1,177 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import os
+import shutil
+import stat
+
+import common
+
+from pyalgotrade.barfeed import barcache
+from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade.barfeed import ninjatraderfeed
+from pyalgotrade import bar
+from pyalgotrade import utils
+from pyalgotrade import marketsession
+
+
+def load_bars(barFeed, instrument):
+    ret = []
+    for dateTime, bars in barFeed:
+        ret.append(bars[instrument])
+    return ret
+
+
+class CountingRowParser(yahoofeed.RowParser):
+    def __init__(self, *args, **kwargs):
+        yahoofeed.RowParser.__init__(self, *args, **kwargs)
+        self.parsed = 0
+
+    def parseBar(self, csvRowDict):
+        self.parsed += 1
+        return yahoofeed.RowParser.parseBar(self, csvRowDict)
+
+
+class CountingFeed(yahoofeed.Feed):
+    def __init__(self, timezone=None):
+        yahoofeed.Feed.__init__(self, timezone=timezone)
+        self.parsed = 0
+
+    def addBarsFromCSV(self, instrument, path, timezone=None):
+        rowParser = CountingRowParser(self.getDailyBarTime(), self.getFrequency(), timezone)
+        csvfeed.BarFeed.addBarsFromCSV(self, instrument, path, rowParser)
+        self.parsed += rowParser.parsed
+
+
+class BarCacheTestCase(common.TestCase):
+    def assertBarsEqual(self, bars1, bars2):
+        self.assertEqual(len(bars1), len(bars2))
+        for bar1, bar2 in zip(bars1, bars2):
+            self.assertEqual(bar1.getDateTime(), bar2.getDateTime())
+            self.assertEqual(bar1.getDateTime().tzinfo, bar2.getDateTime().tzinfo)
+            self.assertEqual(bar1.getOpen(), bar2.getOpen())
+            self.assertEqual(bar1.getHigh(), bar2.getHigh())
+            self.assertEqual(bar1.getLow(), bar2.getLow())
+            self.assertEqual(bar1.getClose(), bar2.getClose())
+            self.assertEqual(bar1.getVolume(), bar2.getVolume())
+            self.assertEqual(bar1.getAdjClose(), bar2.getAdjClose())
+            self.assertEqual(bar1.getFrequency(), bar2.getFrequency())
+
+    def testYahoo(self):
+        path = common.get_data_file_path("orcl-2000-yahoofinance.csv")
+        with common.TmpDir() as tmpPath:
+            barFeed = CountingFeed()
+            barFeed.setCacheDir(tmpPath)
+            barFeed.addBarsFromCSV("orcl", path)
+            self.assertEqual(barFeed.parsed, 252)
+            bars1 = load_bars(barFeed, "orcl")
+
+            barFeed = CountingFeed()
+            barFeed.setCacheDir(tmpPath)
+            barFeed.addBarsFromCSV("orcl", path)
+            self.assertEqual(barFeed.parsed, 0)
+            bars2 = load_bars(barFeed, "orcl")
+
+            self.assertEqual(len(bars1), 252)
+            self.assertBarsEqual(bars1, bars2)
+            # Cache files get the same mode as files created with open().
+            for fileName in os.listdir(tmpPath):
+                self.assertEqual(stat.S_IMODE(os.stat(os.path.join(tmpPath, fileName)).st_mode), 0666 & ~utils.umask)
+
+    def testLocalizedAndFiltered(self):
+        path = common.get_data_file_path("nt-spy-minute-2011-03.csv")
+        with common.TmpDir() as tmpPath:
+            loaded = []
+            for i in range(2):
+                barFeed = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE, marketsession.USEquities.getTimezone())
+                barFeed.setCacheDir(tmpPath)
+                barFeed.setBarFilter(csvfeed.USEquitiesRTH())
+                barFeed.addBarsFromCSV("spy", path)
+                loaded.append(load_bars(barFeed, "spy"))
+
+            barFeed = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE, marketsession.USEquities.getTimezone())
+            barFeed.setBarFilter(csvfeed.USEquitiesRTH())
+            barFeed.addBarsFromCSV("spy", path)
+            expected = load_bars(barFeed, "spy")
+
+            self.assertBarsEqual(loaded[0], expected)
+            self.assertBarsEqual(loaded[1], expected)
+
+    def testInvalidation(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "orcl.csv")
+            cacheDir = os.path.join(tmpPath, "cache")
+            shutil.copy(common.get_data_file_path("orcl-2000-yahoofinance.csv"), path)
+
+            barFeed = CountingFeed()
+            barFeed.setCacheDir(cacheDir)
+            barFeed.addBarsFromCSV("orcl", path)
+            self.assertEqual(barFeed.parsed, 252)
+
+            # Drop the last bar and make sure the file gets parsed again.
+            lines = open(path).readlines()
+            with open(path, "w") as f:
+                f.writelines(lines[:-1])
+            barFeed = CountingFeed()
+            barFeed.setCacheDir(cacheDir)
+            barFeed.addBarsFromCSV("orcl", path)
+            self.assertEqual(barFeed.parsed, 251)
+            self.assertEqual(len(load_bars(barFeed, "orcl")), 251)
+
+            # Different parser settings should not hit the cache either.
+            barFeed = CountingFeed()
+            barFeed.setCacheDir(cacheDir)
+            barFeed.addBarsFromCSV("orcl", path, marketsession.USEquities.getTimezone())
+            self.assertEqual(barFeed.parsed, 251)
+
+    def testGenericAdjClose(self):
+        with common.TmpDir() as tmpPath:
+            for i in range(2):
+                barFeed = csvfeed.GenericBarFeed(bar.Frequency.DAY)
+                barFeed.setCacheDir(tmpPath)
+                barFeed.setDateTimeFormat("%Y-%m-%d")
+                barFeed.setColumnName("datetime", "Date")
+                barFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+                self.assertTrue(barFeed.barsHaveAdjClose())
+                bars = load_bars(barFeed, "orcl")
+                self.assertEqual(bars[0].getDateTime(), datetime.datetime(2000, 1, 3))
+                self.assertEqual(bars[0].getAdjClose(), 28.87)
+
+    def testUnpackChecksValues(self):
+        bars = [bar.BasicBar(datetime.datetime(2011, 1, 3), 10, 11, 9, 10, 100, None, bar.Frequency.DAY)]
+        values, frequency, timezone = barcache.pack_bars(bars)
+        self.assertBarsEqual(barcache.unpack_bars(values, frequency, timezone), bars)
+        values["high"][0] = 8
+        with self.assertRaisesRegexp(Exception, "high < low"):
+            barcache.unpack_bars(values, frequency, timezone)
+
+    def testDefaultCacheDir(self):
+        with common.TmpDir() as tmpPath:
+            prevCacheDir = barcache.cache_dir
+            barcache.cache_dir = tmpPath
+            try:
+                barFeed = CountingFeed()
+                self.assertEqual(barFeed.getCacheDir(), tmpPath)
+                barFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+                self.assertTrue(len(os.listdir(tmpPath)) > 0)
+            finally:
+                barcache.cache_dir = prevCacheDir
@@ -24,6 +24,7 @@ import common
 
 from pyalgotrade import barfeed
 from pyalgotrade.barfeed import common as bfcommon
+from pyalgotrade.barfeed import membf
 from pyalgotrade import bar
 from pyalgotrade import dispatcher
 
@@ -81,6 +82,63 @@ class OptimizerBarFeedTestCase(common.TestCase):
         self.assertEquals(barFeed.barsHaveAdjClose(), False)
 
 
+class MemBarFeed(membf.BarFeed):
+    def barsHaveAdjClose(self):
+        return False
+
+
+class MemBarFeedTestCase(common.TestCase):
+    def __buildBar(self, dateTime):
+        return bar.BasicBar(dateTime, 1, 1, 1, 1, 1, None, bar.Frequency.DAY)
+
+    def testSparseInstruments(self):
+        barFeed = MemBarFeed(bar.Frequency.DAY)
+        begin = datetime.datetime(2001, 1, 1)
+        expected = {}
+        for i in xrange(10):
+            instrument = "inst%d" % i
+            # Every instrument has a bar every i + 1 days, and bars are added in reverse order.
+            dateTimes = [begin + datetime.timedelta(days=j) for j in xrange(0, 30, i + 1)]
+            barFeed.addBarsFromSequence(instrument, [self.__buildBar(dateTime) for dateTime in reversed(dateTimes)])
+            for dateTime in dateTimes:
+                expected.setdefault(dateTime, []).append(instrument)
+
+        self.assertEquals(barFeed.peekDateTime(), begin)
+        values = []
+        for dateTime, bars in barFeed:
+            self.assertEquals(barFeed.getCurrentDateTime(), dateTime)
+            for instrument in bars.getInstruments():
+                self.assertEquals(bars[instrument].getDateTime(), dateTime)
+            values.append((dateTime, sorted(bars.getInstruments())))
+        self.assertEquals(values, [(dateTime, sorted(expected[dateTime])) for dateTime in sorted(expected.keys())])
+        self.assertTrue(barFeed.eof())
+        self.assertEquals(barFeed.peekDateTime(), None)
+        self.assertEquals(barFeed.getNextBars(), None)
+        for i in xrange(10):
+            self.assertEquals(len(barFeed["inst%d" % i]), len(xrange(0, 30, i + 1)))
+
+    def testReset(self):
+        barFeed = MemBarFeed(bar.Frequency.DAY)
+        dateTimes = [datetime.datetime(2001, 1, 1), datetime.datetime(2001, 1, 2)]
+        barFeed.addBarsFromSequence("orcl", [self.__buildBar(dateTime) for dateTime in dateTimes])
+        barFeed.loadAll()
+        self.assertTrue(barFeed.eof())
+        barFeed.reset()
+        self.assertFalse(barFeed.eof())
+        self.assertEquals(barFeed.peekDateTime(), dateTimes[0])
+        barFeed.loadAll()
+        self.assertEquals(barFeed["orcl"].getDateTimes(), dateTimes)
+
+    def testDuplicateBars(self):
+        barFeed = MemBarFeed(bar.Frequency.DAY)
+        dateTime = datetime.datetime(2001, 1, 1)
+        barFeed.addBarsFromSequence("orcl", [self.__buildBar(dateTime)])
+        barFeed.addBarsFromSequence("ibm", [self.__buildBar(dateTime)])
+        barFeed.addBarsFromSequence("orcl", [self.__buildBar(dateTime)])
+        with self.assertRaisesRegexp(Exception, "Duplicate bars found for.*"):
+            barFeed.loadAll()
+
+
 class CommonTestCase(common.TestCase):
     def testSanitize(self):
         self.assertEqual(bfcommon.sanitize_ohlc(10, 12, 9, 10), (10, 12, 9, 10))
@@ -21,7 +21,6 @@
 import datetime
 import time
 import threading
-import Queue
 import json
 
 import common as tc_common
@@ -40,7 +39,7 @@ from pyalgotrade import dispatcher
 class WebSocketClientThreadMock(threading.Thread):
     def __init__(self, events):
         threading.Thread.__init__(self)
-        self.__queue = Queue.Queue()
+        self.__queue = dispatcher.EventQueue()
         self.__queue.put((wsclient.WebSocketClient.ON_CONNECTED, None))
         for event in events:
             self.__queue.put(event)
@@ -20,12 +20,15 @@
 
 import datetime
 
+import pytz
+
 import common
 
 from pyalgotrade import broker
 from pyalgotrade.broker import backtesting
 from pyalgotrade import bar
 from pyalgotrade import barfeed
+from pyalgotrade import sessioncalendar
 
 
 class OrderUpdateCallback:
@@ -1180,6 +1183,25 @@ class MarketOrderTestCase(BaseTestCase):
         with self.assertRaisesRegexp(Exception, "Market-on-close not supported with intraday feeds"):
             brk.createMarketOrder(broker.Order.Action.BUY, BaseTestCase.TestInstrument, 1, onClose=True)
 
+    def testIntradayMarketOnCloseWithCalendar(self):
+        barFeed = self.buildBarFeed(BaseTestCase.TestInstrument, bar.Frequency.MINUTE)
+        cash = 1000000
+        brk = backtesting.Broker(cash, barFeed)
+        # Sessions from 00:00 to 00:03 UTC, every day.
+        brk.setSessionCalendar(sessioncalendar.SessionCalendar(pytz.utc, datetime.time(0, 0), datetime.time(0, 3), weekdays=range(7)))
+
+        order = brk.createMarketOrder(broker.Order.Action.BUY, BaseTestCase.TestInstrument, 2, onClose=True)
+        brk.placeOrder(order)
+
+        # Only the last bar of the session fills the order, at the closing price.
+        barFeed.dispatchBars(12, 15, 8, 14)
+        barFeed.dispatchBars(12, 15, 8, 13)
+        self.assertTrue(order.isAccepted())
+        barFeed.dispatchBars(12, 15, 8, 11)
+        self.assertTrue(order.isFilled())
+        self.assertEqual(order.getAvgFillPrice(), 11)
+        self.assertEqual(order.getExecutionInfo().getDateTime(), datetime.datetime(2011, 1, 1, 0, 2))
+
 
 class LimitOrderTestCase(BaseTestCase):
     def testBuySellPartial(self):
@@ -24,6 +24,39 @@ import common
 
 from pyalgotrade.bitcoincharts import barfeed
 from pyalgotrade.utils import dt
+from pyalgotrade import bar
+
+
+def load_trades(fromDateTime=None, toDateTime=None):
+    feed = barfeed.CSVTradeFeed()
+    feed.addBarsFromCSV(common.get_data_file_path("bitstampUSD.csv"), fromDateTime=fromDateTime, toDateTime=toDateTime)
+    return [bars["BTC"] for dateTime, bars in feed]
+
+
+# Groups trades by hour without using resamplebase.
+def group_by_hour(trades):
+    ret = []
+    for trade in trades:
+        hour = trade.getDateTime().replace(minute=0, second=0, microsecond=0)
+        price = trade.getPrice()
+        if len(ret) and ret[-1][0] == hour:
+            dateTime, open_, high, low, close, volume = ret[-1]
+            ret[-1] = (hour, open_, max(high, price), min(low, price), price, volume + trade.getVolume())
+        else:
+            ret.append((hour, price, price, price, price, trade.getVolume()))
+    return ret
+
+
+def load_hourly_bars(fromDateTime=None, toDateTime=None):
+    feed = barfeed.CSVTradeFeed(frequency=bar.Frequency.HOUR)
+    feed.addBarsFromCSV(common.get_data_file_path("bitstampUSD.csv"), fromDateTime=fromDateTime, toDateTime=toDateTime)
+    ret = []
+    for dateTime, bars in feed:
+        bar_ = bars["BTC"]
+        assert bar_.getFrequency() == bar.Frequency.HOUR
+        assert dateTime == bar_.getDateTime()
+        ret.append((dateTime, bar_.getOpen(), bar_.getHigh(), bar_.getLow(), bar_.getClose(), bar_.getVolume()))
+    return ret
 
 
 class TestCase(common.TestCase):
@@ -81,3 +114,43 @@ class TestCase(common.TestCase):
         self.assertEquals(loaded[-1][1]["bitstampUSD"].getDateTime(), dt.as_utc(datetime.datetime(2012, 5, 30, 23, 49, 21)))
         self.assertEquals(loaded[-1][1]["bitstampUSD"].getClose(), 5.14)
         self.assertEquals(loaded[-1][1]["bitstampUSD"].getVolume(), 20)
+
+    def testAggregateTrades(self):
+        expected = group_by_hour(load_trades())
+        self.assertEqual(len(expected), 1600)
+        loaded = load_hourly_bars()
+        self.assertEqual(len(loaded), len(expected))
+        for groupedBar, expectedBar in zip(loaded, expected):
+            self.assertEqual(groupedBar[:5], expectedBar[:5])
+            self.assertEqual(round(groupedBar[5], 8), round(expectedBar[5], 8))
+        self.assertEqual(loaded[0][0], dt.as_utc(datetime.datetime(2011, 9, 13, 13)))
+        self.assertEqual(loaded[-1][0], dt.as_utc(datetime.datetime(2012, 5, 31, 8)))
+
+    def testAggregateTradesInRange(self):
+        fromDateTime = dt.as_utc(datetime.datetime(2012, 5, 29, 1, 30))
+        toDateTime = dt.as_utc(datetime.datetime(2012, 5, 30, 23, 49, 21))
+        expected = group_by_hour(load_trades(fromDateTime, toDateTime))
+        loaded = load_hourly_bars(fromDateTime, toDateTime)
+        self.assertEqual([values[:5] for values in loaded], [values[:5] for values in expected])
+        # The first bar begins before fromDateTime, but only has the trades after it.
+        self.assertEqual(loaded[0][0], dt.as_utc(datetime.datetime(2012, 5, 29, 1)))
+        self.assertEqual(loaded[0][1], 5.07)
+
+    def testAggregateTradesManyFiles(self):
+        path = common.get_data_file_path("bitstampUSD.csv")
+        feed = barfeed.CSVTradeFeed(frequency=bar.Frequency.HOUR)
+        feed.addBarsFromCSV(path, toDateTime=dt.as_utc(datetime.datetime(2012, 5, 29, 1, 59, 59)))
+        feed.addBarsFromCSV(path, fromDateTime=dt.as_utc(datetime.datetime(2012, 5, 29, 2)))
+        self.assertEqual(len([dateTime for dateTime, bars in feed]), len(load_hourly_bars()))
+
+        # Both parts have trades between 1:00 and 2:00.
+        feed = barfeed.CSVTradeFeed(frequency=bar.Frequency.HOUR)
+        feed.addBarsFromCSV(path, toDateTime=dt.as_utc(datetime.datetime(2012, 5, 29, 1, 50)))
+        with self.assertRaisesRegexp(Exception, "overlap the ones already loaded for BTC"):
+            feed.addBarsFromCSV(path, fromDateTime=dt.as_utc(datetime.datetime(2012, 5, 29, 1, 50)))
+        # Other instruments are not affected.
+        feed.addBarsFromCSV(path, "other", fromDateTime=dt.as_utc(datetime.datetime(2012, 5, 29, 1, 50)))
+
+    def testAggregateTradesInvalidFrequency(self):
+        with self.assertRaisesRegexp(Exception, "Unsupported frequency"):
+            barfeed.CSVTradeFeed(frequency=bar.Frequency.WEEK)
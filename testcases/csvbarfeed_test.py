@@ -0,0 +1,217 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import os
+
+import numpy as np
+
+import common
+
+from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade.utils import csvutils
+from pyalgotrade.utils import dt
+from pyalgotrade import bar
+from pyalgotrade import marketsession
+
+
+COLUMN_NAMES = {
+    "datetime": "Date Time",
+    "open": "Open",
+    "high": "High",
+    "low": "Low",
+    "close": "Close",
+    "volume": "Volume",
+    "adj_close": "Adj Close",
+}
+
+
+def build_row_parser(columnNames=COLUMN_NAMES, dateTimeFormat="%Y-%m-%d %H:%M:%S", dailyBarTime=None, timezone=None):
+    return csvfeed.GenericRowParser(columnNames, dateTimeFormat, dailyBarTime, bar.Frequency.DAY, timezone)
+
+
+def parse_rows(rowParser, path):
+    reader = csvutils.FastDictReader(open(path, "r"), fieldnames=rowParser.getFieldNames(), delimiter=rowParser.getDelimiter())
+    return [rowParser.parseBar(row) for row in reader]
+
+
+def parse_datetimes(values, dateTimeFormat):
+    layout = csvutils.get_fixed_datetime_layout(dateTimeFormat)
+    chars = np.array(values).view(np.uint8).reshape(len(values), layout[0])
+    return csvutils.parse_fixed_datetimes(chars, layout)
+
+
+def assert_bars_equal(testCase, bars1, bars2):
+    testCase.assertEqual(len(bars1), len(bars2))
+    for bar1, bar2 in zip(bars1, bars2):
+        testCase.assertEqual(bar1.getDateTime(), bar2.getDateTime())
+        testCase.assertEqual(bar1.getDateTime().tzinfo, bar2.getDateTime().tzinfo)
+        testCase.assertEqual(bar1.getOpen(), bar2.getOpen())
+        testCase.assertEqual(bar1.getHigh(), bar2.getHigh())
+        testCase.assertEqual(bar1.getLow(), bar2.getLow())
+        testCase.assertEqual(bar1.getClose(), bar2.getClose())
+        testCase.assertEqual(bar1.getVolume(), bar2.getVolume())
+        testCase.assertEqual(bar1.getAdjClose(), bar2.getAdjClose())
+
+
+class BulkParserTestCase(common.TestCase):
+    def __writeFile(self, tmpPath, lines):
+        ret = os.path.join(tmpPath, "bars.csv")
+        with open(ret, "w") as f:
+            f.write("\n".join(lines))
+        return ret
+
+    def testDateTimeLayout(self):
+        self.assertEqual(csvutils.get_fixed_datetime_layout("%Y-%m-%d")[0], 10)
+        self.assertEqual(csvutils.get_fixed_datetime_layout("%Y%m%d %H%M%S")[0], 15)
+        self.assertEqual(csvutils.get_fixed_datetime_layout("%Y-%m-%dT%H:%M:%S.%fZ"), None)
+        self.assertEqual(csvutils.get_fixed_datetime_layout("%d/%b/%Y"), None)
+        self.assertEqual(csvutils.get_fixed_datetime_layout("%m-%d"), None)
+
+    def testParseDateTimes(self):
+        values = ["2000-01-03 09:30:00", "2012-02-29 23:59:59"]
+        dateTimes = parse_datetimes(values, "%Y-%m-%d %H:%M:%S").astype(object).tolist()
+        self.assertEqual(dateTimes, [datetime.datetime.strptime(value, "%Y-%m-%d %H:%M:%S") for value in values])
+
+        self.assertEqual(parse_datetimes(["2011-02-29"], "%Y-%m-%d"), None)
+        self.assertEqual(parse_datetimes(["2011-13-01"], "%Y-%m-%d"), None)
+        self.assertEqual(parse_datetimes(["2011-12-00"], "%Y-%m-%d"), None)
+        self.assertEqual(parse_datetimes(["2011/12/01"], "%Y-%m-%d"), None)
+        self.assertEqual(parse_datetimes(["2011-1a-01"], "%Y-%m-%d"), None)
+        self.assertEqual(parse_datetimes(["2011-12-01 24:00:00"], "%Y-%m-%d %H:%M:%S"), None)
+
+    def testYahooFile(self):
+        columnNames = dict(COLUMN_NAMES)
+        columnNames["datetime"] = "Date"
+        path = common.get_data_file_path("orcl-2000-yahoofinance.csv")
+        timezone = marketsession.USEquities.getTimezone()
+        rowParser = build_row_parser(columnNames, "%Y-%m-%d", datetime.time(16), timezone)
+        bars = rowParser.parseBars(path)
+        self.assertEqual(len(bars), 252)
+        self.assertTrue(rowParser.barsHaveAdjClose())
+        self.assertEqual(bars[-1].getDateTime(), dt.localize(datetime.datetime(2000, 1, 3, 16), timezone))
+        assert_bars_equal(self, bars, parse_rows(build_row_parser(columnNames, "%Y-%m-%d", datetime.time(16), timezone), path))
+
+    def testNoAdjClose(self):
+        with common.TmpDir() as tmpPath:
+            path = self.__writeFile(tmpPath, [
+                "Date Time,Open,High,Low,Close,Volume",
+                "2013-01-01 13:59:00,13.51001,13.56,13.51,13.56,273.88014126",
+                "2013-01-01 14:00:00,13.56,13.6,13.5,13.55,10\r",
+                "",
+            ])
+            rowParser = build_row_parser()
+            bars = rowParser.parseBars(path)
+            self.assertFalse(rowParser.barsHaveAdjClose())
+            assert_bars_equal(self, bars, parse_rows(build_row_parser(), path))
+
+    def testFallback(self):
+        with common.TmpDir() as tmpPath:
+            # Missing values.
+            path = self.__writeFile(tmpPath, [
+                "Date Time,Open,High,Low,Close,Volume,Adj Close",
+                "2013-01-01 13:59:00,13.51001,13.56,13.51,13.56,273.88014126,",
+            ])
+            self.assertEqual(build_row_parser().parseColumns(path), None)
+            feed = csvfeed.GenericBarFeed(bar.Frequency.MINUTE)
+            feed.addBarsFromCSV("orcl", path)
+            feed.loadAll()
+            self.assertEqual(feed["orcl"][0].getAdjClose(), None)
+
+            # Empty lines.
+            path = self.__writeFile(tmpPath, [
+                "Date Time,Open,High,Low,Close,Volume,Adj Close",
+                "2013-01-01 13:59:00,13.51001,13.56,13.51,13.56,273.88014126,13.51",
+                "",
+                "2013-01-01 14:00:00,13.51001,13.56,13.51,13.56,273.88014126,13.51",
+            ])
+            self.assertEqual(build_row_parser().parseColumns(path), None)
+            self.assertEqual(len(parse_rows(build_row_parser(), path)), 2)
+
+            # Datetime not in the first column.
+            path = self.__writeFile(tmpPath, [
+                "Open,High,Low,Close,Volume,Adj Close,Date Time",
+                "13.51001,13.56,13.51,13.56,273.88014126,13.51,2013-01-01 13:59:00",
+            ])
+            self.assertEqual(build_row_parser().parseColumns(path), None)
+
+            # Datetime with a different format.
+            path = self.__writeFile(tmpPath, [
+                "Date Time,Open,High,Low,Close,Volume,Adj Close",
+                "2013-01-01 13:59,13.51001,13.56,13.51,13.56,273.88014126,13.51",
+            ])
+            self.assertEqual(build_row_parser().parseColumns(path), None)
+
+    def testInvalidOHLC(self):
+        with common.TmpDir() as tmpPath:
+            path = self.__writeFile(tmpPath, [
+                "Date Time,Open,High,Low,Close,Volume,Adj Close",
+                "2013-01-01 13:59:00,13.51,13.56,13.51,13.56,273.88014126,13.51",
+                "2013-01-01 14:00:00,13.51,13.56,13.51,13.57,273.88014126,13.51",
+            ])
+            rowParser = build_row_parser()
+            self.assertEqual(len(rowParser.parseColumns(path)["datetime"]), 2)
+            with self.assertRaisesRegexp(Exception, "high < close on 2013-01-01 14:00:00"):
+                rowParser.parseBars(path)
+
+
+class ParallelLoadingTestCase(common.TestCase):
+    FILES = [
+        ("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv")),
+        ("orcl", common.get_data_file_path("orcl-2001-yahoofinance.csv")),
+        ("spy", common.get_data_file_path("spy-2010-yahoofinance.csv")),
+        ("spy", common.get_data_file_path("spy-2011-yahoofinance.csv")),
+    ]
+
+    def __loadFeed(self, files, processes, skipErrors=False):
+        ret = yahoofeed.Feed()
+        ret.addBarsFromCSVFiles(files, timezone=marketsession.USEquities.getTimezone(), processes=processes, skipErrors=skipErrors)
+        ret.loadAll()
+        return ret
+
+    def testParallel(self):
+        serialFeed = self.__loadFeed(ParallelLoadingTestCase.FILES, 1)
+        parallelFeed = self.__loadFeed(ParallelLoadingTestCase.FILES, 2)
+        self.assertEqual(len(serialFeed["orcl"]), 500)
+        self.assertEqual(len(serialFeed["spy"]), 504)
+        for instrument in ["orcl", "spy"]:
+            assert_bars_equal(self, serialFeed[instrument], parallelFeed[instrument])
+        self.assertEqual(parallelFeed["orcl"][0].getDateTime().tzinfo.zone, "US/Eastern")
+
+    def testErrors(self):
+        files = ParallelLoadingTestCase.FILES + [("ibm", "inexistent-file.csv")]
+        for processes in [1, 2]:
+            with self.assertRaisesRegexp(Exception, "Failed to load 1 file\\(s\\):\\ninexistent-file.csv"):
+                self.__loadFeed(files, processes)
+
+            barFeed = self.__loadFeed(files, processes, skipErrors=True)
+            self.assertEqual(len(barFeed["orcl"]), 500)
+            self.assertEqual(len(barFeed["spy"]), 504)
+            self.assertNotIn("ibm", barFeed.getRegisteredInstruments())
+
+    def testGenericBarFeed(self):
+        barFeed = csvfeed.GenericBarFeed(bar.Frequency.DAY)
+        barFeed.setDateTimeFormat("%Y-%m-%d")
+        barFeed.setColumnName("datetime", "Date")
+        barFeed.addBarsFromCSVFiles(ParallelLoadingTestCase.FILES[:2], processes=2)
+        self.assertTrue(barFeed.barsHaveAdjClose())
+        barFeed.loadAll()
+        self.assertEqual(len(barFeed["orcl"]), 500)
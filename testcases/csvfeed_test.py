@@ -28,6 +28,7 @@ from pyalgotrade.feed import csvfeed
 from pyalgotrade import dispatcher
 from pyalgotrade import marketsession
 from pyalgotrade.utils import dt
+from pyalgotrade.utils import csvutils
 
 
 class TestCase(common.TestCase):
@@ -112,3 +113,112 @@ class TestCase(common.TestCase):
         self.assertEqual(len(values), len(reloadedValues))
         for i in range(len(values)):
             self.assertEqual(values[i], reloadedValues[i])
+
+    def __writeFile(self, tmpPath, lines):
+        ret = os.path.join(tmpPath, "values.csv")
+        with open(ret, "w") as f:
+            f.write("\n".join(lines))
+        return ret
+
+    def testColumnsSameAsRows(self):
+        for path, dateTimeFormat, timezone in [
+            (common.get_data_file_path("orcl-2000-yahoofinance.csv"), "%Y-%m-%d", None),
+            (os.path.join("samples", "data", "quandl_gold_2.csv"), "%Y-%m-%d", marketsession.USEquities.timezone),
+        ]:
+            rowParser = csvfeed.BasicRowParser("Date", dateTimeFormat, csvfeed.float_or_string, timezone=timezone)
+            rowParser.setTimeDelta(datetime.timedelta(hours=23, minutes=59, seconds=59))
+            reader = csvutils.FastDictReader(open(path, "r"), fieldnames=rowParser.getFieldNames(), delimiter=rowParser.getDelimiter())
+            rows = [rowParser.parseRow(row) for row in reader]
+
+            dateTimes, columns = rowParser.parseColumns(path)
+            self.assertEqual(dateTimes, [dateTime for dateTime, values in rows])
+            for key, column in columns.iteritems():
+                self.assertEqual(column, [values[key] for dateTime, values in rows])
+
+    def testColumnTypes(self):
+        with common.TmpDir() as tmpPath:
+            path = self.__writeFile(tmpPath, [
+                "Date;Name;Price;Count;Code",
+                "2013-01-02 10:30;ibm;12.5;3;001",
+                "",
+                "2013-01-01 10:30;orcl;-;4;002",
+            ])
+            feed = csvfeed.Feed("Date", "%Y-%m-%d %H:%M", delimiter=";", columnTypes={"Count": int, "Code": str})
+            feed.addValuesFromCSV(path)
+            loaded = [(dateTime, values) for dateTime, values in feed]
+            self.assertEqual(loaded, [
+                (datetime.datetime(2013, 1, 1, 10, 30), {"Name": "orcl", "Price": "-", "Count": 4, "Code": "002"}),
+                (datetime.datetime(2013, 1, 2, 10, 30), {"Name": "ibm", "Price": 12.5, "Count": 3, "Code": "001"}),
+            ])
+
+    def testParseRowOverride(self):
+        class RowParser(csvfeed.BasicRowParser):
+            def parseRow(self, csvRowDict):
+                dateTime, values = csvfeed.BasicRowParser.parseRow(self, csvRowDict)
+                if values["Name"] == "skip":
+                    dateTime = None
+                values["Extra"] = 1
+                return dateTime, values
+
+        with common.TmpDir() as tmpPath:
+            path = self.__writeFile(tmpPath, [
+                "Date,Name,Price",
+                "2013-01-01,ibm,12.5",
+                "2013-01-02,skip,1",
+                "2013-01-03,orcl,13",
+            ])
+            rowParser = RowParser("Date", "%Y-%m-%d", csvfeed.float_or_string)
+            self.assertEqual(rowParser.parseColumns(path), None)
+            feed = csvfeed.BaseFeed(rowParser)
+            feed.addValuesFromCSV(path)
+            loaded = [(dateTime, values) for dateTime, values in feed]
+            self.assertEqual(loaded, [
+                (datetime.datetime(2013, 1, 1), {"Name": "ibm", "Price": 12.5, "Extra": 1}),
+                (datetime.datetime(2013, 1, 3), {"Name": "orcl", "Price": 13, "Extra": 1}),
+            ])
+
+    def testNoneDateTimeInBulk(self):
+        class RowParser(csvfeed.BasicRowParser):
+            def parseColumns(self, path):
+                dateTimes, columns = csvfeed.BasicRowParser.parseColumns(self, path)
+                dateTimes[1] = None
+                return dateTimes, columns
+
+        with common.TmpDir() as tmpPath:
+            path = self.__writeFile(tmpPath, [
+                "Date,Price",
+                "2013-01-01,1",
+                "2013-01-02,2",
+                "2013-01-03,3",
+            ])
+            feed = csvfeed.BaseFeed(RowParser("Date", "%Y-%m-%d", csvfeed.float_or_string))
+            feed.addValuesFromCSV(path)
+            self.assertEqual([values["Price"] for dateTime, values in feed], [1, 3])
+
+    def testMalformedRow(self):
+        with common.TmpDir() as tmpPath:
+            path = self.__writeFile(tmpPath, [
+                "Date,Name,Price",
+                "2013-01-01,ibm,12.5",
+                "2013-01-02,orcl",
+            ])
+            feed = csvfeed.Feed("Date", "%Y-%m-%d")
+            with self.assertRaisesRegexp(Exception, "Line 3 in .* has 2 values instead of 3"):
+                feed.addValuesFromCSV(path)
+
+    def testRowFilterInBulk(self):
+        class RowFilter(csvfeed.RowFilter):
+            def includeRow(self, dateTime, values):
+                return values["Close"] > 30
+
+        feed = csvfeed.Feed("Date", "%Y-%m-%d")
+        feed.setRowFilter(RowFilter())
+        feed.addValuesFromCSV(common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        closes = [values["Close"] for dateTime, values in feed]
+        self.assertTrue(len(closes) > 0 and len(closes) < 252)
+        self.assertTrue(min(closes) > 30)
+
+        feed = csvfeed.Feed("Date", "%Y-%m-%d")
+        feed.setDateRange(datetime.datetime(2000, 1, 1), datetime.datetime(2000, 1, 31))
+        feed.addValuesFromCSV(common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        self.assertEqual(len([dateTime for dateTime, values in feed]), 20)
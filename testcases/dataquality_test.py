@@ -0,0 +1,251 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import csv
+import datetime
+import os
+
+import numpy as np
+import pytz
+
+import common
+
+from pyalgotrade.tools import dataquality
+from pyalgotrade.barfeed import barcache
+from pyalgotrade.barfeed import common as barfeedcommon
+from pyalgotrade.barfeed import csvfeed as barfeedcsvfeed
+from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade import marketsession
+from pyalgotrade import bar
+
+
+def to_micros(dateTime):
+    return barcache.datetime_to_micros(dateTime)
+
+
+def build_columns(rows):
+    # rows are (datetime, open, high, low, close, volume) tuples.
+    return {
+        "datetime": np.array([to_micros(row[0]) for row in rows], dtype=np.int64),
+        "open": np.array([row[1] for row in rows], dtype=np.float64),
+        "high": np.array([row[2] for row in rows], dtype=np.float64),
+        "low": np.array([row[3] for row in rows], dtype=np.float64),
+        "close": np.array([row[4] for row in rows], dtype=np.float64),
+        "volume": np.array([row[5] for row in rows], dtype=np.float64),
+        "adj_close": None,
+    }
+
+
+def daily_rows(dates, price=10, volume=100):
+    return [(datetime.datetime.combine(date, datetime.time()), price, price, price, price, volume) for date in dates]
+
+
+def weekdays(begin, end):
+    ret = []
+    while begin <= end:
+        if begin.weekday() < 5:
+            ret.append(begin)
+        begin += datetime.timedelta(days=1)
+    return ret
+
+
+class DataQualityTestCase(common.TestCase):
+    def setUp(self):
+        common.TestCase.setUp(self)
+        self.calendar = marketsession.USEquities.getCalendar()
+
+    def testCleanFiles(self):
+        files = [
+            ("spy", common.get_data_file_path("spy-2010-yahoofinance.csv")),
+            ("spy", common.get_data_file_path("spy-2011-yahoofinance.csv")),
+            ("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv")),
+        ]
+        reports = dataquality.analyze_files(yahoofeed.Feed(), files, self.calendar)
+        self.assertEqual([report.getInstrument() for report in reports], ["spy", "orcl"])
+        self.assertEqual(reports[0].getBarCount(), 504)
+        self.assertEqual(reports[0].getFirstDateTime(), datetime.datetime(2010, 1, 4))
+        self.assertEqual(reports[0].getLastDateTime(), datetime.datetime(2011, 12, 30))
+        for report in reports:
+            self.assertFalse(report.hasIssues())
+            self.assertEqual(report.getError(), None)
+
+    def testMissingSessions(self):
+        files = [("nikkei", common.get_data_file_path("nikkei-2010-yahoofinance.csv"))]
+        report = dataquality.analyze_files(yahoofeed.Feed(), files, self.calendar)[0]
+        # Japanese holidays are missing sessions for US equities.
+        self.assertTrue(datetime.date(2010, 1, 11) in report.getMissingSessions())
+        self.assertFalse(datetime.date(2010, 1, 18) in report.getMissingSessions())
+
+        dates = weekdays(datetime.date(2011, 1, 3), datetime.date(2011, 1, 31))
+        dates.remove(datetime.date(2011, 1, 12))
+        dates.remove(datetime.date(2011, 1, 13))
+        report = dataquality.analyze_columns("test", build_columns(daily_rows(dates)), bar.Frequency.DAY, self.calendar)
+        self.assertEqual(report.getMissingSessions(), [datetime.date(2011, 1, 12), datetime.date(2011, 1, 13)])
+        self.assertEqual(report.getIssueCounts()["missing_sessions"], 2)
+
+        # No calendar, no missing sessions.
+        report = dataquality.analyze_columns("test", build_columns(daily_rows(dates)))
+        self.assertFalse(report.hasIssues())
+
+    def testIntradayMissingSessions(self):
+        rows = []
+        for date in weekdays(datetime.date(2011, 11, 21), datetime.date(2011, 11, 30)):
+            if date == datetime.date(2011, 11, 28):
+                continue
+            dateTime = datetime.datetime.combine(date, datetime.time(9, 30))
+            while dateTime.time() < datetime.time(16):
+                rows.append((dateTime, 10, 10, 10, 10, 100))
+                dateTime += datetime.timedelta(minutes=30)
+        # A bar after the close.
+        rows.append((datetime.datetime(2011, 11, 28, 17), 10, 10, 10, 10, 100))
+        rows.sort()
+        report = dataquality.analyze_columns("test", build_columns(rows), bar.Frequency.MINUTE * 30, self.calendar)
+        # Thanksgiving is a holiday.
+        self.assertEqual(report.getMissingSessions(), [datetime.date(2011, 11, 28)])
+
+    def testIssues(self):
+        dates = weekdays(datetime.date(2011, 1, 3), datetime.date(2011, 3, 31))
+        rows = daily_rows(dates)
+        # Prices follow a random walk so that the median absolute deviation is not 0.
+        prices = 10 * np.cumprod(1 + np.random.RandomState(0).normal(0, 0.01, len(rows)))
+        for i in xrange(len(rows)):
+            rows[i] = (rows[i][0], prices[i], prices[i], prices[i], prices[i], 100)
+        rows[5] = (rows[5][0], 10, 9, 10, 10, 100)  # High < low.
+        rows[10] = (rows[10][0], 0, 10, 10, 10, 100)  # Invalid open.
+        rows[11] = (rows[11][0], 10, 10, 10, float("nan"), 100)  # Invalid close.
+        rows[20] = (rows[20][0], 20, 20, 20, 20, 100)  # Outlier.
+        for i in xrange(30, 36):
+            rows[i] = rows[i][:5] + (0,)
+        rows.insert(40, rows[40])  # Duplicated.
+        rows[50], rows[51] = rows[51], rows[50]  # Unsorted.
+        rows = [row for row in rows if row[0] != datetime.datetime(2011, 3, 15)]  # Missing session.
+
+        report = dataquality.analyze_columns("test", build_columns(rows), bar.Frequency.DAY, self.calendar)
+        self.assertEqual(report.getOHLCViolations(), [rows[5][0]])
+        self.assertEqual(report.getInvalidPrices(), [rows[10][0], rows[11][0]])
+        self.assertEqual(report.getZeroVolumeRuns(), [(rows[30][0], 6)])
+        self.assertEqual(report.getDuplicated(), [rows[40][0]])
+        self.assertEqual(report.getUnsorted(), [rows[51][0]])
+        outliers = report.getOutliers()
+        # The jump to 20 and the way back.
+        self.assertEqual([outlier[0] for outlier in outliers], [rows[20][0], rows[21][0]])
+        self.assertTrue(outliers[0][1] > 0.5 and outliers[1][1] < -0.3)
+        self.assertEqual(report.getMissingSessions(), [datetime.date(2011, 3, 15)])
+        self.assertEqual(report.getIssueCounts(), {
+            "unsorted": 1, "duplicated": 1, "invalid_prices": 2, "ohlc": 1, "zero_volume_runs": 1, "outliers": 2,
+            "missing_sessions": 1
+        })
+
+        # Shorter runs are ignored.
+        report = dataquality.analyze_columns("test", build_columns(rows), minZeroVolumeRun=7)
+        self.assertEqual(report.getZeroVolumeRuns(), [])
+
+    def testSanitize(self):
+        rows = daily_rows(weekdays(datetime.date(2011, 1, 3), datetime.date(2011, 1, 14)))
+        rows[1] = (rows[1][0], 10, 9, 11, 10, 100)
+        rows[2] = (rows[2][0], -1, 10, 10, 10, 100)
+        rows.insert(4, (rows[3][0], 12, 12, 12, 12, 50))
+        rows.reverse()
+        sanitized = dataquality.sanitize_columns(build_columns(rows))
+        self.assertEqual(len(sanitized["datetime"]), 9)
+        self.assertTrue(np.all(np.diff(sanitized["datetime"]) > 0))
+        self.assertEqual((sanitized["high"][1], sanitized["low"][1]), (10, 10))
+        # The last bar for duplicated datetimes is kept.
+        self.assertEqual(sanitized["close"][2], 10)
+        report = dataquality.analyze_columns("test", sanitized)
+        self.assertFalse(report.hasIssues())
+
+    def testSanitizeOHLCColumns(self):
+        values = [(10, 9, 11, 10), (10, 12, 8, 13), (5, 6, 4, 3), (1, 1, 1, 1)]
+        columns = [np.array(column, dtype=np.float64) for column in zip(*values)]
+        sanitized = zip(*[column.tolist() for column in barfeedcommon.sanitize_ohlc_columns(*columns)])
+        self.assertEqual(sanitized, [barfeedcommon.sanitize_ohlc(*value) for value in values])
+
+    def testInvalidBarsInFile(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bad.csv")
+            with open(path, "w") as f:
+                f.write("Date,Open,High,Low,Close,Volume,Adj Close\n")
+                f.write("2011-01-05,10,11,9,10,100,10\n")
+                f.write("2011-01-04,10,9,11,10,100,10\n")
+                f.write("2011-01-03,10,11,9,10,100,10\n")
+            outputDir = os.path.join(tmpPath, "sanitized")
+            report = dataquality.analyze_files(yahoofeed.Feed(), [("bad", path)], outputDir=outputDir)[0]
+            # The file can't be loaded in a bar feed, but it can be checked.
+            self.assertEqual(report.getError(), None)
+            self.assertEqual(report.getOHLCViolations(), [datetime.datetime(2011, 1, 4)])
+            self.assertEqual(report.getUnsorted(), [])
+
+            bars = barcache.load_packed_bars(os.path.join(outputDir, "bad"))
+            self.assertEqual([bar_.getDateTime().day for bar_ in bars], [3, 4, 5])
+            self.assertEqual((bars[1].getHigh(), bars[1].getLow()), (10, 10))
+            self.assertEqual(bars[1].getAdjClose(), 10)
+
+            # Errors are reported.
+            report = dataquality.analyze_files(yahoofeed.Feed(), [("missing", os.path.join(tmpPath, "missing.csv"))])[0]
+            self.assertNotEqual(report.getError(), None)
+            self.assertTrue(report.hasIssues())
+
+    def testLoadColumnsTimezone(self):
+        # Columns parsed in bulk are converted to the calendar timezone just like the bars built row by row.
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bars.csv")
+            with open(path, "w") as f:
+                f.write("Date Time,Open,High,Low,Close,Volume,Adj Close\n")
+                f.write("2011-01-03 09:00:00,10,11,9,10,100,10\n")
+                f.write("2011-01-04 13:30:00,10,11,9,10,100,10\n")
+                f.write("2011-07-04 10:00:00,10,11,9,10,100,10\n")
+            barFeed = barfeedcsvfeed.GenericBarFeed(bar.Frequency.MINUTE, pytz.timezone("Asia/Tokyo"))
+            rowParser = barFeed.createRowParser()
+            self.assertNotEqual(rowParser.parseColumns(path), None)
+            for timezone in [None, pytz.timezone("Asia/Tokyo"), marketsession.USEquities.getTimezone()]:
+                expected = dataquality.bars_to_columns(barfeedcsvfeed.parse_bars(path, rowParser), timezone)
+                columns = dataquality.load_columns(path, rowParser, timezone)
+                self.assertEqual(columns["datetime"].tolist(), expected["datetime"].tolist())
+            self.assertEqual(
+                dataquality.micros_to_datetimes(columns["datetime"])[:2],
+                [datetime.datetime(2011, 1, 2, 19), datetime.datetime(2011, 1, 3, 23, 30)]
+            )
+
+    def testParallel(self):
+        files = [
+            ("spy", common.get_data_file_path("spy-2010-yahoofinance.csv")),
+            ("nikkei", common.get_data_file_path("nikkei-2010-yahoofinance.csv")),
+            ("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv")),
+        ]
+        expected = dataquality.analyze_files(yahoofeed.Feed(), files, self.calendar)
+        reports = dataquality.analyze_files(yahoofeed.Feed(), files, self.calendar, processes=2)
+        self.assertEqual([report.getIssueCounts() for report in reports], [report.getIssueCounts() for report in expected])
+        self.assertEqual(reports[1].getMissingSessions(), expected[1].getMissingSessions())
+
+    def testWriteSummary(self):
+        files = [
+            ("spy", common.get_data_file_path("spy-2010-yahoofinance.csv")),
+            ("nikkei", common.get_data_file_path("nikkei-2010-yahoofinance.csv")),
+        ]
+        reports = dataquality.analyze_files(yahoofeed.Feed(), files, self.calendar)
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "summary.csv")
+            dataquality.write_summary(reports, path)
+            rows = list(csv.DictReader(open(path, "r")))
+        self.assertEqual([row["Instrument"] for row in rows], ["spy", "nikkei"])
+        self.assertEqual(rows[0]["Bars"], "252")
+        self.assertEqual(rows[0]["missing_sessions"], "0")
+        self.assertEqual(int(rows[1]["missing_sessions"]), len(reports[1].getMissingSessions()))
@@ -18,7 +18,9 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import datetime
 import os
+import sqlite3
 
 import common
 import feed_test
@@ -126,3 +128,138 @@ class SQLiteFeedTestCase(common.TestCase):
             self.assertEqual(len(barDS.getHighDataSeries()), 2)
             self.assertEqual(len(barDS.getLowDataSeries()), 2)
             self.assertEqual(len(barDS.getAdjCloseDataSeries()), 2)
+
+    def testAddManyBars(self):
+        tmpFeed = TemporarySQLiteFeed(SQLiteFeedTestCase.dbName, bar.Frequency.DAY)
+        with tmpFeed:
+            yahooFeed = yahoofeed.Feed()
+            yahooFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"), marketsession.USEquities.timezone)
+            yahooFeed.addBarsFromCSV("spy", common.get_data_file_path("spy-2010-yahoofinance.csv"), marketsession.USEquities.timezone)
+
+            db = tmpFeed.getFeed().getDatabase()
+            db.addBarsFromFeed(yahooFeed, batchSize=100)
+            self.assertEqual(len(db.getBars("orcl", bar.Frequency.DAY)), 252)
+            self.assertEqual(len(db.getBars("spy", bar.Frequency.DAY)), 252)
+
+            # Existing bars get replaced.
+            orclBars = db.getBars("orcl", bar.Frequency.DAY)
+            first = orclBars[0]
+            updated = bar.BasicBar(first.getDateTime(), 1, 2, 0.5, 1.5, 100, None, bar.Frequency.DAY)
+            db.addManyBars([("orcl", updated)], bar.Frequency.DAY)
+            orclBars = db.getBars("orcl", bar.Frequency.DAY)
+            self.assertEqual(len(orclBars), 252)
+            self.assertEqual(orclBars[0].getClose(), 1.5)
+            self.assertEqual(orclBars[0].getAdjClose(), None)
+
+            # Single bars can still be added.
+            db.addBar("orcl", first, bar.Frequency.DAY)
+            self.assertEqual(db.getBars("orcl", bar.Frequency.DAY)[0].getClose(), first.getClose())
+
+    def testAddManyBarsRollback(self):
+        tmpFeed = TemporarySQLiteFeed(SQLiteFeedTestCase.dbName, bar.Frequency.DAY)
+        with tmpFeed:
+            db = tmpFeed.getFeed().getDatabase()
+            dateTime = datetime.datetime(2000, 1, 1)
+            goodBar = bar.BasicBar(dateTime, 1, 2, 0.5, 1.5, 100, None, bar.Frequency.DAY)
+            badBar = bar.BasicBar(dateTime, 1, 2, 0.5, 1.5, None, None, bar.Frequency.DAY)
+            with self.assertRaises(sqlite3.IntegrityError):
+                db.addManyBars([("orcl", goodBar), ("ibm", badBar)], bar.Frequency.DAY)
+            self.assertEqual(len(db.getBars("orcl", bar.Frequency.DAY)), 0)
+
+            db.addManyBars([("ibm", goodBar)], bar.Frequency.DAY)
+            self.assertEqual(len(db.getBars("ibm", bar.Frequency.DAY)), 1)
+
+    def testPragmas(self):
+        try:
+            feed = sqlitefeed.Feed(SQLiteFeedTestCase.dbName, bar.Frequency.DAY, journalMode="WAL", pragmas=sqlitefeed.INGESTION_PRAGMAS)
+            db = feed.getDatabase()
+            self.assertEqual(db.getPragma("journal_mode"), "wal")
+            self.assertEqual(db.getPragma("synchronous"), 1)
+            self.assertEqual(db.getPragma("cache_size"), -64000)
+            db.disconnect()
+        finally:
+            for suffix in ["", "-wal", "-shm"]:
+                if os.path.exists(SQLiteFeedTestCase.dbName + suffix):
+                    os.remove(SQLiteFeedTestCase.dbName + suffix)
+
+
+class SQLiteStreamingFeedTestCase(common.TestCase):
+    dbName = "SQLiteStreamingFeedTestCase.sqlite"
+
+    def __fillDatabase(self, db):
+        yahooFeed = yahoofeed.Feed()
+        for instrument in ["spy", "goog", "nikkei"]:
+            yahooFeed.addBarsFromCSV(instrument, common.get_data_file_path("%s-2011-yahoofinance.csv" % instrument))
+        db.addBarsFromFeed(yahooFeed)
+
+    def __getValues(self, barFeed):
+        ret = []
+        for dateTime, bars in barFeed:
+            ret.append((dateTime, sorted([(instrument, bars[instrument].getClose(), bars[instrument].getAdjClose()) for instrument in bars.getInstruments()])))
+        return ret
+
+    def __removeDatabase(self):
+        if os.path.exists(SQLiteStreamingFeedTestCase.dbName):
+            os.remove(SQLiteStreamingFeedTestCase.dbName)
+
+    def testSameAsFeed(self):
+        self.__removeDatabase()
+        try:
+            memFeed = sqlitefeed.Feed(SQLiteStreamingFeedTestCase.dbName, bar.Frequency.DAY)
+            self.__fillDatabase(memFeed.getDatabase())
+            streamingFeed = sqlitefeed.StreamingFeed(SQLiteStreamingFeedTestCase.dbName, bar.Frequency.DAY, fetchSize=10)
+            for instrument in ["spy", "goog", "nikkei", "ibm"]:
+                memFeed.loadBars(instrument)
+                streamingFeed.loadBars(instrument)
+
+            values = self.__getValues(memFeed)
+            self.assertEqual(len(values), 259)
+            self.assertEqual(self.__getValues(streamingFeed), values)
+            self.assertEqual(streamingFeed.getRegisteredInstruments(), memFeed.getRegisteredInstruments())
+            self.assertEqual(len(streamingFeed["spy"]), 252)
+
+            # Reset and stream again.
+            streamingFeed.reset()
+            self.assertEqual(self.__getValues(streamingFeed), values)
+
+            memFeed.getDatabase().disconnect()
+            streamingFeed.getDatabase().disconnect()
+        finally:
+            self.__removeDatabase()
+
+    def testDateRanges(self):
+        self.__removeDatabase()
+        try:
+            streamingFeed = sqlitefeed.StreamingFeed(SQLiteStreamingFeedTestCase.dbName, bar.Frequency.DAY)
+            self.__fillDatabase(streamingFeed.getDatabase())
+            self.assertTrue(streamingFeed.getDatabase().hasTimestampIndex())
+            streamingFeed.loadBars("spy", marketsession.USEquities.getTimezone(), toDateTime=datetime.datetime(2011, 1, 31))
+            streamingFeed.loadBars("goog", fromDateTime=datetime.datetime(2011, 12, 1))
+
+            self.assertEqual(streamingFeed.peekDateTime(), marketsession.USEquities.getTimezone().localize(datetime.datetime(2011, 1, 2, 19)))
+            streamingFeed.loadAll()
+            self.assertEqual(len(streamingFeed["spy"]), 20)
+            self.assertEqual(len(streamingFeed["goog"]), 21)
+            self.assertEqual(streamingFeed["spy"][0].getDateTime().tzinfo.zone, "US/Eastern")
+            self.assertTrue(streamingFeed.eof())
+
+            with self.assertRaisesRegexp(Exception, "Can't load more bars once you started consuming bars"):
+                streamingFeed.loadBars("nikkei")
+            streamingFeed.getDatabase().disconnect()
+        finally:
+            self.__removeDatabase()
+
+    def testStop(self):
+        self.__removeDatabase()
+        try:
+            streamingFeed = sqlitefeed.StreamingFeed(SQLiteStreamingFeedTestCase.dbName, bar.Frequency.DAY)
+            self.__fillDatabase(streamingFeed.getDatabase())
+            streamingFeed.loadBars("spy")
+            streamingFeed.start()
+            self.assertNotEqual(streamingFeed.getNextBars(), None)
+            streamingFeed.stop()
+            self.assertTrue(streamingFeed.eof())
+            self.assertEqual(streamingFeed.getNextBars(), None)
+            streamingFeed.getDatabase().disconnect()
+        finally:
+            self.__removeDatabase()
@@ -0,0 +1,324 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import BaseHTTPServer
+import SocketServer
+import datetime
+import email.utils
+import os
+import stat
+import threading
+import time
+import urlparse
+
+import common
+
+from pyalgotrade.tools import downloader
+from pyalgotrade.tools import yahoofinance
+from pyalgotrade import bar
+from pyalgotrade import utils
+
+
+def get_yahoo_csv(query):
+    # Serves the rows in the test files for the requested date range, newest first, like Yahoo! Finance does.
+    begin = datetime.date(int(query["c"][0]), int(query["a"][0]) + 1, int(query["b"][0])).strftime("%Y-%m-%d")
+    end = datetime.date(int(query["f"][0]), int(query["d"][0]) + 1, int(query["e"][0])).strftime("%Y-%m-%d")
+    header = None
+    rows = []
+    for year in range(int(query["c"][0]), int(query["f"][0]) + 1):
+        path = common.get_data_file_path("%s-%d-yahoofinance.csv" % (query["s"][0], year))
+        if os.path.exists(path):
+            lines = open(path, "r").read().splitlines()
+            header = lines[0]
+            rows.extend([line for line in lines[1:] if begin <= line[:10] <= end])
+    if len(rows) == 0:
+        return None
+    rows.sort(reverse=True)
+    return "\n".join([header] + rows) + "\n"
+
+
+class RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def sendResponse(self, status, body, contentType="text/plain", headers={}):
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse.urlsplit(self.path)
+        with self.server.lock:
+            self.server.requests.append(url.path)
+            self.server.requestTimes.append(time.time())
+            hits = self.server.requests.count(url.path)
+
+        if url.path == "/ok":
+            self.sendResponse(200, "ok")
+        elif url.path.startswith("/flaky"):
+            # Fails the first time it is requested.
+            if hits == 1:
+                self.sendResponse(503, "unavailable")
+            else:
+                self.sendResponse(200, "ok")
+        elif url.path == "/throttled":
+            # Asks to wait a second the first time it is requested.
+            if hits == 1:
+                self.sendResponse(429, "too many requests", headers={"Retry-After": "1"})
+            else:
+                self.sendResponse(200, "ok")
+        elif url.path == "/redirect":
+            self.sendResponse(302, "", headers={"Location": "/ok"})
+        elif url.path == "/table.csv":
+            content = get_yahoo_csv(urlparse.parse_qs(url.query))
+            if content is not None:
+                self.sendResponse(200, content, "text/csv")
+            else:
+                self.sendResponse(404, "not found")
+        else:
+            self.sendResponse(404, "not found")
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.sendResponse(200, body.upper())
+
+
+class HTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ("127.0.0.1", 0), RequestHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = []
+        self.requestTimes = []
+
+    def getURL(self, path=""):
+        return "http://127.0.0.1:%d%s" % (self.server_address[1], path)
+
+
+class DownloaderTestCase(common.TestCase):
+    def setUp(self):
+        common.TestCase.setUp(self)
+        self.server = HTTPServer()
+        self.serverThread = threading.Thread(target=self.server.serve_forever, args=(0.05,))
+        self.serverThread.daemon = True
+        self.serverThread.start()
+
+    def tearDown(self):
+        downloader.get_client().close()
+        self.server.shutdown()
+        self.server.server_close()
+        common.TestCase.tearDown(self)
+
+    def testKeepAlive(self):
+        client = downloader.HTTPClient()
+        for i in range(5):
+            response = client.request(self.server.getURL("/ok"))
+            self.assertEqual(response.getStatus(), 200)
+            self.assertEqual(response.getBody(), "ok")
+            self.assertEqual(response.getHeader("content-type"), "text/plain")
+        client.close()
+        self.assertEqual(self.server.connections, 1)
+
+    def testPost(self):
+        response = downloader.fetch(self.server.getURL("/post"), "hello", {"Content-Type": "text/plain"})
+        self.assertEqual(response.getBody(), "HELLO")
+
+    def testRetry(self):
+        client = downloader.HTTPClient(retries=1, backoff=0.01)
+        self.assertEqual(client.request(self.server.getURL("/flaky")).getBody(), "ok")
+        self.assertEqual(self.server.requests, ["/flaky", "/flaky"])
+
+    def testRetryAfter(self):
+        client = downloader.HTTPClient(retries=1, backoff=0.01)
+        self.assertEqual(client.request(self.server.getURL("/throttled")).getBody(), "ok")
+        self.assertEqual(self.server.requests, ["/throttled", "/throttled"])
+        self.assertTrue(self.server.requestTimes[1] - self.server.requestTimes[0] >= 0.95)
+
+    def testRetryAfterPausesRateLimit(self):
+        downloader.set_rate_limit("127.0.0.1", 100, 1)
+        try:
+            downloader.HTTPClient(retries=1, backoff=0.01).request(self.server.getURL("/throttled"))
+            # The retry already waited, so this one doesn't wait again.
+            begin = time.time()
+            downloader.HTTPClient().request(self.server.getURL("/ok"))
+            self.assertTrue(time.time() - begin < 0.5)
+        finally:
+            downloader.remove_rate_limit("127.0.0.1")
+        self.assertEqual(self.server.requests, ["/throttled", "/throttled", "/ok"])
+
+    def testParseRetryAfter(self):
+        self.assertEqual(downloader.parse_retry_after("120"), 120)
+        self.assertEqual(downloader.parse_retry_after(" 0 "), 0)
+        self.assertEqual(downloader.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+        future = downloader.parse_retry_after(email.utils.formatdate(time.time() + 60, usegmt=True))
+        self.assertTrue(55 <= future <= 60)
+        self.assertEqual(downloader.parse_retry_after("soon"), None)
+        self.assertEqual(downloader.parse_retry_after(None), None)
+
+    def testNoRetries(self):
+        client = downloader.HTTPClient(retries=0)
+        with self.assertRaisesRegexp(downloader.HTTPError, "HTTP Error 503"):
+            client.request(self.server.getURL("/flaky"))
+
+    def testNotFoundIsNotRetried(self):
+        client = downloader.HTTPClient(retries=3, backoff=0.01)
+        with self.assertRaisesRegexp(downloader.HTTPError, "HTTP Error 404"):
+            client.request(self.server.getURL("/missing"))
+        self.assertEqual(self.server.requests, ["/missing"])
+
+    def testConnectionRefused(self):
+        url = self.server.getURL("/ok")
+        self.server.shutdown()
+        self.server.server_close()
+        client = downloader.HTTPClient(retries=1, backoff=0.01)
+        with self.assertRaises(Exception):
+            client.request(url)
+
+    def testRedirect(self):
+        response = downloader.fetch(self.server.getURL("/redirect"))
+        self.assertEqual(response.getBody(), "ok")
+        self.assertEqual(self.server.requests, ["/redirect", "/ok"])
+
+    def testRateLimit(self):
+        downloader.set_rate_limit("127.0.0.1", 10, 1)
+        try:
+            manager = downloader.DownloadManager(4)
+            for i in range(6):
+                manager.addDownload(downloader.fetch, self.server.getURL("/ok"))
+            self.assertEqual(manager.run(), [None] * 6)
+        finally:
+            downloader.remove_rate_limit("127.0.0.1")
+        requestTimes = sorted(self.server.requestTimes)
+        self.assertTrue(requestTimes[-1] - requestTimes[0] >= 0.45)
+
+    def testDefaultRateLimit(self):
+        downloader.set_rate_limit("127.0.0.1", 10, 1)
+        try:
+            rateLimiter = downloader.rate_limiters["127.0.0.1"]
+            downloader.set_default_rate_limit("127.0.0.1", 1, 1)
+            self.assertTrue(downloader.rate_limiters["127.0.0.1"] is rateLimiter)
+        finally:
+            downloader.remove_rate_limit("127.0.0.1")
+        downloader.set_default_rate_limit("127.0.0.1", 1, 1)
+        try:
+            self.assertIn("127.0.0.1", downloader.rate_limiters)
+        finally:
+            downloader.remove_rate_limit("127.0.0.1")
+
+    def testProviderRateLimits(self):
+        from pyalgotrade.tools import googlefinance
+        from pyalgotrade.tools import quandl
+
+        for module in (yahoofinance, googlefinance, quandl):
+            host = urlparse.urlsplit(module.base_url).hostname
+            self.assertIn(host, downloader.rate_limiters)
+
+    def testDownloadManager(self):
+        manager = downloader.DownloadManager(3)
+        paths = ["/ok", "/missing", "/ok", "/missing2", "/ok"]
+        for path in paths:
+            manager.addDownload(downloader.fetch, self.server.getURL(path))
+        results = manager.run()
+        self.assertEqual(len(results), 5)
+        self.assertEqual([result is None for result in results], [True, False, True, False, True])
+        self.assertEqual(results[1].getStatus(), 404)
+        self.assertEqual(sorted(self.server.requests), sorted(paths))
+        # Connections are reused within each thread.
+        self.assertTrue(self.server.connections <= 3)
+        # The manager can be reused.
+        self.assertEqual(manager.run(), [])
+
+    def testDownloadFiles(self):
+        def download(path, csvFile):
+            downloader.write_file(csvFile, downloader.fetch(self.server.getURL(path)).getBody())
+
+        with common.TmpDir() as tmpPath:
+            okFile = os.path.join(tmpPath, "ok.txt")
+            missingFile = os.path.join(tmpPath, "missing.txt")
+            downloads = [
+                ("ok", okFile, download, ("/ok", okFile)),
+                ("missing", missingFile, download, ("/missing", missingFile)),
+            ]
+            failed = downloader.download_files(downloads, 2, True, downloader.logger)
+            self.assertEqual(failed, set([missingFile]))
+            self.assertEqual(open(okFile, "r").read(), "ok")
+            self.assertEqual(os.listdir(tmpPath), ["ok.txt"])
+
+            with self.assertRaisesRegexp(downloader.HTTPError, "HTTP Error 404"):
+                downloader.download_files(downloads, 2, False, downloader.logger)
+
+    def testWriteFile(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "file.csv")
+            downloader.write_file(path, "first")
+            downloader.write_file(path, "second")
+            self.assertEqual(open(path, "r").read(), "second")
+            self.assertEqual(os.listdir(tmpPath), ["file.csv"])
+
+            # Files get the same mode as files created with open(), and replaced files keep theirs.
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0666 & ~utils.umask)
+            os.chmod(path, 0640)
+            downloader.write_file(path, "second")
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0640)
+            downloader.append_file(path, "third")
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0640)
+            downloader.write_file(path, "second")
+
+            # Nothing is left behind if the write fails.
+            with self.assertRaises(Exception):
+                downloader.write_file(path, None)
+            self.assertEqual(open(path, "r").read(), "second")
+            self.assertEqual(os.listdir(tmpPath), ["file.csv"])
+
+    def testYahooFinanceBuildFeed(self):
+        baseUrl = yahoofinance.base_url
+        yahoofinance.base_url = self.server.getURL()
+        try:
+            with common.TmpDir() as tmpPath:
+                instruments = ["orcl", "spy"]
+                barFeed = yahoofinance.build_feed(instruments, 2010, 2011, tmpPath, downloads=4, skipErrors=True)
+                # There is no data for orcl in 2010 and 2011.
+                self.assertEqual(sorted(os.listdir(tmpPath)), ["spy-2010-yahoofinance.csv", "spy-2011-yahoofinance.csv"])
+                self.assertEqual(barFeed.getFrequency(), bar.Frequency.DAY)
+                count = 0
+                for dateTime, bars in barFeed:
+                    count += 1
+                self.assertEqual(count, len(barFeed["spy"]))
+                self.assertTrue(count > 250 * 2)
+
+                # Files are not downloaded again.
+                requests = len(self.server.requests)
+                yahoofinance.build_feed(["spy"], 2010, 2011, tmpPath)
+                self.assertEqual(len(self.server.requests), requests)
+        finally:
+            yahoofinance.base_url = baseUrl
@@ -0,0 +1,160 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+
+import pytz
+
+import common
+
+from pyalgotrade.utils import dt
+
+
+TIMEZONES = ["US/Eastern", "Europe/London", "Australia/Sydney", "Asia/Kolkata", "America/Sao_Paulo", "UTC"]
+
+
+def pytz_localize(dateTime, timeZone):
+    if dt.datetime_is_naive(dateTime):
+        return timeZone.localize(dateTime)
+    return dateTime.astimezone(timeZone)
+
+
+def hours(begin, end, minutes=30):
+    ret = []
+    while begin < end:
+        ret.append(begin)
+        begin += datetime.timedelta(minutes=minutes)
+    return ret
+
+
+class LocalizeTestCase(common.TestCase):
+    def assertLocalized(self, dateTime, timeZone):
+        expected = pytz_localize(dateTime, timeZone)
+        localized = dt.localize(dateTime, timeZone)
+        self.assertEqual(localized, expected)
+        self.assertEqual(localized.replace(tzinfo=None), expected.replace(tzinfo=None))
+        self.assertTrue(localized.tzinfo is expected.tzinfo)
+
+    def testSameAsPytz(self):
+        dateTimes = hours(datetime.datetime(2011, 1, 1), datetime.datetime(2012, 1, 1))
+        for zone in TIMEZONES:
+            timeZone = pytz.timezone(zone)
+            for dateTime in dateTimes:
+                self.assertLocalized(dateTime, timeZone)
+                self.assertLocalized(pytz.utc.localize(dateTime), timeZone)
+            self.assertLocalized(timeZone.localize(dateTimes[0]), pytz.utc)
+
+    def testFallBack(self):
+        timeZone = pytz.timezone("US/Eastern")
+        # 1:30 is ambiguous and pytz defaults to standard time.
+        localized = dt.localize(datetime.datetime(2011, 11, 6, 1, 30), timeZone)
+        self.assertEqual(localized.tzname(), "EST")
+        self.assertEqual(dt.as_utc(localized), pytz.utc.localize(datetime.datetime(2011, 11, 6, 6, 30)))
+        # Both 1:30 are converted from UTC.
+        localized = dt.localize(pytz.utc.localize(datetime.datetime(2011, 11, 6, 5, 30)), timeZone)
+        self.assertEqual(localized.replace(tzinfo=None), datetime.datetime(2011, 11, 6, 1, 30))
+        self.assertEqual(localized.tzname(), "EDT")
+        self.assertEqual(dt.localize(localized, timeZone), localized)
+        # The day after.
+        localized = dt.localize(datetime.datetime(2011, 11, 8, 12), timeZone)
+        self.assertEqual(localized.tzname(), "EST")
+
+    def testSpringForward(self):
+        timeZone = pytz.timezone("US/Eastern")
+        localized = dt.localize(datetime.datetime(2011, 3, 13, 1, 59), timeZone)
+        self.assertEqual(localized.tzname(), "EST")
+        localized = dt.localize(datetime.datetime(2011, 3, 13, 3), timeZone)
+        self.assertEqual(localized.tzname(), "EDT")
+        localized = dt.localize(pytz.utc.localize(datetime.datetime(2011, 3, 13, 7)), timeZone)
+        self.assertEqual(localized.replace(tzinfo=None), datetime.datetime(2011, 3, 13, 3))
+        # The day before.
+        localized = dt.localize(datetime.datetime(2011, 3, 11, 12), timeZone)
+        self.assertEqual(localized.tzname(), "EST")
+
+    def testDaysNearTransitionsAreNotCached(self):
+        timeZone = pytz.timezone("Europe/London")
+        self.assertEqual(dt.get_day_tzinfo(timeZone, datetime.date(2011, 3, 27)), None)
+        self.assertEqual(dt.get_day_tzinfo(timeZone, datetime.date(2011, 3, 26)), None)
+        tzInfo, offset = dt.get_day_tzinfo(timeZone, datetime.date(2011, 7, 1))
+        self.assertEqual(tzInfo, timeZone.localize(datetime.datetime(2011, 7, 1, 12)).tzinfo)
+        self.assertEqual(offset, datetime.timedelta(hours=1))
+
+    def testCacheIsBounded(self):
+        timeZone = pytz.timezone("US/Eastern")
+        maxCached = dt.MAX_CACHED_TZINFOS
+        dt.MAX_CACHED_TZINFOS = 10
+        try:
+            dt.tzinfo_cache.clear()
+            for dateTime in hours(datetime.datetime(2011, 1, 1), datetime.datetime(2011, 2, 1), minutes=60 * 24):
+                self.assertLocalized(dateTime, timeZone)
+                self.assertTrue(len(dt.tzinfo_cache) <= 10)
+        finally:
+            dt.MAX_CACHED_TZINFOS = maxCached
+
+    def testNoTransitionTable(self):
+        # Timezones without a pytz transition table are localized without the cache.
+        class FixedOffset(datetime.tzinfo):
+            def utcoffset(self, dateTime):
+                return datetime.timedelta(hours=5, minutes=30)
+
+            def dst(self, dateTime):
+                return datetime.timedelta(0)
+
+            def localize(self, dateTime):
+                return dateTime.replace(tzinfo=self)
+
+        dt.tzinfo_cache.clear()
+        for timeZone in [pytz.FixedOffset(330), FixedOffset()]:
+            self.assertFalse(hasattr(timeZone, "_utc_transition_times"))
+            localized = dt.localize(datetime.datetime(2011, 1, 1, 12), timeZone)
+            self.assertTrue(localized.tzinfo is timeZone)
+            self.assertEqual(dt.as_utc(localized), pytz.utc.localize(datetime.datetime(2011, 1, 1, 6, 30)))
+            localized = dt.localize(pytz.utc.localize(datetime.datetime(2011, 1, 1, 6, 30)), timeZone)
+            self.assertEqual(localized.replace(tzinfo=None), datetime.datetime(2011, 1, 1, 12))
+        self.assertEqual(dt.tzinfo_cache, {})
+
+    def testNonPytzTimezone(self):
+        class FixedOffset(datetime.tzinfo):
+            def utcoffset(self, dateTime):
+                return datetime.timedelta(hours=-3)
+
+            def dst(self, dateTime):
+                return datetime.timedelta(0)
+
+        dateTime = datetime.datetime(2011, 1, 1, 12, tzinfo=FixedOffset())
+        self.assertEqual(dt.as_utc(dateTime), pytz.utc.localize(datetime.datetime(2011, 1, 1, 15)))
+
+
+class TimestampTestCase(common.TestCase):
+    def testSameAsTotalSeconds(self):
+        dateTimes = hours(datetime.datetime(1960, 1, 1), datetime.datetime(2030, 1, 1), minutes=60 * 24 * 7 + 1)
+        dateTimes.append(datetime.datetime(2011, 1, 1, 1, 1, 1, 123456))
+        for dateTime in dateTimes:
+            expected = (pytz.utc.localize(dateTime) - dt.epoch_utc).total_seconds()
+            self.assertEqual(dt.datetime_to_timestamp(dateTime), expected)
+            self.assertEqual(dt.datetime_to_timestamp(pytz.utc.localize(dateTime)), expected)
+            self.assertEqual(dt.timestamp_to_datetime(expected), pytz.utc.localize(dateTime))
+
+    def testLocalized(self):
+        timeZone = pytz.timezone("US/Eastern")
+        for dateTime in hours(datetime.datetime(2011, 11, 5), datetime.datetime(2011, 11, 7)):
+            localized = timeZone.localize(dateTime)
+            self.assertEqual(dt.datetime_to_timestamp(localized), (localized - dt.epoch_utc).total_seconds())
+        self.assertEqual(dt.timestamp_to_datetime(0, False), datetime.datetime(1970, 1, 1))
@@ -80,3 +80,19 @@ class MemFeedTestCase(common.TestCase):
         self.assertEqual(len(values), len(reloadedValues))
         for i in range(len(values)):
             self.assertEqual(values[i], reloadedValues[i])
+
+    def testSparseAndUnsorted(self):
+        dateTime = datetime.datetime(2000, 1, 1)
+        feed = memfeed.MemFeed()
+        feed.addValues([(dateTime + datetime.timedelta(days=2), {"a": 2}), (dateTime, {"a": 0, "b": 0})])
+        feed.addColumns([dateTime + datetime.timedelta(days=1), dateTime + datetime.timedelta(days=2)], {"b": [1, 2]})
+
+        loaded = [(loadedDateTime, values) for loadedDateTime, values in feed]
+        self.assertEqual(loaded, [
+            (dateTime, {"a": 0, "b": 0}),
+            (dateTime + datetime.timedelta(days=1), {"b": 1}),
+            (dateTime + datetime.timedelta(days=2), {"a": 2}),
+            (dateTime + datetime.timedelta(days=2), {"b": 2}),
+        ])
+        self.assertEqual(feed["a"][:], [0, 2])
+        self.assertEqual(feed["b"][:], [0, 1, 2])
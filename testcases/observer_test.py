@@ -20,6 +20,10 @@
 
 import datetime
 import copy
+import threading
+import Queue
+import urllib2
+import BaseHTTPServer
 
 import common
 
@@ -93,6 +97,49 @@ class RealtimeFeed(observer.Subject):
         return self.__priority
 
 
+class EventQueueFeed(observer.Subject):
+    def __init__(self):
+        self.__queue = dispatcher.EventQueue()
+        self.__event = observer.Event()
+        self.__stopped = False
+
+    def getQueue(self):
+        return self.__queue
+
+    def setWaker(self, waker):
+        self.__queue.setWaker(waker)
+
+    def getEvent(self):
+        return self.__event
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self.__stopped = True
+
+    def join(self):
+        pass
+
+    def eof(self):
+        return self.__stopped
+
+    def dispatch(self):
+        ret = False
+        try:
+            self.__event.emit(self.__queue.get(False))
+            ret = True
+        except Queue.Empty:
+            pass
+        return ret
+
+    def peekDateTime(self):
+        return None
+
+    def getPollInterval(self):
+        return None
+
+
 class DispatcherTestCase(common.TestCase):
     def test1NrtFeed(self):
         values = []
@@ -220,6 +267,194 @@ class DispatcherTestCase(common.TestCase):
         # Check that although feed2 is realtime, feed1 was dispatched before.
         self.assertTrue(values[0] < values[1])
 
+    def testManyNrtFeeds(self):
+        values = []
+        now = datetime.datetime.now()
+        feeds = []
+        for i in xrange(20):
+            # Every feed has events every i + 1 seconds.
+            datetimes = [now + datetime.timedelta(seconds=j) for j in xrange(0, 100, i + 1)]
+            feed = NonRealtimeFeed(datetimes, 0)
+            feed.getEvent().subscribe(lambda x, i=i: values.append((x, i)))
+            feeds.append(feed)
+        rtValues = []
+        rtFeed = RealtimeFeed(range(200))
+        rtFeed.getEvent().subscribe(lambda x: rtValues.append(disp.getCurrentDateTime()))
+
+        disp = dispatcher.Dispatcher()
+        disp.addSubject(rtFeed)
+        for feed in feeds:
+            disp.addSubject(feed)
+        disp.run()
+
+        # Events should be sorted by datetime, and using the order in which subjects were added to break ties.
+        self.assertEqual(len(values), sum([len(xrange(0, 100, i + 1)) for i in xrange(20)]))
+        self.assertEqual(values, sorted(values))
+        # The realtime feed gets dispatched on every event until it hits eof.
+        self.assertEqual(rtValues, [now + datetime.timedelta(seconds=i) for i in xrange(100)] + [None] * 100)
+
+    def testPeekOnlyDispatched(self):
+        class CountingFeed(NonRealtimeFeed):
+            def __init__(self, datetimes):
+                NonRealtimeFeed.__init__(self, datetimes)
+                self.peekCount = 0
+
+            def peekDateTime(self):
+                self.peekCount += 1
+                return NonRealtimeFeed.peekDateTime(self)
+
+        now = datetime.datetime.now()
+        feed1 = CountingFeed([now + datetime.timedelta(seconds=i) for i in xrange(100)])
+        feed2 = CountingFeed([now + datetime.timedelta(seconds=1000)])
+
+        disp = dispatcher.Dispatcher()
+        disp.addSubject(feed1)
+        disp.addSubject(feed2)
+        disp.run()
+
+        # feed2 should not be checked again while feed1 is dispatching.
+        self.assertTrue(feed2.peekCount < 5)
+        self.assertTrue(feed2.eof())
+
+
+class EventQueueTestCase(common.TestCase):
+    def testWaker(self):
+        waker = dispatcher.Waker()
+        self.assertFalse(waker.wait(0))
+        waker.wake()
+        waker.wake()
+        self.assertTrue(waker.wait(0))
+        # Wake ups are consumed.
+        self.assertFalse(waker.wait(0))
+        waker.close()
+        # It can be used after being closed.
+        waker.wake()
+        self.assertTrue(waker.wait(0))
+        waker.close()
+
+    def testWakersAreNotShared(self):
+        feed1 = EventQueueFeed()
+        disp1 = dispatcher.Dispatcher()
+        disp1.addSubject(feed1)
+        feed2 = EventQueueFeed()
+        disp2 = dispatcher.Dispatcher()
+        disp2.addSubject(feed2)
+        self.assertNotEqual(disp1.getWaker(), disp2.getWaker())
+
+        feed1.getQueue().put(1)
+        self.assertFalse(disp2.getWaker().wait(0))
+        self.assertTrue(disp1.getWaker().wait(0))
+        feed2.getQueue().put(2)
+        self.assertFalse(disp1.getWaker().wait(0))
+        self.assertTrue(disp2.getWaker().wait(0))
+
+    def testWakeUp(self):
+        values = []
+        waits = []
+        idle = threading.Event()
+        feed = EventQueueFeed()
+        disp = dispatcher.Dispatcher()
+        disp.addSubject(feed)
+
+        # Waits are recorded. They should only end because an item was put in the queue.
+        waker = disp.getWaker()
+        wait = waker.wait
+        waker.wait = lambda timeout: waits.append(wait(timeout))
+
+        def onEvent(value):
+            values.append(value)
+            if len(values) == 5:
+                disp.stop()
+
+        def producer():
+            for i in xrange(5):
+                # Items are put once the dispatcher has no events left, so it has to be woken up.
+                idle.wait()
+                idle.clear()
+                feed.getQueue().put(i)
+
+        feed.getEvent().subscribe(onEvent)
+        disp.getIdleEvent().subscribe(idle.set)
+        thread = threading.Thread(target=producer)
+        thread.start()
+        prevMaxIdleWait = dispatcher.Dispatcher.MAX_IDLE_WAIT
+        dispatcher.Dispatcher.MAX_IDLE_WAIT = 60
+        try:
+            disp.run()
+        finally:
+            dispatcher.Dispatcher.MAX_IDLE_WAIT = prevMaxIdleWait
+            thread.join()
+
+        self.assertEqual(values, range(5))
+        self.assertEqual(waits, [True] * 5)
+
+    def testPolledSubject(self):
+        # A subject that has no events during the first dispatch calls.
+        class PolledFeed(RealtimeFeed):
+            def __init__(self):
+                RealtimeFeed.__init__(self, [])
+                self.dispatchCalls = 0
+
+            def eof(self):
+                return self.dispatchCalls == 20
+
+            def dispatch(self):
+                self.dispatchCalls += 1
+                return False
+
+        # Subjects that need to be polled keep the dispatcher from waiting.
+        polled = PolledFeed()
+        feed = EventQueueFeed()
+        disp = dispatcher.Dispatcher()
+        disp.addSubject(feed)
+        disp.addSubject(polled)
+        disp.getIdleEvent().subscribe(lambda: polled.eof() and disp.stop())
+        waits = []
+        disp.getWaker().wait = waits.append
+        disp.run()
+        self.assertEqual(polled.dispatchCalls, 20)
+        self.assertEqual(waits, [])
+
+    def testLocalHTTPServer(self):
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(self.path[1:])
+
+            def log_message(self, *args):
+                pass
+
+        server = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), Handler)
+        serverThread = threading.Thread(target=server.serve_forever)
+        serverThread.start()
+
+        values = []
+        feed = EventQueueFeed()
+        disp = dispatcher.Dispatcher()
+        disp.addSubject(feed)
+
+        def onEvent(value):
+            values.append(value)
+            if len(values) == 3:
+                disp.stop()
+
+        def poller():
+            for i in xrange(3):
+                url = "http://127.0.0.1:%d/%d" % (server.server_address[1], i)
+                feed.getQueue().put(urllib2.urlopen(url).read())
+
+        feed.getEvent().subscribe(onEvent)
+        pollerThread = threading.Thread(target=poller)
+        pollerThread.start()
+        try:
+            disp.run()
+        finally:
+            pollerThread.join()
+            server.shutdown()
+            serverThread.join()
+        self.assertEqual(values, ["0", "1", "2"])
+
 
 class EventTestCase(common.TestCase):
     def testEmitOrder(self):
@@ -0,0 +1,120 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import os
+import shutil
+import stat
+
+import common
+
+from pyalgotrade.barfeed import offsetindex
+from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade.bitcoincharts import barfeed
+from pyalgotrade.utils import dt
+from pyalgotrade import utils
+
+
+def copy_data_file(fileName, tmpPath):
+    ret = os.path.join(tmpPath, fileName)
+    shutil.copy(common.get_data_file_path(fileName), ret)
+    return ret
+
+
+def load_trades(path, useOffsetIndex, fromDateTime=None, toDateTime=None):
+    feed = barfeed.CSVTradeFeed()
+    feed.setUseOffsetIndex(useOffsetIndex)
+    feed.addBarsFromCSV(path, fromDateTime=fromDateTime, toDateTime=toDateTime)
+    return [(dateTime, bars["BTC"].getPrice(), bars["BTC"].getVolume()) for dateTime, bars in feed]
+
+
+class OffsetIndexTestCase(common.TestCase):
+    def testTradeFeed(self):
+        with common.TmpDir() as tmpPath:
+            path = copy_data_file("bitstampUSD.csv", tmpPath)
+            fromDateTime = dt.as_utc(datetime.datetime(2012, 5, 29))
+            toDateTime = datetime.datetime(2012, 5, 31)
+
+            loaded = load_trades(path, True, fromDateTime, toDateTime)
+            self.assertEqual(len(loaded), 579)
+            self.assertEqual(loaded, load_trades(path, False, fromDateTime, toDateTime))
+            self.assertTrue(os.path.exists(offsetindex.get_index_path(path)))
+            # The index gets the same mode as files created with open().
+            self.assertEqual(stat.S_IMODE(os.stat(offsetindex.get_index_path(path)).st_mode), 0666 & ~utils.umask)
+
+            # The index gets reused.
+            index = offsetindex.load_index(path, None)
+            self.assertTrue(index.isSorted())
+            self.assertTrue(index.getOffset(fromDateTime) > index.getDataOffset())
+            loaded = load_trades(path, True, fromDateTime)
+            self.assertEqual(len(loaded), 646)
+            self.assertEqual(loaded[-1][0], dt.as_utc(datetime.datetime(2012, 5, 31, 8, 41, 18, 5)))
+
+            # No date range means no index is needed.
+            self.assertEqual(len(load_trades(path, True)), 9999)
+
+    def testSeek(self):
+        path = common.get_data_file_path("bitstampUSD.csv")
+        rowParser = barfeed.RowParser(barfeed.UnixTimeFix())
+        index = offsetindex.build_index(path, rowParser, 1024)
+        self.assertTrue(len(index.getOffsets()) > 100)
+        allTrades = csvfeed.parse_bars(path, barfeed.RowParser(barfeed.UnixTimeFix()))
+
+        for fromDateTime in [
+            datetime.datetime(2011, 1, 1),
+            datetime.datetime(2011, 9, 13, 13, 53, 36),
+            datetime.datetime(2012, 2, 1, 10, 30, 15, 500),
+            datetime.datetime(2012, 5, 31, 8, 41, 18),
+            datetime.datetime(2013, 1, 1),
+        ]:
+            fromDateTime = dt.as_utc(fromDateTime)
+            toDateTime = fromDateTime + datetime.timedelta(days=7)
+            expected = [bar_.getDateTime() for bar_ in allTrades if fromDateTime <= bar_.getDateTime() <= toDateTime]
+            bars = csvfeed.parse_bars_in_range(path, barfeed.RowParser(barfeed.UnixTimeFix()), fromDateTime, toDateTime, index)
+            self.assertEqual([bar_.getDateTime() for bar_ in bars], expected)
+
+    def testFileChanged(self):
+        with common.TmpDir() as tmpPath:
+            path = copy_data_file("bitstampUSD.csv", tmpPath)
+            fromDateTime = dt.as_utc(datetime.datetime(2012, 5, 31, 8))
+            self.assertEqual(len(load_trades(path, True, fromDateTime)), 14)
+
+            with open(path, "a") as f:
+                f.write("1338454000,5.2,1\n")
+            self.assertEqual(offsetindex.load_index(path, None), None)
+            loaded = load_trades(path, True, fromDateTime)
+            self.assertEqual(len(loaded), 15)
+            self.assertEqual(loaded[-1][1], 5.2)
+
+    def testUnsortedFile(self):
+        with common.TmpDir() as tmpPath:
+            # Yahoo! Finance files are sorted in descending order.
+            path = copy_data_file("orcl-2000-yahoofinance.csv", tmpPath)
+            barFeed = yahoofeed.Feed()
+            barFeed.setUseOffsetIndex(True)
+            barFeed.setBarFilter(csvfeed.DateRangeFilter(datetime.datetime(2000, 3, 1), datetime.datetime(2000, 3, 31)))
+            barFeed.addBarsFromCSV("orcl", path)
+            barFeed.loadAll()
+            self.assertEqual(len(barFeed["orcl"]), 23)
+
+            index = offsetindex.build_index(path, barFeed.createRowParser(), 1024)
+            self.assertFalse(index.isSorted())
+            self.assertFalse(offsetindex.load_index(path, barFeed.createRowParser().getCacheKey()).isSorted())
@@ -0,0 +1,129 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import os
+
+import common
+import feed_test
+
+from pyalgotrade.barfeed import prefetchfeed
+from pyalgotrade.barfeed import streamingfeed
+from pyalgotrade.barfeed import sqlitefeed
+from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade import bar
+from pyalgotrade import strategy
+
+
+FILES = [
+    ("orcl", "orcl-2000-yahoofinance.csv"),
+    ("orcl", "orcl-2001-yahoofinance.csv"),
+    ("spy", "spy-2010-yahoofinance.csv"),
+]
+
+
+def build_yahoo_feed(files=FILES):
+    ret = yahoofeed.Feed()
+    for instrument, fileName in files:
+        ret.addBarsFromCSV(instrument, common.get_data_file_path(fileName))
+    return ret
+
+
+def get_values(barFeed):
+    ret = []
+    for dateTime, bars in barFeed:
+        ret.append((dateTime, sorted([(instrument, bars[instrument].getClose()) for instrument in bars.getInstruments()])))
+    return ret
+
+
+class TestStrategy(strategy.BacktestingStrategy):
+    def __init__(self, barFeed, stopAfter=None):
+        strategy.BacktestingStrategy.__init__(self, barFeed)
+        self.barCount = 0
+        self.__stopAfter = stopAfter
+
+    def onBars(self, bars):
+        self.barCount += 1
+        if self.barCount == self.__stopAfter:
+            self.stop()
+
+
+class PrefetchFeedTestCase(common.TestCase):
+    def testBaseFeedInterface(self):
+        barFeed = prefetchfeed.Feed(build_yahoo_feed())
+        feed_test.tstBaseFeedInterface(self, barFeed)
+
+    def testSameValues(self):
+        expected = get_values(build_yahoo_feed())
+        self.assertEqual(len(expected), 752)
+        for depth, chunkSize in [(1, 1), (2, 7), (2, 256), (3, 1000)]:
+            barFeed = prefetchfeed.Feed(build_yahoo_feed(), depth, chunkSize)
+            self.assertEqual(get_values(barFeed), expected)
+            self.assertEqual(sorted(barFeed.getRegisteredInstruments()), ["orcl", "spy"])
+            self.assertEqual(len(barFeed["orcl"]), 500)
+
+    def testStreamingFeed(self):
+        streamingFeed = streamingfeed.Feed(yahoofeed.Feed())
+        for instrument, fileName in FILES:
+            streamingFeed.addBarsFromCSV(instrument, common.get_data_file_path(fileName))
+        barFeed = prefetchfeed.Feed(streamingFeed, chunkSize=10)
+        self.assertEqual(get_values(barFeed), get_values(build_yahoo_feed()))
+
+        # Reset and replay.
+        barFeed.reset()
+        self.assertEqual(get_values(barFeed), get_values(build_yahoo_feed()))
+
+    def testSQLiteFeed(self):
+        dbFilePath = "PrefetchFeedTestCase.sqlite"
+        if os.path.exists(dbFilePath):
+            os.remove(dbFilePath)
+        try:
+            sqliteFeed = sqlitefeed.StreamingFeed(dbFilePath, bar.Frequency.DAY, fetchSize=10)
+            sqliteFeed.getDatabase().addBarsFromFeed(build_yahoo_feed())
+            sqliteFeed.loadBars("orcl")
+            sqliteFeed.loadBars("spy")
+            barFeed = prefetchfeed.Feed(sqliteFeed, chunkSize=10)
+            # Bars loaded from the database are in UTC.
+            values = [(dateTime.replace(tzinfo=None), closes) for dateTime, closes in get_values(barFeed)]
+            self.assertEqual(values, get_values(build_yahoo_feed()))
+            sqliteFeed.getDatabase().disconnect()
+        finally:
+            os.remove(dbFilePath)
+
+    def testStrategy(self):
+        barFeed = prefetchfeed.Feed(build_yahoo_feed(), chunkSize=10)
+        strat = TestStrategy(barFeed)
+        strat.run()
+        self.assertEqual(strat.barCount, 752)
+
+    def testStopEarly(self):
+        for depth, chunkSize in [(1, 1), (2, 10)]:
+            barFeed = prefetchfeed.Feed(build_yahoo_feed(), depth, chunkSize)
+            strat = TestStrategy(barFeed, 5)
+            strat.run()
+            self.assertEqual(strat.barCount, 5)
+            self.assertTrue(barFeed.eof())
+
+    def testError(self):
+        streamingFeed = streamingfeed.Feed(yahoofeed.Feed())
+        streamingFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2001-yahoofinance.csv"))
+        streamingFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        barFeed = prefetchfeed.Feed(streamingFeed, chunkSize=10)
+        with self.assertRaisesRegexp(Exception, "Bars for orcl are not sorted"):
+            get_values(barFeed)
@@ -0,0 +1,137 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import json
+import threading
+
+import common
+
+from pyalgotrade import strategy
+from pyalgotrade import observer
+from pyalgotrade import profiler
+from pyalgotrade.barfeed import yahoofeed
+
+
+class TestStrategy(strategy.BacktestingStrategy):
+    def __init__(self, barFeed, cash):
+        strategy.BacktestingStrategy.__init__(self, barFeed, cash)
+        self.barCount = 0
+
+    def onBars(self, bars):
+        self.barCount += 1
+
+
+def handler():
+    pass
+
+
+class ProfilerTestCase(common.TestCase):
+    def __runStrategy(self, profilingEnabled):
+        barFeed = yahoofeed.Feed()
+        barFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        strat = TestStrategy(barFeed, 1000)
+        strat.setProfilingEnabled(profilingEnabled)
+        strat.run()
+        return strat
+
+    def testDisabled(self):
+        strat = self.__runStrategy(False)
+        self.assertEqual(strat.getProfiler(), None)
+        self.assertEqual(strat.getProfileReport(), None)
+
+    def testStrategy(self):
+        strat = self.__runStrategy(True)
+        self.assertEqual(observer.get_active_profiler(), None)
+
+        stats = dict((handlerStats.getName(), handlerStats) for handlerStats in strat.getProfiler().getStats())
+        self.assertEqual(stats["TestStrategy.onBars"].getCalls(), strat.barCount)
+        self.assertEqual(stats["BaseStrategy.__onBars"].getCalls(), strat.barCount)
+        self.assertEqual(stats["BaseStrategy.onStart"].getCalls(), 1)
+        for handlerStats in stats.values():
+            self.assertTrue(handlerStats.getSelfWallTime() <= handlerStats.getWallTime() + 1e-9)
+            self.assertTrue(handlerStats.getSelfCPUTime() <= handlerStats.getCPUTime() + 1e-9)
+        # The time spent in onBars is included in __onBars cumulative time, but not in its self time.
+        self.assertTrue(stats["BaseStrategy.__onBars"].getWallTime() >= stats["TestStrategy.onBars"].getWallTime())
+
+        self.assertIn("TestStrategy.onBars", strat.getProfileReport())
+        report = json.loads(strat.getProfiler().getJSONReport())
+        self.assertEqual(len(report["handlers"]), len(stats))
+        self.assertTrue(report["wallTime"] > 0)
+
+    def testEvent(self):
+        event = observer.Event()
+        event.subscribe(handler)
+        prof = profiler.Profiler()
+        event.emit()
+        prof.start()
+        event.emit()
+        event.emit()
+        prof.stop()
+        event.emit()
+        stats = prof.getStats()
+        self.assertEqual(len(stats), 1)
+        self.assertEqual(stats[0].getName(), "%s.handler" % __name__)
+        self.assertEqual(stats[0].getCalls(), 2)
+
+    def testThreads(self):
+        # Events emitted from other threads are not profiled, and each thread can have its own profiler.
+        event = observer.Event()
+        event.subscribe(handler)
+        profilers = []
+
+        def run():
+            prof = profiler.Profiler()
+            prof.start()
+            event.emit()
+            prof.stop()
+            profilers.append(prof)
+
+        prof = profiler.Profiler()
+        prof.start()
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        event.emit()
+        prof.stop()
+
+        self.assertEqual(prof.getStats()[0].getCalls(), 1)
+        self.assertEqual(profilers[0].getStats()[0].getCalls(), 1)
+        self.assertEqual(observer.get_active_profiler(), None)
+
+    def testStrategiesInThreads(self):
+        strats = []
+
+        def run():
+            strats.append(self.__runStrategy(False))
+
+        thread = threading.Thread(target=run)
+        prof = profiler.Profiler()
+        prof.start()
+        thread.start()
+        thread.join()
+        prof.stop()
+        # The strategy ran in another thread, so its handlers were not profiled.
+        self.assertEqual(prof.getStats(), [])
+        self.assertTrue(strats[0].barCount > 0)
+
+    def testHandlerName(self):
+        self.assertEqual(profiler.get_handler_name(handler), "%s.handler" % __name__)
+        self.assertEqual(profiler.get_handler_name(TestStrategy.onBars), "TestStrategy.onBars")
+        self.assertEqual(profiler.get_handler_name(TestStrategy.onStart), "BaseStrategy.onStart")
@@ -0,0 +1,201 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import os
+import threading
+
+import common
+import downloader_test
+
+from pyalgotrade.tools import downloader
+from pyalgotrade.tools import refresh
+from pyalgotrade.tools import yahoofinance
+from pyalgotrade.barfeed import sqlitefeed
+from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade import bar
+from pyalgotrade.utils import dt
+
+
+def get_expected_lines(instrument, fromDate, toDate):
+    ret = []
+    for year in range(fromDate.year, toDate.year + 1):
+        path = common.get_data_file_path("%s-%d-yahoofinance.csv" % (instrument, year))
+        if os.path.exists(path):
+            ret.extend(open(path, "r").read().splitlines()[1:])
+    fromDate = fromDate.strftime("%Y-%m-%d")
+    toDate = toDate.strftime("%Y-%m-%d")
+    return sorted([line for line in ret if fromDate <= line[:10] <= toDate])
+
+
+class ReadLastLineTestCase(common.TestCase):
+    def testReadLastLine(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "file.csv")
+            for content, expected in [
+                ("", None),
+                ("\n\n", None),
+                ("header", "header"),
+                ("header\n", "header"),
+                ("header\nrow1\nrow2", "row2"),
+                ("header\r\nrow1\r\nrow2\r\n\r\n", "row2"),
+                ("header\n" + "x" * (refresh.BLOCK_SIZE * 2) + "\nlast\n", "last"),
+                ("header\n" + "x" * (refresh.BLOCK_SIZE * 2) + "\n", "x" * (refresh.BLOCK_SIZE * 2)),
+            ]:
+                with open(path, "w") as f:
+                    f.write(content)
+                self.assertEqual(refresh.read_last_line(path), expected)
+
+    def testAppendFile(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "file.csv")
+            downloader.append_file(path, "a\n")
+            downloader.append_file(path, "b\n")
+            self.assertEqual(open(path, "r").read(), "a\nb\n")
+            # A line break is added if the file doesn't end with one.
+            downloader.write_file(path, "a")
+            downloader.append_file(path, "b\n")
+            self.assertEqual(open(path, "r").read(), "a\nb\n")
+            self.assertEqual(os.listdir(tmpPath), ["file.csv"])
+
+
+class RefreshTestCase(common.TestCase):
+    def setUp(self):
+        common.TestCase.setUp(self)
+        self.server = downloader_test.HTTPServer()
+        self.serverThread = threading.Thread(target=self.server.serve_forever, args=(0.05,))
+        self.serverThread.daemon = True
+        self.serverThread.start()
+        self.baseUrl = yahoofinance.base_url
+        yahoofinance.base_url = self.server.getURL()
+
+    def tearDown(self):
+        yahoofinance.base_url = self.baseUrl
+        downloader.get_client().close()
+        self.server.shutdown()
+        self.server.server_close()
+        common.TestCase.tearDown(self)
+
+    def testUpdateCSVFile(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "spy.csv")
+            fromDate = datetime.date(2010, 1, 1)
+            toDate = datetime.date(2010, 6, 30)
+            count = yahoofinance.update_daily_bars("spy", path, fromDate, toDate)
+            lines = open(path, "r").read().splitlines()
+            self.assertEqual(lines[0], "Date,Open,High,Low,Close,Volume,Adj Close")
+            self.assertEqual(lines[1:], get_expected_lines("spy", fromDate, toDate))
+            self.assertEqual(count, len(lines) - 1)
+
+            # Only the bars after the last one get downloaded and appended.
+            toDate = datetime.date(2011, 12, 31)
+            count = yahoofinance.update_daily_bars("spy", path, fromDate, toDate)
+            self.assertEqual(open(path, "r").read().splitlines()[1:], get_expected_lines("spy", fromDate, toDate))
+            self.assertEqual(count, len(get_expected_lines("spy", datetime.date(2010, 7, 1), toDate)))
+            self.assertEqual(os.listdir(tmpPath), ["spy.csv"])
+
+            # Up to date.
+            requests = len(self.server.requests)
+            self.assertEqual(yahoofinance.update_daily_bars("spy", path, fromDate, toDate), 0)
+            self.assertEqual(len(self.server.requests), requests + 1)
+            self.assertEqual(yahoofinance.update_daily_bars("spy", path, fromDate, datetime.date(2011, 12, 29)), 0)
+            self.assertEqual(len(self.server.requests), requests + 1)
+
+            # The file can be loaded and it is sorted.
+            rowParser = yahoofeed.RowParser(None, bar.Frequency.DAY)
+            header, lastBar = refresh.get_last_bar(path, rowParser)
+            self.assertEqual(lastBar.getDateTime(), datetime.datetime(2011, 12, 30))
+            barFeed = yahoofeed.Feed()
+            barFeed.addBarsFromCSV("spy", path)
+            self.assertEqual(len([dateTime for dateTime, bars in barFeed]), len(get_expected_lines("spy", fromDate, toDate)))
+
+    def testUpdateDescendingCSVFile(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "spy.csv")
+            # Files downloaded from Yahoo! Finance have the most recent bars first.
+            yahoofinance.download_daily_bars("spy", 2010, path)
+            lines = open(path, "r").read().splitlines()
+            self.assertEqual(lines[1:], get_expected_lines("spy", datetime.date(2010, 1, 1), datetime.date(2010, 12, 31))[::-1])
+
+            rowParser = yahoofeed.RowParser(None, bar.Frequency.DAY)
+            header, lastBar = refresh.get_last_bar(path, rowParser)
+            self.assertEqual(lastBar.getDateTime(), datetime.datetime(2010, 12, 31))
+
+            toDate = datetime.date(2011, 12, 31)
+            count = yahoofinance.update_daily_bars("spy", path, datetime.date(2010, 1, 1), toDate)
+            self.assertEqual(count, len(get_expected_lines("spy", datetime.date(2011, 1, 1), toDate)))
+            lines = open(path, "r").read().splitlines()
+            self.assertEqual(lines[0], "Date,Open,High,Low,Close,Volume,Adj Close")
+            self.assertEqual(lines[1:], get_expected_lines("spy", datetime.date(2010, 1, 1), toDate)[::-1])
+            self.assertEqual(os.listdir(tmpPath), ["spy.csv"])
+
+            # Up to date.
+            self.assertEqual(yahoofinance.update_daily_bars("spy", path, datetime.date(2010, 1, 1), toDate), 0)
+            self.assertEqual(open(path, "r").read().splitlines(), lines)
+
+    def testNoBars(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "orcl.csv")
+            with self.assertRaisesRegexp(downloader.HTTPError, "HTTP Error 404"):
+                yahoofinance.update_daily_bars("orcl", path, datetime.date(2010, 1, 1), datetime.date(2010, 12, 31))
+            self.assertFalse(os.path.exists(path))
+
+    def testColumnsDontMatch(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "spy.csv")
+            downloader.write_file(path, "Date,Open,High,Low,Close,Adj Close,Volume\n2010-01-04,1,1,1,1,1,1\n")
+            with self.assertRaisesRegexp(Exception, "The columns downloaded don't match"):
+                yahoofinance.update_daily_bars("spy", path, datetime.date(2010, 1, 1), datetime.date(2010, 1, 31))
+
+    def testBuildUpdatedFeed(self):
+        with common.TmpDir() as tmpPath:
+            toDate = datetime.date(2010, 12, 31)
+            yahoofinance.build_updated_feed(["spy", "goog"], 2010, tmpPath, toDate, downloads=2, skipErrors=True)
+            # There is no data for goog in 2010.
+            self.assertEqual(os.listdir(tmpPath), ["spy-yahoofinance.csv"])
+
+            toDate = datetime.date(2011, 12, 31)
+            barFeed = yahoofinance.build_updated_feed(["spy", "goog"], 2010, tmpPath, toDate, downloads=2)
+            self.assertEqual(sorted(os.listdir(tmpPath)), ["goog-yahoofinance.csv", "spy-yahoofinance.csv"])
+            for dateTime, bars in barFeed:
+                pass
+            self.assertEqual(len(barFeed["spy"]), len(get_expected_lines("spy", datetime.date(2010, 1, 1), toDate)))
+            self.assertEqual(len(barFeed["goog"]), len(get_expected_lines("goog", datetime.date(2011, 1, 1), toDate)))
+
+    def testUpdateDatabase(self):
+        with common.TmpDir() as tmpPath:
+            db = sqlitefeed.Database(os.path.join(tmpPath, "bars.sqlite"))
+            self.assertEqual(db.getLastDateTime("spy", bar.Frequency.DAY), None)
+
+            failed = yahoofinance.update_database(db, ["spy", "goog", "orcl"], 2010, datetime.date(2011, 6, 30), skipErrors=True, downloads=3)
+            self.assertEqual(failed, set(["orcl"]))
+            self.assertEqual(db.getLastDateTime("spy", bar.Frequency.DAY), dt.as_utc(datetime.datetime(2011, 6, 30)))
+
+            toDate = datetime.date(2011, 12, 31)
+            yahoofinance.update_database(db, ["spy", "goog"], 2010, toDate, downloads=2)
+            for instrument in ["spy", "goog"]:
+                expected = get_expected_lines(instrument, datetime.date(2010, 1, 1), toDate)
+                bars = db.getBars(instrument, bar.Frequency.DAY)
+                self.assertEqual([bar_.getDateTime().strftime("%Y-%m-%d") for bar_ in bars], [line[:10] for line in expected])
+                self.assertEqual(bars[-1].getClose(), float(expected[-1].split(",")[4]))
+
+            with self.assertRaisesRegexp(downloader.HTTPError, "HTTP Error 404"):
+                yahoofinance.update_database(db, ["orcl"], 2010, toDate)
+            db.disconnect()
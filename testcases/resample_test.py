@@ -21,11 +21,16 @@
 import datetime
 import os
 
+import pytz
+
 import common
 
 from pyalgotrade.barfeed import ninjatraderfeed
 from pyalgotrade.barfeed import yahoofeed
 from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import barcache
+from pyalgotrade.barfeed import membf
+from pyalgotrade.bitcoincharts import barfeed as btcbarfeed
 from pyalgotrade.tools import resample
 from pyalgotrade import marketsession
 from pyalgotrade.utils import dt
@@ -35,6 +40,7 @@ from pyalgotrade.dataseries import bards
 from pyalgotrade import bar
 from pyalgotrade import dispatcher
 from pyalgotrade import resamplebase
+from pyalgotrade import strategy
 
 
 class IntraDayRange(common.TestCase):
@@ -161,6 +167,97 @@ class MonthRange(common.TestCase):
         self.assertEqual(r.getEnding(), datetime.datetime(2012, 1, 1))
 
 
+class DSTRange(common.TestCase):
+    def setUp(self):
+        common.TestCase.setUp(self)
+        self.timezone = pytz.timezone("US/Eastern")
+
+    def testFallBackDay(self):
+        begin = self.timezone.localize(datetime.datetime(2011, 11, 6))
+        r = resamplebase.build_range(begin + datetime.timedelta(hours=20), bar.Frequency.DAY)
+        self.assertEqual(r.getBeginning(), begin)
+        self.assertEqual(r.getEnding(), self.timezone.localize(datetime.datetime(2011, 11, 7)))
+        self.assertEqual(r.getEndingMicros() - r.getBeginningMicros(), 25 * 3600 * 1000000)
+        # 23:30 EST is 25 hours and a half after midnight EDT.
+        self.assertTrue(r.belongs(dt.localize(begin + datetime.timedelta(hours=24, minutes=30), self.timezone)))
+        self.assertFalse(r.belongs(dt.localize(begin + datetime.timedelta(hours=25), self.timezone)))
+
+    def testSpringForwardDay(self):
+        begin = self.timezone.localize(datetime.datetime(2011, 3, 13))
+        r = resamplebase.build_range(begin, bar.Frequency.DAY)
+        self.assertEqual(r.getEndingMicros() - r.getBeginningMicros(), 23 * 3600 * 1000000)
+        self.assertTrue(r.belongs(dt.localize(begin + datetime.timedelta(hours=22, minutes=59), self.timezone)))
+        self.assertFalse(r.belongs(dt.localize(begin + datetime.timedelta(hours=23), self.timezone)))
+
+    def testAmbiguousHour(self):
+        edt = self.timezone.localize(datetime.datetime(2011, 11, 6, 1, 30), is_dst=True)
+        est = self.timezone.localize(datetime.datetime(2011, 11, 6, 1, 30), is_dst=False)
+        r1 = resamplebase.build_range(edt, bar.Frequency.HOUR)
+        r2 = resamplebase.build_range(est, bar.Frequency.HOUR)
+        self.assertNotEqual(r1.getBeginningMicros(), r2.getBeginningMicros())
+        self.assertEqual(r1.getEndingMicros(), r2.getBeginningMicros())
+        self.assertTrue(r1.belongs(edt))
+        self.assertFalse(r1.belongs(est))
+        self.assertEqual(r2.getBeginning().replace(tzinfo=None), datetime.datetime(2011, 11, 6, 1))
+
+    def testMonth(self):
+        r = resamplebase.build_range(self.timezone.localize(datetime.datetime(2011, 11, 15)), bar.Frequency.MONTH)
+        self.assertEqual(r.getBeginning(), self.timezone.localize(datetime.datetime(2011, 11, 1)))
+        self.assertEqual(r.getEnding(), self.timezone.localize(datetime.datetime(2011, 12, 1)))
+        self.assertEqual(r.getEndingMicros() - r.getBeginningMicros(), (30 * 24 + 1) * 3600 * 1000000)
+
+    def testBoundariesAreCached(self):
+        dateTime = self.timezone.localize(datetime.datetime(2011, 11, 6, 12))
+        r1 = resamplebase.build_range(dateTime, bar.Frequency.DAY)
+        r2 = resamplebase.build_range(dateTime + datetime.timedelta(hours=1), bar.Frequency.DAY)
+        self.assertTrue(r1.getBeginning() is r2.getBeginning())
+
+    def testBoundariesCacheIsBounded(self):
+        prevMaxCached = resamplebase.MAX_CACHED_BOUNDARIES
+        resamplebase.MAX_CACHED_BOUNDARIES = 10
+        try:
+            dateTime = self.timezone.localize(datetime.datetime(2011, 1, 1, 12))
+            for i in range(100):
+                r = resamplebase.build_range(dateTime + datetime.timedelta(days=i), bar.Frequency.DAY)
+                self.assertTrue(len(resamplebase.boundaries_cache) <= 10)
+            self.assertEqual(r.getBeginning(), self.timezone.localize(datetime.datetime(2011, 4, 10)))
+        finally:
+            resamplebase.MAX_CACHED_BOUNDARIES = prevMaxCached
+
+    def testNonPytzTimezone(self):
+        class FixedOffset(datetime.tzinfo):
+            def utcoffset(self, dateTime):
+                return datetime.timedelta(hours=5, minutes=30)
+
+            def dst(self, dateTime):
+                return datetime.timedelta(0)
+
+        timezone = FixedOffset()
+        dateTime = datetime.datetime(2011, 11, 6, 12, 40, tzinfo=timezone)
+        r = resamplebase.build_range(dateTime, bar.Frequency.HOUR)
+        # Slots are aligned to UTC hours.
+        self.assertEqual(r.getBeginning(), datetime.datetime(2011, 11, 6, 12, 30, tzinfo=timezone))
+        self.assertEqual(r.getEnding(), datetime.datetime(2011, 11, 6, 13, 30, tzinfo=timezone))
+        self.assertEqual(r.getBeginning().tzinfo, timezone)
+        self.assertTrue(r.belongs(dateTime))
+
+    def testNaiveIsUTC(self):
+        dateTime = datetime.datetime(2011, 11, 6, 12)
+        self.assertEqual(resamplebase.datetime_to_micros(dateTime), resamplebase.datetime_to_micros(pytz.utc.localize(dateTime)))
+        self.assertEqual(resamplebase.datetime_to_micros(dateTime), dt.datetime_to_timestamp(dateTime) * 1000000)
+
+    def testResampleFallBackDay(self):
+        barDs = bards.BarDataSeries()
+        resampledBarDS = resampled_ds.ResampledBarDataSeries(barDs, bar.Frequency.DAY)
+        dateTime = pytz.utc.localize(datetime.datetime(2011, 11, 6, 4))
+        for i in range(26):
+            barDateTime = dt.localize(dateTime + datetime.timedelta(hours=i), self.timezone)
+            barDs.append(bar.BasicBar(barDateTime, 1, 1, 1, 1, 10, 1, bar.Frequency.HOUR))
+        self.assertEqual(len(resampledBarDS), 1)
+        self.assertEqual(resampledBarDS[0].getDateTime(), self.timezone.localize(datetime.datetime(2011, 11, 6)))
+        self.assertEqual(resampledBarDS[0].getVolume(), 250)
+
+
 class DataSeriesTestCase(common.TestCase):
 
     def testResample(self):
@@ -291,3 +388,286 @@ class BarFeedTestCase(common.TestCase):
         # Check last bar
         self.assertEqual(weeklySpyBarDS[-1].getDateTime().date(), datetime.date(2010, 11, 1))
         self.assertEqual(weeklyNikkeiBarDS[-1].getDateTime().date(), datetime.date(2010, 11, 1))
+
+    def testRangesNest(self):
+        self.assertTrue(resampled_bf.ranges_nest(bar.Frequency.MINUTE * 15, bar.Frequency.MINUTE * 5))
+        self.assertTrue(resampled_bf.ranges_nest(bar.Frequency.HOUR, bar.Frequency.MINUTE * 15))
+        self.assertTrue(resampled_bf.ranges_nest(bar.Frequency.DAY, bar.Frequency.HOUR))
+        self.assertTrue(resampled_bf.ranges_nest(bar.Frequency.MONTH, bar.Frequency.DAY))
+        self.assertTrue(resampled_bf.ranges_nest(bar.Frequency.MONTH, bar.Frequency.MINUTE))
+        self.assertFalse(resampled_bf.ranges_nest(bar.Frequency.HOUR, bar.Frequency.MINUTE * 7))
+        self.assertFalse(resampled_bf.ranges_nest(bar.Frequency.DAY, bar.Frequency.MINUTE * 7))
+        self.assertFalse(resampled_bf.ranges_nest(bar.Frequency.HOUR, bar.Frequency.HOUR))
+        self.assertFalse(resampled_bf.ranges_nest(bar.Frequency.MINUTE, bar.Frequency.HOUR))
+
+    def testRangeNests(self):
+        kolkata = pytz.timezone("Asia/Kolkata")
+        dayRange = resamplebase.build_range(dt.localize(datetime.datetime(2011, 1, 3, 12), kolkata), bar.Frequency.DAY)
+        self.assertTrue(resampled_bf.range_nests(dayRange, bar.Frequency.MINUTE * 30))
+        self.assertFalse(resampled_bf.range_nests(dayRange, bar.Frequency.HOUR))
+
+        # Lord Howe Island goes back from UTC+11 to UTC+10:30 on 2011-04-03.
+        lordHowe = pytz.timezone("Australia/Lord_Howe")
+        dayRange = resamplebase.build_range(dt.localize(datetime.datetime(2011, 4, 2, 12), lordHowe), bar.Frequency.DAY)
+        self.assertTrue(resampled_bf.range_nests(dayRange, bar.Frequency.HOUR))
+        dayRange = resamplebase.build_range(dt.localize(datetime.datetime(2011, 4, 3, 12), lordHowe), bar.Frequency.DAY)
+        self.assertFalse(resampled_bf.range_nests(dayRange, bar.Frequency.HOUR))
+        self.assertTrue(resampled_bf.range_nests(dayRange, bar.Frequency.MINUTE * 30))
+
+    # Checks that grouping bars grouped by the previous frequency gives the same bars as grouping the source bars.
+    def __testResampleTree(self, barFeed, frequencies):
+        # Every bar feed grouping the source bars, and every bar feed grouping the previous one.
+        flat = []
+        tree = []
+        for frequency in frequencies:
+            flat.append(resampled_bf.ResampledBarFeed(barFeed, frequency))
+            tree.append(resampled_bf.ResampledBarFeed(tree[-1] if len(tree) else barFeed, frequency))
+        self.assertTrue(tree[-1].getBarFeed() is tree[-2])
+
+        values = {}
+
+        def record(resampledBarFeed):
+            values[resampledBarFeed] = []
+
+            def onBars(dateTime, bars):
+                values[resampledBarFeed].append((barFeed.getCurrentDateTime(), get_bar_values([bars["spy"]])[0]))
+            resampledBarFeed.getNewValuesEvent().subscribe(onBars)
+
+        disp = dispatcher.Dispatcher()
+        disp.addSubject(barFeed)
+        for resampledBarFeed in flat + tree:
+            record(resampledBarFeed)
+            disp.addSubject(resampledBarFeed)
+        disp.run()
+
+        for flatBarFeed, treeBarFeed in zip(flat, tree):
+            self.assertTrue(len(values[flatBarFeed]) > 10)
+            self.assertEqual(len(values[treeBarFeed]), len(values[flatBarFeed]))
+            for (flatDateTime, flatValues), (treeDateTime, treeValues) in zip(values[flatBarFeed], values[treeBarFeed]):
+                # Bars are generated at the same time.
+                self.assertEqual(treeDateTime, flatDateTime)
+                self.assertEqual(treeValues[:5], flatValues[:5])
+                # Volumes are added in a different order.
+                self.assertEqual(round(treeValues[5], 6), round(flatValues[5], 6))
+                self.assertEqual(treeValues[6:], flatValues[6:])
+        return flat, tree
+
+    def testResampleTree(self):
+        barFeed = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE, marketsession.USEquities.getTimezone())
+        barFeed.addBarsFromCSV("spy", common.get_data_file_path("nt-spy-minute-2011.csv"))
+        frequencies = [bar.Frequency.MINUTE * 5, bar.Frequency.MINUTE * 15, bar.Frequency.HOUR, bar.Frequency.DAY]
+        flat, tree = self.__testResampleTree(barFeed, frequencies)
+
+        # Pending bars are pushed from the top of the tree.
+        checkDateTime = dt.localize(datetime.datetime(2011, 3, 1), marketsession.USEquities.getTimezone())
+        tree[-1].checkNow(checkDateTime)
+        for flatBarFeed in flat:
+            flatBarFeed.checkNow(checkDateTime)
+        self.assertEqual(get_bar_values([tree[-1].getNextBars()["spy"]]), get_bar_values([flat[-1].getNextBars()["spy"]]))
+        self.assertEqual(tree[0].getNextBars().getDateTime(), flat[0].getNextBars().getDateTime())
+        self.assertEqual(tree[0].getNextBars(), None)
+
+    def testResampleTreeHalfHourOffset(self):
+        # Day ranges begin at half past an hour in UTC, so they nest 30 minute ranges but not 1 hour ranges.
+        barFeed = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE, pytz.timezone("Asia/Kolkata"))
+        barFeed.addBarsFromCSV("spy", common.get_data_file_path("nt-spy-minute-2011.csv"))
+        self.__testResampleTree(barFeed, [bar.Frequency.MINUTE * 30, bar.Frequency.HOUR, bar.Frequency.DAY])
+
+    def testResampleTreeOffsetChange(self):
+        # Lord Howe Island goes back from UTC+11 to UTC+10:30 on 2011-04-03, so 1 hour ranges nest into the days
+        # before but not into the days after.
+        timezone = pytz.timezone("Australia/Lord_Howe")
+        bars = []
+        dateTime = pytz.utc.localize(datetime.datetime(2011, 3, 28))
+        for i in xrange(12 * 24 * 4):
+            barDateTime = dt.localize(dateTime + datetime.timedelta(minutes=15 * i), timezone)
+            bars.append(bar.BasicBar(barDateTime, i, i + 2, i - 1, i + 1, 10, None, bar.Frequency.MINUTE * 15))
+        barFeed = MemBarFeed(bar.Frequency.MINUTE * 15)
+        barFeed.addBarsFromSequence("spy", bars)
+        flat, tree = self.__testResampleTree(barFeed, [bar.Frequency.HOUR, bar.Frequency.DAY])
+        self.assertTrue(tree[-1].getBarFeed() is tree[-2])
+
+    def testStrategyResampleTree(self):
+        barFeed = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE)
+        barFeed.addBarsFromCSV("spy", common.get_data_file_path("nt-spy-minute-2011.csv"))
+        strat = ResampleStrategy(barFeed)
+        strat.run()
+        # 1 hour bars were requested before 15 minute bars.
+        self.assertTrue(strat.resampled[bar.Frequency.HOUR].getBarFeed() is strat.resampled[bar.Frequency.MINUTE * 5])
+        self.assertTrue(strat.resampled[bar.Frequency.MINUTE * 15].getBarFeed() is strat.resampled[bar.Frequency.MINUTE * 5])
+        self.assertTrue(strat.resampled[bar.Frequency.DAY].getBarFeed() is strat.resampled[bar.Frequency.HOUR])
+        self.assertTrue(strat.resampled[bar.Frequency.MINUTE * 5].getBarFeed() is barFeed)
+        # The same as grouping every bar for every frequency. The last groups are never complete.
+        self.assertEqual(strat.counts[bar.Frequency.HOUR], 339)
+        self.assertEqual(strat.counts[bar.Frequency.DAY], 24)
+
+    def testStrategyResampleHalfHourOffset(self):
+        barFeed = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE, pytz.timezone("Asia/Kolkata"))
+        barFeed.addBarsFromCSV("spy", common.get_data_file_path("nt-spy-minute-2011.csv"))
+        strat = ResampleStrategy(barFeed)
+        strat.run()
+        self.assertTrue(strat.resampled[bar.Frequency.DAY].getBarFeed() is strat.resampled[bar.Frequency.HOUR])
+        # The last group is never complete.
+        barFeed = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE, pytz.timezone("Asia/Kolkata"))
+        barFeed.addBarsFromCSV("spy", common.get_data_file_path("nt-spy-minute-2011.csv"))
+        days = set([bar_.getDateTime().date() for bar_ in load_bars(barFeed, "spy")])
+        self.assertEqual(strat.counts[bar.Frequency.DAY], len(days) - 1)
+
+
+class MemBarFeed(membf.BarFeed):
+    def barsHaveAdjClose(self):
+        return False
+
+
+class ResampleStrategy(strategy.BacktestingStrategy):
+    def __init__(self, barFeed):
+        strategy.BacktestingStrategy.__init__(self, barFeed)
+        self.resampled = {}
+        self.counts = {}
+        for frequency in [bar.Frequency.MINUTE * 5, bar.Frequency.HOUR, bar.Frequency.MINUTE * 15, bar.Frequency.DAY]:
+            self.counts[frequency] = 0
+            self.resampled[frequency] = self.resampleBarFeed(frequency, self.__buildCallback(frequency))
+
+    def __buildCallback(self, frequency):
+        def callback(dateTime, bars):
+            self.counts[frequency] += 1
+        return callback
+
+    def onBars(self, bars):
+        pass
+
+
+def load_bars(barFeed, instrument):
+    return [bars[instrument] for dateTime, bars in barFeed if instrument in bars]
+
+
+def resample_with_dataseries(bars, frequency):
+    barDS = bards.BarDataSeries(len(bars))
+    resampledBarDS = resampled_ds.ResampledBarDataSeries(barDS, frequency, len(bars))
+    for bar_ in bars:
+        barDS.append(bar_)
+    resampledBarDS.pushLast()
+    return resampledBarDS[:]
+
+
+def get_bar_values(bars):
+    return [
+        (bar_.getDateTime(), bar_.getOpen(), bar_.getHigh(), bar_.getLow(), bar_.getClose(), bar_.getVolume(), bar_.getAdjClose(), bar_.getFrequency())
+        for bar_ in bars
+    ]
+
+
+class BulkResampleTestCase(common.TestCase):
+    def __testSameAsDataSeries(self, bars, frequencies):
+        for frequency in frequencies:
+            expected = get_bar_values(resample_with_dataseries(bars, frequency))
+            self.assertTrue(len(expected) > 0)
+            resampledBars = resample.resample_bars(bars, frequency)
+            values = get_bar_values(resampledBars)
+            self.assertEqual(len(values), len(expected))
+            for barValues, expectedValues in zip(values, expected):
+                self.assertEqual(barValues[:5], expectedValues[:5])
+                # Volumes are added in a different order.
+                self.assertEqual(round(barValues[5], 6), round(expectedValues[5], 6))
+                self.assertEqual(barValues[6:], expectedValues[6:])
+            self.assertEqual(resampledBars[0].getDateTime().tzinfo, expected[0][0].tzinfo)
+
+    def testNinjaTraderMinutes(self):
+        feed = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE)
+        feed.addBarsFromCSV("spy", common.get_data_file_path("nt-spy-minute-2011.csv"))
+        frequencies = [bar.Frequency.MINUTE * 5, bar.Frequency.MINUTE * 7, bar.Frequency.HOUR, bar.Frequency.DAY, bar.Frequency.MONTH]
+        self.__testSameAsDataSeries(load_bars(feed, "spy"), frequencies)
+
+    def testNinjaTraderMinutesLocalized(self):
+        feed = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE, marketsession.USEquities.getTimezone())
+        feed.addBarsFromCSV("spy", common.get_data_file_path("nt-spy-minute-2011.csv"))
+        frequencies = [bar.Frequency.HOUR, bar.Frequency.DAY, bar.Frequency.MONTH]
+        self.__testSameAsDataSeries(load_bars(feed, "spy"), frequencies)
+
+    def testYahooDays(self):
+        feed = yahoofeed.Feed()
+        feed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        self.__testSameAsDataSeries(load_bars(feed, "orcl"), [bar.Frequency.DAY, bar.Frequency.MONTH])
+
+    def testTrades(self):
+        feed = btcbarfeed.CSVTradeFeed()
+        feed.addBarsFromCSV(common.get_data_file_path("bitstampUSD.csv"))
+        self.__testSameAsDataSeries(load_bars(feed, "BTC"), [bar.Frequency.MINUTE, bar.Frequency.DAY])
+
+    def testBeforeEpoch(self):
+        dateTimes = [
+            datetime.datetime(1969, 12, 31, 23, 58, 30, 500000),
+            datetime.datetime(1969, 12, 31, 23, 59),
+            datetime.datetime(1969, 12, 31, 23, 59, 59, 500000),
+            datetime.datetime(1970, 1, 1, 0, 0, 0, 500000),
+        ]
+        bars = [bar.BasicBar(dateTime, 1, 1, 1, 1, 1, None, bar.Frequency.SECOND) for dateTime in dateTimes]
+        resampledBars = resample.resample_bars(bars, bar.Frequency.MINUTE)
+        self.assertEqual([bar_.getDateTime() for bar_ in resampledBars], [
+            datetime.datetime(1969, 12, 31, 23, 58),
+            datetime.datetime(1969, 12, 31, 23, 59),
+            datetime.datetime(1970, 1, 1),
+        ])
+        self.assertEqual([bar_.getVolume() for bar_ in resampledBars], [1, 2, 1])
+        self.__testSameAsDataSeries(bars, [bar.Frequency.MINUTE, bar.Frequency.HOUR])
+
+    def testUnsorted(self):
+        bars = [
+            bar.BasicBar(datetime.datetime(2011, 1, 2), 1, 1, 1, 1, 1, None, bar.Frequency.DAY),
+            bar.BasicBar(datetime.datetime(2011, 1, 1), 1, 1, 1, 1, 1, None, bar.Frequency.DAY),
+        ]
+        with self.assertRaisesRegexp(Exception, "Bars are not sorted"):
+            resample.resample_bars(bars, bar.Frequency.MONTH)
+        self.assertEqual(resample.resample_bars([], bar.Frequency.MONTH), [])
+
+    def testResampleFilesToCSV(self):
+        with common.TmpDir() as tmpPath:
+            feed = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE)
+            feed.addBarsFromCSV("spy", common.get_data_file_path("nt-spy-minute-2011.csv"))
+            expectedFile = os.path.join(tmpPath, "expected.csv")
+            resample.resample_to_csv(feed, bar.Frequency.HOUR, expectedFile)
+
+            files = [("spy", common.get_data_file_path("nt-spy-minute-2011.csv"))]
+            barFeed = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE)
+            paths = resample.resample_files(barFeed, files, bar.Frequency.HOUR, os.path.join(tmpPath, "out"))
+            self.assertEqual(paths, [os.path.join(tmpPath, "out", "spy.csv")])
+
+            expected = []
+            for path in [expectedFile, paths[0]]:
+                loadedFeed = csvfeed.GenericBarFeed(bar.Frequency.HOUR)
+                loadedFeed.addBarsFromCSV("spy", path)
+                expected.append(get_bar_values(load_bars(loadedFeed, "spy")))
+            self.assertEqual(len(expected[0]), 340)
+            self.assertEqual(expected[1], expected[0])
+
+    def testResampleFilesInParallel(self):
+        files = [
+            ("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv")),
+            ("spy", common.get_data_file_path("spy-2010-yahoofinance.csv")),
+            ("orcl", common.get_data_file_path("orcl-2001-yahoofinance.csv")),
+        ]
+        with common.TmpDir() as tmpPath:
+            for processes, binary in [(1, True), (2, True), (2, False)]:
+                outputDir = os.path.join(tmpPath, "%d-%s" % (processes, binary))
+                paths = resample.resample_files(yahoofeed.Feed(), files, bar.Frequency.MONTH, outputDir, processes=processes, binary=binary)
+                self.assertEqual([os.path.basename(path) for path in paths], ["orcl" + os.path.splitext(paths[0])[1], "spy" + os.path.splitext(paths[0])[1]])
+
+                for instrument, path in zip(["orcl", "spy"], paths):
+                    barFeed = yahoofeed.Feed()
+                    for fileInstrument, filePath in files:
+                        if fileInstrument == instrument:
+                            barFeed.addBarsFromCSV(instrument, filePath)
+                    expected = get_bar_values(resample_with_dataseries(load_bars(barFeed, instrument), bar.Frequency.MONTH))
+                    if binary:
+                        self.assertEqual(get_bar_values(barcache.load_packed_bars(os.path.splitext(path)[0])), expected)
+                    else:
+                        loadedFeed = csvfeed.GenericBarFeed(bar.Frequency.MONTH)
+                        loadedFeed.addBarsFromCSV(instrument, path)
+                        self.assertEqual(get_bar_values(load_bars(loadedFeed, instrument)), expected)
+                self.assertEqual(len(expected), 12)
+
+    def testResampleFilesError(self):
+        with common.TmpDir() as tmpPath:
+            files = [("orcl", os.path.join(tmpPath, "missing.csv"))]
+            with self.assertRaisesRegexp(Exception, "Failed to resample 1 instrument"):
+                resample.resample_files(yahoofeed.Feed(), files, bar.Frequency.MONTH, tmpPath)
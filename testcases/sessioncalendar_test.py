@@ -0,0 +1,146 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+
+import pytz
+
+import common
+
+from pyalgotrade import sessioncalendar
+from pyalgotrade import marketsession
+from pyalgotrade import resamplebase
+from pyalgotrade import bar
+from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import ninjatraderfeed
+from pyalgotrade.utils import dt
+
+
+def minutes(begin, end):
+    ret = []
+    while begin < end:
+        ret.append(begin)
+        begin += datetime.timedelta(minutes=1)
+    return ret
+
+
+class SessionCalendarTestCase(common.TestCase):
+    def setUp(self):
+        common.TestCase.setUp(self)
+        self.calendar = marketsession.USEquities.getCalendar()
+        self.timezone = marketsession.USEquities.getTimezone()
+
+    def testHolidays(self):
+        holidays = [
+            datetime.date(2011, 1, 17), datetime.date(2011, 2, 21), datetime.date(2011, 4, 22), datetime.date(2011, 5, 30),
+            datetime.date(2011, 7, 4), datetime.date(2011, 9, 5), datetime.date(2011, 11, 24), datetime.date(2011, 12, 26)
+        ]
+        for date in holidays:
+            self.assertEqual(self.calendar.getSession(date), None)
+        # New Year's Day on a Saturday is not observed.
+        self.assertNotEqual(self.calendar.getSession(datetime.date(2010, 12, 31)), None)
+        # Weekends.
+        self.assertEqual(self.calendar.getSession(datetime.date(2011, 1, 1)), None)
+        self.assertFalse(self.calendar.inSession(datetime.datetime(2011, 1, 1, 12)))
+
+    def testSessions(self):
+        openDateTime, closeDateTime = self.calendar.getSession(datetime.date(2011, 1, 3))
+        self.assertEqual(openDateTime, self.timezone.localize(datetime.datetime(2011, 1, 3, 9, 30)))
+        self.assertEqual(closeDateTime, self.timezone.localize(datetime.datetime(2011, 1, 3, 16)))
+        self.assertEqual(dt.as_utc(openDateTime), dt.as_utc(datetime.datetime(2011, 1, 3, 14, 30)))
+        # Daylight saving time.
+        openDateTime, closeDateTime = self.calendar.getSession(datetime.date(2011, 7, 1))
+        self.assertEqual(dt.as_utc(openDateTime), dt.as_utc(datetime.datetime(2011, 7, 1, 13, 30)))
+        # Early close.
+        openDateTime, closeDateTime = self.calendar.getSession(datetime.date(2011, 11, 25))
+        self.assertEqual(closeDateTime, self.timezone.localize(datetime.datetime(2011, 11, 25, 13)))
+
+    def testLocalSessions(self):
+        fromDate = datetime.date(2011, 11, 21)
+        toDate = datetime.date(2011, 11, 28)
+        days, opens, closes = self.calendar.getLocalSessions(fromDate, toDate)
+        epoch = resamplebase.EPOCH.date()
+        dates = [epoch + datetime.timedelta(days=int(day)) for day in days]
+        self.assertEqual([date.day for date in dates], [21, 22, 23, 25, 28])
+        for date, openMicros, closeMicros in zip(dates, opens, closes):
+            openDateTime, closeDateTime = self.calendar.getSession(date)
+            self.assertEqual(resamplebase.datetime_to_micros(openDateTime.replace(tzinfo=None)), openMicros)
+            self.assertEqual(resamplebase.datetime_to_micros(closeDateTime.replace(tzinfo=None)), closeMicros)
+        # Across years.
+        days, opens, closes = self.calendar.getLocalSessions(datetime.date(2010, 12, 30), datetime.date(2011, 1, 4))
+        self.assertEqual(len(days), 4)
+        days, opens, closes = self.calendar.getLocalSessions(toDate, fromDate)
+        self.assertEqual(len(days), 0)
+
+    def testIsOpen(self):
+        self.assertFalse(self.calendar.isOpen(datetime.datetime(2011, 1, 3, 9, 29)))
+        self.assertTrue(self.calendar.isOpen(datetime.datetime(2011, 1, 3, 9, 30)))
+        self.assertTrue(self.calendar.isOpen(datetime.datetime(2011, 1, 3, 15, 59)))
+        self.assertFalse(self.calendar.isOpen(datetime.datetime(2011, 1, 3, 16)))
+        self.assertTrue(self.calendar.inSession(datetime.datetime(2011, 1, 3, 16)))
+        self.assertFalse(self.calendar.inSession(datetime.datetime(2011, 1, 3, 16, 1)))
+        # Aware datetimes.
+        self.assertTrue(self.calendar.isOpen(dt.as_utc(datetime.datetime(2011, 1, 3, 14, 30))))
+        self.assertFalse(self.calendar.isOpen(dt.as_utc(datetime.datetime(2011, 7, 1, 20))))
+        self.assertTrue(self.calendar.isOpen(dt.as_utc(datetime.datetime(2011, 7, 1, 19, 59))))
+
+    def testIsLastBar(self):
+        self.assertFalse(self.calendar.isLastBar(datetime.datetime(2011, 1, 3, 15, 58), bar.Frequency.MINUTE))
+        self.assertTrue(self.calendar.isLastBar(datetime.datetime(2011, 1, 3, 15, 59), bar.Frequency.MINUTE))
+        self.assertTrue(self.calendar.isLastBar(datetime.datetime(2011, 1, 3, 16), bar.Frequency.MINUTE))
+        self.assertTrue(self.calendar.isLastBar(datetime.datetime(2011, 1, 3, 15), bar.Frequency.HOUR))
+        self.assertTrue(self.calendar.isLastBar(datetime.datetime(2011, 11, 25, 12, 59), bar.Frequency.MINUTE))
+        self.assertFalse(self.calendar.isLastBar(datetime.datetime(2011, 11, 25, 16), bar.Frequency.MINUTE))
+
+    def testMaskSameAsLookups(self):
+        # A week with a DST change and a week with a holiday.
+        dateTimes = minutes(datetime.datetime(2011, 3, 10), datetime.datetime(2011, 3, 16))
+        dateTimes.extend(minutes(datetime.datetime(2011, 11, 22), datetime.datetime(2011, 11, 28)))
+        timestamps = [resamplebase.datetime_to_micros(self.timezone.localize(dateTime)) for dateTime in dateTimes]
+        mask = self.calendar.inSessionMask(timestamps)
+        self.assertEqual(mask.tolist(), [self.calendar.inSession(dateTime) for dateTime in dateTimes])
+        self.assertEqual(mask.sum(), (391 * 4) + (391 * 2 + 211))
+        self.assertEqual(self.calendar.inSessionMask([]).tolist(), [])
+
+    def testSessionsAcrossUTCDays(self):
+        timezone = pytz.timezone("Australia/Sydney")
+        calendar = sessioncalendar.SessionCalendar(timezone, datetime.time(10), datetime.time(16))
+        # Opens at 23:00 UTC the day before.
+        dateTime = dt.as_utc(datetime.datetime(2012, 12, 31, 23, 30))
+        self.assertTrue(calendar.isOpen(dateTime))
+        self.assertTrue(calendar.isOpen(timezone.localize(datetime.datetime(2013, 1, 1, 10, 30))))
+        self.assertEqual(calendar.inSessionMask([resamplebase.datetime_to_micros(dateTime)]).tolist(), [True])
+        self.assertFalse(calendar.isOpen(dt.as_utc(datetime.datetime(2012, 12, 31, 22, 30))))
+
+    def testNoTradingHours(self):
+        with self.assertRaisesRegexp(Exception, "Trading hours for TSE are not available"):
+            marketsession.TSE.getCalendar()
+
+    def testRTHFilter(self):
+        barFilter = csvfeed.USEquitiesRTH()
+        rowParser = ninjatraderfeed.RowParser(ninjatraderfeed.Frequency.MINUTE, None, self.timezone)
+        bars = csvfeed.load_bars(common.get_data_file_path("nt-spy-minute-2011.csv"), rowParser)
+        filtered = barFilter.filterBars(bars)
+        self.assertEqual(filtered, [bar_ for bar_ in bars if barFilter.includeBar(bar_)])
+        self.assertTrue(len(filtered) < len(bars))
+        for bar_ in filtered:
+            barTime = bar_.getDateTime().time()
+            self.assertTrue(bar_.getDateTime().weekday() < 5)
+            self.assertTrue(barTime >= datetime.time(9, 30) and barTime <= datetime.time(16))
@@ -0,0 +1,163 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import os
+
+import common
+
+from pyalgotrade.barfeed import streamingfeed
+from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade.barfeed import csvfeed
+from pyalgotrade import bar
+from pyalgotrade import strategy
+from pyalgotrade import marketsession
+
+
+FILES = [
+    ("orcl", "orcl-2000-yahoofinance.csv"),
+    ("orcl", "orcl-2001-yahoofinance.csv"),
+    ("spy", "spy-2010-yahoofinance.csv"),
+    ("spy", "spy-2011-yahoofinance.csv"),
+    ("nikkei", "nikkei-2010-yahoofinance.csv"),
+]
+
+
+def get_values(barFeed):
+    ret = []
+    for dateTime, bars in barFeed:
+        ret.append((dateTime, sorted([(instrument, bars[instrument].getClose()) for instrument in bars.getInstruments()])))
+    return ret
+
+
+def write_file(src, dst, transform):
+    lines = open(src).readlines()
+    with open(dst, "w") as f:
+        f.write(lines[0])
+        f.writelines(transform(lines[1:]))
+
+
+class TestStrategy(strategy.BacktestingStrategy):
+    def __init__(self, barFeed):
+        strategy.BacktestingStrategy.__init__(self, barFeed)
+        self.barCount = 0
+
+    def onBars(self, bars):
+        self.barCount += 1
+
+
+class StreamingFeedTestCase(common.TestCase):
+    def __buildFeeds(self, files, timezone=None):
+        memFeed = yahoofeed.Feed()
+        streamingFeed = streamingfeed.Feed(yahoofeed.Feed())
+        for instrument, fileName in files:
+            path = common.get_data_file_path(fileName)
+            memFeed.addBarsFromCSV(instrument, path, timezone)
+            streamingFeed.addBarsFromCSV(instrument, path, timezone)
+        return memFeed, streamingFeed
+
+    def testSameAsMemBarFeed(self):
+        memFeed, streamingFeed = self.__buildFeeds(FILES)
+        expected = get_values(memFeed)
+        self.assertEqual(len(expected), 1012)
+        self.assertEqual(get_values(streamingFeed), expected)
+        self.assertEqual(streamingFeed.getRegisteredInstruments(), memFeed.getRegisteredInstruments())
+        self.assertEqual(len(streamingFeed["orcl"]), 500)
+
+    def testLocalized(self):
+        memFeed, streamingFeed = self.__buildFeeds(FILES[2:4], marketsession.USEquities.getTimezone())
+        self.assertEqual(get_values(streamingFeed), get_values(memFeed))
+        self.assertEqual(streamingFeed["spy"][0].getDateTime().tzinfo.zone, "US/Eastern")
+
+    def testReset(self):
+        memFeed, streamingFeed = self.__buildFeeds(FILES[:2])
+        values = get_values(streamingFeed)
+        self.assertTrue(streamingFeed.eof())
+        streamingFeed.reset()
+        self.assertEqual(get_values(streamingFeed), values)
+
+    def testStrategy(self):
+        memFeed, streamingFeed = self.__buildFeeds(FILES[:3])
+        strat = TestStrategy(streamingFeed)
+        strat.run()
+        self.assertEqual(strat.barCount, 752)
+        self.assertEqual(strat.getFeed().getCurrentDateTime(), streamingFeed["spy"][-1].getDateTime())
+
+    def testBarFilter(self):
+        csvBarFeed = yahoofeed.Feed()
+        csvBarFeed.setBarFilter(csvfeed.DateRangeFilter(toDate=datetime.datetime(2000, 1, 31)))
+        streamingFeed = streamingfeed.Feed(csvBarFeed)
+        streamingFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        streamingFeed.loadAll()
+        self.assertEqual(len(streamingFeed["orcl"]), 20)
+
+    def testUnsorted(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "orcl.csv")
+            # Swap two rows.
+            write_file(common.get_data_file_path("orcl-2000-yahoofinance.csv"), path, lambda rows: rows[:10] + [rows[11], rows[10]] + rows[12:])
+            streamingFeed = streamingfeed.Feed(yahoofeed.Feed())
+            streamingFeed.addBarsFromCSV("orcl", path)
+            with self.assertRaisesRegexp(Exception, "Bars for orcl are not sorted. .* found after .* in .*orcl.csv"):
+                streamingFeed.loadAll()
+
+    def testUnsortedFiles(self):
+        streamingFeed = streamingfeed.Feed(yahoofeed.Feed())
+        streamingFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2001-yahoofinance.csv"))
+        streamingFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        with self.assertRaisesRegexp(Exception, "Bars for orcl are not sorted"):
+            streamingFeed.loadAll()
+
+    def testDuplicateBars(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "orcl.csv")
+            write_file(common.get_data_file_path("orcl-2000-yahoofinance.csv"), path, lambda rows: rows[:10] + rows[9:])
+            streamingFeed = streamingfeed.Feed(yahoofeed.Feed())
+            streamingFeed.addBarsFromCSV("orcl", path)
+            with self.assertRaisesRegexp(Exception, "Duplicate bars found for \\['orcl'\\] on 2000-12-15"):
+                streamingFeed.loadAll()
+
+    def testAscendingFile(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "orcl.csv")
+            write_file(common.get_data_file_path("orcl-2000-yahoofinance.csv"), path, lambda rows: list(reversed(rows)))
+            memFeed = yahoofeed.Feed()
+            memFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+            streamingFeed = streamingfeed.Feed(yahoofeed.Feed())
+            streamingFeed.addBarsFromCSV("orcl", path)
+            self.assertEqual(get_values(streamingFeed), get_values(memFeed))
+
+    def testAddAfterStart(self):
+        memFeed, streamingFeed = self.__buildFeeds(FILES[:1])
+        streamingFeed.start()
+        with self.assertRaisesRegexp(Exception, "Can't add more bars once you started consuming bars"):
+            streamingFeed.addBarsFromCSV("spy", common.get_data_file_path("spy-2010-yahoofinance.csv"))
+
+    def testGenericBarFeed(self):
+        csvBarFeed = csvfeed.GenericBarFeed(bar.Frequency.DAY)
+        csvBarFeed.setDateTimeFormat("%Y-%m-%d")
+        csvBarFeed.setColumnName("datetime", "Date")
+        streamingFeed = streamingfeed.Feed(csvBarFeed)
+        streamingFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        streamingFeed.start()
+        self.assertTrue(streamingFeed.barsHaveAdjClose())
+        streamingFeed.setUseAdjustedValues(True)
+        streamingFeed.loadAll()
+        self.assertEqual(streamingFeed["orcl"][0].getAdjClose(), streamingFeed["orcl"][0].getPrice())
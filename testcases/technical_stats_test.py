@@ -70,3 +70,133 @@ class TestCase(common.TestCase):
             if i >= 4:
                 self.assertEqual(round(zscore[-1], 4), round(expected[i], 4))
             i += 1
+
+    def __buildValues(self, count, seed=1234):
+        rnd = numpy.random.RandomState(seed)
+        # Prices around 1000 with a couple of repeated values to exercise ties.
+        ret = list(numpy.round(1000 + rnd.standard_normal(count).cumsum(), 1))
+        ret[10:13] = [ret[9]] * 3
+        return ret
+
+    def testEWMAVariance(self):
+        values = self.__buildValues(300)
+        period = 10
+        alpha = 2.0 / (period + 1)
+        seqDS = dataseries.SequenceDataSeries()
+        ewmaVar = stats.EWMAVariance(seqDS, period)
+        for i, value in enumerate(values):
+            seqDS.append(value)
+            if i < period - 1:
+                self.assertEqual(ewmaVar[-1], None)
+            else:
+                weights = alpha * (1 - alpha) ** numpy.arange(i, -1, -1)
+                weights[0] = (1 - alpha) ** i
+                window = numpy.array(values[:i+1])
+                mean = numpy.average(window, weights=weights)
+                expected = numpy.average((window - mean) ** 2, weights=weights)
+                self.assertAlmostEqual(ewmaVar[-1], expected, places=6)
+
+    def testEWMAVarianceConstant(self):
+        seqDS = dataseries.SequenceDataSeries()
+        ewmaVar = stats.EWMAVariance(seqDS, 2)
+        for value in [5, 5, 5]:
+            seqDS.append(value)
+        self.assertEqual(ewmaVar[0], None)
+        self.assertEqual(ewmaVar[1], 0)
+        self.assertEqual(ewmaVar[2], 0)
+
+    def __testQuantile(self, values, period, quantile):
+        seqDS = dataseries.SequenceDataSeries()
+        quantileDS = stats.Quantile(seqDS, period, quantile)
+        for i, value in enumerate(values):
+            seqDS.append(value)
+            if i < period - 1:
+                self.assertEqual(quantileDS[-1], None)
+            else:
+                expected = numpy.percentile(values[i-period+1:i+1], quantile * 100)
+                self.assertAlmostEqual(quantileDS[-1], expected, places=8)
+
+    def testQuantile(self):
+        values = self.__buildValues(500)
+        for period in [1, 2, 5, 20]:
+            for quantile in [0, 0.05, 0.25, 0.5, 0.73, 1]:
+                self.__testQuantile(values, period, quantile)
+
+    def testQuantileMonotonic(self):
+        # Values leaving the window never reach the top of the lower heap, so they have to be compacted.
+        self.__testQuantile(range(1000), 10, 0.5)
+        self.__testQuantile(range(1000, 0, -1), 10, 0.5)
+
+    def testQuantileSkipNone(self):
+        seqDS = dataseries.SequenceDataSeries()
+        median = stats.Quantile(seqDS, 3, 0.5)
+        for value in [1, None, 3, 2, None, 10]:
+            seqDS.append(value)
+        self.assertEqual(median[0], None)
+        self.assertEqual(median[1], None)
+        self.assertEqual(median[2], None)
+        self.assertEqual(median[3], 2)
+        self.assertEqual(median[4], 2)
+        self.assertEqual(median[5], 3)
+
+    def __centralMoments(self, values):
+        values = numpy.array(values)
+        diff = values - values.mean()
+        return (diff ** 2).mean(), (diff ** 3).mean(), (diff ** 4).mean()
+
+    def testSkewness(self):
+        values = self.__buildValues(500)
+        period = 20
+        seqDS = dataseries.SequenceDataSeries()
+        skew = stats.Skewness(seqDS, period)
+        for i, value in enumerate(values):
+            seqDS.append(value)
+            if i < period - 1:
+                self.assertEqual(skew[-1], None)
+            else:
+                m2, m3, m4 = self.__centralMoments(values[i-period+1:i+1])
+                self.assertAlmostEqual(skew[-1], m3 / m2 ** 1.5, places=6)
+
+    def testKurtosis(self):
+        values = self.__buildValues(500)
+        period = 20
+        seqDS = dataseries.SequenceDataSeries()
+        kurt = stats.Kurtosis(seqDS, period)
+        for i, value in enumerate(values):
+            seqDS.append(value)
+            if i < period - 1:
+                self.assertEqual(kurt[-1], None)
+            else:
+                m2, m3, m4 = self.__centralMoments(values[i-period+1:i+1])
+                self.assertAlmostEqual(kurt[-1], m4 / m2 ** 2 - 3, places=6)
+
+    def testMomentsConstant(self):
+        seqDS = dataseries.SequenceDataSeries()
+        skew = stats.Skewness(seqDS, 3)
+        kurt = stats.Kurtosis(seqDS, 3)
+        for value in [2, 2, 2, 2]:
+            seqDS.append(value)
+        self.assertEqual(skew[-1], None)
+        self.assertEqual(kurt[-1], None)
+
+    def testMomentsBecomeConstant(self):
+        # Rounding errors left by the values that leave the window shouldn't be taken as variance.
+        period = 10
+        seqDS = dataseries.SequenceDataSeries()
+        skew = stats.Skewness(seqDS, period)
+        kurt = stats.Kurtosis(seqDS, period)
+        for value in self.__buildValues(period * 3):
+            seqDS.append(value * 1000)
+        for i in xrange(period * 3):
+            seqDS.append(10.1)
+            if i >= period - 1:
+                self.assertEqual(skew[-1], None)
+                self.assertEqual(kurt[-1], None)
+
+        # Values vary again.
+        values = self.__buildValues(period)
+        for value in values:
+            seqDS.append(value)
+        m2, m3, m4 = self.__centralMoments(values[-period:])
+        self.assertAlmostEqual(skew[-1], m3 / m2 ** 1.5, places=6)
+        self.assertAlmostEqual(kurt[-1], m4 / m2 ** 2 - 3, places=6)
@@ -0,0 +1,216 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import os
+
+import numpy as np
+import pytz
+
+import common
+import feed_test
+
+from pyalgotrade.barfeed import tickstore
+from pyalgotrade.bitcoincharts import barfeed
+from pyalgotrade.utils import dt
+from pyalgotrade import bar
+from pyalgotrade import strategy
+
+
+def load_trades(fromDateTime=None, toDateTime=None):
+    feed = barfeed.CSVTradeFeed()
+    feed.addBarsFromCSV(common.get_data_file_path("bitstampUSD.csv"), fromDateTime=fromDateTime, toDateTime=toDateTime)
+    return [(dateTime, bars["BTC"].getPrice(), bars["BTC"].getVolume()) for dateTime, bars in feed]
+
+
+def write_trades(path):
+    rowParser = barfeed.RowParser(barfeed.UnixTimeFix())
+    return tickstore.write_from_csv(common.get_data_file_path("bitstampUSD.csv"), rowParser, path, 1000)
+
+
+def get_values(barFeed, instrument="BTC"):
+    return [(dateTime, bars[instrument].getPrice(), bars[instrument].getVolume()) for dateTime, bars in barFeed]
+
+
+class TestStrategy(strategy.BacktestingStrategy):
+    def __init__(self, barFeed):
+        strategy.BacktestingStrategy.__init__(self, barFeed)
+        self.tradeCount = 0
+
+    def onBars(self, bars):
+        self.tradeCount += 1
+
+
+class TickStoreTestCase(common.TestCase):
+    def testWriteAndLoad(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bitstampUSD")
+            self.assertEqual(write_trades(path), 9999)
+            expected = load_trades()
+            for mmap in [True, False]:
+                store = tickstore.load(path, mmap)
+                self.assertEqual(len(store), 9999)
+                self.assertEqual(store.getTimestamps().dtype, np.int64)
+                values = [(store.getDateTime(i), store.getTrade(i).getPrice(), store.getTrade(i).getVolume()) for i in xrange(len(store))]
+                self.assertEqual(values, expected)
+                self.assertEqual(store.getTrade(0).getTradeId(), None)
+
+    def testSaveAndLoad(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "trades")
+            dateTime = datetime.datetime(2014, 1, 1)
+            writer = tickstore.TickStoreWriter(path, 2)
+            for i in xrange(5):
+                writer.addTrade(dateTime + datetime.timedelta(seconds=i), 100 + i, 0.5, 1000 + i)
+            writer.close()
+
+            store = tickstore.load(path)
+            self.assertEqual(store.getTradeIds().tolist(), range(1000, 1005))
+            trade = store.getTrade(4)
+            self.assertEqual(trade.getDateTime(), dt.as_utc(dateTime + datetime.timedelta(seconds=4)))
+            self.assertEqual(trade.getClose(), 104)
+            self.assertEqual(trade.getTradeId(), 1004)
+            self.assertEqual(trade.getFrequency(), bar.Frequency.TRADE)
+
+            copyPath = os.path.join(tmpPath, "copy")
+            tickstore.save(store.slice(dateTime + datetime.timedelta(seconds=1), dateTime + datetime.timedelta(seconds=2)), copyPath)
+            self.assertEqual(tickstore.load(copyPath).getPrices().tolist(), [101, 102])
+
+    def testEmpty(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "trades")
+            tickstore.TickStoreWriter(path).close()
+            store = tickstore.load(path)
+            self.assertEqual(len(store), 0)
+            self.assertEqual(len(store.slice(datetime.datetime(2014, 1, 1))), 0)
+
+            barFeed = tickstore.Feed()
+            barFeed.addTicks("BTC", store)
+            self.assertEqual(get_values(barFeed), [])
+
+    def testUnsorted(self):
+        with common.TmpDir() as tmpPath:
+            writer = tickstore.TickStoreWriter(os.path.join(tmpPath, "trades"))
+            writer.addTrade(datetime.datetime(2014, 1, 2), 1, 1)
+            with self.assertRaisesRegexp(Exception, "Trades are not sorted"):
+                writer.addTrade(datetime.datetime(2014, 1, 1), 1, 1)
+            with self.assertRaisesRegexp(Exception, "Duplicate trade datetime"):
+                writer.addTrade(datetime.datetime(2014, 1, 2), 2, 1)
+            # The rejected trades were not added.
+            writer.addTrade(datetime.datetime(2014, 1, 2, 0, 0, 0, 1), 2, 1)
+            writer.close()
+            store = tickstore.load(os.path.join(tmpPath, "trades"))
+            self.assertEqual(store.getPrices().tolist(), [1, 2])
+
+    def testSlice(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bitstampUSD")
+            write_trades(path)
+            store = tickstore.load(path)
+            fromDateTime = dt.as_utc(datetime.datetime(2012, 5, 29))
+            toDateTime = datetime.datetime(2012, 5, 31)
+            self.assertEqual(len(store.slice(fromDateTime, toDateTime)), 579)
+            self.assertEqual(len(store.slice(fromDateTime)), 646)
+            self.assertEqual(len(store.slice(toDateTime=toDateTime)), 9999 - 646 + 579)
+            self.assertEqual(len(store.slice(toDateTime, fromDateTime)), 0)
+            # Slices are views.
+            self.assertFalse(store.slice(fromDateTime).getPrices().flags["OWNDATA"])
+            # Both ends are inclusive.
+            lastDateTime = store.getDateTime(len(store) - 1)
+            self.assertEqual(len(store.slice(lastDateTime, lastDateTime)), 1)
+
+    def testFeed(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bitstampUSD")
+            write_trades(path)
+            barFeed = tickstore.Feed()
+            barFeed.addTicks("BTC", tickstore.load(path))
+            self.assertEqual(get_values(barFeed), load_trades())
+
+            # Reset and replay.
+            barFeed.reset()
+            self.assertEqual(len(get_values(barFeed)), 9999)
+            self.assertEqual(len(barFeed["BTC"]), 1024)
+
+    def testFeedInRange(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bitstampUSD")
+            write_trades(path)
+            fromDateTime = dt.as_utc(datetime.datetime(2012, 5, 29))
+            toDateTime = dt.as_utc(datetime.datetime(2012, 5, 31))
+            barFeed = tickstore.Feed()
+            barFeed.addTicks("BTC", tickstore.load(path), fromDateTime, toDateTime)
+            self.assertEqual(get_values(barFeed), load_trades(fromDateTime, toDateTime))
+
+    def testFeedTimezone(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bitstampUSD")
+            write_trades(path)
+            timezone = pytz.timezone("US/Eastern")
+            barFeed = tickstore.Feed(timezone)
+            barFeed.addTicks("BTC", tickstore.load(path).slice(toDateTime=datetime.datetime(2011, 9, 13, 14)))
+            dateTime, bars = iter(barFeed).next()
+            self.assertEqual(dateTime, dt.as_utc(datetime.datetime(2011, 9, 13, 13, 53, 36)))
+            self.assertEqual(dateTime.tzinfo.zone, "US/Eastern")
+            self.assertEqual(bars["BTC"].getDateTime(), dateTime)
+
+    def testMergeInstruments(self):
+        dateTime = datetime.datetime(2014, 1, 1)
+        store1 = tickstore.TickStore(
+            np.array([tickstore.datetime_to_micros(dateTime + datetime.timedelta(seconds=i)) for i in [0, 1, 3]]),
+            np.array([1.0, 2.0, 3.0]), np.array([1.0, 1.0, 1.0])
+        )
+        store2 = tickstore.TickStore(
+            np.array([tickstore.datetime_to_micros(dateTime + datetime.timedelta(seconds=i)) for i in [1, 2]]),
+            np.array([10.0, 20.0]), np.array([1.0, 1.0])
+        )
+        barFeed = tickstore.Feed()
+        barFeed.addTicks("a", store1)
+        barFeed.addTicks("b", store2)
+        values = [(barsDateTime.second, sorted([(instrument, bars[instrument].getPrice()) for instrument in bars.getInstruments()])) for barsDateTime, bars in barFeed]
+        self.assertEqual(values, [
+            (0, [("a", 1.0)]),
+            (1, [("a", 2.0), ("b", 10.0)]),
+            (2, [("b", 20.0)]),
+            (3, [("a", 3.0)]),
+        ])
+
+        with self.assertRaisesRegexp(Exception, "already added"):
+            barFeed = tickstore.Feed()
+            barFeed.addTicks("a", store1)
+            barFeed.addTicks("a", store2)
+
+    def testStrategy(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bitstampUSD")
+            write_trades(path)
+            barFeed = tickstore.Feed()
+            barFeed.addTicks("BTC", tickstore.load(path))
+            strat = TestStrategy(barFeed)
+            strat.run()
+            self.assertEqual(strat.tradeCount, 9999)
+
+    def testBaseFeedInterface(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "bitstampUSD")
+            write_trades(path)
+            barFeed = tickstore.Feed()
+            barFeed.addTicks("BTC", tickstore.load(path))
+            feed_test.tstBaseFeedInterface(self, barFeed)
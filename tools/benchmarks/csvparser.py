@@ -0,0 +1,104 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+
+Compares the row by row CSV parser used by csvfeed.GenericBarFeed with the bulk one.
+Usage: python csvparser.py [rows]
+"""
+
+import sys
+import os
+import datetime
+import tempfile
+import time
+
+sys.path.append(os.path.join("..", ".."))  # For pyalgotrade
+
+from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.utils import csvutils
+from pyalgotrade import bar
+
+
+COLUMN_NAMES = {
+    "datetime": "Date Time",
+    "open": "Open",
+    "high": "High",
+    "low": "Low",
+    "close": "Close",
+    "volume": "Volume",
+    "adj_close": "Adj Close",
+}
+
+
+def write_file(path, rows):
+    dateTime = datetime.datetime(2000, 1, 3, 9, 30)
+    with open(path, "w") as f:
+        f.write("Date Time,Open,High,Low,Close,Volume,Adj Close\n")
+        for i in xrange(rows):
+            price = 100 + (i % 100) / 10.0
+            f.write("%s,%.2f,%.2f,%.2f,%.2f,%d,%.2f\n" % (
+                dateTime.strftime("%Y-%m-%d %H:%M:%S"), price, price + 0.5, price - 0.5, price + 0.25, 1000 + i, price
+            ))
+            dateTime += datetime.timedelta(minutes=1)
+
+
+def build_row_parser():
+    return csvfeed.GenericRowParser(COLUMN_NAMES, "%Y-%m-%d %H:%M:%S", None, bar.Frequency.MINUTE, None)
+
+
+def parse_rows(path):
+    rowParser = build_row_parser()
+    reader = csvutils.FastDictReader(open(path, "r"), fieldnames=rowParser.getFieldNames(), delimiter=rowParser.getDelimiter())
+    return [rowParser.parseBar(row) for row in reader]
+
+
+def parse_columns(path):
+    return build_row_parser().parseColumns(path)
+
+
+def parse_bars(path):
+    return build_row_parser().parseBars(path)
+
+
+def measure(func, path, rows):
+    begin = time.time()
+    func(path)
+    elapsed = time.time() - begin
+    return elapsed, rows / elapsed
+
+
+def main():
+    rows = 200000
+    if len(sys.argv) > 1:
+        rows = int(sys.argv[1])
+
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        write_file(path, rows)
+        baseline, baselineRate = measure(parse_rows, path, rows)
+        print "%-30s %10.3f s %12d rows/s" % ("Row by row (baseline)", baseline, baselineRate)
+        for name, func in [("Bulk, typed columns", parse_columns), ("Bulk, BasicBar instances", parse_bars)]:
+            elapsed, rate = measure(func, path, rows)
+            print "%-30s %10.3f s %12d rows/s %8.1fx" % (name, elapsed, rate, baseline / elapsed)
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+
+Compares pyalgotrade.utils.dt timezone and timestamp conversions with the plain pytz ones.
+Usage: python dtlocalize.py [datetimes]
+"""
+
+import sys
+import os
+import datetime
+import time
+
+import pytz
+
+sys.path.append(os.path.join("..", ".."))  # For pyalgotrade
+
+from pyalgotrade.utils import dt
+
+
+def pytz_localize(dateTime, timeZone):
+    if dt.datetime_is_naive(dateTime):
+        return timeZone.localize(dateTime)
+    return dateTime.astimezone(timeZone)
+
+
+def pytz_timestamp(dateTime):
+    return (pytz_localize(dateTime, pytz.utc) - dt.epoch_utc).total_seconds()
+
+
+def measure(func, values):
+    begin = time.time()
+    for value in values:
+        func(value)
+    return time.time() - begin
+
+
+def main():
+    count = 200000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+
+    timeZone = pytz.timezone("US/Eastern")
+    naive = [datetime.datetime(2011, 1, 3, 9, 30) + datetime.timedelta(minutes=i) for i in xrange(count)]
+    utc = [pytz.utc.localize(dateTime) for dateTime in naive]
+    localized = [timeZone.localize(dateTime) for dateTime in naive]
+
+    for name, baseline, func, values in [
+        ("Localize naive", lambda d: pytz_localize(d, timeZone), lambda d: dt.localize(d, timeZone), naive),
+        ("Convert UTC to timezone", lambda d: pytz_localize(d, timeZone), lambda d: dt.localize(d, timeZone), utc),
+        ("Convert to UTC", lambda d: pytz_localize(d, pytz.utc), dt.as_utc, localized),
+        ("Timestamp from naive", pytz_timestamp, dt.datetime_to_timestamp, naive),
+        ("Timestamp from localized", pytz_timestamp, dt.datetime_to_timestamp, localized),
+    ]:
+        baselineTime = measure(baseline, values)
+        elapsed = measure(func, values)
+        print "%-28s %10.3f s %10.3f s %8.1fx" % (name, baselineTime, elapsed, baselineTime / elapsed)
+
+
+if __name__ == "__main__":
+    main()
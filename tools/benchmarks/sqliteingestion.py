@@ -0,0 +1,96 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+
+Compares adding bars to a sqlitefeed.Database one at a time with adding them in bulk.
+Usage: python sqliteingestion.py [bars]
+"""
+
+import sys
+import os
+import datetime
+import shutil
+import tempfile
+import time
+
+sys.path.append(os.path.join("..", ".."))  # For pyalgotrade
+
+from pyalgotrade.barfeed import sqlitefeed
+from pyalgotrade import bar
+
+
+INSTRUMENTS = ["ibm", "orcl", "spy", "aapl"]
+
+
+def build_bars(count):
+    ret = []
+    dateTime = datetime.datetime(2000, 1, 3, 9, 30)
+    while len(ret) < count:
+        for i, instrument in enumerate(INSTRUMENTS):
+            price = 100 + (len(ret) % 100) / 10.0
+            ret.append((instrument, bar.BasicBar(dateTime, price, price + 0.5, price - 0.5, price + 0.25, 1000 + i, price, bar.Frequency.MINUTE)))
+        dateTime += datetime.timedelta(minutes=1)
+    return ret[:count]
+
+
+def add_one_at_a_time(db, instrumentBars):
+    for instrument, bar_ in instrumentBars:
+        db.addBar(instrument, bar_, bar.Frequency.MINUTE)
+
+
+def add_in_bulk(db, instrumentBars, batchSize=10000):
+    for i in xrange(0, len(instrumentBars), batchSize):
+        db.addManyBars(instrumentBars[i:i + batchSize], bar.Frequency.MINUTE)
+
+
+def measure(tmpDir, name, func, instrumentBars, journalMode=None, pragmas=None):
+    db = sqlitefeed.Database(os.path.join(tmpDir, "%s.sqlite" % name), journalMode, pragmas)
+    try:
+        begin = time.time()
+        func(db, instrumentBars)
+        elapsed = time.time() - begin
+    finally:
+        db.disconnect()
+    return elapsed, len(instrumentBars) / elapsed
+
+
+def main():
+    count = 100000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+
+    instrumentBars = build_bars(count)
+    tmpDir = tempfile.mkdtemp()
+    try:
+        # Adding bars one at a time is really slow, so fewer bars are used and the rate is extrapolated.
+        baselineBars = instrumentBars[:min(count, 5000)]
+        baseline, baselineRate = measure(tmpDir, "baseline", add_one_at_a_time, baselineBars)
+        print "%-35s %10.3f s %12d bars/s" % ("One at a time (%d bars)" % len(baselineBars), baseline, baselineRate)
+        for name, journalMode, pragmas in [
+            ("Bulk", None, None),
+            ("Bulk, WAL", "WAL", None),
+            ("Bulk, WAL and ingestion pragmas", "WAL", sqlitefeed.INGESTION_PRAGMAS),
+        ]:
+            elapsed, rate = measure(tmpDir, name.replace(" ", ""), add_in_bulk, instrumentBars, journalMode, pragmas)
+            print "%-35s %10.3f s %12d bars/s %8.1fx" % (name, elapsed, rate, rate / baselineRate)
+    finally:
+        shutil.rmtree(tmpDir)
+
+
+if __name__ == "__main__":
+    main()
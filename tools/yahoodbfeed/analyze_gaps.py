@@ -25,6 +25,8 @@ import datetime
 sys.path.append(os.path.join("..", "symbols"))
 sys.path.append(os.path.join("..", ".."))  # For pyalgotrade
 
+import pytz
+
 import symbolsxml
 import merval_calendar
 import pyalgotrade.logger
@@ -33,80 +35,49 @@ pyalgotrade.logger.file_log = "analyze_gaps.log"
 logger = pyalgotrade.logger.getLogger("analyze_gaps")
 
 from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade.tools import dataquality
+from pyalgotrade import sessioncalendar
 
 
 storage = "data"
-
-
-class MissingDataVerifier:
-    def __init__(self, barDataSeries, threshold):
-        self.__barDataSeries = barDataSeries
-        self.__threshold = threshold
-
-    def isTradingDay(self, dateTime):
-        raise NotImplementedError()
-
-    def getDatesInBetween(self, prevDateTime, currentDateTime):
-        assert((currentDateTime - prevDateTime).days > 1)
-        ret = []
-        dateTime = prevDateTime + datetime.timedelta(days=1)
-        while dateTime < currentDateTime:
-            # Skip weekends.
-            if dateTime.weekday() not in [5, 6]:
-                ret.append(dateTime.date())
-            dateTime = dateTime + datetime.timedelta(days=1)
-        return ret
-
-    def __processGap(self, prevDateTime, currentDateTime):
-        dates = self.getDatesInBetween(prevDateTime, currentDateTime)
-        dates = filter(lambda x: not self.isTradingDay(x), dates)
-        if len(dates) >= self.__threshold:
-            logger.warning("%d day gap between %s and %s" % (len(dates), prevDateTime, currentDateTime))
-
-    def run(self):
-        prevDateTime = None
-        for bar in self.__barDataSeries:
-            currentDateTime = bar.getDateTime()
-            if prevDateTime is not None:
-                if (currentDateTime - prevDateTime).days > 1:
-                    self.__processGap(prevDateTime, currentDateTime)
-            prevDateTime = currentDateTime
+processes = None
 
 
 def get_csv_filename(symbol, year):
     return os.path.join(storage, "%s-%d-yahoofinance.csv" % (symbol, year))
 
 
-def process_symbol(symbol, fromYear, toYear, missingDataVerifierClass):
-    logger.info("Processing %s from %d to %d" % (symbol, fromYear, toYear))
-
-    filesFound = 0
-    # Load the bars from the CSV files.
-    feed = yahoofeed.Feed(maxLen=1000000)
-    feed.sanitizeBars(True)
-    for year in range(fromYear, toYear+1):
-        fileName = get_csv_filename(symbol, year)
-        if os.path.exists(fileName):
-            filesFound += 1
-            feed.addBarsFromCSV(symbol, fileName)
-
-    if filesFound > 0:
-        # Process all items.
-        for dateTime, bars in feed:
-            pass
-
-        missingDataVerifier = missingDataVerifierClass(feed[symbol])
-        missingDataVerifier.run()
-    else:
-        logger.error("No files found")
-
-
-class MervalMissingDataVerifier(MissingDataVerifier):
-    def __init__(self, barDataSeries):
-        MissingDataVerifier.__init__(self, barDataSeries, 5)
-
-    def isTradingDay(self, dateTime):
-        return not merval_calendar.is_trading_day(dateTime)
+def get_merval_calendar():
+    holidays = set()
+    for year, months in merval_calendar.skip_dates.iteritems():
+        for month, days in months.iteritems():
+            for day in days:
+                holidays.add(datetime.date(year, month, day))
+    return sessioncalendar.SessionCalendar(pytz.timezone("America/Argentina/Buenos_Aires"), datetime.time(11), datetime.time(17), holidays)
+
+
+def process_symbols(symbols, fromYear, toYear, calendar):
+    files = []
+    for symbol in symbols:
+        for year in range(fromYear, toYear+1):
+            fileName = get_csv_filename(symbol, year)
+            if os.path.exists(fileName):
+                files.append((symbol, fileName))
+    symbolsFound = set([item[0] for item in files])
+    for symbol in symbols:
+        if symbol not in symbolsFound:
+            logger.error("No files found for %s" % (symbol))
+
+    reports = dataquality.analyze_files(yahoofeed.Feed(), files, calendar, processes)
+    for report in reports:
+        if report.getError() is not None:
+            logger.error("%s: %s" % (report.getInstrument(), report.getError()))
+        elif report.hasIssues():
+            counts = report.getIssueCounts()
+            logger.warning("%s: %s" % (report.getInstrument(), ", ".join(["%s %d" % (issue, counts[issue]) for issue in dataquality.ISSUES if counts[issue]])))
+            for date in report.getMissingSessions():
+                logger.warning("%s: No bars on %s" % (report.getInstrument(), date))
+    dataquality.write_summary(reports, "analyze_gaps.csv")
 
 
 def main():
@@ -116,11 +87,10 @@ def main():
     try:
         # MERVAL config.
         symbolsFile = os.path.join("..", "symbols", "merval.xml")
-        missingDataVerifierClass = MervalMissingDataVerifier
-
-        stockCallback = lambda stock: process_symbol(stock.getTicker(), fromYear, toYear, missingDataVerifierClass)
-        indexCallback = stockCallback
-        symbolsxml.parse(symbolsFile, stockCallback, indexCallback)
+        symbols = []
+        callback = lambda stock: symbols.append(stock.getTicker())
+        symbolsxml.parse(symbolsFile, callback, callback)
+        process_symbols(symbols, fromYear, toYear, get_merval_calendar())
     except Exception, e:
         logger.error(str(e))
 
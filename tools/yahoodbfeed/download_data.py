@@ -30,39 +30,43 @@ pyalgotrade.logger.file_log = "download_data.log"
 logger = pyalgotrade.logger.getLogger("download_data")
 
 from pyalgotrade.tools import yahoofinance
+from pyalgotrade.tools import downloader
 import symbolsxml
 
 
 storage = "data"
+downloads = 8
 
 
 def get_csv_filename(symbol, year):
     return os.path.join(storage, "%s-%d-yahoofinance.csv" % (symbol, year))
 
 
-def download_files_for_symbol(symbol, fromYear, toYear):
+def download_files(symbols, fromYear, toYear):
     if not os.path.exists(storage):
         logger.info("Creating %s directory" % (storage))
         os.mkdir(storage)
 
-    status = ""
-    for year in range(fromYear, toYear+1):
-        fileName = get_csv_filename(symbol, year)
-        if not os.path.exists(fileName):
-            logger.info("Downloading %s %d to %s" % (symbol, year, fileName))
-            try:
-                yahoofinance.download_daily_bars(symbol, year, fileName)
-                status += "1"
-            except Exception, e:
-                logger.error(str(e))
+    missing = []
+    for symbol in symbols:
+        for year in range(fromYear, toYear+1):
+            fileName = get_csv_filename(symbol, year)
+            if not os.path.exists(fileName):
+                missing.append(("%s %d" % (symbol, year), fileName, yahoofinance.download_daily_bars, (symbol, year, fileName)))
+    failed = downloader.download_files(missing, downloads, True, logger)
+
+    for symbol in symbols:
+        status = ""
+        for year in range(fromYear, toYear+1):
+            if get_csv_filename(symbol, year) in failed:
                 status += "0"
-        else:
-            status += "1"
+            else:
+                status += "1"
 
-    if status.find("1") == -1:
-        logger.fatal("No data found for %s" % (symbol))
-    elif status.lstrip("0").find("0") != -1:
-        logger.fatal("Some bars are missing for %s" % (symbol))
+        if status.find("1") == -1:
+            logger.fatal("No data found for %s" % (symbol))
+        elif status.lstrip("0").find("0") != -1:
+            logger.fatal("Some bars are missing for %s" % (symbol))
 
 
 def main():
@@ -71,8 +75,10 @@ def main():
 
     try:
         symbolsFile = os.path.join("..", "symbols", "merval.xml")
-        callback = lambda stock: download_files_for_symbol(stock.getTicker(), fromYear, toYear)
+        symbols = []
+        callback = lambda stock: symbols.append(stock.getTicker())
         symbolsxml.parse(symbolsFile, callback, callback)
+        download_files(symbols, fromYear, toYear)
     except Exception, e:
         logger.error(str(e))
 